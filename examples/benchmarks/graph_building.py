@@ -0,0 +1,92 @@
+"""
+Benchmark of process graph flattening and unflattening on large graphs.
+
+Usage:
+
+    python examples/benchmarks/graph_building.py --sizes 10000 30000 100000
+
+Graph shapes:
+
+- "chain": long method chain (each node depends on the previous one),
+  which used to hit the recursion limit.
+- "bandmath": many small band math expressions on a shared input, combined in one array.
+
+The "interactive" benchmark simulates building a long chain step by step,
+getting the flat graph (e.g. to download or validate) after each step.
+"""
+
+import argparse
+import gc
+import time
+from typing import Callable, List
+
+from openeo.internal.graph_building import GraphFlattener, PGNode
+
+
+def chain_graph(size: int) -> PGNode:
+    node = PGNode("load_collection", id="S2")
+    for i in range(size - 1):
+        node = PGNode("add", x={"from_node": node}, y=i)
+    return node
+
+
+def bandmath_graph(size: int) -> PGNode:
+    data = PGNode("load_collection", id="S2")
+    expressions = []
+    # Each expression has 4 nodes: 2 band lookups, a subtraction and a division.
+    for i in range(max(1, (size - 2) // 4)):
+        b1 = PGNode("array_element", data=data, index=i % 13)
+        b2 = PGNode("array_element", data=data, index=(i + 1) % 13)
+        expressions.append(PGNode("divide", x=PGNode("subtract", x=b1, y=b2), y=i + 1))
+    return PGNode("array_create", data=expressions)
+
+
+def timed(func: Callable, repeat: int) -> float:
+    """Best time (in seconds) of multiple runs."""
+    times = []
+    for _ in range(repeat):
+        gc.collect()
+        start = time.perf_counter()
+        func()
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+
+def interactive(steps: int, cached: bool = True) -> float:
+    """Time (in seconds) to build a chain step by step, getting the flat graph after each step."""
+    node = PGNode("load_collection", id="S2")
+    start = time.perf_counter()
+    for i in range(steps):
+        node = PGNode("add", x={"from_node": node}, y=i)
+        result = PGNode("save_result", data=node, format="GTiff")
+        if cached:
+            result.flat_graph()
+        else:
+            GraphFlattener().flatten(result)
+    return time.perf_counter() - start
+
+
+def main(sizes: List[int], repeat: int):
+    print(f"{'shape':<10} {'nodes':>8} {'flatten':>10} {'unflatten':>10} {'nodes/s':>10}")
+    for shape, build in [("chain", chain_graph), ("bandmath", bandmath_graph)]:
+        for size in sizes:
+            graph = build(size)
+            flat_graph = graph.flat_graph()
+            flatten = timed(graph.flat_graph, repeat=repeat)
+            unflatten = timed(lambda: PGNode.from_flat_graph(flat_graph), repeat=repeat)
+            print(
+                f"{shape:<10} {len(flat_graph):>8} {flatten:>9.3f}s {unflatten:>9.3f}s"
+                f" {len(flat_graph) / flatten:>10.0f}"
+            )
+
+    print(f"\n{'interactive':<12} {'steps':>8} {'uncached':>10} {'cached':>10}")
+    for steps in [1000, 3000]:
+        print(f"{'':<12} {steps:>8} {interactive(steps, cached=False):>9.3f}s {interactive(steps):>9.3f}s")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 30_000, 100_000])
+    parser.add_argument("--repeat", type=int, default=3)
+    arguments = parser.parse_args()
+    main(sizes=arguments.sizes, repeat=arguments.repeat)
@@ -0,0 +1,58 @@
+"""
+Benchmark of generating many process graphs that only differ in a few values (e.g. bbox and dates),
+by rebuilding (and flattening) the graph each time versus instantiating a graph template.
+
+Usage:
+
+    python examples/benchmarks/graph_template.py --count 50000
+"""
+
+import argparse
+import time
+
+from openeo.api.process import Parameter
+from openeo.internal.graph_building import PGNode
+from openeo.internal.graph_template import GraphTemplate
+
+
+def build(spatial_extent, start, end) -> PGNode:
+    """Typical batch job graph: load, cloud mask, band math, temporal composite and save."""
+    data = PGNode(
+        "load_collection", id="S2", spatial_extent=spatial_extent, temporal_extent=[start, end], bands=["B04", "B08", "SCL"]
+    )
+    scl = PGNode("filter_bands", data=data, bands=["SCL"])
+    mask = PGNode("apply", data=scl, process={"process_graph": PGNode("neq", x={"from_parameter": "x"}, y=4)})
+    data = PGNode("mask", data=data, mask=mask)
+    b4 = PGNode("array_element", data={"from_parameter": "data"}, index=0)
+    b8 = PGNode("array_element", data={"from_parameter": "data"}, index=1)
+    ndvi = PGNode("divide", x=PGNode("subtract", x=b8, y=b4), y=PGNode("add", x=b8, y=b4))
+    data = PGNode("reduce_dimension", data=data, dimension="bands", reducer={"process_graph": ndvi})
+    median = PGNode("median", data={"from_parameter": "data"})
+    data = PGNode("reduce_dimension", data=data, dimension="t", reducer={"process_graph": median})
+    return PGNode("save_result", data=data, format="GTiff")
+
+
+def main(count: int):
+    rows = [({"west": 3 + i * 1e-4, "south": 51, "east": 3.1 + i * 1e-4, "north": 51.1}, "2022-01-01", "2022-02-01") for i in range(count)]
+
+    start = time.perf_counter()
+    for bbox, t0, t1 in rows:
+        build(bbox, t0, t1).flat_graph()
+    rebuild = time.perf_counter() - start
+
+    start = time.perf_counter()
+    template = GraphTemplate(
+        build(Parameter("bbox", description="bbox"), Parameter("start", description="start"), Parameter("end", description="end"))
+    )
+    for bbox, t0, t1 in rows:
+        template.instantiate(bbox=bbox, start=t0, end=t1)
+    instantiate = time.perf_counter() - start
+
+    print(f"{count} graphs: rebuild + flatten {rebuild:.3f}s, template {instantiate:.3f}s ({rebuild / instantiate:.0f}x)")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--count", type=int, default=50_000)
+    arguments = parser.parse_args()
+    main(count=arguments.count)
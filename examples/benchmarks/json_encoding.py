@@ -0,0 +1,85 @@
+"""
+Benchmark of JSON encoding of process graphs with large inline data (GeoJSON, arrays).
+
+Usage:
+
+    python examples/benchmarks/json_encoding.py --points 100000 1000000
+
+Compares:
+
+- "json": plain stdlib ``json.dumps`` of the full process graph (indent=2)
+- "to_json": ``to_json()`` (orjson when available)
+- "wire": compact request body encoding (``json_encoding.dumps_bytes``)
+- "stream": ``print_json()`` to a file, node by node
+
+Reported are run time and peak memory allocated during encoding (measured in a separate run).
+"""
+
+import argparse
+import gc
+import json
+import random
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+from typing import Callable, List, Tuple
+
+from openeo.internal import json_encoding
+from openeo.internal.graph_building import PGNode
+
+
+def build_graph(points: int) -> PGNode:
+    """Process graph with an inline polygon and a (same size) array of floats."""
+    rng = random.Random(42)
+    ring = [[round(rng.uniform(3, 4), 6), round(rng.uniform(51, 52), 6)] for _ in range(points)]
+    ring.append(ring[0])
+    data = PGNode("load_collection", id="S2")
+    data = PGNode("aggregate_spatial", data=data, geometries={"type": "Polygon", "coordinates": [ring]}, reducer="mean")
+    data = PGNode("linear_scale_range", x=data, values=[rng.random() for _ in range(points)])
+    return PGNode("save_result", data=data, format="JSON")
+
+
+def measure(func: Callable, repeat: int) -> Tuple[float, float]:
+    """Best time (in seconds) and peak memory (in MB) of given function."""
+    times = []
+    for _ in range(repeat):
+        gc.collect()
+        start = time.perf_counter()
+        func()
+        times.append(time.perf_counter() - start)
+    gc.collect()
+    tracemalloc.start()
+    func()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return min(times), peak / 1e6
+
+
+def main(points: List[int], repeat: int):
+    print(f"orjson available: {json_encoding.orjson is not None}")
+    print(f"{'points':>8} {'method':<8} {'time':>8} {'peak mem':>10} {'size':>10}")
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        path = Path(tmp_dir) / "graph.json"
+        for size in points:
+            graph = build_graph(size)
+            pg = {"process_graph": graph.flat_graph()}
+            methods = [
+                ("json", lambda: json.dumps(pg, indent=2)),
+                ("to_json", lambda: graph.to_json()),
+                ("wire", lambda: json_encoding.dumps_bytes(pg)),
+                ("stream", lambda: graph.print_json(file=path)),
+            ]
+            for name, func in methods:
+                elapsed, peak = measure(func, repeat=repeat)
+                result = func()
+                encoded_size = path.stat().st_size if result is None else len(result)
+                print(f"{size:>8} {name:<8} {elapsed:>7.3f}s {peak:>8.1f}MB {encoded_size / 1e6:>8.1f}MB")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--points", type=int, nargs="+", default=[100_000, 1_000_000])
+    parser.add_argument("--repeat", type=int, default=3)
+    arguments = parser.parse_args()
+    main(points=arguments.points, repeat=arguments.repeat)
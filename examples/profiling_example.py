@@ -1,9 +1,5 @@
 # -*- coding: utf-8 -*-
-from pathlib import Path
 import openeo
-import tarfile
-import tempfile
-import pstats
 
 
 if __name__ == '__main__':
@@ -24,11 +20,12 @@ if __name__ == '__main__':
     # enable profiling and run the process
     # IMPORTANT: profiling can only be enabled in batch mode
     job_options={ 'profile':'true' }
-    data.execute_batch('profiling_example_result.json',out_format='json',job_options=job_options)
+    job=data.execute_batch('profiling_example_result.json',out_format='json',job_options=job_options)
 
-    # read and display profiling results of the rdd's
-    with tarfile.open('profile_dumps.tar.gz', 'r') as tf:
-        with tempfile.TemporaryDirectory() as td:
-            tf.extractall(td)
-            for iprof in list(filter(lambda i: i.endswith('.pstats'), tf.getnames())):
-                pstats.Stats(str(Path(td,iprof))).print_stats()
+    # merge the profiling results of the rdd's and show the hotspots
+    profile=job.get_results().get_profile()
+    profile.stats.sort_stats('cumulative').print_stats(20)
+    for hotspot in profile.hotspots(limit=10):
+        print(hotspot)
+    # render e.g. with flamegraph.pl or https://www.speedscope.app/
+    profile.write_collapsed_stacks('profiling_example.folded')
@@ -0,0 +1,324 @@
+"""
+Split large sets of geometries (e.g. hundreds of thousands of field polygons) for ``aggregate_spatial``
+in spatially compact batches, run an ``aggregate_spatial`` batch job per batch
+(limited to the bounding box of the batch)
+with :py:class:`~openeo.extra.job_management.MultiBackendJobManager`
+and merge the results, keyed by the original feature ids.
+
+Usage example:
+
+.. code-block:: python
+
+    import geopandas
+    from openeo.extra.job_management import MultiBackendJobManager
+    from openeo.extra.geometry_batching import run_aggregate_spatial_batched
+
+    fields = geopandas.read_file("fields.gpkg").set_index("field_id")
+    cube = connection.load_collection(
+        "SENTINEL2_L2A", temporal_extent=["2022-01-01", "2023-01-01"], bands=["B04", "B08"]
+    ).ndvi()
+
+    manager = MultiBackendJobManager(root_dir="batches")
+    manager.add_backend("foo", connection=connection, parallel_jobs=4)
+
+    results = run_aggregate_spatial_batched(
+        cube, geometries=fields, reducer="mean", max_features=2000,
+        manager=manager, output_file="batches.csv",
+    )
+    df = results.to_pandas()
+
+.. versionadded:: 0.21.0
+"""
+
+import json
+import logging
+import math
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Union
+
+import pandas as pd
+import shapely.geometry
+from shapely.geometry.base import BaseGeometry
+
+from openeo.extra.job_management import MultiBackendJobManager, run_partition_jobs
+from openeo.rest import OpenEoClientException
+from openeo.rest.datacube import DataCube
+from openeo.rest.vectorcube import VectorCube
+from openeo.util import BBoxDict
+
+_log = logging.getLogger(__name__)
+
+# Names of the feature index column in CSV results of `aggregate_spatial`.
+_FEATURE_INDEX_NAMES = ["feature_index", "polygon", "index"]
+
+
+class GeometryBatch:
+    """
+    Batch of features from :py:func:`batch_geometries`.
+
+    .. versionadded:: 0.21.0
+    """
+
+    __slots__ = ("id", "feature_ids", "geometries", "bbox")
+
+    def __init__(self, id: str, feature_ids: List[Any], geometries: List[BaseGeometry], buffer: float = 0):
+        #: Batch identifier, e.g. "batch-0003".
+        self.id = id
+        #: Original ids of the features in this batch (in batch order).
+        self.feature_ids = feature_ids
+        #: Geometries of the features (in batch order).
+        self.geometries = geometries
+        #: Bounding box of the features, extended with ``buffer`` (in degrees) on each side.
+        west, south, east, north = shapely.geometry.GeometryCollection(geometries).bounds
+        self.bbox = BBoxDict.from_sequence(
+            (west - buffer, south - buffer, east + buffer, north + buffer), crs=4326
+        )
+
+    def __repr__(self):
+        return f"<{type(self).__name__} {self.id} ({len(self.feature_ids)} features)>"
+
+    def to_geojson(self) -> dict:
+        """Features of this batch as GeoJSON FeatureCollection."""
+        return {
+            "type": "FeatureCollection",
+            "features": [
+                {"type": "Feature", "id": i, "properties": {}, "geometry": shapely.geometry.mapping(g)}
+                for i, g in enumerate(self.geometries)
+            ],
+        }
+
+
+def _features(geometries) -> List[tuple]:
+    """Normalize (GeoDataFrame, GeoSeries, GeoJSON or list of geometries) to list of (id, shapely geometry)."""
+    if hasattr(geometries, "geometry") and hasattr(geometries, "index"):
+        # GeoDataFrame/GeoSeries: use index as feature id.
+        if getattr(geometries, "crs", None) is not None and geometries.crs.to_epsg() != 4326:
+            geometries = geometries.to_crs(epsg=4326)
+        series = geometries.geometry if hasattr(geometries, "columns") else geometries
+        return list(zip(geometries.index, series))
+    if isinstance(geometries, dict):
+        if geometries.get("type") == "FeatureCollection":
+            return [
+                (f.get("id", i), shapely.geometry.shape(f["geometry"])) for i, f in enumerate(geometries["features"])
+            ]
+        raise OpenEoClientException(f"Expected GeoJSON FeatureCollection, but got {geometries.get('type')!r}.")
+    if isinstance(geometries, (list, tuple)):
+        return [(i, g if isinstance(g, BaseGeometry) else shapely.geometry.shape(g)) for i, g in enumerate(geometries)]
+    raise OpenEoClientException(f"Unsupported geometries {type(geometries)}.")
+
+
+def batch_geometries(
+    geometries,
+    *,
+    max_features: int = 1000,
+    max_area: Optional[float] = None,
+    buffer: float = 0.0001,
+) -> List[GeometryBatch]:
+    """
+    Partition features in spatially compact batches
+    by recursively splitting them (k-d tree style) along the widest axis of their centroids,
+    until each batch has at most ``max_features`` features and a bounding box area of at most ``max_area``.
+    Batches follow the spatial distribution of the features:
+    dense areas give small batches, sparse areas large ones.
+
+    :param geometries: features: GeoDataFrame or GeoSeries (index used as feature id, reprojected to EPSG:4326),
+        GeoJSON FeatureCollection (feature "id" used as feature id, if any) or list of (shapely/GeoJSON) geometries
+        (list index used as feature id)
+    :param max_features: maximum number of features per batch
+    :param max_area: maximum area (in square degrees) of the bounding box of a batch.
+        A single feature larger than that is a batch on its own.
+    :param buffer: margin (in degrees) to add on each side of the bounding box of a batch,
+        so that a batch of a single point (or of points on a line) does not get an empty bounding box.
+        The default (0.0001 degrees) is about 10 meter.
+    :return: list of batches
+
+    .. versionadded:: 0.21.0
+    """
+    if max_features < 1:
+        raise ValueError(f"max_features must be at least 1, but got {max_features!r}.")
+    features = _features(geometries)
+    centroids = [g.centroid for _, g in features]
+    bounds = [g.bounds for _, g in features]
+
+    def too_large(indices: List[int]) -> bool:
+        if len(indices) > max_features:
+            return True
+        if max_area is not None and len(indices) > 1:
+            west = min(bounds[i][0] for i in indices)
+            south = min(bounds[i][1] for i in indices)
+            east = max(bounds[i][2] for i in indices)
+            north = max(bounds[i][3] for i in indices)
+            return (east - west) * (north - south) > max_area
+        return False
+
+    batches = []
+    # Depth first, so that batches are ordered spatially (like a space filling curve).
+    stack = [list(range(len(features)))] if features else []
+    while stack:
+        indices = stack.pop()
+        if not too_large(indices):
+            batches.append(indices)
+            continue
+        xs = [centroids[i].x for i in indices]
+        ys = [centroids[i].y for i in indices]
+        axis = 0 if max(xs) - min(xs) >= max(ys) - min(ys) else 1
+        indices = sorted(indices, key=lambda i: (centroids[i].x, centroids[i].y)[axis])
+        if len(indices) > max_features:
+            # Split at a multiple of `max_features`, to get full batches (and as few batches as possible).
+            middle = math.ceil(math.ceil(len(indices) / max_features) / 2) * max_features
+        else:
+            middle = len(indices) // 2
+        stack.extend([indices[middle:], indices[:middle]])
+
+    return [
+        GeometryBatch(
+            id=f"batch-{b:04d}",
+            feature_ids=[features[i][0] for i in indices],
+            geometries=[features[i][1] for i in indices],
+            buffer=buffer,
+        )
+        for b, indices in enumerate(batches)
+    ]
+
+
+def aggregate_spatial_batches(
+    cube: DataCube, batches: List[GeometryBatch], reducer, **kwargs
+) -> Dict[GeometryBatch, VectorCube]:
+    """
+    Build an ``aggregate_spatial`` vector cube per batch,
+    on the data cube filtered to the bounding box of the batch.
+
+    :param cube: data cube to aggregate
+    :param batches: geometry batches (see :py:func:`batch_geometries`)
+    :param reducer: reducer of :py:meth:`DataCube.aggregate_spatial() <openeo.rest.datacube.DataCube.aggregate_spatial>`
+    :param kwargs: additional arguments for ``aggregate_spatial`` (e.g. ``context``)
+    :return: vector cube per batch
+
+    .. versionadded:: 0.21.0
+    """
+    return {
+        batch: cube.filter_bbox(**batch.bbox).aggregate_spatial(
+            geometries=batch.to_geojson(), reducer=reducer, **kwargs
+        )
+        for batch in batches
+    }
+
+
+class BatchedResults:
+    """
+    Downloaded ``aggregate_spatial`` results of geometry batches, to merge keyed by the original feature ids.
+
+    :param batches: all batches
+    :param files: downloaded result file per batch id (missing for batches that failed)
+
+    .. versionadded:: 0.21.0
+    """
+
+    def __init__(self, batches: List[GeometryBatch], files: Dict[str, Path]):
+        self.batches = batches
+        self.files = {k: Path(v) for k, v in files.items()}
+
+    def __repr__(self):
+        return f"<{type(self).__name__} {len(self.files)}/{len(self.batches)} batches>"
+
+    @property
+    def missing(self) -> List[GeometryBatch]:
+        """Batches without result file (e.g. because their job failed)."""
+        return [b for b in self.batches if b.id not in self.files]
+
+    @staticmethod
+    def _read(path: Path, batch: GeometryBatch) -> pd.DataFrame:
+        """Read batch result as DataFrame with "feature_id" and "date" columns, and a column per band."""
+        if path.suffix.lower() == ".json":
+            # Time series JSON: {date: [[value per band] per feature]}, possibly empty list for features without data.
+            timeseries = json.loads(path.read_text(encoding="utf8"))
+            band_count = max((len(v) for features in timeseries.values() for v in features), default=0)
+            df = pd.DataFrame.from_records(
+                [
+                    (date, feature_index, *(values or [float("nan")] * band_count))
+                    for date, features in timeseries.items()
+                    for feature_index, values in enumerate(features)
+                ],
+                columns=["date", "feature_index", *range(band_count)],
+            )
+        elif path.suffix.lower() == ".csv":
+            df = pd.read_csv(path)
+            column = next((c for c in _FEATURE_INDEX_NAMES if c in df.columns), None)
+            if column is None:
+                raise OpenEoClientException(f"No feature index column (one of {_FEATURE_INDEX_NAMES}) in {path}.")
+            df = df.rename(columns={column: "feature_index"})
+        else:
+            raise OpenEoClientException(f"Unsupported result format {path.suffix!r} of {path}.")
+        df.insert(0, "feature_id", [batch.feature_ids[int(i)] for i in df.pop("feature_index")])
+        return df
+
+    def to_pandas(self, allow_missing: bool = False) -> pd.DataFrame:
+        """
+        Merge the (JSON time series or CSV) results of the batches
+        in a DataFrame with a "feature_id" column (the original feature ids), a "date" column
+        and a column per band (by band index for JSON results).
+
+        :param allow_missing: whether to ignore batches without results (instead of raising an exception)
+        """
+        if self.missing and not allow_missing:
+            raise OpenEoClientException(f"Missing results of batches {[b.id for b in self.missing]}.")
+        frames = [self._read(self.files[b.id], b) for b in self.batches if b.id in self.files]
+        return pd.concat(frames, ignore_index=True)
+
+
+def run_aggregate_spatial_batched(
+    cube: DataCube,
+    geometries,
+    reducer,
+    *,
+    manager: MultiBackendJobManager,
+    output_file: Union[str, Path],
+    max_features: int = 1000,
+    max_area: Optional[float] = None,
+    buffer: float = 0.0001,
+    out_format: str = "JSON",
+    title: Optional[str] = None,
+    job_options: Optional[dict] = None,
+    **kwargs,
+) -> BatchedResults:
+    """
+    Partition geometries in spatially compact batches (see :py:func:`batch_geometries`),
+    run an ``aggregate_spatial`` batch job per batch with given job manager (in parallel, on its backends)
+    and return the downloaded results, to merge with :py:meth:`BatchedResults.to_pandas`.
+
+    The process graph is rebuilt on the connection of the job manager backend,
+    so ``cube`` does not have to be built on the same connection.
+    Running again with the same ``output_file`` resumes the batch jobs tracked in it.
+
+    :param cube: data cube to aggregate
+    :param geometries: features (see :py:func:`batch_geometries`)
+    :param reducer: reducer of :py:meth:`DataCube.aggregate_spatial() <openeo.rest.datacube.DataCube.aggregate_spatial>`
+    :param manager: job manager (with backends) to run the batch jobs
+    :param output_file: job tracking file of the job manager (CSV)
+    :param max_features: maximum number of features per batch
+    :param max_area: maximum area (in square degrees) of the bounding box of a batch
+    :param buffer: margin (in degrees) to add on each side of the bounding box of a batch
+    :param out_format: output file format of the batch jobs: "JSON" or "CSV"
+    :param title: job title (the batch id is appended)
+    :param job_options: custom job options
+    :param kwargs: additional arguments for ``aggregate_spatial`` (e.g. ``context``)
+    :return: results of the batches
+    """
+    batches = batch_geometries(geometries, max_features=max_features, max_area=max_area, buffer=buffer)
+    vector_cubes = aggregate_spatial_batches(cube, batches, reducer=reducer, **kwargs)
+    files = run_partition_jobs(
+        {batch.id: vector_cube.flat_graph() for batch, vector_cube in vector_cubes.items()},
+        manager=manager,
+        output_file=output_file,
+        columns={
+            "features": [len(b.feature_ids) for b in batches],
+            **{k: [b.bbox[k] for b in batches] for k in ["west", "south", "east", "north"]},
+        },
+        out_format=out_format,
+        title=title or "Aggregate",
+        job_options=job_options,
+    )
+    results = BatchedResults(batches=batches, files=files)
+    if results.missing:
+        _log.warning(f"No results for batches {[b.id for b in results.missing]}.")
+    return results
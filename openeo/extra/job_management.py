@@ -1,11 +1,19 @@
+import asyncio
 import collections
+import concurrent.futures
 import contextlib
 import datetime
+import functools
 import json
 import logging
+import os
+import socket
+import sqlite3
+import threading
 import time
+import uuid
 from pathlib import Path
-from typing import Callable, Dict, Optional, Union
+from typing import Callable, Dict, Iterable, List, Optional, Union
 
 import pandas as pd
 import requests
@@ -13,7 +21,9 @@ import shapely.wkt
 from requests.adapters import HTTPAdapter, Retry
 
 from openeo import BatchJob, Connection
+from openeo.extra.job_metrics import JobManagerMetrics
 from openeo.rest import OpenEoApiError
+from openeo.rest.job_registry import JobResultRegistry
 from openeo.util import deep_get
 
 
@@ -26,6 +36,9 @@ _Backend = collections.namedtuple("_Backend", ["get_connection", "parallel_jobs"
 
 MAX_RETRIES = 5
 
+# Job statuses that are still "in progress" from the job manager's perspective.
+_ACTIVE_STATUSES = ("created", "queued", "running")
+
 class MultiBackendJobManager:
     """
     Tracker for multiple jobs on multiple backends.
@@ -66,7 +79,10 @@ class MultiBackendJobManager:
     """
 
     def __init__(
-        self, poll_sleep: int = 60, root_dir: Optional[Union[str, Path]] = "."
+        self,
+        poll_sleep: int = 60,
+        root_dir: Optional[Union[str, Path]] = ".",
+        job_registry: Optional[JobResultRegistry] = None,
     ):
         """Create a MultiBackendJobManager.
 
@@ -83,14 +99,31 @@ class MultiBackendJobManager:
                 - get_job_dir
                 - get_error_log_path
                 - get_job_metadata_path
+
+        :param job_registry:
+            (optional) registry of finished jobs, to reuse the results of an earlier job
+            with the same process graph instead of starting a new job
+            (see :py:class:`~openeo.rest.job_registry.JobResultRegistry`).
+            It is set on the backend connections, so that ``create_job`` calls in ``start_job``
+            return the earlier job on a match, which is handled as a finished job right away.
+
+        .. versionchanged:: 0.21.0
+            added ``job_registry`` argument.
         """
         self.backends: Dict[str, _Backend] = {}
         self.poll_sleep = poll_sleep
         self._connections: Dict[str, _Backend] = {}
+        # Guards `_connections` (`_get_connection` can be called from executor threads in `run_jobs_async`).
+        self._connections_lock = threading.Lock()
 
         # An explicit None or "" should also default to "."
         self._root_dir = Path(root_dir or ".")
 
+        # Operational metrics of the current (or last) run.
+        self.metrics = JobManagerMetrics()
+
+        self._job_registry = job_registry
+
     def add_backend(
         self,
         name: str,
@@ -134,16 +167,19 @@ class MultiBackendJobManager:
         # Remember that the get_connection attribute on _Backend can be a Connection object instead
         # of a callable, so we don't want to assume it is a fresh connection that doesn't have the
         # retry adapter yet.
-        if backend_name in self._connections:
-            return self._connections[backend_name]
+        with self._connections_lock:
+            if backend_name in self._connections:
+                return self._connections[backend_name]
 
-        connection = self.backends[backend_name].get_connection()
-        # If we really need it we can skip making it resilient, but by default it should be resilient.
-        if resilient:
-            self._make_resilient(connection)
+            connection = self.backends[backend_name].get_connection()
+            # If we really need it we can skip making it resilient, but by default it should be resilient.
+            if resilient:
+                self._make_resilient(connection)
+            if self._job_registry is not None:
+                connection.job_registry = self._job_registry
 
-        self._connections[backend_name] = connection
-        return connection
+            self._connections[backend_name] = connection
+            return connection
 
     def _make_resilient(self, connection):
         """Add an HTTPAdapter that retries the request if it fails.
@@ -192,6 +228,16 @@ class MultiBackendJobManager:
             df["geometry"] = df["geometry"].apply(shapely.wkt.loads)
         return df
 
+    def _resume_df(self, df: pd.DataFrame, output_file: Path) -> pd.DataFrame:
+        """Resume from existing output file if any, and normalize the dataframe."""
+        if output_file.exists() and output_file.is_file():
+            # Resume from existing CSV
+            _log.info(f"Resuming `run_jobs` from {output_file.absolute()}")
+            df = pd.read_csv(output_file)
+            status_histogram = df.groupby("status").size().to_dict()
+            _log.info(f"Status histogram: {status_histogram}")
+        return self._normalize_df(df)
+
     def _persists(self, df, output_file):
         df.to_csv(output_file, index=False)
         _log.info(f"Wrote job metadata to {output_file.absolute()}")
@@ -242,20 +288,16 @@ class MultiBackendJobManager:
         # TODO: this resume functionality better fits outside of this function
         #       (e.g. if `output_file` exists: `df` is fully discarded)
         output_file = Path(output_file)
-        if output_file.exists() and output_file.is_file():
-            # Resume from existing CSV
-            _log.info(f"Resuming `run_jobs` from {output_file.absolute()}")
-            df = pd.read_csv(output_file)
-            status_histogram = df.groupby("status").size().to_dict()
-            _log.info(f"Status histogram: {status_histogram}")
-
-        df = self._normalize_df(df)
+        df = self._resume_df(df, output_file)
+        self.metrics = JobManagerMetrics()
 
         while (
             df[
                 (df.status != "finished")
                 & (df.status != "skipped")
                 & (df.status != "start_failed")
+                & (df.status != "error")
+                & (df.status != "canceled")
             ].size
             > 0
         ):
@@ -264,6 +306,7 @@ class MultiBackendJobManager:
             status_histogram = df.groupby("status").size().to_dict()
             _log.info(f"Status histogram: {status_histogram}")
             self._persists(df, output_file)
+            self._write_metrics(output_file)
 
             if len(df[df.status == "not_started"]) > 0:
                 # Check number of jobs running at each backend
@@ -287,6 +330,309 @@ class MultiBackendJobManager:
 
             time.sleep(self.poll_sleep)
 
+        self._write_metrics(output_file, report=True)
+
+    def run_jobs_leased(
+        self,
+        job_store: "SqliteJobStore",
+        start_job: Callable[[], BatchJob],
+        df: Optional[pd.DataFrame] = None,
+        worker_id: Optional[str] = None,
+        lease_duration: float = 600,
+    ):
+        """
+        Run jobs from a shared job store, cooperating with other job manager instances
+        (possibly in other processes or on other machines) working on the same store.
+
+        Each instance claims rows of the job store with a time-limited lease
+        and only starts and tracks the jobs of the rows it claimed.
+        Leases are renewed on each poll iteration (heartbeat).
+        When an instance dies, its leases expire and the rows
+        (including already running jobs) are taken over by the remaining instances.
+
+        The ``parallel_jobs`` limit of each backend is enforced across all instances.
+
+        Usage example:
+
+        .. code-block:: python
+
+            job_store = SqliteJobStore("jobs.db")
+            # In each process/worker:
+            manager.run_jobs_leased(job_store=job_store, start_job=start_job, df=jobs_df)
+
+        :param job_store: the shared job store to work on.
+        :param start_job: callback to create/start a job for a row,
+            see :py:meth:`run_jobs` for the details.
+        :param df: DataFrame to initialize the job store with, if it is not initialized yet.
+            Ignored when the job store already contains jobs (e.g. when resuming
+            or when another instance already initialized it).
+        :param worker_id: identifier of this instance for the leases.
+            Defaults to an identifier based on hostname and process id.
+        :param lease_duration: number of seconds a claim on a row stays valid without renewal.
+            Should be comfortably larger than the duration of a poll iteration.
+
+        .. versionadded:: 0.21.0
+        """
+        if df is not None:
+            job_store.initialize(self._normalize_df(df))
+        worker_id = worker_id or f"{socket.gethostname()}-{os.getpid()}-{uuid.uuid4().hex[:8]}"
+        self.metrics = JobManagerMetrics()
+        # Each worker writes its own metrics next to the job store.
+        metrics_base = job_store.path.with_name(
+            f"{job_store.path.stem}.{worker_id}{job_store.path.suffix or '.db'}"
+        )
+
+        while job_store.count_unfinished() > 0:
+            job_store.renew_leases(worker_id=worker_id, lease_duration=lease_duration)
+            taken_over = job_store.take_over_stale(worker_id=worker_id, lease_duration=lease_duration)
+            if taken_over:
+                _log.info(f"Worker {worker_id} took over stale rows {taken_over}")
+
+            owned = self._normalize_df(job_store.read_owned(worker_id=worker_id))
+            with ignore_connection_errors(context="get statuses"):
+                self._update_statuses(owned)
+            job_store.persist(owned, worker_id=worker_id)
+            status_histogram = owned.groupby("status").size().to_dict()
+            _log.info(f"Status histogram (worker {worker_id}): {status_histogram}")
+            self._write_metrics(metrics_base)
+
+            for backend_name in self.backends:
+                claimed = job_store.claim(
+                    worker_id=worker_id,
+                    backend_name=backend_name,
+                    parallel_jobs=self.backends[backend_name].parallel_jobs,
+                    lease_duration=lease_duration,
+                )
+                if not claimed:
+                    continue
+                to_launch = self._normalize_df(job_store.read_rows(claimed))
+                for i in to_launch.index:
+                    self._launch_job(start_job, to_launch, i, backend_name)
+                    job_store.persist(to_launch.loc[[i]], worker_id=worker_id)
+
+            time.sleep(self.poll_sleep)
+
+        self._write_metrics(metrics_base, report=True)
+
+    async def run_jobs_async(
+        self,
+        df: pd.DataFrame,
+        start_job: Callable[[], BatchJob],
+        output_file: Union[str, Path],
+        min_poll_interval: float = 5,
+        max_poll_interval: Optional[float] = None,
+        executor: Optional[concurrent.futures.Executor] = None,
+    ):
+        """
+        Asyncio based variant of :py:meth:`run_jobs`.
+
+        Instead of polling all jobs in a fixed ``poll_sleep`` loop,
+        each tracked job gets its own poll schedule, starting with fast polling
+        that gradually becomes less frequent (like :py:meth:`BatchJob.start_and_wait`).
+        A new job is launched as soon as a slot frees up on a backend.
+
+        Usage example:
+
+        .. code-block:: python
+
+            asyncio.run(manager.run_jobs_async(df=jobs_df, start_job=start_job, output_file="jobs.csv"))
+
+        :param df: DataFrame that specifies the jobs, and tracks the jobs' statuses.
+        :param start_job: callback to create/start a job for a row,
+            with the same contract as for :py:meth:`run_jobs`.
+            Can also be a coroutine function, which will be awaited directly.
+            A regular (synchronous) callback is run in the executor.
+        :param output_file: Path to output file (CSV) containing the status and metadata of the jobs.
+        :param min_poll_interval: initial number of seconds between status polls of a job.
+        :param max_poll_interval: maximum number of seconds between status polls of a job.
+            Defaults to the ``poll_sleep`` setting of the job manager.
+        :param executor: executor to run the blocking calls (requests to the backend, callbacks) in.
+            Defaults to the default executor of the event loop.
+
+        .. versionadded:: 0.21.0
+        """
+        output_file = Path(output_file)
+        df = self._resume_df(df, output_file)
+        self.metrics = JobManagerMetrics()
+        max_poll_interval = max_poll_interval or self.poll_sleep
+        min_poll_interval = min(min_poll_interval, max_poll_interval)
+        loop = asyncio.get_running_loop()
+
+        def run_blocking(f, *args, **kwargs):
+            return loop.run_in_executor(executor, functools.partial(f, *args, **kwargs))
+
+        to_launch = collections.deque(df.index[df.status == "not_started"])
+        # Only the blocking calls (requests to the backend, callbacks) are run in the executor:
+        # the dataframe and metrics are only updated from the event loop thread.
+        flush_requested = asyncio.Event()
+
+        async def flusher():
+            # Debounced persisting of the job statuses and metrics:
+            # at most once per `min_poll_interval`, instead of on each status poll.
+            while True:
+                await flush_requested.wait()
+                flush_requested.clear()
+                self._persists(df, output_file)
+                self._write_metrics(output_file)
+                await asyncio.sleep(min_poll_interval)
+
+        async def handle_job(handler, the_job: BatchJob, i, backend_name: str, context: str):
+            # Run a job handler (e.g. result download) with a bounded number of attempts,
+            # independently of the status polling.
+            for attempt in range(1, MAX_RETRIES + 1):
+                try:
+                    await run_blocking(handler, the_job, df.loc[i])
+                    return
+                except (requests.exceptions.ConnectionError, OpenEoApiError) as e:
+                    _log.warning(f"Failed to {context} of job {the_job.job_id!r} (attempt {attempt}/{MAX_RETRIES}): {e}")
+                    self.metrics.retry(backend_name, context=context)
+                    await asyncio.sleep(min_poll_interval)
+            _log.error(f"Giving up trying to {context} of job {the_job.job_id!r} after {MAX_RETRIES} attempts")
+
+        async def track_job(i):
+            job_id = df.loc[i, "id"]
+            backend_name = df.loc[i, "backend_name"]
+            poll_interval = min_poll_interval
+            while True:
+                await asyncio.sleep(poll_interval)
+                poll_interval = min(1.25 * poll_interval, max_poll_interval)
+                try:
+                    the_job = self._get_connection(backend_name).job(job_id)
+                    job_metadata = await run_blocking(the_job.describe)
+                except requests.exceptions.ConnectionError as e:
+                    _log.warning(f"Ignoring connection error (context get status of {job_id!r}): {e}")
+                    self.metrics.retry(backend_name, context="get status")
+                    continue
+                except OpenEoApiError as e:
+                    _log.error(f"Error for job {job_id!r} on backend {backend_name}: {e}")
+                    self.metrics.retry(backend_name, context="get status")
+                    continue
+
+                status = job_metadata["status"]
+                _log.info(f"Status of job {job_id!r} (on backend {backend_name}) is {status!r}")
+                self.metrics.job_status(backend_name, job_id, status, usage=job_metadata.get("usage"))
+                if status == "finished":
+                    await handle_job(self._handle_job_done, the_job, i, backend_name, context="handle results")
+                if df.loc[i, "status"] != "error" and status == "error":
+                    await handle_job(self.on_job_error, the_job, i, backend_name, context="handle error")
+
+                if df.loc[i, "status"] != status:
+                    flush_requested.set()
+                df.loc[i, "status"] = status
+                for key in job_metadata.get("usage", {}).keys():
+                    df.loc[i, key] = _format_usage_stat(job_metadata, key)
+                if status not in _ACTIVE_STATUSES:
+                    return
+
+        async def launch_job(i, backend_name):
+            df.loc[i, "backend_name"] = backend_name
+            row = df.loc[i]
+            kwargs = dict(
+                row=row, connection_provider=self._get_connection, provider=backend_name
+            )
+            try:
+                _log.info(f"Starting job on backend {backend_name} for {row.to_dict()}")
+                kwargs["connection"] = await run_blocking(self._get_connection, backend_name, resilient=True)
+                if asyncio.iscoroutinefunction(start_job):
+                    job = await start_job(**kwargs)
+                else:
+                    job = await run_blocking(start_job, **kwargs)
+            except requests.exceptions.ConnectionError:
+                _log.warning(f"Failed to start job for {row.to_dict()}", exc_info=True)
+                df.loc[i, "status"] = "start_failed"
+                self.metrics.job_start_failed(backend_name)
+                return
+
+            # Async equivalent of `_handle_started_job`.
+            df.loc[i, "start_time"] = datetime.datetime.now().isoformat()
+            if not job:
+                df.loc[i, "status"] = "skipped"
+                return
+            df.loc[i, "id"] = job.job_id
+            self.metrics.job_started(backend_name, job.job_id)
+            try:
+                status = await run_blocking(job.status)
+                df.loc[i, "status"] = status
+                if status == "finished":
+                    # Reused results of an earlier job.
+                    await handle_job(self._handle_job_done, job, i, backend_name, context="handle results")
+                elif status == "created":
+                    # start job if not yet done by callback
+                    try:
+                        await run_blocking(job.start)
+                        df.loc[i, "status"] = await run_blocking(job.status)
+                    except OpenEoApiError as e:
+                        _log.error(e)
+                        df.loc[i, "status"] = "start_failed"
+                        self.metrics.job_start_failed(backend_name)
+            except requests.exceptions.ConnectionError as e:
+                _log.warning(f"Ignoring connection error (context get status of {job.job_id!r}): {e}")
+                self.metrics.retry(backend_name, context="get status")
+
+        async def run_backend(backend_name):
+            parallel_jobs = self.backends[backend_name].parallel_jobs
+            slot_freed = asyncio.Condition()
+            active = set()
+            tasks = []
+
+            def track(i):
+                active.add(i)
+
+                async def tracker():
+                    try:
+                        await track_job(i)
+                    finally:
+                        async with slot_freed:
+                            active.discard(i)
+                            slot_freed.notify_all()
+
+                tasks.append(asyncio.ensure_future(tracker()))
+
+            try:
+                # Resume tracking of jobs that are already active on this backend.
+                for i in df.index[df.status.isin(_ACTIVE_STATUSES) & (df.backend_name == backend_name)]:
+                    track(i)
+
+                while to_launch:
+                    async with slot_freed:
+                        await slot_freed.wait_for(lambda: len(active) < parallel_jobs)
+                    # Don't keep launching jobs when tracking of another job failed.
+                    for task in tasks:
+                        if task.done() and not task.cancelled() and task.exception():
+                            raise task.exception()
+                    if not to_launch:
+                        break
+                    i = to_launch.popleft()
+                    await launch_job(i, backend_name)
+                    flush_requested.set()
+                    if df.loc[i, "status"] in _ACTIVE_STATUSES:
+                        track(i)
+
+                await _gather_or_cancel(tasks)
+            finally:
+                await _cancel_all(tasks)
+
+        flush_task = asyncio.ensure_future(flusher())
+        try:
+            await _gather_or_cancel([asyncio.ensure_future(run_backend(b)) for b in self.backends])
+        finally:
+            await _cancel_all([flush_task])
+        status_histogram = df.groupby("status").size().to_dict()
+        _log.info(f"Status histogram: {status_histogram}")
+        self._persists(df, output_file)
+        self._write_metrics(output_file, report=True)
+
+    def _write_metrics(self, base_path: Path, report: bool = False):
+        """
+        Write metrics next to the job tracking file (or job store):
+        a time-series snapshot (appended to a JSON lines file)
+        and, if requested, the (JSON and HTML) report.
+        """
+        self.metrics.write_snapshot(base_path.with_suffix(".metrics.jsonl"))
+        if report:
+            self.metrics.write_report(base_path.with_suffix(".report.json"))
+            self.metrics.write_report(base_path.with_suffix(".report.html"))
+
     def _launch_job(self, start_job, df, i, backend_name):
         """Helper method for launching jobs
 
@@ -326,23 +672,43 @@ class MultiBackendJobManager:
         except requests.exceptions.ConnectionError as e:
             _log.warning(f"Failed to start job for {row.to_dict()}", exc_info=True)
             df.loc[i, "status"] = "start_failed"
+            self.metrics.job_start_failed(backend_name)
         else:
-            df.loc[i, "start_time"] = datetime.datetime.now().isoformat()
-            if job:
-                df.loc[i, "id"] = job.job_id
-                with ignore_connection_errors(context="get status"):
-                    status = job.status()
-                    df.loc[i, "status"] = status
-                    if status == "created":
-                        # start job if not yet done by callback
-                        try:
-                            job.start()
-                            df.loc[i, "status"] = job.status()
-                        except OpenEoApiError as e:
-                            _log.error(e)
-                            df.loc[i, "status"] = "start_failed"
-            else:
-                df.loc[i, "status"] = "skipped"
+            self._handle_started_job(job, df, i, backend_name)
+
+    def _handle_started_job(self, job: Optional[BatchJob], df: pd.DataFrame, i, backend_name: str):
+        """
+        Helper to track a job just returned by the ``start_job`` callback:
+        record it in the dataframe and start it if that was not done by the callback yet.
+        """
+        df.loc[i, "start_time"] = datetime.datetime.now().isoformat()
+        if not job:
+            df.loc[i, "status"] = "skipped"
+            return
+        df.loc[i, "id"] = job.job_id
+        self.metrics.job_started(backend_name, job.job_id)
+        with ignore_connection_errors(context="get status"):
+            status = job.status()
+            df.loc[i, "status"] = status
+            if status == "finished":
+                # Reused results of an earlier job.
+                self._handle_job_done(job, df.loc[i])
+            elif status == "created":
+                # start job if not yet done by callback
+                try:
+                    job.start()
+                    df.loc[i, "status"] = job.status()
+                except OpenEoApiError as e:
+                    _log.error(e)
+                    df.loc[i, "status"] = "start_failed"
+                    self.metrics.job_start_failed(backend_name)
+
+    def _handle_job_done(self, job: BatchJob, row):
+        """Register finished job (if there is a job registry) and handle it with :py:meth:`on_job_done`."""
+        if self._job_registry is not None:
+            with ignore_connection_errors(context="register job"):
+                self._job_registry.register(job)
+        self.on_job_done(job, row)
 
     def on_job_done(self, job: BatchJob, row):
         """
@@ -360,7 +726,11 @@ class MultiBackendJobManager:
         metadata_path = self.get_job_metadata_path(job.job_id)
 
         self.ensure_job_dir_exists(job.job_id)
+        download_start = time.time()
         job.get_results().download_files(target=job_dir)
+        self.metrics.job_downloaded(
+            backend_name=row.get("backend_name"), job_id=job.job_id, duration=time.time() - download_start
+        )
 
         with open(metadata_path, "w") as f:
             json.dump(job_metadata, f, ensure_ascii=False)
@@ -419,8 +789,9 @@ class MultiBackendJobManager:
                 _log.info(
                     f"Status of job {job_id!r} (on backend {backend_name}) is {job_metadata['status']!r}"
                 )
+                self.metrics.job_status(backend_name, job_id, job_metadata["status"], usage=job_metadata.get("usage"))
                 if job_metadata["status"] == "finished":
-                    self.on_job_done(the_job, df.loc[i])
+                    self._handle_job_done(the_job, df.loc[i])
                 if df.loc[i, "status"] != "error" and job_metadata["status"] == "error":
                     self.on_job_error(the_job, df.loc[i])
 
@@ -431,6 +802,7 @@ class MultiBackendJobManager:
             except OpenEoApiError as e:
                 print(f"error for job {job_id!r} on backend {backend_name}")
                 print(e)
+                self.metrics.retry(backend_name, context="get status")
 
 
 def _format_usage_stat(job_metadata: dict, field: str) -> str:
@@ -439,6 +811,79 @@ def _format_usage_stat(job_metadata: dict, field: str) -> str:
     return f"{value} {unit}".strip()
 
 
+async def _cancel_all(tasks: List[asyncio.Future]):
+    """Cancel the given tasks (if not done yet) and wait for them to wrap up."""
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+
+
+async def _gather_or_cancel(tasks: List[asyncio.Future]) -> list:
+    """Like :py:func:`asyncio.gather`, but cancel the remaining tasks as soon as one of them fails."""
+    try:
+        return await asyncio.gather(*tasks)
+    except BaseException:
+        await _cancel_all(tasks)
+        raise
+
+
+def run_partition_jobs(
+    graphs: Dict[str, dict],
+    *,
+    manager: MultiBackendJobManager,
+    output_file: Union[str, Path],
+    columns: Dict[str, list],
+    out_format: str,
+    title: str,
+    job_options: Optional[dict] = None,
+) -> Dict[str, Path]:
+    """
+    Run a batch job per (partition) process graph with given job manager,
+    and collect the downloaded result file per partition id.
+    Used to run the partitions of a split up workload, e.g. spatial tiles, time windows or geometry batches.
+
+    :param graphs: flat process graph per partition id
+    :param manager: job manager (with backends) to run the jobs
+    :param output_file: job tracking file of the job manager (CSV)
+    :param columns: additional (informative) columns for the job tracking dataframe
+    :param out_format: output file format of the jobs
+    :param title: job title prefix (the partition id is appended)
+    :param job_options: custom job options
+    :return: result file per partition id (missing for partitions that failed)
+
+    .. versionadded:: 0.21.0
+    """
+    df = pd.DataFrame({"partition_id": list(graphs), **columns})
+
+    def start_job(row: pd.Series, connection, **kwargs):
+        partition_id = row["partition_id"]
+        return connection.datacube_from_flat_graph(graphs[partition_id]).create_job(
+            out_format=out_format,
+            title=f"{title} {partition_id}",
+            job_options=job_options,
+        )
+
+    manager.run_jobs(df=df, start_job=start_job, output_file=output_file)
+
+    files = {}
+    jobs = pd.read_csv(output_file, dtype={"partition_id": str})
+    for row in jobs[jobs.status == "finished"].itertuples():
+        # Skip job metadata and logs that are stored next to the results.
+        metadata_files = {
+            manager.get_job_metadata_path(row.id),
+            manager.get_error_log_path(row.id),
+            manager.get_job_dir(row.id) / "job-results.json",
+        }
+        results = [
+            p for p in sorted(manager.get_job_dir(row.id).glob("*")) if p.is_file() and p not in metadata_files
+        ]
+        if len(results) == 1:
+            files[row.partition_id] = results[0]
+        else:
+            _log.warning(f"Expected one result file for {row.partition_id} (job {row.id}), but got {results}.")
+    return files
+
+
 @contextlib.contextmanager
 def ignore_connection_errors(context: Optional[str] = None):
     """Context manager to ignore connection errors."""
@@ -448,3 +893,239 @@ def ignore_connection_errors(context: Optional[str] = None):
         _log.warning(f"Ignoring connection error (context {context or 'n/a'}): {e}")
         # Back off a bit
         time.sleep(5)
+
+
+class SqliteJobStore:
+    """
+    Job store (the equivalent of the job tracking CSV file of :py:meth:`MultiBackendJobManager.run_jobs`)
+    backed by a SQLite database file, with support for row-level leases,
+    so that multiple job manager instances can safely work on the same set of jobs.
+
+    Each row has a lease owner (the id of the claiming job manager instance)
+    and a lease expiry timestamp.
+    Claims are done in an exclusive transaction, which makes them atomic across processes.
+
+    .. note::
+        SQLite handles concurrent access from multiple processes on the same machine well,
+        but it should not be used on network file systems (e.g. NFS).
+
+    .. versionadded:: 0.21.0
+    """
+
+    _LEASE_OWNER = "lease_owner"
+    _LEASE_EXPIRY = "lease_expiry"
+
+    def __init__(self, path: Union[str, Path], table: str = "jobs", timeout: float = 60):
+        self._path = Path(path)
+        self._table = table
+        self._timeout = timeout
+
+    @contextlib.contextmanager
+    def _connect(self, exclusive: bool = False):
+        # Autocommit mode (isolation_level=None) with explicit transaction handling.
+        connection = sqlite3.connect(str(self._path), timeout=self._timeout, isolation_level=None)
+        try:
+            connection.execute("BEGIN IMMEDIATE" if exclusive else "BEGIN")
+            try:
+                yield connection
+            except BaseException:
+                connection.execute("ROLLBACK")
+                raise
+            else:
+                connection.execute("COMMIT")
+        finally:
+            connection.close()
+
+    @property
+    def path(self) -> Path:
+        return self._path
+
+    def _columns(self, connection: sqlite3.Connection) -> List[str]:
+        return [r[1] for r in connection.execute(f"PRAGMA table_info({self._quote(self._table)})")]
+
+    @staticmethod
+    def _quote(name: str) -> str:
+        return '"' + str(name).replace('"', '""') + '"'
+
+    @staticmethod
+    def _to_sql_value(value):
+        if value is None:
+            return None
+        if hasattr(value, "wkt"):
+            # Shapely geometry
+            return value.wkt
+        if hasattr(value, "item"):
+            # Numpy scalar
+            value = value.item()
+        if isinstance(value, float) and value != value:
+            # NaN
+            return None
+        return value
+
+    def exists(self) -> bool:
+        """Check whether the job store is initialized."""
+        if not self._path.exists():
+            return False
+        with self._connect() as connection:
+            return bool(self._columns(connection))
+
+    def initialize(self, df: pd.DataFrame) -> bool:
+        """
+        Initialize the job store with the rows of given dataframe,
+        unless it is already initialized.
+
+        :return: whether the job store was initialized by this call.
+        """
+        with self._connect(exclusive=True) as connection:
+            if self._columns(connection):
+                _log.info(f"Job store {self._path} already initialized: not overwriting it.")
+                return False
+            columns = [str(c) for c in df.columns]
+            column_defs = ", ".join(
+                ["row_id INTEGER PRIMARY KEY"]
+                + [self._quote(c) for c in columns]
+                + [f"{self._LEASE_OWNER} TEXT", f"{self._LEASE_EXPIRY} REAL"]
+            )
+            connection.execute(f"CREATE TABLE {self._quote(self._table)} ({column_defs})")
+            placeholders = ", ".join("?" * (len(columns) + 1))
+            connection.executemany(
+                f"INSERT INTO {self._quote(self._table)} (row_id, {', '.join(self._quote(c) for c in columns)}) VALUES ({placeholders})",
+                (
+                    [int(i)] + [self._to_sql_value(v) for v in row]
+                    for i, row in zip(range(len(df)), df.itertuples(index=False, name=None))
+                ),
+            )
+        return True
+
+    def _read(self, where: str = "", params: Iterable = ()) -> pd.DataFrame:
+        with self._connect() as connection:
+            df = pd.read_sql_query(
+                f"SELECT * FROM {self._quote(self._table)} {where} ORDER BY row_id",
+                connection,
+                params=list(params),
+                index_col="row_id",
+            )
+        return df
+
+    def read(self) -> pd.DataFrame:
+        """Read the full job store as dataframe (including lease columns)."""
+        return self._read()
+
+    def read_rows(self, row_ids: List[int]) -> pd.DataFrame:
+        """Read given rows (without lease columns)."""
+        placeholders = ", ".join("?" * len(row_ids))
+        df = self._read(where=f"WHERE row_id IN ({placeholders})", params=row_ids)
+        return df.drop(columns=[self._LEASE_OWNER, self._LEASE_EXPIRY])
+
+    def read_owned(self, worker_id: str) -> pd.DataFrame:
+        """Read the unfinished rows owned by given worker (without lease columns)."""
+        statuses = ("not_started",) + _ACTIVE_STATUSES
+        df = self._read(
+            where=f"WHERE {self._LEASE_OWNER} = ? AND status IN ({', '.join('?' * len(statuses))})",
+            params=[worker_id, *statuses],
+        )
+        return df.drop(columns=[self._LEASE_OWNER, self._LEASE_EXPIRY])
+
+    def count_unfinished(self) -> int:
+        """Number of rows that are not started yet or have an active job."""
+        statuses = ("not_started",) + _ACTIVE_STATUSES
+        with self._connect() as connection:
+            (count,) = connection.execute(
+                f"SELECT COUNT(*) FROM {self._quote(self._table)} WHERE status IN ({', '.join('?' * len(statuses))})",
+                statuses,
+            ).fetchone()
+        return count
+
+    def claim(self, worker_id: str, backend_name: str, parallel_jobs: int, lease_duration: float) -> List[int]:
+        """
+        Claim not started rows for given backend,
+        as far as the ``parallel_jobs`` limit of the backend allows
+        (taking into account the rows of all workers).
+
+        :return: ids of the claimed rows.
+        """
+        now = time.time()
+        table = self._quote(self._table)
+        active = ", ".join(f"'{s}'" for s in _ACTIVE_STATUSES)
+        with self._connect(exclusive=True) as connection:
+            (load,) = connection.execute(
+                f"""SELECT COUNT(*) FROM {table} WHERE backend_name = ? AND (
+                    status IN ({active})
+                    OR (status = 'not_started' AND {self._LEASE_OWNER} != ? AND {self._LEASE_EXPIRY} >= ?)
+                )""",
+                (backend_name, worker_id, now),
+            ).fetchone()
+            available = parallel_jobs - load
+            if available <= 0:
+                return []
+            row_ids = [
+                r[0]
+                for r in connection.execute(
+                    f"""SELECT row_id FROM {table} WHERE status = 'not_started' AND (
+                        {self._LEASE_OWNER} IS NULL OR {self._LEASE_OWNER} = ? OR {self._LEASE_EXPIRY} < ?
+                    ) ORDER BY ({self._LEASE_OWNER} = ?) DESC, row_id LIMIT ?""",
+                    (worker_id, now, worker_id, available),
+                )
+            ]
+            connection.executemany(
+                f"UPDATE {table} SET backend_name = ?, {self._LEASE_OWNER} = ?, {self._LEASE_EXPIRY} = ? WHERE row_id = ?",
+                [(backend_name, worker_id, now + lease_duration, i) for i in row_ids],
+            )
+        return row_ids
+
+    def take_over_stale(self, worker_id: str, lease_duration: float) -> List[int]:
+        """
+        Take over the rows with an active job, but with an expired lease
+        (e.g. because the owning worker died).
+
+        :return: ids of the rows taken over.
+        """
+        now = time.time()
+        table = self._quote(self._table)
+        active = ", ".join(f"'{s}'" for s in _ACTIVE_STATUSES)
+        with self._connect(exclusive=True) as connection:
+            where = f"WHERE status IN ({active}) AND ({self._LEASE_OWNER} IS NULL OR {self._LEASE_EXPIRY} < ?)"
+            row_ids = [r[0] for r in connection.execute(f"SELECT row_id FROM {table} {where}", (now,))]
+            connection.execute(
+                f"UPDATE {table} SET {self._LEASE_OWNER} = ?, {self._LEASE_EXPIRY} = ? {where}",
+                (worker_id, now + lease_duration, now),
+            )
+        return row_ids
+
+    def renew_leases(self, worker_id: str, lease_duration: float) -> int:
+        """
+        Renew (heartbeat) the leases of all rows owned by given worker.
+
+        :return: number of renewed leases.
+        """
+        with self._connect(exclusive=True) as connection:
+            cursor = connection.execute(
+                f"UPDATE {self._quote(self._table)} SET {self._LEASE_EXPIRY} = ? WHERE {self._LEASE_OWNER} = ?",
+                (time.time() + lease_duration, worker_id),
+            )
+            return cursor.rowcount
+
+    def persist(self, df: pd.DataFrame, worker_id: str) -> int:
+        """
+        Write back the given rows (indexed by row id),
+        but only the rows that are still owned by given worker.
+        New columns (e.g. usage stats) are added to the store as necessary.
+
+        :return: number of rows written.
+        """
+        table = self._quote(self._table)
+        columns = [str(c) for c in df.columns if c not in (self._LEASE_OWNER, self._LEASE_EXPIRY)]
+        written = 0
+        with self._connect(exclusive=True) as connection:
+            existing = set(self._columns(connection))
+            for c in columns:
+                if c not in existing:
+                    connection.execute(f"ALTER TABLE {table} ADD COLUMN {self._quote(c)}")
+            assignments = ", ".join(f"{self._quote(c)} = ?" for c in columns)
+            for i, row in zip(df.index, df[columns].itertuples(index=False, name=None)):
+                cursor = connection.execute(
+                    f"UPDATE {table} SET {assignments} WHERE row_id = ? AND {self._LEASE_OWNER} = ?",
+                    [self._to_sql_value(v) for v in row] + [int(i), worker_id],
+                )
+                written += cursor.rowcount
+        return written
@@ -0,0 +1,230 @@
+import collections
+import datetime
+import html
+import json
+import logging
+import threading
+import time
+from pathlib import Path
+from typing import Dict, List, Optional, Union
+
+import numpy as np
+
+from openeo.util import deep_get, rfc3339
+
+_log = logging.getLogger(__name__)
+
+
+class _JobTimeline:
+    """Timestamps (first observation) of the lifecycle events of a single job."""
+
+    __slots__ = ("backend_name", "events", "usage", "download_time")
+
+    def __init__(self, backend_name: str):
+        self.backend_name = backend_name
+        self.events: Dict[str, float] = {}
+        self.usage: dict = {}
+        self.download_time: Optional[float] = None
+
+    def mark(self, event: str, timestamp: float):
+        self.events.setdefault(event, timestamp)
+
+    def duration(self, start_events: List[str], end_events: List[str]) -> Optional[float]:
+        start = next((self.events[e] for e in start_events if e in self.events), None)
+        end = next((self.events[e] for e in end_events if e in self.events), None)
+        if start is None or end is None:
+            return None
+        return max(0.0, end - start)
+
+    @property
+    def queue_wait(self) -> Optional[float]:
+        return self.duration(start_events=["started", "created", "queued"], end_events=["running"])
+
+    @property
+    def run_time(self) -> Optional[float]:
+        return self.duration(start_events=["running"], end_events=["finished", "error", "canceled"])
+
+
+def _format_timestamp(timestamp: float) -> str:
+    return rfc3339.datetime(datetime.datetime.fromtimestamp(timestamp, tz=datetime.timezone.utc))
+
+
+def _stats(values: List[float]) -> dict:
+    """Summary statistics (including percentiles) of a list of durations."""
+    if not values:
+        return {"count": 0}
+    values = np.asarray(values, dtype=float)
+    return {
+        "count": int(values.size),
+        "mean": float(values.mean()),
+        "min": float(values.min()),
+        "p50": float(np.percentile(values, 50)),
+        "p90": float(np.percentile(values, 90)),
+        "p95": float(np.percentile(values, 95)),
+        "max": float(values.max()),
+    }
+
+
+class JobManagerMetrics:
+    """
+    Live operational metrics of a :py:class:`~openeo.extra.job_management.MultiBackendJobManager` run:
+    per backend queue wait time, run time, throughput, start failures, retries, download time
+    and aggregated usage stats (e.g. cpu and memory usage as reported by the backend).
+
+    The metrics object is available as ``metrics`` attribute of the job manager
+    and can be inspected while the job manager is running (e.g. from another thread).
+
+    .. versionadded:: 0.21.0
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._start = time.time()
+        self._jobs: Dict[str, _JobTimeline] = {}
+        self._counters: Dict[str, collections.Counter] = collections.defaultdict(collections.Counter)
+
+    def _timeline(self, backend_name: str, job_id: str) -> _JobTimeline:
+        if job_id not in self._jobs:
+            self._jobs[job_id] = _JobTimeline(backend_name=backend_name)
+        return self._jobs[job_id]
+
+    def job_started(self, backend_name: str, job_id: str):
+        """Record that a job was created/started by the job manager."""
+        with self._lock:
+            self._counters[backend_name]["started"] += 1
+            self._timeline(backend_name, job_id).mark("started", time.time())
+
+    def job_start_failed(self, backend_name: str):
+        """Record a failure to create/start a job."""
+        with self._lock:
+            self._counters[backend_name]["start_failed"] += 1
+
+    def job_status(self, backend_name: str, job_id: str, status: str, usage: Optional[dict] = None):
+        """Record an observed job status (and usage stats) from a status poll."""
+        with self._lock:
+            self._counters[backend_name]["polls"] += 1
+            timeline = self._timeline(backend_name, job_id)
+            timeline.mark(status, time.time())
+            if usage:
+                timeline.usage = usage
+
+    def retry(self, backend_name: Optional[str], context: Optional[str] = None):
+        """Record a failed request that will be retried (e.g. a failed status poll)."""
+        with self._lock:
+            self._counters[backend_name or "n/a"]["retries"] += 1
+
+    def job_downloaded(self, backend_name: str, job_id: str, duration: float):
+        """Record the time it took to download the results of a job."""
+        with self._lock:
+            self._timeline(backend_name, job_id).download_time = duration
+
+    def _backend_names(self) -> List[str]:
+        return sorted(set(self._counters.keys()).union(j.backend_name for j in self._jobs.values()))
+
+    def snapshot(self) -> dict:
+        """Compact point-in-time overview of the metrics (e.g. for time-series tracking)."""
+        with self._lock:
+            now = time.time()
+            backends = {}
+            for backend_name in self._backend_names():
+                jobs = [j for j in self._jobs.values() if j.backend_name == backend_name]
+                statuses = collections.Counter(
+                    max(j.events, key=j.events.get) for j in jobs if j.events
+                )
+                backends[backend_name] = {
+                    "statuses": dict(statuses),
+                    **self._counters[backend_name],
+                }
+            return {
+                "timestamp": _format_timestamp(now),
+                "elapsed": now - self._start,
+                "backends": backends,
+            }
+
+    def report(self) -> dict:
+        """Full report of the metrics, per backend, with percentiles of the durations."""
+        with self._lock:
+            now = time.time()
+            elapsed = now - self._start
+            backends = {}
+            for backend_name in self._backend_names():
+                jobs = [j for j in self._jobs.values() if j.backend_name == backend_name]
+                finished = [j for j in jobs if "finished" in j.events]
+                usage = collections.defaultdict(float)
+                for job in jobs:
+                    for field in job.usage:
+                        value = deep_get(job.usage, field, "value", default=None)
+                        unit = deep_get(job.usage, field, "unit", default="")
+                        if isinstance(value, (int, float)):
+                            usage[f"{field} ({unit})" if unit else field] += value
+                counters = self._counters[backend_name]
+                backends[backend_name] = {
+                    "jobs": len(jobs),
+                    "finished": len(finished),
+                    "error": sum(1 for j in jobs if "error" in j.events),
+                    "start_failed": counters["start_failed"],
+                    "retries": counters["retries"],
+                    "polls": counters["polls"],
+                    "throughput_per_hour": len(finished) / (elapsed / 3600) if elapsed > 0 else None,
+                    "queue_wait": _stats([j.queue_wait for j in jobs if j.queue_wait is not None]),
+                    "run_time": _stats([j.run_time for j in jobs if j.run_time is not None]),
+                    "download_time": _stats([j.download_time for j in jobs if j.download_time is not None]),
+                    "usage": dict(usage),
+                }
+            return {
+                "start": _format_timestamp(self._start),
+                "end": _format_timestamp(now),
+                "elapsed": elapsed,
+                "backends": backends,
+            }
+
+    def write_snapshot(self, path: Union[str, Path]):
+        """Append a snapshot (as JSON line) to given file."""
+        with Path(path).open("a", encoding="utf8") as f:
+            f.write(json.dumps(self.snapshot()) + "\n")
+
+    def write_report(self, path: Union[str, Path]):
+        """Write report to given path, as HTML if the path ends with ``.html``, as JSON otherwise."""
+        path = Path(path)
+        report = self.report()
+        if path.suffix.lower() in {".html", ".htm"}:
+            path.write_text(_render_html_report(report), encoding="utf8")
+        else:
+            path.write_text(json.dumps(report, indent=2), encoding="utf8")
+        _log.info(f"Wrote job manager metrics report to {path.absolute()}")
+
+
+def _render_html_report(report: dict) -> str:
+    def fmt(value) -> str:
+        if isinstance(value, float):
+            return f"{value:.2f}"
+        return html.escape(str(value))
+
+    def stats_cell(stats: dict) -> str:
+        if not stats.get("count"):
+            return "-"
+        return "<br>".join(f"{k}: {fmt(v)}" for k, v in stats.items())
+
+    columns = ["jobs", "finished", "error", "start_failed", "retries", "throughput_per_hour"]
+    duration_columns = ["queue_wait", "run_time", "download_time"]
+    rows = []
+    for backend_name, metrics in report["backends"].items():
+        cells = [fmt(backend_name)]
+        cells += [fmt(metrics[c]) for c in columns]
+        cells += [stats_cell(metrics[c]) for c in duration_columns]
+        cells.append("<br>".join(f"{fmt(k)}: {fmt(v)}" for k, v in metrics["usage"].items()) or "-")
+        rows.append("<tr>" + "".join(f"<td>{c}</td>" for c in cells) + "</tr>")
+    header = "".join(f"<th>{c}</th>" for c in ["backend"] + columns + duration_columns + ["usage"])
+    return f"""<!DOCTYPE html>
+<html>
+<head><meta charset="utf-8"><title>Job manager report</title></head>
+<body>
+<h1>Job manager report</h1>
+<p>Start: {fmt(report["start"])}, end: {fmt(report["end"])}, elapsed: {fmt(report["elapsed"])}s</p>
+<table border="1">
+<tr>{header}</tr>
+{"".join(rows)}
+</table>
+</body>
+</html>
+"""
@@ -0,0 +1,322 @@
+"""
+Discrete-event simulation of :py:class:`~openeo.extra.job_management.MultiBackendJobManager` runs,
+to evaluate and tune scheduling settings (e.g. ``parallel_jobs``, ``poll_sleep``)
+in a fast and reproducible way, without real backends.
+
+The job manager runs unmodified against fake backends (at the level of the HTTP transport)
+in virtual time: sleeping and requests advance a virtual clock instead of taking wall clock time.
+
+Usage example:
+
+.. code-block:: python
+
+    simulator = JobManagerSimulator(seed=42)
+    simulator.add_backend(
+        "foo",
+        FakeBackend(
+            queue_time=lambda rng: rng.expovariate(1 / 300),
+            run_time=lambda rng: rng.uniform(600, 1200),
+            failure_rate=0.05,
+            max_requests_per_minute=60,
+        ),
+        parallel_jobs=3,
+    )
+    manager = MultiBackendJobManager(poll_sleep=30, root_dir="sim")
+    report = simulator.run(manager, df=jobs_df, output_file="sim/jobs.csv")
+    print(report.makespan, report.backends["foo"]["slot_utilization"])
+
+.. versionadded:: 0.21.0
+"""
+
+import collections
+import json
+import random
+import re
+import urllib.parse
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Tuple, Union
+from unittest import mock
+
+import pandas as pd
+import requests
+import requests.adapters
+
+import openeo.extra.job_management
+import openeo.extra.job_metrics
+from openeo.rest.connection import Connection
+from openeo.rest.job import BatchJob
+
+# A duration: a fixed number of seconds or a callable that draws one from a random generator.
+Duration = Union[float, Callable[[random.Random], float]]
+
+
+class VirtualClock:
+    """
+    Virtual clock, as stand-in for the :py:mod:`time` module (only ``time()`` and ``sleep()``).
+    """
+
+    def __init__(self, start: float = 1_700_000_000):
+        self.start = start
+        self.now = start
+
+    def time(self) -> float:
+        return self.now
+
+    def sleep(self, seconds: float):
+        self.advance(seconds)
+
+    def advance(self, seconds: float):
+        self.now += max(0.0, seconds)
+
+    @property
+    def elapsed(self) -> float:
+        return self.now - self.start
+
+
+class _SimulatedJob:
+    __slots__ = ("job_id", "created_at", "running_at", "done_at", "final_status", "observed_done_at")
+
+    def __init__(self, job_id: str, created_at: float):
+        self.job_id = job_id
+        self.created_at = created_at
+        self.running_at: Optional[float] = None
+        self.done_at: Optional[float] = None
+        self.final_status: Optional[str] = None
+        # When the (final) status was first reported to the client.
+        self.observed_done_at: Optional[float] = None
+
+    def status(self, now: float) -> str:
+        if self.running_at is None:
+            return "created"
+        elif now < self.running_at:
+            return "queued"
+        elif now < self.done_at:
+            return "running"
+        return self.final_status
+
+
+class FakeBackend:
+    """
+    Fake openEO backend for simulations, with configurable job queue time, run time,
+    failure rate, request latency and request rate limit.
+
+    :param queue_time: time (seconds) a started job stays in "queued" status
+        (fixed value or callable that draws a value from given random generator).
+    :param run_time: time (seconds) a job stays in "running" status.
+    :param failure_rate: probability that a job ends with "error" status.
+    :param request_latency: time (seconds) each request takes.
+    :param max_requests_per_minute: request rate limit: requests above this rate
+        are throttled (delayed), as done by rate limiting proxies.
+    """
+
+    def __init__(
+        self,
+        queue_time: Duration = 60,
+        run_time: Duration = 600,
+        failure_rate: float = 0.0,
+        request_latency: float = 0.1,
+        max_requests_per_minute: Optional[int] = None,
+    ):
+        self.queue_time = queue_time
+        self.run_time = run_time
+        self.failure_rate = failure_rate
+        self.request_latency = request_latency
+        self.max_requests_per_minute = max_requests_per_minute
+        # Simulation state (set up by `JobManagerSimulator`).
+        self.name: str = "fake"
+        self.clock = VirtualClock()
+        self.rng = random.Random()
+        self.jobs: Dict[str, _SimulatedJob] = {}
+        self.request_counts = collections.Counter()
+        self.throttled = 0
+        self._request_times = collections.deque()
+
+    def reset(self, name: str, clock: VirtualClock, rng: random.Random):
+        self.name = name
+        self.clock = clock
+        self.rng = rng
+        self.jobs = {}
+        self.request_counts = collections.Counter()
+        self.throttled = 0
+        self._request_times = collections.deque()
+
+    @property
+    def url(self) -> str:
+        return f"https://{self.name}.sim.test/"
+
+    def _draw(self, duration: Duration) -> float:
+        return float(duration(self.rng) if callable(duration) else duration)
+
+    def _throttle(self):
+        if not self.max_requests_per_minute:
+            return
+        while self._request_times and self._request_times[0] <= self.clock.now - 60:
+            self._request_times.popleft()
+        if len(self._request_times) >= self.max_requests_per_minute:
+            self.throttled += 1
+            self.clock.advance(self._request_times[0] + 60 - self.clock.now)
+            self._request_times.popleft()
+        self._request_times.append(self.clock.now)
+
+    def handle(self, method: str, path: str) -> Tuple[int, dict, dict]:
+        """Handle a request: returns status code, JSON body and headers."""
+        self._throttle()
+        self.clock.advance(self.request_latency)
+        now = self.clock.now
+
+        endpoint = re.sub(r"^/jobs/[^/]+", "/jobs/{job_id}", path)
+        self.request_counts[f"{method} {endpoint}"] += 1
+
+        if (method, path) == ("GET", "/"):
+            return 200, {"api_version": "1.1.0", "endpoints": []}, {}
+        if (method, path) == ("POST", "/jobs"):
+            job_id = f"{self.name}-job-{len(self.jobs):06d}"
+            self.jobs[job_id] = _SimulatedJob(job_id=job_id, created_at=now)
+            return 201, {}, {"OpenEO-Identifier": job_id}
+        match = re.match(r"^/jobs/(?P<job_id>[^/]+)(?P<sub>/.*)?$", path)
+        if match and match.group("job_id") in self.jobs:
+            job = self.jobs[match.group("job_id")]
+            sub = match.group("sub")
+            if method == "GET" and not sub:
+                status = job.status(now)
+                if status in ("finished", "error") and job.observed_done_at is None:
+                    job.observed_done_at = now
+                return 200, {"id": job.job_id, "status": status}, {}
+            if method == "POST" and sub == "/results":
+                if job.running_at is None:
+                    job.running_at = now + self._draw(self.queue_time)
+                    job.done_at = job.running_at + self._draw(self.run_time)
+                    job.final_status = "error" if self.rng.random() < self.failure_rate else "finished"
+                return 202, {}, {}
+            if method == "GET" and sub == "/results":
+                return 200, {"assets": {}, "links": []}, {}
+            if method == "GET" and sub == "/logs":
+                logs = [{"id": "1", "level": "error", "message": "Simulated failure"}]
+                return 200, {"logs": logs if job.final_status == "error" else []}, {}
+        return 404, {"code": "NotFound", "message": f"No such endpoint {method} {path}"}, {}
+
+
+class _FakeBackendAdapter(requests.adapters.BaseAdapter):
+    """Requests transport adapter that serves requests from a :py:class:`FakeBackend`."""
+
+    def __init__(self, backend: FakeBackend):
+        super().__init__()
+        self.backend = backend
+
+    def send(self, request, **kwargs):
+        path = urllib.parse.urlparse(request.url).path
+        status_code, body, headers = self.backend.handle(method=request.method, path=path.rstrip("/") or "/")
+        response = requests.Response()
+        response.status_code = status_code
+        response._content = json.dumps(body).encode("utf8")
+        response.headers.update({"Content-Type": "application/json", **headers})
+        response.encoding = "utf8"
+        response.url = request.url
+        response.request = request
+        return response
+
+    def close(self):
+        pass
+
+
+class SimulationReport:
+    """Result of a :py:meth:`JobManagerSimulator.run`."""
+
+    def __init__(self, makespan: float, backends: Dict[str, dict], metrics: dict):
+        #: Total (virtual) time of the job manager run in seconds.
+        self.makespan = makespan
+        #: Per backend stats: job counts, utilization, request counts, ...
+        self.backends = backends
+        #: Report of the job manager's metrics (see :py:class:`~openeo.extra.job_metrics.JobManagerMetrics`).
+        self.metrics = metrics
+
+    @property
+    def request_count(self) -> int:
+        return sum(b["requests"] for b in self.backends.values())
+
+    def to_dict(self) -> dict:
+        return {"makespan": self.makespan, "backends": self.backends, "metrics": self.metrics}
+
+    def __repr__(self):
+        return f"<SimulationReport makespan={self.makespan:.0f}s requests={self.request_count}>"
+
+
+def _default_start_job(row: pd.Series, connection: Connection, **kwargs) -> BatchJob:
+    return connection.create_job({"add": {"process_id": "add", "arguments": {"x": 3, "y": 5}, "result": True}})
+
+
+class JobManagerSimulator:
+    """
+    Discrete-event simulator to run a :py:class:`~openeo.extra.job_management.MultiBackendJobManager`
+    against fake backends in virtual time.
+
+    :param seed: seed for the random generators, for reproducible simulations.
+    """
+
+    def __init__(self, seed: int = 42):
+        self.seed = seed
+        self._backends: Dict[str, FakeBackend] = {}
+        self._parallel_jobs: Dict[str, int] = {}
+
+    def add_backend(self, name: str, backend: FakeBackend, parallel_jobs: int = 2):
+        self._backends[name] = backend
+        self._parallel_jobs[name] = parallel_jobs
+
+    def run(
+        self,
+        manager: "openeo.extra.job_management.MultiBackendJobManager",
+        df: pd.DataFrame,
+        output_file: Union[str, Path],
+        start_job: Callable[..., BatchJob] = _default_start_job,
+    ) -> SimulationReport:
+        """
+        Run the job manager (with :py:meth:`~openeo.extra.job_management.MultiBackendJobManager.run_jobs`)
+        on the fake backends in virtual time.
+
+        :param manager: job manager to simulate (backends are registered automatically).
+        :param df: DataFrame of jobs to run.
+        :param output_file: job tracking file of the run.
+        :param start_job: callback to create a job for a row,
+            by default a job with a trivial process graph is created.
+        :return: simulation report
+        """
+        clock = VirtualClock()
+        for name, backend in self._backends.items():
+            backend.reset(name=name, clock=clock, rng=random.Random(f"{self.seed}-{name}"))
+            session = requests.Session()
+            session.mount(backend.url, _FakeBackendAdapter(backend))
+            manager.add_backend(
+                name,
+                connection=Connection(backend.url, session=session),
+                parallel_jobs=self._parallel_jobs[name],
+            )
+            # Don't count connection setup requests.
+            backend.request_counts.clear()
+
+        start = clock.now
+        with mock.patch.object(openeo.extra.job_management, "time", clock), mock.patch.object(
+            openeo.extra.job_metrics, "time", clock
+        ):
+            manager.run_jobs(df=df, start_job=start_job, output_file=output_file)
+            metrics = manager.metrics.report()
+        makespan = clock.now - start
+
+        backends = {}
+        for name, backend in self._backends.items():
+            jobs: List[_SimulatedJob] = [j for j in backend.jobs.values() if j.done_at is not None]
+            capacity = self._parallel_jobs[name] * makespan
+            slot_time = sum((j.observed_done_at or clock.now) - j.created_at for j in jobs)
+            compute_time = sum(min(j.done_at, clock.now) - min(j.running_at, clock.now) for j in jobs)
+            lags = [j.observed_done_at - j.done_at for j in jobs if j.observed_done_at is not None]
+            backends[name] = {
+                "jobs": len(backend.jobs),
+                "finished": sum(1 for j in jobs if j.final_status == "finished"),
+                "error": sum(1 for j in jobs if j.final_status == "error"),
+                "slot_utilization": slot_time / capacity if capacity else 0.0,
+                "compute_utilization": compute_time / capacity if capacity else 0.0,
+                "mean_detection_lag": sum(lags) / len(lags) if lags else None,
+                "requests": sum(backend.request_counts.values()),
+                "request_counts": dict(backend.request_counts),
+                "throttled": backend.throttled,
+            }
+        return SimulationReport(makespan=makespan, backends=backends, metrics=metrics)
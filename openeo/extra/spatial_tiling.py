@@ -0,0 +1,341 @@
+"""
+Split large-area data cube workloads into a grid of spatial tiles,
+run them as parallel batch jobs with :py:class:`~openeo.extra.job_management.MultiBackendJobManager`
+and mosaic the downloaded tile results.
+
+Usage example:
+
+.. code-block:: python
+
+    from openeo.extra.job_management import MultiBackendJobManager, run_partition_jobs
+    from openeo.extra.spatial_tiling import TileGrid, run_tiled
+
+    cube = connection.load_collection(
+        "SENTINEL2_L2A",
+        spatial_extent={"west": 3, "south": 50.5, "east": 6, "north": 51.5},
+        temporal_extent=["2022-06-01", "2022-09-01"],
+        bands=["B04", "B08"],
+    ).ndvi().max_time()
+
+    manager = MultiBackendJobManager(root_dir="tiles")
+    manager.add_backend("foo", connection=connection, parallel_jobs=4)
+
+    grid = TileGrid(size=20_000, crs=32631, overlap=320)
+    mosaic = run_tiled(cube, grid=grid, manager=manager, output_file="tiles.csv")
+    mosaic.to_xarray().to_netcdf("ndvi.nc")
+
+.. versionadded:: 0.21.0
+"""
+
+import logging
+import math
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple, Union
+
+import numpy as np
+import xarray
+
+from openeo.extra.job_management import MultiBackendJobManager, run_partition_jobs
+from openeo.internal.graph_building import PGNode
+from openeo.rest import OpenEoClientException
+from openeo.rest.datacube import DataCube
+from openeo.util import BBoxDict, to_bbox_dict
+
+_log = logging.getLogger(__name__)
+
+
+def _crs_code(crs) -> str:
+    """Normalized CRS representation (e.g. ``4326``, ``"EPSG:4326"`` and ``"epsg:4326"`` all give ``"4326"``)."""
+    crs = str(4326 if crs is None else crs).upper()
+    return crs[len("EPSG:"):] if crs.startswith("EPSG:") else crs
+
+
+def _transform_bounds(bounds: Tuple[float, float, float, float], src_crs, dst_crs) -> Tuple[float, ...]:
+    """Transform bounding box to another CRS (densifying the edges, to get the full extent)."""
+    try:
+        import pyproj
+    except ImportError:
+        raise OpenEoClientException(
+            "Tiling in another CRS than the one of the spatial extent requires `pyproj`, e.g. `pip install pyproj`."
+        )
+
+    def to_pyproj(crs) -> "pyproj.CRS":
+        code = _crs_code(crs)
+        return pyproj.CRS.from_epsg(int(code)) if code.isdigit() else pyproj.CRS.from_user_input(crs)
+
+    transformer = pyproj.Transformer.from_crs(to_pyproj(src_crs), to_pyproj(dst_crs), always_xy=True)
+    return transformer.transform_bounds(*bounds, densify_pts=21)
+
+
+class Tile:
+    """
+    Tile of a :py:class:`TileGrid`.
+
+    .. versionadded:: 0.21.0
+    """
+
+    __slots__ = ("id", "core", "extent")
+
+    def __init__(self, id: str, core: BBoxDict, extent: BBoxDict):
+        #: Tile identifier (based on column and row in the grid), e.g. "x3_y12".
+        self.id = id
+        #: Part of the full extent covered by this tile (without overlap): tile cores do not overlap.
+        self.core = core
+        #: Extent to process for this tile: the core extended with the overlap.
+        self.extent = extent
+
+    def __repr__(self):
+        return f"<{type(self).__name__} {self.id} {dict(self.extent)}>"
+
+
+class TileGrid:
+    """
+    Regular grid of square tiles to split a large spatial extent in.
+
+    :param size: tile size, in units of the CRS (e.g. meter for UTM)
+    :param crs: CRS (e.g. EPSG code) of the grid.
+        By default, the CRS of the spatial extent to split is used.
+        Splitting an extent in another CRS requires ``pyproj``.
+    :param overlap: overlap (in units of the CRS) to add on each side of a tile,
+        e.g. to avoid edge effects of neighbourhood operations.
+    :param origin: grid origin: tiles are aligned to multiples of ``size`` from this point,
+        so that the same area always gives the same tiles (which allows reuse of results of earlier tiles).
+
+    .. versionadded:: 0.21.0
+    """
+
+    def __init__(
+        self,
+        size: float,
+        *,
+        crs: Union[int, str, None] = None,
+        overlap: float = 0,
+        origin: Tuple[float, float] = (0, 0),
+    ):
+        if size <= 0:
+            raise ValueError(f"Tile size must be positive, but got {size!r}.")
+        if overlap < 0:
+            raise ValueError(f"Tile overlap can not be negative, but got {overlap!r}.")
+        self.size = size
+        self.crs = crs
+        self.overlap = overlap
+        self.origin = origin
+
+    def __repr__(self):
+        return f"<{type(self).__name__} size {self.size} crs {self.crs} overlap {self.overlap}>"
+
+    def split(self, extent: Union[dict, list, tuple]) -> List[Tile]:
+        """
+        Split a spatial extent in tiles.
+
+        :param extent: bounding box (dict with "west", "south", "east", "north" and optionally "crs", or a list)
+        :return: list of tiles (row by row, from south-west to north-east),
+            with extents in the CRS of the grid, clipped to the given extent.
+        """
+        bbox = to_bbox_dict(extent)
+        bounds = (bbox["west"], bbox["south"], bbox["east"], bbox["north"])
+        crs = self.crs if self.crs is not None else bbox.get("crs", 4326)
+        if _crs_code(crs) != _crs_code(bbox.get("crs")):
+            bounds = _transform_bounds(bounds, src_crs=bbox.get("crs", 4326), dst_crs=crs)
+        west, south, east, north = bounds
+        if not all(math.isfinite(v) for v in bounds) or not (west < east and south < north):
+            raise ValueError(f"Invalid (empty) spatial extent {extent!r}.")
+
+        x0, y0 = self.origin
+        columns = range(math.floor((west - x0) / self.size), math.ceil((east - x0) / self.size))
+        rows = range(math.floor((south - y0) / self.size), math.ceil((north - y0) / self.size))
+        tiles = []
+        for row in rows:
+            for column in columns:
+                core = (
+                    max(west, x0 + column * self.size),
+                    max(south, y0 + row * self.size),
+                    min(east, x0 + (column + 1) * self.size),
+                    min(north, y0 + (row + 1) * self.size),
+                )
+                if not (core[0] < core[2] and core[1] < core[3]):
+                    continue
+                extent = (
+                    max(west, core[0] - self.overlap),
+                    max(south, core[1] - self.overlap),
+                    min(east, core[2] + self.overlap),
+                    min(north, core[3] + self.overlap),
+                )
+                tiles.append(
+                    Tile(
+                        id=f"x{column}_y{row}",
+                        core=BBoxDict.from_sequence(core, crs=crs),
+                        extent=BBoxDict.from_sequence(extent, crs=crs),
+                    )
+                )
+        return tiles
+
+
+def _spatial_extent(flat_graph: Dict[str, dict]) -> Optional[dict]:
+    """Get the (bounding box) spatial extent of the ``load_collection`` nodes of a flat graph."""
+    extents = [
+        node["arguments"].get("spatial_extent")
+        for node in flat_graph.values()
+        if node["process_id"] == "load_collection"
+    ]
+    extents = [e for e in extents if isinstance(e, dict) and all(k in e for k in ["west", "south", "east", "north"])]
+    if not extents:
+        return None
+    if any(e != extents[0] for e in extents[1:]):
+        raise OpenEoClientException(
+            "Different spatial extents in `load_collection` nodes: specify the extent to split explicitly."
+        )
+    return extents[0]
+
+
+def tile_graph(flat_graph: Dict[str, dict], extent: dict) -> Dict[str, dict]:
+    """
+    Build a copy of a flat process graph with the spatial extent
+    of all its ``load_collection`` nodes replaced by the given (tile) extent.
+
+    .. versionadded:: 0.21.0
+    """
+    result = {}
+    for node_id, node in flat_graph.items():
+        if node["process_id"] == "load_collection":
+            node = {**node, "arguments": {**node["arguments"], "spatial_extent": dict(extent)}}
+        result[node_id] = node
+    return result
+
+
+def split_cube(cube: DataCube, grid: TileGrid, *, extent: Optional[dict] = None) -> Dict[Tile, DataCube]:
+    """
+    Split a data cube in a data cube per tile,
+    by substituting the tile extent as spatial extent of its ``load_collection`` nodes.
+
+    The tile cubes are resampled (``resample_spatial``) to the CRS of the grid,
+    so that their results can be cropped to the tile cores and mosaicked
+    (see :py:class:`TileMosaic`), whatever the native CRS of the collection is.
+
+    :param cube: data cube to split
+    :param grid: tile grid
+    :param extent: spatial extent to split (by default: the spatial extent of the ``load_collection`` nodes)
+    :return: mapping of tile to the data cube for that tile
+
+    .. versionadded:: 0.21.0
+    """
+    flat_graph = cube.flat_graph()
+    extent = extent or _spatial_extent(flat_graph)
+    if extent is None:
+        raise OpenEoClientException("No bounding box `spatial_extent` in `load_collection` to split.")
+    result = {}
+    for tile in grid.split(extent):
+        tile_cube = type(cube)(
+            graph=PGNode.from_flat_graph(tile_graph(flat_graph, tile.extent)),
+            connection=cube.connection,
+            metadata=cube.metadata,
+        )
+        crs = _crs_code(tile.core["crs"])
+        result[tile] = tile_cube.resample_spatial(resolution=0, projection=int(crs) if crs.isdigit() else crs)
+    return result
+
+
+class TileMosaic:
+    """
+    Mosaic of the (downloaded) results of tiles.
+
+    :param tiles: all tiles of the mosaic
+    :param files: downloaded result file per tile id (missing for tiles that failed)
+
+    .. versionadded:: 0.21.0
+    """
+
+    def __init__(self, tiles: List[Tile], files: Dict[str, Path]):
+        self.tiles = tiles
+        self.files = {k: Path(v) for k, v in files.items()}
+
+    def __repr__(self):
+        return f"<{type(self).__name__} {len(self.files)}/{len(self.tiles)} tiles>"
+
+    @property
+    def missing(self) -> List[Tile]:
+        """Tiles without result file (e.g. because their job failed)."""
+        return [t for t in self.tiles if t.id not in self.files]
+
+    @staticmethod
+    def _open(path: Path, chunks: Optional[dict]) -> xarray.Dataset:
+        if path.suffix.lower() in {".tif", ".tiff"}:
+            try:
+                import rioxarray
+            except ImportError:
+                raise OpenEoClientException(
+                    "Mosaicking GeoTIFF tiles requires `rioxarray`, e.g. `pip install rioxarray`."
+                )
+            data = rioxarray.open_rasterio(path, chunks=chunks)
+            return data.to_dataset(name="data") if isinstance(data, xarray.DataArray) else data
+        return xarray.open_dataset(path, chunks=chunks)
+
+    @staticmethod
+    def _crop(ds: xarray.Dataset, core: BBoxDict) -> xarray.Dataset:
+        """Crop tile data to its core (pixel centers in the half open extent), removing the overlap."""
+        x, y = ds["x"].values, ds["y"].values
+        return ds.isel(
+            x=np.flatnonzero((x >= core["west"]) & (x < core["east"])),
+            y=np.flatnonzero((y >= core["south"]) & (y < core["north"])),
+        )
+
+    def to_xarray(self, chunks: Optional[dict] = None) -> xarray.Dataset:
+        """
+        Mosaic the tile results (NetCDF, or GeoTIFF with ``rioxarray``) as xarray dataset:
+        each tile is cropped to its core (to remove the overlap) and the tiles are combined by their coordinates.
+        Data is only loaded when accessed,
+        or not at all (dask backed) when ``chunks`` is specified (e.g. ``{}``), which requires ``dask``.
+
+        :param chunks: chunking for :py:func:`xarray.open_dataset` (e.g. ``{}`` for dask arrays)
+        :return: mosaic of the tiles
+        """
+        if self.missing:
+            raise OpenEoClientException(f"Missing results of tiles {[t.id for t in self.missing]}.")
+        datasets = [self._crop(self._open(self.files[t.id], chunks=chunks), t.core) for t in self.tiles]
+        return xarray.combine_by_coords(datasets, combine_attrs="drop_conflicts")
+
+
+def run_tiled(
+    cube: DataCube,
+    grid: TileGrid,
+    *,
+    manager: MultiBackendJobManager,
+    output_file: Union[str, Path],
+    extent: Optional[dict] = None,
+    out_format: str = "netCDF",
+    title: Optional[str] = None,
+    job_options: Optional[dict] = None,
+) -> TileMosaic:
+    """
+    Split a data cube in tiles (see :py:func:`split_cube`),
+    run a batch job per tile with given job manager (in parallel, on its backends)
+    and return the mosaic of the downloaded tile results.
+
+    The ``load_collection`` based process graph is rebuilt on the connection of the job manager backend,
+    so ``cube`` does not have to be built on the same connection.
+    Running again with the same ``output_file`` resumes the tile jobs tracked in it.
+
+    :param cube: data cube to process
+    :param grid: tile grid
+    :param manager: job manager (with backends) to run the tile jobs
+    :param output_file: job tracking file of the job manager (CSV)
+    :param extent: spatial extent to split (by default: the spatial extent of the ``load_collection`` nodes)
+    :param out_format: output file format of the tile jobs
+    :param title: job title (the tile id is appended)
+    :param job_options: custom job options
+    :return: mosaic of the tiles
+    """
+    tiles = split_cube(cube, grid=grid, extent=extent)
+    files = run_partition_jobs(
+        {tile.id: tile_cube.flat_graph() for tile, tile_cube in tiles.items()},
+        manager=manager,
+        output_file=output_file,
+        columns={k: [t.extent[k] for t in tiles] for k in ["west", "south", "east", "north"]},
+        out_format=out_format,
+        title=title or "Tile",
+        job_options=job_options,
+    )
+    mosaic = TileMosaic(tiles=list(tiles), files=files)
+    if mosaic.missing:
+        _log.warning(f"No results for tiles {[t.id for t in mosaic.missing]}.")
+    return mosaic
@@ -0,0 +1,388 @@
+"""
+Split long time series workloads (e.g. ``aggregate_spatial`` over many years) in temporal windows,
+run them as parallel batch jobs with :py:class:`~openeo.extra.job_management.MultiBackendJobManager`
+and concatenate the downloaded results (in temporal order) into a single ``pandas`` or ``xarray`` object.
+
+Usage example:
+
+.. code-block:: python
+
+    from openeo.extra.job_management import MultiBackendJobManager
+    from openeo.extra.temporal_partitioning import TimeWindows, run_temporal
+
+    timeseries = connection.load_collection(
+        "SENTINEL2_L2A",
+        temporal_extent=["2015-07-01", "2024-01-01"],
+        bands=["B04", "B08"],
+    ).ndvi().aggregate_spatial(geometries=fields, reducer="mean")
+
+    manager = MultiBackendJobManager(root_dir="windows")
+    manager.add_backend("foo", connection=connection, parallel_jobs=4)
+
+    results = run_temporal(timeseries, windows=TimeWindows("year"), manager=manager, output_file="windows.csv")
+    df = results.to_pandas()
+
+.. versionadded:: 0.21.0
+"""
+
+import datetime
+import json
+import logging
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple, Union
+
+import pandas as pd
+import xarray
+
+from openeo.extra.job_management import MultiBackendJobManager, run_partition_jobs
+from openeo.internal.graph_building import PGNode
+from openeo.rest import OpenEoClientException
+from openeo.rest.conversions import timeseries_json_to_pandas
+from openeo.rest.datacube import DataCube
+from openeo.util import rfc3339
+
+_log = logging.getLogger(__name__)
+
+# Calendar periods (in number of months) supported by `TimeWindows`.
+_PERIOD_MONTHS = {"month": 1, "quarter": 3, "year": 12}
+
+# Names of the temporal dimension/column in results.
+_TIME_NAMES = ["t", "time", "date"]
+
+
+def _parse(value: Union[str, datetime.date, None]) -> Optional[datetime.datetime]:
+    """Parse date or datetime (string) to naive (UTC) datetime."""
+    if isinstance(value, str):
+        value = rfc3339.parse_date_or_datetime(value)
+    if isinstance(value, datetime.datetime):
+        if value.tzinfo is not None:
+            value = value.astimezone(datetime.timezone.utc).replace(tzinfo=None)
+        return value
+    elif isinstance(value, datetime.date):
+        return datetime.datetime.combine(value, datetime.time())
+    return None
+
+
+def _is_date(value) -> bool:
+    """Whether given value is a date (not a datetime) or date string."""
+    if isinstance(value, str):
+        value = rfc3339.parse_date_or_datetime(value)
+    return isinstance(value, datetime.date) and not isinstance(value, datetime.datetime)
+
+
+def _add_months(d: datetime.datetime, months: int) -> datetime.datetime:
+    year, month = divmod(d.month - 1 + months, 12)
+    return d.replace(year=d.year + year, month=month + 1, day=1)
+
+
+class TimeWindow:
+    """
+    Window of :py:class:`TimeWindows`: temporal extents (as openEO style half-open intervals).
+
+    .. versionadded:: 0.21.0
+    """
+
+    __slots__ = ("id", "core", "extent")
+
+    def __init__(self, id: str, core: Tuple[str, str], extent: Tuple[str, str]):
+        #: Window identifier (based on the core extent), e.g. "2020-01-01_2021-01-01".
+        self.id = id
+        #: Part of the full extent covered by this window (without overlap): window cores do not overlap.
+        self.core = core
+        #: Extent to process for this window: the core extended with the overlap.
+        self.extent = extent
+
+    def __repr__(self):
+        return f"<{type(self).__name__} {list(self.extent)}>"
+
+
+class TimeWindows:
+    """
+    Consecutive temporal windows to split a long temporal extent in.
+
+    :param window: window length: a calendar period ("month", "quarter" or "year"),
+        aligned to the calendar (e.g. "year" windows start on January 1),
+        or a fixed length (number of days or :py:class:`datetime.timedelta`), starting from the start of the extent.
+    :param overlap: overlap (number of days or :py:class:`datetime.timedelta`) to add on each side of a window,
+        e.g. for temporal compositing or smoothing that needs observations around the window.
+        Results in the overlap are dropped when concatenating.
+
+    .. versionadded:: 0.21.0
+    """
+
+    def __init__(
+        self,
+        window: Union[str, int, datetime.timedelta],
+        *,
+        overlap: Union[int, datetime.timedelta] = 0,
+    ):
+        if isinstance(window, str):
+            if window not in _PERIOD_MONTHS:
+                raise ValueError(f"Invalid window {window!r}: expected one of {list(_PERIOD_MONTHS)} or a duration.")
+        else:
+            window = window if isinstance(window, datetime.timedelta) else datetime.timedelta(days=window)
+            if window <= datetime.timedelta(0):
+                raise ValueError(f"Window length must be positive, but got {window!r}.")
+        overlap = overlap if isinstance(overlap, datetime.timedelta) else datetime.timedelta(days=overlap)
+        if overlap < datetime.timedelta(0):
+            raise ValueError(f"Window overlap can not be negative, but got {overlap!r}.")
+        self.window = window
+        self.overlap = overlap
+
+    def __repr__(self):
+        return f"<{type(self).__name__} window {self.window} overlap {self.overlap}>"
+
+    def _next(self, d: datetime.datetime) -> datetime.datetime:
+        """Start of the window after the one containing given datetime."""
+        if isinstance(self.window, str):
+            months = _PERIOD_MONTHS[self.window]
+            start = _add_months(d.replace(hour=0, minute=0, second=0, microsecond=0), -((d.month - 1) % months))
+            return _add_months(start, months)
+        return d + self.window
+
+    def split(self, extent: Union[list, tuple]) -> List[TimeWindow]:
+        """
+        Split a temporal extent in windows.
+
+        :param extent: temporal extent: start (inclusive) and end (exclusive) date(time)
+        :return: list of windows (in temporal order), clipped to the given extent.
+        """
+        if not isinstance(extent, (list, tuple)) or len(extent) != 2 or None in extent:
+            raise ValueError(f"Expected bounded temporal extent (start and end), but got {extent!r}.")
+        start, end = (_parse(v) for v in extent)
+        if not start < end:
+            raise ValueError(f"Invalid (empty) temporal extent {extent!r}.")
+        as_date = all(_is_date(v) for v in extent) and (
+            isinstance(self.window, str) or self.window % datetime.timedelta(days=1) == datetime.timedelta(0)
+        ) and self.overlap % datetime.timedelta(days=1) == datetime.timedelta(0)
+
+        def format(d: datetime.datetime) -> str:
+            return rfc3339.date(d) if as_date else rfc3339.datetime(d)
+
+        windows = []
+        core_start = start
+        while core_start < end:
+            core_end = min(self._next(core_start), end)
+            core = (format(core_start), format(core_end))
+            windows.append(
+                TimeWindow(
+                    id=f"{core[0]}_{core[1]}",
+                    core=core,
+                    extent=(format(max(start, core_start - self.overlap)), format(min(end, core_end + self.overlap))),
+                )
+            )
+            core_start = core_end
+        return windows
+
+
+def _temporal_extents(flat_graph: Dict[str, dict]) -> List[Tuple[str, str, list]]:
+    """List (node id, argument name, extent) of the temporal extents in ``load_collection``/``filter_temporal``."""
+    extents = []
+    for node_id, node in flat_graph.items():
+        argument = {"load_collection": "temporal_extent", "filter_temporal": "extent"}.get(node["process_id"])
+        extent = node["arguments"].get(argument) if argument else None
+        if isinstance(extent, (list, tuple)) and len(extent) == 2:
+            extents.append((node_id, argument, list(extent)))
+    return extents
+
+
+def _intersect(extent: list, other) -> Optional[list]:
+    """Intersection of two temporal extents (with open bounds as ``None``), ``None`` if it is empty."""
+    start, end = extent
+    if other[0] is not None and (start is None or _parse(start) < _parse(other[0])):
+        start = other[0]
+    if other[1] is not None and (end is None or _parse(end) > _parse(other[1])):
+        end = other[1]
+    if start is not None and end is not None and _parse(start) >= _parse(end):
+        return None
+    return [start, end]
+
+
+def temporal_graph(flat_graph: Dict[str, dict], extent: Tuple[str, str]) -> Optional[Dict[str, dict]]:
+    """
+    Build a copy of a flat process graph with the temporal extents
+    of its ``load_collection`` nodes (and ``filter_temporal`` nodes) limited to the given (window) extent.
+
+    :return: the limited flat graph,
+        or ``None`` if the given extent does not overlap with the temporal extent of one of the nodes.
+
+    .. versionadded:: 0.21.0
+    """
+    result = dict(flat_graph)
+    for node_id, argument, node_extent in _temporal_extents(flat_graph):
+        node = flat_graph[node_id]
+        limited = _intersect(node_extent, extent)
+        if limited is None:
+            return None
+        result[node_id] = {**node, "arguments": {**node["arguments"], argument: limited}}
+    for node_id, node in flat_graph.items():
+        if node["process_id"] == "load_collection" and node["arguments"].get("temporal_extent") is None:
+            result[node_id] = {**node, "arguments": {**node["arguments"], "temporal_extent": list(extent)}}
+    return result
+
+
+def split_cube_temporal(
+    cube: DataCube, windows: TimeWindows, *, extent: Optional[list] = None
+) -> Dict[TimeWindow, DataCube]:
+    """
+    Split a data cube (or vector cube, e.g. of ``aggregate_spatial``) in a cube per temporal window,
+    by limiting the temporal extent of its ``load_collection`` (and ``filter_temporal``) nodes to the window.
+
+    :param cube: data cube to split
+    :param windows: temporal windows
+    :param extent: temporal extent to split (by default:
+        the intersection of the temporal extents in ``load_collection`` and ``filter_temporal`` nodes)
+    :return: mapping of window to the data cube for that window
+        (windows outside the temporal extent of a ``load_collection`` or ``filter_temporal`` node are skipped)
+
+    .. versionadded:: 0.21.0
+    """
+    flat_graph = cube.flat_graph()
+    if extent is None:
+        extent = [None, None]
+        for _, _, node_extent in _temporal_extents(flat_graph):
+            extent = _intersect(extent, node_extent)
+            if extent is None:
+                raise OpenEoClientException("Empty temporal extent in `load_collection`/`filter_temporal` to split.")
+        if None in extent:
+            raise OpenEoClientException("No bounded temporal extent in `load_collection`/`filter_temporal` to split.")
+    cubes = {}
+    for window in windows.split(extent):
+        window_graph = temporal_graph(flat_graph, window.extent)
+        if window_graph is None:
+            _log.info(f"Skipping window {window.id}: outside of the temporal extent of the process graph.")
+            continue
+        cubes[window] = type(cube)(
+            graph=PGNode.from_flat_graph(window_graph), connection=cube.connection, metadata=cube.metadata
+        )
+    return cubes
+
+
+class TemporalResults:
+    """
+    Downloaded results of temporal windows, to concatenate in temporal order.
+    Results in the overlap of a window (outside its core extent) are dropped,
+    so each observation is taken from exactly one window.
+
+    :param windows: all windows
+    :param files: downloaded result file per window id (missing for windows that failed)
+
+    .. versionadded:: 0.21.0
+    """
+
+    def __init__(self, windows: List[TimeWindow], files: Dict[str, Path]):
+        self.windows = windows
+        self.files = {k: Path(v) for k, v in files.items()}
+
+    def __repr__(self):
+        return f"<{type(self).__name__} {len(self.files)}/{len(self.windows)} windows>"
+
+    @property
+    def missing(self) -> List[TimeWindow]:
+        """Windows without result file (e.g. because their job failed)."""
+        return [w for w in self.windows if w.id not in self.files]
+
+    def _check_complete(self):
+        if self.missing:
+            raise OpenEoClientException(f"Missing results of windows {[w.id for w in self.missing]}.")
+
+    @staticmethod
+    def _in_core(timestamps, window: TimeWindow):
+        """Boolean mask of the timestamps in the core extent of given window."""
+        timestamps = pd.to_datetime(pd.Series(timestamps), utc=True).dt.tz_localize(None)
+        start, end = (pd.Timestamp(_parse(v)) for v in window.core)
+        return ((timestamps >= start) & (timestamps < end)).values
+
+    def to_pandas(self) -> pd.DataFrame:
+        """
+        Concatenate the results as pandas DataFrame:
+        JSON time series results (like from ``aggregate_spatial``)
+        are merged and converted with :py:func:`~openeo.rest.conversions.timeseries_json_to_pandas`,
+        CSV results are concatenated (the time column is one of "t", "time" or "date"),
+        and NetCDF results are concatenated with :py:meth:`to_xarray` and converted to a DataFrame.
+        """
+        self._check_complete()
+        suffixes = {p.suffix.lower() for p in self.files.values()}
+        if suffixes == {".json"}:
+            merged = {}
+            for window in self.windows:
+                timeseries = json.loads(self.files[window.id].read_text(encoding="utf8"))
+                in_core = self._in_core(list(timeseries.keys()), window)
+                merged.update((k, v) for (k, v), keep in zip(timeseries.items(), in_core) if keep)
+            return timeseries_json_to_pandas(merged)
+        elif suffixes == {".csv"}:
+            frames = []
+            for window in self.windows:
+                df = pd.read_csv(self.files[window.id])
+                column = next((c for c in _TIME_NAMES if c in df.columns), None)
+                if column is None:
+                    raise OpenEoClientException(f"No time column (one of {_TIME_NAMES}) in {self.files[window.id]}.")
+                frames.append(df[self._in_core(df[column], window)])
+            return pd.concat(frames, ignore_index=True)
+        elif suffixes <= {".nc", ".nc4", ".netcdf"}:
+            return self.to_xarray().to_dataframe()
+        raise OpenEoClientException(f"Unsupported result formats {sorted(suffixes)}.")
+
+    def to_xarray(self, chunks: Optional[dict] = None) -> xarray.Dataset:
+        """
+        Concatenate the (NetCDF) results along their temporal dimension ("t", "time" or "date").
+
+        :param chunks: chunking for :py:func:`xarray.open_dataset` (e.g. ``{}`` for dask arrays, requires ``dask``)
+        """
+        self._check_complete()
+        datasets = []
+        dimension = None
+        for window in self.windows:
+            ds = xarray.open_dataset(self.files[window.id], chunks=chunks)
+            dimension = next((d for d in _TIME_NAMES if d in ds.dims), None)
+            if dimension is None:
+                raise OpenEoClientException(f"No temporal dimension in {self.files[window.id]}.")
+            datasets.append(ds.isel({dimension: self._in_core(ds[dimension].values, window).nonzero()[0]}))
+        return xarray.concat(datasets, dim=dimension, combine_attrs="drop_conflicts")
+
+
+def run_temporal(
+    cube: DataCube,
+    windows: TimeWindows,
+    *,
+    manager: MultiBackendJobManager,
+    output_file: Union[str, Path],
+    extent: Optional[list] = None,
+    out_format: str = "JSON",
+    title: Optional[str] = None,
+    job_options: Optional[dict] = None,
+) -> TemporalResults:
+    """
+    Split a data cube (or vector cube) in temporal windows (see :py:func:`split_cube_temporal`),
+    run a batch job per window with given job manager (in parallel, on its backends)
+    and return the downloaded results, to concatenate with
+    :py:meth:`TemporalResults.to_pandas` or :py:meth:`TemporalResults.to_xarray`.
+
+    The process graph is rebuilt on the connection of the job manager backend,
+    so ``cube`` does not have to be built on the same connection.
+    Running again with the same ``output_file`` resumes the window jobs tracked in it.
+
+    :param cube: data cube or vector cube to process
+    :param windows: temporal windows
+    :param manager: job manager (with backends) to run the window jobs
+    :param output_file: job tracking file of the job manager (CSV)
+    :param extent: temporal extent to split (by default: the temporal extent of the process graph)
+    :param out_format: output file format of the window jobs: "JSON", "CSV" or "netCDF"
+    :param title: job title (the window id is appended)
+    :param job_options: custom job options
+    :return: results of the windows
+    """
+    split = split_cube_temporal(cube, windows=windows, extent=extent)
+    files = run_partition_jobs(
+        {window.id: window_cube.flat_graph() for window, window_cube in split.items()},
+        manager=manager,
+        output_file=output_file,
+        columns={"start": [w.extent[0] for w in split], "end": [w.extent[1] for w in split]},
+        out_format=out_format,
+        title=title or "Window",
+        job_options=job_options,
+    )
+    results = TemporalResults(windows=list(split), files=files)
+    if results.missing:
+        _log.warning(f"No results for windows {[w.id for w in results.missing]}.")
+    return results
@@ -4,20 +4,27 @@ Functionality for abstracting, building, manipulating and processing openEO proc
 """
 import abc
 import collections
+import hashlib
 import json
+import logging
 import sys
+import threading
+import types
+import weakref
 from pathlib import Path
-from typing import Any, Dict, Optional, Tuple, Union
+from typing import Any, Dict, Iterator, List, Mapping, Optional, Tuple, Union
 
 from openeo.api.process import Parameter
+from openeo.internal import json_encoding
 from openeo.internal.compat import nullcontext
 from openeo.internal.process_graph_visitor import (
     ProcessGraphUnflattener,
     ProcessGraphVisitException,
-    ProcessGraphVisitor,
 )
 from openeo.util import dict_no_none, load_json_resource
 
+_log = logging.getLogger(__name__)
+
 
 class FlatGraphableMixin(metaclass=abc.ABCMeta):
     """
@@ -37,13 +44,18 @@ class FlatGraphableMixin(metaclass=abc.ABCMeta):
         and :ref:`process_graph_export` for more usage information.
 
         Also see ``json.dumps`` docs for more information on the JSON formatting options.
+        Encoding is done with `orjson <https://github.com/ijl/orjson>`_ when it is installed
+        (for the default and the compact ``separators=(",", ":")`` formatting).
 
         :param indent: JSON indentation level.
         :param separators: (optional) tuple of item/key separators.
         :return: JSON string
+
+        .. versionchanged:: 0.21.0
+            use orjson when available.
         """
         pg = {"process_graph": self.flat_graph()}
-        return json.dumps(pg, indent=indent, separators=separators)
+        return json_encoding.dumps(pg, indent=indent, separators=separators)
 
     def print_json(self, *, file=None, indent: Union[int, None] = 2, separators: Optional[Tuple[str, str]] = None):
         """
@@ -60,6 +72,10 @@ class FlatGraphableMixin(metaclass=abc.ABCMeta):
         :param separators: (optional) tuple of item/key separators.
 
         .. versionadded:: 0.12.0
+
+        .. versionchanged:: 0.21.0
+            JSON is written node by node (instead of building one string in memory first)
+            and encoded with orjson when available.
         """
         pg = {"process_graph": self.flat_graph()}
         if isinstance(file, (str, Path)):
@@ -69,7 +85,8 @@ class FlatGraphableMixin(metaclass=abc.ABCMeta):
             # Just use file as-is, but don't close it automatically.
             file_ctx = nullcontext(enter_result=file or sys.stdout)
         with file_ctx as f:
-            json.dump(pg, f, indent=indent, separators=separators)
+            for chunk in json_encoding.iterdumps(pg, indent=indent, separators=separators):
+                f.write(chunk)
             if indent is not None:
                 f.write("\n")
 
@@ -107,23 +124,29 @@ class PGNode(_FromNodeMixin, FlatGraphableMixin):
 
     """
 
-    __slots__ = ["_process_id", "_arguments", "_namespace"]
+    __slots__ = ["_process_id", "_arguments", "_namespace", "_flat_graph_cache", "_version"]
 
     def __init__(self, process_id: str, arguments: dict = None, namespace: Union[str, None] = None, **kwargs):
         self._process_id = process_id
         # Merge arguments dict and kwargs
         arguments = dict(**(arguments or {}), **kwargs)
         # Make sure direct PGNode arguments are properly wrapped in a "from_node" dict
+        # (without modifying the given containers).
         for arg, value in arguments.items():
             if isinstance(value, _FromNodeMixin):
                 arguments[arg] = {"from_node": value.from_node()}
-            elif isinstance(value, list):
-                for index, arrayelement in enumerate(value):
-                    if isinstance(arrayelement, _FromNodeMixin):
-                        value[index] = {"from_node": arrayelement.from_node()}
-        # TODO: use a frozendict of some sort to ensure immutability?
-        self._arguments = arguments
+            elif isinstance(value, list) and any(isinstance(v, _FromNodeMixin) for v in value):
+                arguments[arg] = [
+                    {"from_node": v.from_node()} if isinstance(v, _FromNodeMixin) else v for v in value
+                ]
+        # Arguments are not exposed for in-place modification (see `arguments` property), as flat graphs are cached:
+        # copy the container structure so that later changes to the given containers do not leak in.
+        self._arguments = _copy_structure(arguments)
         self._namespace = namespace
+        self._flat_graph_cache: Optional[_FlatGraphCache] = None
+        # Incremented on each argument update, to invalidate cached flat graphs
+        # (of the node itself and of the nodes depending on it).
+        self._version = 0
 
     def from_node(self):
         return self
@@ -136,8 +159,15 @@ class PGNode(_FromNodeMixin, FlatGraphableMixin):
         return self._process_id
 
     @property
-    def arguments(self) -> dict:
-        return self._arguments
+    def arguments(self) -> Mapping[str, Any]:
+        """
+        Process arguments, as read-only mapping
+        (nested containers, like lists or dicts, are copies).
+
+        .. versionchanged:: 0.21.0 arguments are read-only
+            (use :py:meth:`update_arguments` to update them)
+        """
+        return types.MappingProxyType(_copy_structure(self._arguments))
 
     @property
     def namespace(self) -> Union[str, None]:
@@ -149,7 +179,8 @@ class PGNode(_FromNodeMixin, FlatGraphableMixin):
 
         .. versionadded:: 0.10.1
         """
-        self._arguments = {**self._arguments, **kwargs}
+        self._arguments = {**self._arguments, **_copy_structure(kwargs)}
+        self._version += 1
 
     def _as_tuple(self):
         return (self._process_id, self._arguments, self._namespace)
@@ -166,7 +197,7 @@ class PGNode(_FromNodeMixin, FlatGraphableMixin):
         def _deep_copy(x):
             """PGNode aware deep copy helper"""
             if isinstance(x, PGNode):
-                return dict_no_none(process_id=x.process_id, arguments=_deep_copy(x.arguments), namespace=x.namespace)
+                return dict_no_none(process_id=x.process_id, arguments=_deep_copy(x._arguments), namespace=x.namespace)
             if isinstance(x, Parameter):
                 return {"from_parameter": x.name}
             elif isinstance(x, dict):
@@ -180,9 +211,67 @@ class PGNode(_FromNodeMixin, FlatGraphableMixin):
 
         return _deep_copy(self)
 
-    def flat_graph(self) -> Dict[str, dict]:
-        """Get the process graph in internal flat dict representation."""
-        return GraphFlattener().flatten(node=self)
+    def flat_graph(self, *, deduplicate: bool = False) -> Dict[str, dict]:
+        """
+        Get the process graph in internal flat dict representation.
+
+        :param deduplicate: whether to merge structurally identical nodes
+            (e.g. the same ``load_collection`` or band math subexpression built multiple times),
+            so that the backend does not compute them multiple times.
+
+        .. versionchanged:: 0.21.0 added ``deduplicate`` argument
+        """
+        if deduplicate:
+            flattener = GraphFlattener(deduplicate=True)
+            flat_graph = flattener.flatten(node=self)
+            if flattener.stats["saved"]:
+                _log.info(
+                    f"Deduplicated process graph: merged {flattener.stats['saved']} of {flattener.stats['nodes']} nodes."
+                )
+            return flat_graph
+        return self._cached_flat_graph().export()
+
+    def _first_dependency(self) -> Optional["PGNode"]:
+        """
+        Get the node that is flattened first when flattening this node, if there is nothing else
+        (e.g. a child process graph) that is flattened before it.
+        """
+        arguments = self._arguments
+        for arg_id, value in sorted(arguments.items()) if len(arguments) > 1 else arguments.items():
+            if isinstance(value, dict) and "node" not in value and isinstance(value.get("from_node"), PGNode):
+                return value["from_node"]
+            if _contains_graph_reference(value):
+                return None
+        return None
+
+    def _cached_flat_graph(self) -> "_FlatGraphCache":
+        """
+        Get the cached flat graph (and flattening state) of this node, building it if necessary.
+
+        The flat graph is built incrementally when possible: flattening continues from the cached state
+        of the closest node along the chain of "first dependencies" (e.g. the input cube of a process),
+        as that state is identical to the intermediate state of flattening this node from scratch.
+        """
+        cache = self._flat_graph_cache
+        if cache is None or not cache.is_valid(self):
+            flattener = GraphFlattener()
+            dependency = self._first_dependency()
+            ancestor = dependency
+            while ancestor is not None:
+                ancestor_cache = ancestor._flat_graph_cache
+                if ancestor_cache is not None and ancestor_cache.is_valid(ancestor):
+                    flattener._resume(ancestor_cache, node=ancestor)
+                    break
+                ancestor = ancestor._first_dependency()
+            if dependency is not None and dependency is not ancestor:
+                # Also cache the flat graph of the first dependency, e.g. to build on in a next call.
+                flattener._flatten(dependency)
+                dependency._flat_graph_cache = _FlatGraphCache.from_flattener(flattener, node=dependency)
+                _FlatGraphCache.track(dependency)
+            flattener._flatten(self)
+            cache = self._flat_graph_cache = _FlatGraphCache.from_flattener(flattener, node=self)
+        _FlatGraphCache.track(self)
+        return cache
 
     @staticmethod
     def to_process_graph_argument(value: Union['PGNode', str, dict]) -> dict:
@@ -226,6 +315,78 @@ def as_flat_graph(x: Union[dict, FlatGraphableMixin, Path, Any]) -> Dict[str, di
     raise ValueError(x)
 
 
+def graph_fingerprint(graph: Union[dict, FlatGraphableMixin, Path, Any]) -> str:
+    """
+    Canonical fingerprint (hex digest) of a process graph:
+    only depends on the structure of the process graph (processes, arguments and how they are connected),
+    not on the node ids or the order of nodes and arguments.
+    For example, the same graph built in different ways (or in a different session) has the same fingerprint.
+
+    :param graph: process graph (e.g. a :py:class:`~openeo.rest.datacube.DataCube` or a flat graph dict)
+    :return: SHA-256 hex digest
+
+    .. versionadded:: 0.21.0
+    """
+    flat_graph = as_flat_graph(graph)
+    if "process_graph" in flat_graph:
+        flat_graph = flat_graph["process_graph"]
+    return _flat_graph_fingerprint(flat_graph)
+
+
+def _sha256(data) -> str:
+    """SHA-256 hex digest of canonical JSON representation of given data."""
+    data = json.dumps(data, sort_keys=True, separators=(",", ":"), default=repr)
+    return hashlib.sha256(data.encode("utf8")).hexdigest()
+
+
+def _flat_graph_fingerprint(flat_graph: Dict[str, dict]) -> str:
+    # Structural digest of each node, in dependency order (without recursion, to support very long chains).
+    digests: Dict[str, str] = {}
+
+    def canonical(value):
+        if isinstance(value, dict):
+            if len(value) == 1 and "from_node" in value:
+                return {"from_node": digests[value["from_node"]]}
+            if len(value) == 1 and isinstance(value.get("process_graph"), dict):
+                return {"process_graph": _flat_graph_fingerprint(value["process_graph"])}
+            return {k: canonical(v) for k, v in value.items()}
+        elif isinstance(value, (list, tuple)):
+            return [canonical(v) for v in value]
+        return value
+
+    visiting = set()
+    for start in flat_graph:
+        if start in digests:
+            continue
+        visiting.add(start)
+        stack = [(start, ProcessGraphUnflattener._from_node_keys(flat_graph[start].get("arguments", {})))]
+        while stack:
+            node_id, dependencies = stack[-1]
+            for dependency in dependencies:
+                if dependency in digests:
+                    continue
+                if dependency not in flat_graph:
+                    raise ProcessGraphVisitException(f"Invalid node reference {dependency!r} in node {node_id!r}.")
+                if dependency in visiting:
+                    raise ProcessGraphVisitException("Cycle in process graph")
+                visiting.add(dependency)
+                stack.append(
+                    (dependency, ProcessGraphUnflattener._from_node_keys(flat_graph[dependency].get("arguments", {})))
+                )
+                break
+            else:
+                stack.pop()
+                visiting.discard(node_id)
+                node = flat_graph[node_id]
+                digests[node_id] = _sha256(
+                    [node["process_id"], node.get("namespace"), canonical(node.get("arguments", {}))]
+                )
+
+    results = sorted(digests[k] for k, node in flat_graph.items() if node.get("result"))
+    # Note: set of node digests, so that duplicate nodes (e.g. with or without deduplication) don't matter.
+    return _sha256([results, sorted(set(digests.values()))])
+
+
 class ReduceNode(PGNode):
     """
     A process graph node for "reduce" processes (has a reducer sub-process-graph)
@@ -284,68 +445,199 @@ class FlatGraphNodeIdGenerator:
         self._counters[process_id] += 1
         return "{p}{c}".format(p=process_id.replace('_', ''), c=self._counters[process_id])
 
+    def copy(self) -> "FlatGraphNodeIdGenerator":
+        """Copy of the generator, continuing from the current state."""
+        generator = FlatGraphNodeIdGenerator()
+        generator._counters.update(self._counters)
+        return generator
+
 
-class GraphFlattener(ProcessGraphVisitor):
+class _FlattenFrame:
+    """Traversal state of a single node in :py:class:`GraphFlattener`."""
 
-    def __init__(self, node_id_generator: FlatGraphNodeIdGenerator = None):
-        super().__init__()
+    __slots__ = ("node", "arguments", "items", "array", "elements", "pending", "subgraph_nodes")
+
+    def __init__(self, node: PGNode):
+        self.node = node
+        # Flattened arguments (under construction).
+        self.arguments = {}
+        arguments = node._arguments
+        self.items = iter(sorted(arguments.items()) if len(arguments) > 1 else arguments.items())
+        # Flattened array and iterator of remaining elements of the current array argument (if any).
+        self.array: Optional[list] = None
+        self.elements: Optional[Iterator] = None
+        # Argument id (``None`` for array element) and value to store after its node has been flattened.
+        self.pending: Optional[Tuple[Optional[str], dict]] = None
+        # Number of nodes emitted in child process graphs of this node.
+        self.subgraph_nodes = 0
+
+
+class GraphFlattener:
+    """
+    Convert a graph of :py:class:`PGNode` objects to a flat dict representation.
+
+    Node ids are generated in depth-first post-order (dependencies before dependents),
+    visiting arguments in sorted order. The traversal uses an explicit stack instead of recursion,
+    so that deeply nested graphs (e.g. built with long method chains) can be flattened too.
+
+    Nodes that are reused (the same :py:class:`PGNode` object) are only emitted once.
+    With ``deduplicate=True``, structurally identical nodes (same process id, namespace and arguments,
+    after deduplication of their dependencies) are also merged (common subexpression elimination),
+    e.g. the same ``load_collection`` or band math subexpression that was built multiple times.
+    The ``stats`` attribute then reports the number of nodes that were saved.
+
+    :param node_id_generator: node id generator (to share between a graph and its child process graphs)
+    :param deduplicate: whether to merge structurally identical nodes.
+    """
+
+    def __init__(self, node_id_generator: FlatGraphNodeIdGenerator = None, *, deduplicate: bool = False):
         self._node_id_generator = node_id_generator or FlatGraphNodeIdGenerator()
         self._last_node_id = None
         self._flattened: Dict[str, dict] = {}
-        self._argument_stack = []
         self._node_cache = {}
+        # Flattened nodes (including the nodes of child process graphs) and their argument version.
+        self._versions: List[Tuple[PGNode, int]] = []
+        self._deduplicate = deduplicate
+        # Structural digest of each emitted node (by node id) and node id by digest.
+        self._digests: Dict[str, str] = {}
+        self._digest_ids: Dict[str, str] = {}
+        # Structural digest of flattened child process graphs (by `id()` of the flat graph dict).
+        self._subgraph_digests: Dict[int, str] = {}
+        #: Node counts (including child process graphs): "nodes" (before deduplication),
+        #: "emitted" (in the flat graph) and "saved" (merged away by deduplication).
+        self.stats = {"nodes": 0, "emitted": 0, "saved": 0}
 
     def flatten(self, node: PGNode) -> Dict[str, dict]:
         """Consume given nested process graph and return flat dict representation"""
-        self.accept_node(node)
-        assert len(self._argument_stack) == 0
+        self._flatten(node)
         self._flattened[self._last_node_id]["result"] = True
         return self._flattened
 
-    def accept_node(self, node: PGNode):
-        # Process reused nodes only first time and remember node id.
-        node_id = id(node)
-        if node_id not in self._node_cache:
-            super()._accept_process(process_id=node.process_id, arguments=node.arguments, namespace=node.namespace)
-            self._node_cache[node_id] = self._last_node_id
-        else:
-            self._last_node_id = self._node_cache[node_id]
+    def _resume(self, cache: "_FlatGraphCache", node: PGNode):
+        """Continue from the (cached) state after flattening another node (without modifying that state)."""
+        self._flattened = dict(cache.flattened)
+        self._node_cache = dict(cache.node_cache)
+        self._versions = [*cache.versions, (node, cache.version)]
+        self._node_id_generator = cache.node_id_generator.copy()
+        self._last_node_id = cache.result_id
+
+    def _flatten(self, node: PGNode):
+        """Flatten given node (and its dependencies), without flagging the result node."""
+        stack = [_FlattenFrame(node)]
+        while stack:
+            frame = stack[-1]
+            child = self._advance(frame)
+            if child is not None:
+                stack.append(_FlattenFrame(child))
+            else:
+                stack.pop()
+                node = frame.node
+                self._versions.append((node, node._version))
+                self.stats["nodes"] += 1
+                if self._deduplicate:
+                    digest = self._digest(node.process_id, frame.arguments, node.namespace)
+                    if digest in self._digest_ids:
+                        # Child process graphs of the merged node are dropped too.
+                        self.stats["emitted"] -= frame.subgraph_nodes
+                        self.stats["saved"] += 1 + frame.subgraph_nodes
+                        self._node_cache[id(node)] = self._last_node_id = self._digest_ids[digest]
+                        continue
+                node_id = self._node_id_generator.generate(node.process_id)
+                self._flattened[node_id] = dict_no_none(
+                    process_id=node.process_id,
+                    arguments=frame.arguments,
+                    namespace=node.namespace,
+                )
+                self.stats["emitted"] += 1
+                if self._deduplicate:
+                    self._digests[node_id] = digest
+                    self._digest_ids[digest] = node_id
+                self._node_cache[id(node)] = self._last_node_id = node_id
+
+    def _canonical(self, value):
+        """
+        Canonical form of a flattened argument value for structural hashing:
+        node references are replaced by the structural digest of the referenced node.
+        """
+        if isinstance(value, dict):
+            if len(value) == 1 and value.get("from_node") in self._digests:
+                return {"from_node": self._digests[value["from_node"]]}
+            if len(value) == 1 and id(value.get("process_graph")) in self._subgraph_digests:
+                return {"process_graph": self._subgraph_digests[id(value["process_graph"])]}
+            return {k: self._canonical(v) for k, v in value.items()}
+        elif isinstance(value, (list, tuple)):
+            return [self._canonical(v) for v in value]
+        return value
 
-    def enterProcess(self, process_id: str, arguments: dict, namespace: Union[str, None]):
-        self._argument_stack.append({})
+    def _digest(self, process_id: str, arguments: dict, namespace: Optional[str]) -> str:
+        """Structural digest of a (flattened) node."""
+        return _sha256([process_id, namespace, self._canonical(arguments)])
 
-    def leaveProcess(self, process_id: str, arguments: dict, namespace: Union[str, None]):
-        node_id = self._node_id_generator.generate(process_id)
-        self._flattened[node_id] = dict_no_none(
-            process_id=process_id,
-            arguments=self._argument_stack.pop(),
-            namespace=namespace,
-        )
+    def _visit(self, value: dict) -> Optional[PGNode]:
+        """
+        Handle node reference in given argument value:
+        return the referenced node if it still has to be flattened,
+        otherwise just point the last node id to it.
+        """
+        if "node" in value and "from_node" in value:
+            node = value["node"]
+        elif value.get("from_node"):
+            node = value["from_node"]
+        elif "process_id" in value:
+            node = value
+        else:
+            return None
+        node_id = self._node_cache.get(id(node))
+        if node_id is None:
+            return node
         self._last_node_id = node_id
+        return None
 
-    def _store_argument(self, argument_id: str, value):
-        if isinstance(value, Parameter):
-            value = {"from_parameter": value.name}
-        self._argument_stack[-1][argument_id] = value
-
-    def _store_array_element(self, value):
-        if isinstance(value, Parameter):
-            value = {"from_parameter": value.name}
-        self._argument_stack[-1].append(value)
-
-    def enterArray(self, argument_id: str):
-        array = []
-        self._store_argument(argument_id, array)
-        self._argument_stack.append(array)
-
-    def leaveArray(self, argument_id: str):
-        self._argument_stack.pop()
-
-    def arrayElementDone(self, value):
-        self._store_array_element(self._flatten_argument(value))
-
-    def constantArrayElement(self, value):
-        self._store_array_element(self._flatten_argument(value))
+    def _advance(self, frame: _FlattenFrame) -> Optional[PGNode]:
+        """
+        Flatten the arguments of the node of given frame, until encountering a node that has to be
+        flattened first: return that node (or ``None`` when all arguments are handled).
+        """
+        if frame.pending is not None:
+            self._store(frame, *frame.pending)
+            frame.pending = None
+        while True:
+            if frame.elements is not None:
+                for element in frame.elements:
+                    if isinstance(element, dict):
+                        child = self._visit(element)
+                        if child is not None:
+                            frame.pending = (None, element)
+                            return child
+                    self._store(frame, None, element)
+                frame.array = frame.elements = None
+
+            item = next(frame.items, None)
+            if item is None:
+                return None
+            arg_id, value = item
+            if isinstance(value, list):
+                frame.array = frame.arguments[arg_id] = []
+                frame.elements = iter(value)
+            elif isinstance(value, dict):
+                child = self._visit(value)
+                if child is not None:
+                    frame.pending = (arg_id, value)
+                    return child
+                self._store(frame, arg_id, value)
+            else:
+                if isinstance(value, Parameter):
+                    value = {"from_parameter": value.name}
+                frame.arguments[arg_id] = value
+
+    def _store(self, frame: _FlattenFrame, argument_id: Optional[str], value):
+        """Store flattened argument value (or array element if no argument id is given)."""
+        emitted = self.stats["emitted"]
+        if argument_id is None:
+            frame.array.append(self._flatten_argument(value))
+        else:
+            frame.arguments[argument_id] = self._flatten_argument(value)
+        frame.subgraph_nodes += self.stats["emitted"] - emitted
 
     def _flatten_argument(self, value):
         if isinstance(value, dict):
@@ -354,7 +646,13 @@ class GraphFlattener(ProcessGraphVisitor):
             elif "process_graph" in value:
                 pg = value["process_graph"]
                 if isinstance(pg, PGNode):
-                    value = {"process_graph": GraphFlattener(node_id_generator=self._node_id_generator).flatten(pg)}
+                    flattener = GraphFlattener(node_id_generator=self._node_id_generator, deduplicate=self._deduplicate)
+                    value = {"process_graph": flattener.flatten(pg)}
+                    self._versions.extend(flattener._versions)
+                    for key, count in flattener.stats.items():
+                        self.stats[key] += count
+                    if self._deduplicate:
+                        self._subgraph_digests[id(value["process_graph"])] = flattener._digests[flattener._last_node_id]
                 elif isinstance(pg, dict):
                     # Assume it is already a valid flat graph representation of a subprocess
                     value = {"process_graph": pg}
@@ -366,11 +664,123 @@ class GraphFlattener(ProcessGraphVisitor):
             value = {"from_parameter": value.name}
         return value
 
-    def leaveArgument(self, argument_id: str, value):
-        self._store_argument(argument_id, self._flatten_argument(value))
 
-    def constantArgument(self, argument_id: str, value):
-        self._store_argument(argument_id, value)
+def _contains_graph_reference(value) -> bool:
+    """Check whether given argument value contains references to other nodes or child process graphs."""
+    stack = [value]
+    while stack:
+        value = stack.pop()
+        if isinstance(value, (_FromNodeMixin, PGNode)):
+            return True
+        elif isinstance(value, dict):
+            if "from_node" in value or "process_graph" in value or "process_id" in value:
+                return True
+            stack.extend(value.values())
+        elif isinstance(value, (list, tuple)):
+            stack.extend(value)
+    return False
+
+
+def _copy_structure(value):
+    """Copy the (JSON-style) container structure of given value: dicts, lists and tuples."""
+    if isinstance(value, dict):
+        return {k: _copy_structure(v) for k, v in value.items()}
+    elif isinstance(value, list):
+        return [_copy_structure(v) for v in value]
+    elif isinstance(value, tuple):
+        return tuple(_copy_structure(v) for v in value)
+    return value
+
+
+class _FlatGraphCache:
+    """
+    Cached flat graph of a :py:class:`PGNode` (without "result" flag),
+    and the flattening state to continue from when flattening nodes that depend on it.
+
+    The cached data is never modified (new flat graphs are built from copies),
+    so it can be shared between threads.
+    It is only valid as long as the arguments of the node and the nodes it depends on are not updated
+    (as tracked with the argument version of each node).
+    """
+
+    __slots__ = ("version", "versions", "flattened", "node_cache", "node_id_generator", "result_id")
+
+    # Nodes that hold a cached flat graph (weakly referenced, most recently used last),
+    # to limit the number of cached flat graphs.
+    max_size = 32
+    _nodes: "collections.OrderedDict[int, weakref.ref]" = collections.OrderedDict()
+    _lock = threading.Lock()
+
+    def __init__(
+        self,
+        version: int,
+        versions: Tuple[Tuple[PGNode, int], ...],
+        flattened: Dict[str, dict],
+        node_cache: Dict[int, str],
+        node_id_generator: FlatGraphNodeIdGenerator,
+        result_id: str,
+    ):
+        # Argument version of the node itself, and of the nodes it depends on (excluding the node itself,
+        # to avoid a reference cycle).
+        self.version = version
+        self.versions = versions
+        self.flattened = flattened
+        self.node_cache = node_cache
+        self.node_id_generator = node_id_generator
+        self.result_id = result_id
+
+    @classmethod
+    def from_flattener(cls, flattener: GraphFlattener, node: PGNode) -> "_FlatGraphCache":
+        # Note: copies, as the flattener might continue (e.g. with nodes depending on this one).
+        return cls(
+            version=node._version,
+            versions=tuple((n, v) for n, v in flattener._versions if n is not node),
+            flattened=dict(flattener._flattened),
+            node_cache=dict(flattener._node_cache),
+            node_id_generator=flattener._node_id_generator.copy(),
+            result_id=flattener._last_node_id,
+        )
+
+    def is_valid(self, node: PGNode) -> bool:
+        """Check that the arguments of given (cached) node and its dependencies were not updated since caching."""
+        return node._version == self.version and all(n._version == v for n, v in self.versions)
+
+    @classmethod
+    def track(cls, node: PGNode):
+        """Mark given node's cache as recently used, and evict least recently used caches."""
+        with cls._lock:
+            key = id(node)
+            ref = cls._nodes.pop(key, None)
+            if ref is None or ref() is not node:
+                ref = weakref.ref(node, lambda r, key=key: cls._forget(key, r))
+            cls._nodes[key] = ref
+            while len(cls._nodes) > cls.max_size:
+                _, ref = cls._nodes.popitem(last=False)
+                evicted = ref()
+                if evicted is not None:
+                    evicted._flat_graph_cache = None
+
+    @classmethod
+    def _forget(cls, key: int, ref: "weakref.ref"):
+        with cls._lock:
+            if cls._nodes.get(key) is ref:
+                del cls._nodes[key]
+
+    def export(self) -> Dict[str, dict]:
+        """Get (a copy of) the flat graph, with "result" flag."""
+        flat_graph = {}
+        for node_id, node in self.flattened.items():
+            node = dict(node)
+            # Note: fast path for the most common argument values: node references and constants.
+            node["arguments"] = {
+                k: {"from_node": v["from_node"]}
+                if isinstance(v, dict) and len(v) == 1 and "from_node" in v
+                else (_copy_structure(v) if isinstance(v, (dict, list, tuple)) else v)
+                for k, v in node["arguments"].items()
+            }
+            flat_graph[node_id] = node
+        flat_graph[self.result_id]["result"] = True
+        return flat_graph
 
 
 class PGNodeGraphUnflattener(ProcessGraphUnflattener):
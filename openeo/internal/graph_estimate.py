@@ -0,0 +1,469 @@
+"""
+Client-side (pre-flight) estimation of the data volume a process graph will touch:
+number of pixels, bands, time steps and bytes, per ``load_collection`` and for the result.
+
+This is a rough, static estimate based on collection metadata (extents, resolution, bands)
+propagated through the process graph (filters, resampling, reductions, ...),
+e.g. to reject or reroute (to batch processing) requests that are too large.
+It is complementary to the backend side estimate of :py:meth:`BatchJob.estimate() <openeo.rest.job.BatchJob.estimate>`.
+
+.. versionadded:: 0.21.0
+"""
+
+import datetime
+import functools
+import math
+import operator
+import re
+from typing import Callable, Dict, List, Optional, Tuple
+
+import shapely.geometry
+
+from openeo.internal.process_graph_visitor import ProcessGraphUnflattener, ProcessGraphVisitException
+from openeo.metadata import CollectionMetadata
+from openeo.util import deep_get, rfc3339
+
+# Approximate length (in meter) of a degree of latitude and of longitude at the equator.
+_METERS_PER_DEGREE_LAT = 110_574
+_METERS_PER_DEGREE_LON = 111_320
+
+# Time step (in days) to assume for collections without temporal step metadata (e.g. Sentinel-2 revisit time).
+DEFAULT_TIME_STEP_DAYS = 5
+
+# Number of days of a period of `aggregate_temporal_period`.
+_PERIOD_DAYS = {
+    "hour": 1 / 24,
+    "day": 1,
+    "week": 7,
+    "dekad": 10,
+    "month": 365.25 / 12,
+    "season": 365.25 / 4,
+    "tropical-season": 365.25 / 2,
+    "year": 365.25,
+    "decade": 3652.5,
+    "decade-ad": 3652.5,
+}
+
+
+def _is_geographic(crs) -> bool:
+    """Whether given CRS (EPSG code, string or PROJJSON dict) is geographic (lon/lat degrees) or not."""
+    if isinstance(crs, dict):
+        return crs.get("type") == "GeographicCRS" or deep_get(crs, "id", "code", default=None) == 4326
+    return str(crs).upper() in {"4326", "EPSG:4326", "OGC:CRS84", "WGS84"}
+
+
+def _parse_duration_days(duration: str) -> Optional[float]:
+    """Parse ISO 8601 duration (e.g. "P5D", "PT1H") to number of days."""
+    match = re.fullmatch(
+        r"P(?:(\d+(?:\.\d+)?)Y)?(?:(\d+(?:\.\d+)?)M)?(?:(\d+(?:\.\d+)?)W)?(?:(\d+(?:\.\d+)?)D)?"
+        r"(?:T(?:(\d+(?:\.\d+)?)H)?(?:(\d+(?:\.\d+)?)M)?(?:(\d+(?:\.\d+)?)S)?)?",
+        str(duration).upper(),
+    )
+    if not match or not any(match.groups()):
+        return None
+    y, mo, w, d, h, mi, s = (float(g) if g else 0 for g in match.groups())
+    return y * 365.25 + mo * 365.25 / 12 + w * 7 + d + h / 24 + mi / 1440 + s / 86400
+
+
+def _parse_date(value) -> Optional[datetime.datetime]:
+    """Parse date or datetime (string) to naive datetime (for easy comparison)."""
+    if isinstance(value, str):
+        try:
+            value = rfc3339.parse_date_or_datetime(value)
+        except ValueError:
+            return None
+    if isinstance(value, datetime.datetime):
+        return value.replace(tzinfo=None)
+    elif isinstance(value, datetime.date):
+        return datetime.datetime(value.year, value.month, value.day)
+    return None
+
+
+class _BBox:
+    """Spatial extent: bounding box in geographic (degrees) or projected coordinates (assumed meters)."""
+
+    __slots__ = ("west", "south", "east", "north", "geographic")
+
+    def __init__(self, west: float, south: float, east: float, north: float, geographic: bool = True):
+        self.west, self.south, self.east, self.north = west, south, east, north
+        self.geographic = geographic
+
+    @classmethod
+    def from_argument(cls, value) -> Optional["_BBox"]:
+        """Bounding box from a process argument: bbox dict or GeoJSON."""
+        if isinstance(value, dict) and all(k in value for k in ["west", "south", "east", "north"]):
+            return cls(
+                value["west"], value["south"], value["east"], value["north"],
+                geographic=_is_geographic(value.get("crs", 4326)),
+            )
+        if isinstance(value, dict) and "type" in value:
+            try:
+                if value["type"] == "FeatureCollection":
+                    geometry = shapely.geometry.GeometryCollection(
+                        [shapely.geometry.shape(f["geometry"]) for f in value["features"]]
+                    )
+                elif value["type"] == "Feature":
+                    geometry = shapely.geometry.shape(value["geometry"])
+                else:
+                    geometry = shapely.geometry.shape(value)
+            except Exception:
+                return None
+            if not geometry.is_empty:
+                return cls(*geometry.bounds, geographic=True)
+        return None
+
+    def intersection(self, other: Optional["_BBox"]) -> "_BBox":
+        if other is None:
+            return self
+        if other.geographic != self.geographic:
+            # Can not compare (without reprojection): assume the new extent is within the existing one.
+            return other
+        return _BBox(
+            max(self.west, other.west),
+            max(self.south, other.south),
+            max(min(self.east, other.east), max(self.west, other.west)),
+            max(min(self.north, other.north), max(self.south, other.south)),
+            geographic=self.geographic,
+        )
+
+    def size(self, geographic: bool) -> Tuple[float, float]:
+        """Size (width, height) in degrees (geographic) or meters."""
+        width, height = self.east - self.west, self.north - self.south
+        if self.geographic and not geographic:
+            latitude = math.radians((self.north + self.south) / 2)
+            return width * _METERS_PER_DEGREE_LON * math.cos(latitude), height * _METERS_PER_DEGREE_LAT
+        elif geographic and not self.geographic:
+            return width / _METERS_PER_DEGREE_LON, height / _METERS_PER_DEGREE_LAT
+        return width, height
+
+
+class VolumeEstimate:
+    """
+    Estimated size of a data cube. Unknown values (e.g. due to missing metadata) are ``None``.
+
+    .. versionadded:: 0.21.0
+    """
+
+    __slots__ = (
+        "width", "height", "bands", "time_steps", "bytes_per_value",
+        "_bbox", "_resolution", "_temporal", "_time_step_days", "_band_names",
+    )
+
+    def __init__(self, bytes_per_value: int = 4):
+        #: Number of pixels along the x and y dimension.
+        self.width: Optional[int] = None
+        self.height: Optional[int] = None
+        #: Number of bands (1 for a cube without band dimension).
+        self.bands: Optional[int] = 1
+        #: Number of time steps (1 for a cube without temporal dimension).
+        self.time_steps: Optional[int] = 1
+        self.bytes_per_value = bytes_per_value
+        # Propagation state.
+        self._bbox: Optional[_BBox] = None
+        # Resolution (x, y) and whether it is in degrees.
+        self._resolution: Optional[Tuple[float, float, bool]] = None
+        self._temporal: Optional[Tuple[Optional[datetime.datetime], Optional[datetime.datetime]]] = None
+        self._time_step_days: Optional[float] = None
+        self._band_names: Optional[List[str]] = None
+
+    def __repr__(self):
+        return f"<{type(self).__name__} {self.to_dict()}>"
+
+    def copy(self) -> "VolumeEstimate":
+        estimate = VolumeEstimate(bytes_per_value=self.bytes_per_value)
+        for slot in self.__slots__:
+            setattr(estimate, slot, getattr(self, slot))
+        return estimate
+
+    @staticmethod
+    def _product(*values) -> Optional[int]:
+        if any(v is None for v in values):
+            return None
+        return functools.reduce(operator.mul, values, 1)
+
+    @property
+    def pixels(self) -> Optional[int]:
+        """Number of pixels (of a single band and time step)."""
+        return self._product(self.width, self.height)
+
+    @property
+    def values(self) -> Optional[int]:
+        """Total number of values: pixels x bands x time steps."""
+        return self._product(self.width, self.height, self.bands, self.time_steps)
+
+    @property
+    def bytes(self) -> Optional[int]:
+        """Estimated (uncompressed, in memory) size in bytes."""
+        return self._product(self.values, self.bytes_per_value)
+
+    def to_dict(self) -> dict:
+        return {
+            "width": self.width,
+            "height": self.height,
+            "bands": self.bands,
+            "time_steps": self.time_steps,
+            "pixels": self.pixels,
+            "values": self.values,
+            "bytes": self.bytes,
+        }
+
+    def _update_size(self):
+        """Recompute the dimension sizes from the propagation state."""
+        if self._bbox is not None and self._resolution is not None:
+            x_step, y_step, geographic = self._resolution
+            width, height = self._bbox.size(geographic=geographic)
+            self.width = max(1, math.ceil(width / x_step))
+            self.height = max(1, math.ceil(height / y_step))
+        if self._temporal is not None:
+            start, end = self._temporal
+            if start is None or end is None:
+                self.time_steps = None
+            else:
+                days = max((end - start).total_seconds() / 86400, 0)
+                steps = days / (self._time_step_days or DEFAULT_TIME_STEP_DAYS)
+                # Small tolerance for calendar irregularities (e.g. leap years with monthly/yearly steps).
+                self.time_steps = max(1, math.ceil(steps - 0.05))
+        if self._band_names is not None:
+            self.bands = len(self._band_names)
+
+
+class GraphVolumeEstimate:
+    """
+    Estimated data volume of a process graph:
+    the input volume per ``load_collection`` node and the size of the result.
+
+    .. versionadded:: 0.21.0
+    """
+
+    def __init__(self, inputs: Dict[str, VolumeEstimate], output: VolumeEstimate, warnings: List[str]):
+        #: Estimated input volume per ``load_collection`` node (by node id).
+        self.inputs = inputs
+        #: Estimated size of the result.
+        self.output = output
+        #: Issues that make the estimate less reliable (e.g. missing metadata or unbounded extents).
+        self.warnings = warnings
+
+    def __repr__(self):
+        return f"<{type(self).__name__} input bytes {self.input_bytes}, output bytes {self.output.bytes}>"
+
+    @property
+    def input_bytes(self) -> Optional[int]:
+        """Total estimated input volume in bytes (``None`` if unknown)."""
+        sizes = [e.bytes for e in self.inputs.values()]
+        return None if any(s is None for s in sizes) else sum(sizes)
+
+    def to_dict(self) -> dict:
+        return {
+            "inputs": {k: v.to_dict() for k, v in self.inputs.items()},
+            "output": self.output.to_dict(),
+            "input_bytes": self.input_bytes,
+            "warnings": list(self.warnings),
+        }
+
+    def exceeds(self, *, max_input_bytes: Optional[int] = None, max_output_bytes: Optional[int] = None) -> bool:
+        """
+        Check whether the estimate exceeds given limits
+        (e.g. to use a batch job instead of synchronous processing).
+        An unknown estimate is considered to exceed the limit.
+        """
+        for limit, size in [(max_input_bytes, self.input_bytes), (max_output_bytes, self.output.bytes)]:
+            if limit is not None and (size is None or size > limit):
+                return True
+        return False
+
+
+class _Estimator:
+    """Propagate volume estimates through a flat graph (in dependency order)."""
+
+    def __init__(
+        self,
+        flat_graph: Dict[str, dict],
+        metadata: Callable[[str], Optional[CollectionMetadata]],
+        bytes_per_value: int,
+    ):
+        self._flat_graph = flat_graph
+        self._metadata = metadata
+        self._bytes_per_value = bytes_per_value
+        self.inputs: Dict[str, VolumeEstimate] = {}
+        self.warnings: List[str] = []
+
+    def estimate(self) -> VolumeEstimate:
+        results = [k for k, n in self._flat_graph.items() if n.get("result")]
+        if len(results) != 1:
+            raise ProcessGraphVisitException(f"Expected exactly one result node, but got {results}.")
+        unflattener = ProcessGraphUnflattener(self._flat_graph)
+        estimates: Dict[str, VolumeEstimate] = {}
+        for node_id in unflattener._dependency_order(results[0]):
+            node = self._flat_graph[node_id]
+            arguments = node.get("arguments", {})
+            cubes = {
+                k: estimates[v["from_node"]]
+                for k, v in arguments.items()
+                if isinstance(v, dict) and v.get("from_node") in estimates
+            }
+            estimates[node_id] = self._estimate_node(node_id, node["process_id"], arguments, cubes)
+        return estimates[results[0]]
+
+    def _estimate_node(
+        self, node_id: str, process_id: str, arguments: dict, cubes: Dict[str, VolumeEstimate]
+    ) -> VolumeEstimate:
+        if process_id == "load_collection":
+            estimate = self._load_collection(node_id, arguments)
+            self.inputs[node_id] = estimate.copy()
+            return estimate
+        if not cubes:
+            return VolumeEstimate(bytes_per_value=self._bytes_per_value)
+        estimate = (cubes.get("data") or cubes.get("cube1") or next(iter(cubes.values()))).copy()
+
+        if process_id in {"filter_bbox", "filter_spatial", "mask_polygon"}:
+            bbox = _BBox.from_argument(arguments.get("extent", arguments.get("geometries", arguments.get("mask"))))
+            if bbox is not None and process_id != "mask_polygon":
+                estimate._bbox = estimate._bbox.intersection(bbox) if estimate._bbox else bbox
+        elif process_id == "filter_temporal":
+            estimate._temporal = self._intersect_temporal(estimate._temporal, arguments.get("extent"))
+        elif process_id == "filter_bands":
+            bands = arguments.get("bands")
+            if isinstance(bands, list):
+                estimate._band_names = list(bands)
+        elif process_id == "resample_spatial":
+            resolution = arguments.get("resolution", 0)
+            projection = arguments.get("projection")
+            if resolution:
+                x, y = (resolution, resolution) if not isinstance(resolution, list) else resolution
+                geographic = _is_geographic(projection) if projection else (
+                    estimate._resolution[2] if estimate._resolution else False
+                )
+                estimate._resolution = (x, y, geographic)
+        elif process_id == "resample_cube_spatial":
+            target = cubes.get("target")
+            if target is not None and target._resolution is not None:
+                estimate._resolution = target._resolution
+        elif process_id in {"reduce_dimension", "reduce_dimension_binary"}:
+            dimension = arguments.get("dimension")
+            if dimension in {"t", "time"}:
+                estimate._temporal = None
+                estimate.time_steps = 1
+            elif dimension in {"bands", "band"}:
+                estimate._band_names = None
+                estimate.bands = 1
+        elif process_id == "ndvi":
+            if arguments.get("target_band") and estimate._band_names is not None:
+                estimate._band_names = estimate._band_names + [arguments["target_band"]]
+            else:
+                estimate._band_names = None
+                estimate.bands = 1
+        elif process_id == "aggregate_temporal_period":
+            period_days = _PERIOD_DAYS.get(arguments.get("period"))
+            if period_days:
+                estimate._time_step_days = max(period_days, estimate._time_step_days or 0)
+        elif process_id == "aggregate_temporal":
+            intervals = arguments.get("intervals")
+            if isinstance(intervals, list):
+                estimate._temporal = None
+                estimate.time_steps = len(intervals)
+        elif process_id == "aggregate_spatial":
+            geometries = arguments.get("geometries")
+            count = 1
+            if isinstance(geometries, dict) and geometries.get("type") == "FeatureCollection":
+                count = len(geometries.get("features", []))
+            # Vector cube: one value per geometry, band and time step.
+            estimate._bbox = estimate._resolution = None
+            estimate.width, estimate.height = count, 1
+        elif process_id == "merge_cubes":
+            cube2 = cubes.get("cube2")
+            if cube2 is not None:
+                names1, names2 = estimate._band_names, cube2._band_names
+                if names1 is not None and names2 is not None:
+                    estimate._band_names = names1 + [b for b in names2 if b not in names1]
+                elif estimate.bands is not None and cube2.bands is not None:
+                    estimate._band_names = None
+                    estimate.bands = estimate.bands + cube2.bands
+        estimate._update_size()
+        return estimate
+
+    def _load_collection(self, node_id: str, arguments: dict) -> VolumeEstimate:
+        estimate = VolumeEstimate(bytes_per_value=self._bytes_per_value)
+        collection_id = arguments.get("id")
+        metadata = self._metadata(collection_id) if isinstance(collection_id, str) else None
+        if metadata is None:
+            self.warnings.append(f"{node_id}: no metadata for collection {collection_id!r}")
+            metadata = CollectionMetadata(metadata={}, dimensions=[])
+
+        # Spatial extent and resolution.
+        collection_bbox = deep_get(metadata.get("extent") or {}, "spatial", "bbox", default=None)
+        if collection_bbox and isinstance(collection_bbox[0], list):
+            collection_bbox = collection_bbox[0]
+        collection_bbox = _BBox(*collection_bbox[:4]) if collection_bbox and len(collection_bbox) >= 4 else None
+        bbox = _BBox.from_argument(arguments.get("spatial_extent"))
+        if bbox is None:
+            self.warnings.append(f"{node_id}: no spatial extent: using full extent of collection {collection_id!r}")
+        estimate._bbox = collection_bbox.intersection(bbox) if collection_bbox else bbox
+        spatial = metadata.spatial_dimensions
+        steps = [d.step for d in spatial] if len(spatial) == 2 else []
+        if steps and all(isinstance(s, (int, float)) and s > 0 for s in steps):
+            estimate._resolution = (steps[0], steps[1], _is_geographic(spatial[0].crs))
+        else:
+            self.warnings.append(f"{node_id}: unknown spatial resolution of collection {collection_id!r}")
+
+        # Temporal extent and time step.
+        if metadata.has_temporal_dimension():
+            dimension = metadata.temporal_dimension
+            collection_extent = dimension.extent or [None, None]
+            estimate._temporal = (_parse_date(collection_extent[0]), _parse_date(collection_extent[1]))
+            estimate._temporal = self._intersect_temporal(estimate._temporal, arguments.get("temporal_extent"))
+            step = metadata.get("cube:dimensions", dimension.name, "step")
+            estimate._time_step_days = _parse_duration_days(step) if step else None
+            if not arguments.get("temporal_extent"):
+                self.warnings.append(
+                    f"{node_id}: no temporal extent: using full extent of collection {collection_id!r}"
+                )
+            if estimate._temporal[1] is None:
+                estimate._temporal = (estimate._temporal[0], datetime.datetime.utcnow())
+
+        # Bands.
+        bands = arguments.get("bands")
+        if isinstance(bands, list):
+            estimate._band_names = list(bands)
+        elif metadata.has_band_dimension():
+            estimate._band_names = metadata.band_names
+        else:
+            estimate.bands = None if not metadata.dimension_names() else 1
+
+        estimate._update_size()
+        return estimate
+
+    @staticmethod
+    def _intersect_temporal(current, extent) -> Optional[tuple]:
+        if not isinstance(extent, (list, tuple)) or len(extent) != 2:
+            return current
+        start, end = (_parse_date(v) for v in extent)
+        if current is not None:
+            if current[0] and (start is None or current[0] > start):
+                start = current[0]
+            if current[1] and (end is None or current[1] < end):
+                end = current[1]
+        return (start, end)
+
+
+def estimate_volume(
+    flat_graph: Dict[str, dict],
+    metadata: Callable[[str], Optional[CollectionMetadata]],
+    *,
+    bytes_per_value: int = 4,
+) -> GraphVolumeEstimate:
+    """
+    Estimate the data volume of a process graph.
+
+    :param flat_graph: flat process graph
+    :param metadata: function to get the metadata of a collection by id (``None`` if not available),
+        e.g. :py:meth:`Connection.collection_metadata() <openeo.rest.connection.Connection.collection_metadata>`
+    :param bytes_per_value: number of bytes per value (e.g. 4 for float32)
+    :return: estimate of the input volume (per ``load_collection``) and the output size
+
+    .. versionadded:: 0.21.0
+    """
+    if "process_graph" in flat_graph:
+        flat_graph = flat_graph["process_graph"]
+    estimator = _Estimator(flat_graph, metadata=metadata, bytes_per_value=bytes_per_value)
+    output = estimator.estimate()
+    return GraphVolumeEstimate(inputs=estimator.inputs, output=output, warnings=estimator.warnings)
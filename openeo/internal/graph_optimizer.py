@@ -0,0 +1,693 @@
+"""
+Client-side optimization of openEO process graphs (in flat graph representation)
+with rewrite rules that preserve the semantics of the process graph,
+e.g. to push filters into ``load_collection`` so that the backend has to load less data.
+
+.. versionadded:: 0.21.0
+"""
+
+import copy
+import difflib
+import json
+import logging
+import math
+import operator
+from typing import Callable, Dict, Iterator, List, Optional, Sequence, Set, Tuple
+
+_log = logging.getLogger(__name__)
+
+# Dimension names to recognize (literal) temporal and band dimensions.
+_TEMPORAL_DIMENSIONS = {"t", "time"}
+_BAND_DIMENSIONS = {"bands"}
+
+# Processes with side effects: keep these (and their dependencies) even if they do not contribute to the result.
+_SIDE_EFFECT_PROCESSES = {"save_result", "save_ml_model", "export_workspace", "inspect", "debug"}
+
+FlatGraph = Dict[str, dict]
+
+
+def _is_reference(value, key: str) -> bool:
+    return isinstance(value, dict) and len(value) == 1 and key in value
+
+
+def _walk(value, nested: bool = False) -> Iterator:
+    """
+    Iterate over all (nested) values in given argument value.
+    Unless ``nested`` is set, child process graphs (separate scope) are not entered.
+    """
+    stack = [value]
+    while stack:
+        value = stack.pop()
+        yield value
+        if isinstance(value, dict):
+            if nested or not _is_reference(value, "process_graph"):
+                stack.extend(value.values())
+        elif isinstance(value, (list, tuple)):
+            stack.extend(value)
+
+
+def _from_nodes(value) -> Iterator[str]:
+    """Iterate over ``from_node`` references in given argument value (not in child process graphs)."""
+    return (v["from_node"] for v in _walk(value) if _is_reference(v, "from_node"))
+
+
+def _parameter_names(value, nested: bool = True) -> Set[str]:
+    """Names of parameters referenced (``from_parameter``) in given value, optionally in child process graphs."""
+    return {v["from_parameter"] for v in _walk(value, nested=nested) if _is_reference(v, "from_parameter")}
+
+
+def _child_process_graphs(value) -> Iterator[FlatGraph]:
+    """Iterate over (directly) nested child process graphs (callbacks) in given argument value."""
+    for v in _walk(value):
+        if _is_reference(v, "process_graph") and isinstance(v["process_graph"], dict):
+            yield v["process_graph"]
+
+
+def _replace(value, replace: Callable[[dict], Optional[dict]]):
+    """
+    Replace (in place) dicts in given value (not in child process graphs)
+    for which the ``replace`` function returns a replacement (instead of ``None``).
+
+    :return: the value (or its replacement if the value itself has to be replaced)
+    """
+    if isinstance(value, dict):
+        replacement = replace(value)
+        if replacement is not None:
+            return replacement
+    stack = [value]
+    while stack:
+        container = stack.pop()
+        if isinstance(container, dict) and not _is_reference(container, "process_graph"):
+            items = list(container.items())
+        elif isinstance(container, list):
+            items = list(enumerate(container))
+        else:
+            continue
+        for key, item in items:
+            replacement = replace(item) if isinstance(item, dict) else None
+            if replacement is not None:
+                container[key] = replacement
+            else:
+                stack.append(item)
+    return value
+
+
+def _node_reference_replacer(renames: Dict[str, str]) -> Callable[[dict], Optional[dict]]:
+    def replace(value: dict) -> Optional[dict]:
+        if _is_reference(value, "from_node") and value["from_node"] in renames:
+            return {"from_node": renames[value["from_node"]]}
+
+    return replace
+
+
+def _result_id(flat_graph: FlatGraph) -> str:
+    result_ids = [node_id for node_id, node in flat_graph.items() if node.get("result")]
+    if len(result_ids) != 1:
+        raise ValueError(f"Expected one result node, but found {len(result_ids)}")
+    return result_ids[0]
+
+
+def _consumer_counts(flat_graph: FlatGraph) -> Dict[str, int]:
+    """Number of references to each node."""
+    counts = {node_id: 0 for node_id in flat_graph}
+    for node in flat_graph.values():
+        for ref in _from_nodes(node.get("arguments", {})):
+            counts[ref] = counts.get(ref, 0) + 1
+    return counts
+
+
+def _data_input(node: dict) -> Optional[str]:
+    """Id of the node referenced in the "data" argument, if it is a plain node reference."""
+    data = node.get("arguments", {}).get("data")
+    return data["from_node"] if _is_reference(data, "from_node") else None
+
+
+def _bypass(flat_graph: FlatGraph, node_id: str):
+    """Remove a node (with a "data" input), by redirecting its consumers to that input."""
+    node = flat_graph.pop(node_id)
+    source = _data_input(node)
+    replace = _node_reference_replacer({node_id: source})
+    for other in flat_graph.values():
+        _replace(other.get("arguments", {}), replace)
+    if node.get("result"):
+        flat_graph[source]["result"] = True
+
+
+class _RewriteLog:
+    """Collector of applied rewrites."""
+
+    def __init__(self):
+        self.entries: List[Tuple[str, str]] = []
+
+    def add(self, rule: str, message: str):
+        _log.debug(f"Process graph optimization {rule}: {message}")
+        self.entries.append((rule, message))
+
+
+# Filter processes that can be pushed into `load_collection`:
+# mapping to (argument name, corresponding `load_collection` argument name)
+_FILTERS = {
+    "filter_bbox": ("extent", "spatial_extent"),
+    "filter_temporal": ("extent", "temporal_extent"),
+    "filter_bands": ("bands", "bands"),
+}
+
+
+def _commutes_with_filter(node: dict, filter_process: str) -> bool:
+    """Check whether given node commutes with given filter process."""
+    if node.get("namespace"):
+        return False
+    process_id = node["process_id"]
+    arguments = node.get("arguments", {})
+    if process_id == "apply":
+        # Pixel-wise operation: commutes with all filters.
+        return True
+    if process_id in _FILTERS:
+        # Filters of different kinds commute (consecutive filters of the same kind are merged one by one).
+        return process_id != filter_process
+    if process_id in {"reduce_dimension", "apply_dimension"}:
+        if arguments.get("target_dimension") is not None:
+            return False
+        dimension = arguments.get("dimension")
+        if filter_process == "filter_bbox":
+            return dimension in _TEMPORAL_DIMENSIONS | _BAND_DIMENSIONS
+        elif filter_process == "filter_temporal":
+            return dimension in _BAND_DIMENSIONS
+        elif filter_process == "filter_bands":
+            return dimension in _TEMPORAL_DIMENSIONS
+    return False
+
+
+def _is_bbox(extent) -> bool:
+    return (
+        isinstance(extent, dict)
+        and set(extent.keys()).issubset({"west", "south", "east", "north", "crs"})
+        and all(isinstance(extent.get(k), (int, float)) for k in ["west", "south", "east", "north"])
+    )
+
+
+def _normalize_crs(crs):
+    return 4326 if crs in (None, 4326, "4326", "EPSG:4326") else crs
+
+
+def _merge_spatial_extent(current, extent) -> Optional[dict]:
+    """Intersect bounding boxes, or return ``None`` if not possible."""
+    if not (_is_bbox(current) and _is_bbox(extent)):
+        return None
+    if _normalize_crs(current.get("crs")) != _normalize_crs(extent.get("crs")):
+        return None
+    merged = dict(
+        current,
+        west=max(current["west"], extent["west"]),
+        south=max(current["south"], extent["south"]),
+        east=min(current["east"], extent["east"]),
+        north=min(current["north"], extent["north"]),
+    )
+    if merged["west"] >= merged["east"] or merged["south"] >= merged["north"]:
+        # Empty intersection: leave it to the backend to handle this.
+        return None
+    return merged
+
+
+def _merge_temporal_extent(current, extent) -> Optional[list]:
+    """Intersect temporal intervals, or return ``None`` if not possible."""
+    if not all(isinstance(e, (list, tuple)) and len(e) == 2 for e in [current, extent]):
+        return None
+    values = [v for v in [*current, *extent] if v is not None]
+    # Only compare date(time) strings of the same format.
+    if not all(isinstance(v, str) for v in values) or len(set(len(v) for v in values)) > 1:
+        return None
+    starts = [v for v in [current[0], extent[0]] if v is not None]
+    ends = [v for v in [current[1], extent[1]] if v is not None]
+    merged = [max(starts) if starts else None, min(ends) if ends else None]
+    if merged[0] is not None and merged[1] is not None and merged[0] >= merged[1]:
+        return None
+    return merged
+
+
+def _merge_bands(current, bands) -> Optional[list]:
+    """Narrow down band selection, or return ``None`` if not possible."""
+    if not (isinstance(current, list) and isinstance(bands, list)):
+        return None
+    if not all(isinstance(b, str) for b in bands) or not set(bands).issubset(current):
+        return None
+    return list(bands)
+
+
+_FILTER_MERGERS = {
+    "filter_bbox": _merge_spatial_extent,
+    "filter_temporal": _merge_temporal_extent,
+    "filter_bands": _merge_bands,
+}
+
+
+def push_down_filters(flat_graph: FlatGraph, log: _RewriteLog) -> bool:
+    """
+    Rewrite rule to push ``filter_bbox``, ``filter_temporal`` and ``filter_bands``
+    into the ``load_collection`` node they (indirectly) operate on,
+    through processes they commute with (e.g. pixel-wise ``apply``).
+    """
+    consumers = _consumer_counts(flat_graph)
+    for node_id, node in list(flat_graph.items()):
+        filter_process = node["process_id"]
+        if filter_process not in _FILTERS or node.get("namespace"):
+            continue
+        arguments = node.get("arguments", {})
+        argument, load_argument = _FILTERS[filter_process]
+        if argument not in arguments or arguments.get("dimension") is not None or arguments.get("wavelengths"):
+            continue
+        # Walk down the chain of nodes (without other consumers) the filter commutes with.
+        source = _data_input(node)
+        path = []
+        while (
+            source in flat_graph
+            and consumers[source] == 1
+            and _commutes_with_filter(flat_graph[source], filter_process)
+        ):
+            path.append(source)
+            source = _data_input(flat_graph[source])
+        load = flat_graph.get(source)
+        if not load or load["process_id"] != "load_collection" or load.get("namespace") or consumers[source] != 1:
+            continue
+        value = arguments[argument]
+        current = load.get("arguments", {}).get(load_argument)
+        merged = value if current is None else _FILTER_MERGERS[filter_process](current, value)
+        if merged is None:
+            continue
+        load.setdefault("arguments", {})[load_argument] = merged
+        _bypass(flat_graph, node_id)
+        through = f" (through {', '.join(repr(p) for p in path)})" if path else ""
+        log.add("push_down_filters", f"pushed {filter_process} {node_id!r} into load_collection {source!r}{through}")
+        return True
+    return False
+
+
+# Processes with callbacks that can be fused:
+# mapping to (callback argument name, callback parameter name, arguments that have to be equal)
+_FUSABLE = {
+    "apply": ("process", "x", []),
+    "apply_dimension": ("process", "data", ["dimension"]),
+}
+
+# Processes in callbacks that depend on dimension labels (which can be changed by `apply_dimension`)
+_LABEL_PROCESSES = {"array_labels", "array_find_label"}
+
+
+def _fuse_callbacks(first: FlatGraph, second: FlatGraph, parameter: str) -> FlatGraph:
+    """Build a callback that applies the ``second`` callback on the result of the ``first`` callback."""
+    first = copy.deepcopy(first)
+    second = copy.deepcopy(second)
+    # Rename nodes of the first callback to avoid id collisions.
+    renames = {}
+    for node_id in first:
+        new_id = node_id
+        i = 1
+        while new_id in second or new_id in renames.values():
+            i += 1
+            new_id = f"{node_id}_{i}"
+        renames[node_id] = new_id
+    first = {renames[node_id]: node for node_id, node in first.items()}
+    replace = _node_reference_replacer(renames)
+    for node in first.values():
+        node["arguments"] = _replace(node.get("arguments", {}), replace)
+    first_result = _result_id(first)
+    del first[first_result]["result"]
+
+    def replace_parameter(value: dict) -> Optional[dict]:
+        if _is_reference(value, "from_parameter") and value["from_parameter"] == parameter:
+            return {"from_node": first_result}
+
+    for node in second.values():
+        node["arguments"] = _replace(node.get("arguments", {}), replace_parameter)
+    return {**first, **second}
+
+
+def _fusable_callback(node: dict) -> Optional[FlatGraph]:
+    """Get callback of given node if it is a candidate for fusion."""
+    if node.get("namespace") or node["process_id"] not in _FUSABLE:
+        return None
+    argument, parameter, _ = _FUSABLE[node["process_id"]]
+    arguments = node.get("arguments", {})
+    if arguments.get("context") is not None or arguments.get("target_dimension") is not None:
+        return None
+    callback = arguments.get(argument)
+    if not _is_reference(callback, "process_graph") or not isinstance(callback["process_graph"], dict):
+        return None
+    callback = callback["process_graph"]
+    # Callback should only use the main parameter, and only directly (not in nested callbacks).
+    if not _parameter_names(callback, nested=False).issubset({parameter}):
+        return None
+    if parameter in set().union(*(_parameter_names(g) for n in callback.values() for g in _child_process_graphs(n))):
+        return None
+    return callback
+
+
+def fuse_callbacks(flat_graph: FlatGraph, log: _RewriteLog) -> bool:
+    """
+    Rewrite rule to fuse consecutive ``apply`` (or ``apply_dimension`` along the same dimension) nodes
+    into a single node with a combined callback.
+    """
+    consumers = _consumer_counts(flat_graph)
+    for node_id, node in list(flat_graph.items()):
+        second = _fusable_callback(node)
+        source_id = _data_input(node)
+        if second is None or source_id not in flat_graph or consumers[source_id] != 1:
+            continue
+        source = flat_graph[source_id]
+        first = _fusable_callback(source)
+        process_id = node["process_id"]
+        argument, parameter, equal_arguments = _FUSABLE[process_id]
+        if first is None or source["process_id"] != process_id or source.get("result"):
+            continue
+        if any(node["arguments"].get(a) != source["arguments"].get(a) for a in equal_arguments):
+            continue
+        if process_id == "apply_dimension" and any(
+            n["process_id"] in _LABEL_PROCESSES or "label" in n.get("arguments", {}) for n in second.values()
+        ):
+            # Dimension labels might be different after the first `apply_dimension`.
+            continue
+        node["arguments"][argument] = {"process_graph": _fuse_callbacks(first, second, parameter=parameter)}
+        _bypass(flat_graph, source_id)
+        log.add("fuse_callbacks", f"fused {process_id} {source_id!r} into {node_id!r}")
+        return True
+    return False
+
+
+def _remove_dead_nodes(flat_graph: FlatGraph) -> List[str]:
+    """Remove nodes that do not contribute to the result (or to a side effect) in given (child) process graph."""
+    roots = [
+        node_id
+        for node_id, node in flat_graph.items()
+        if node.get("result") or node["process_id"] in _SIDE_EFFECT_PROCESSES or node.get("namespace")
+    ]
+    reachable = set()
+    todo = list(roots)
+    while todo:
+        node_id = todo.pop()
+        if node_id in reachable or node_id not in flat_graph:
+            continue
+        reachable.add(node_id)
+        todo.extend(_from_nodes(flat_graph[node_id].get("arguments", {})))
+    dead = [node_id for node_id in flat_graph if node_id not in reachable]
+    for node_id in dead:
+        del flat_graph[node_id]
+    return dead
+
+
+def remove_dead_nodes(flat_graph: FlatGraph, log: _RewriteLog) -> bool:
+    """
+    Rewrite rule to remove nodes (also in callbacks) that do not contribute to the result
+    (e.g. left-overs of other rewrites or of manually constructed process graphs).
+    Nodes with possible side effects (e.g. ``save_result`` or processes from a custom namespace)
+    and their dependencies are preserved.
+    """
+    changed = False
+    todo = [(flat_graph, "")]
+    while todo:
+        graph, context = todo.pop()
+        dead = _remove_dead_nodes(graph)
+        if dead:
+            changed = True
+            log.add("remove_dead_nodes", f"removed {', '.join(repr(d) for d in dead)}{context}")
+        for node_id, node in graph.items():
+            todo.extend((g, f" in callback of {node_id!r}") for g in _child_process_graphs(node.get("arguments", {})))
+    return changed
+
+
+def _is_number(value) -> bool:
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+
+def _safe_number(value):
+    """Check folded numeric value: only finite floats and integers that fit in a JSON double."""
+    if isinstance(value, bool):
+        return value
+    if isinstance(value, int) and abs(value) <= 2**53:
+        return value
+    if isinstance(value, float) and math.isfinite(value):
+        return value
+    return None
+
+
+def _linear_scale_range(x, inputMin, inputMax, outputMin=0, outputMax=1):
+    if inputMax == inputMin:
+        return None
+    x = min(max(x, min(inputMin, inputMax)), max(inputMin, inputMax))
+    return ((x - inputMin) / (inputMax - inputMin)) * (outputMax - outputMin) + outputMin
+
+
+def _power(base, p):
+    try:
+        result = base**p
+    except (OverflowError, ZeroDivisionError):
+        return None
+    return result if isinstance(result, (int, float)) else None
+
+
+# Processes that can be evaluated client-side when all arguments are numbers:
+# mapping to (required argument names, optional argument names, implementation)
+_NUMERIC_FOLDERS = {
+    "add": (["x", "y"], [], operator.add),
+    "subtract": (["x", "y"], [], operator.sub),
+    "multiply": (["x", "y"], [], operator.mul),
+    "divide": (["x", "y"], [], lambda x, y: x / y if y != 0 else None),
+    "absolute": (["x"], [], abs),
+    "sqrt": (["x"], [], lambda x: math.sqrt(x) if x >= 0 else None),
+    "power": (["base", "p"], [], _power),
+    "lt": (["x", "y"], [], operator.lt),
+    "lte": (["x", "y"], [], operator.le),
+    "gt": (["x", "y"], [], operator.gt),
+    "gte": (["x", "y"], [], operator.ge),
+    "linear_scale_range": (["x", "inputMin", "inputMax"], ["outputMin", "outputMax"], _linear_scale_range),
+}
+
+# Processes that can be evaluated client-side when all arguments are booleans.
+_BOOLEAN_FOLDERS = {
+    "not": (["x"], [], operator.not_),
+    "and": (["x", "y"], [], operator.and_),
+    "or": (["x", "y"], [], operator.or_),
+    "xor": (["x", "y"], [], operator.xor),
+}
+
+# Identity rules: process id to list of (argument to keep, argument, neutral value of that argument)
+_IDENTITIES = {
+    "add": [("x", "y", 0), ("y", "x", 0)],
+    "subtract": [("x", "y", 0)],
+    "multiply": [("x", "y", 1), ("y", "x", 1)],
+    "divide": [("x", "y", 1)],
+    "power": [("base", "p", 1)],
+}
+
+# Processes without side effects or randomness: identical nodes can be shared.
+_PURE_PROCESSES = {"array_element", "eq", "neq"} | set(_NUMERIC_FOLDERS) | set(_BOOLEAN_FOLDERS)
+
+
+def _fold(node: dict) -> Tuple[bool, object]:
+    """Try to evaluate given node client-side: returns tuple (success, value)."""
+    process_id = node["process_id"]
+    arguments = node.get("arguments", {})
+    if node.get("namespace"):
+        return False, None
+    if process_id == "constant" and set(arguments) == {"x"} and isinstance(arguments["x"], (bool, int, float, str)):
+        return True, arguments["x"]
+    for folders, check in [(_NUMERIC_FOLDERS, _is_number), (_BOOLEAN_FOLDERS, lambda v: isinstance(v, bool))]:
+        if process_id in folders:
+            required, optional, function = folders[process_id]
+            if not set(required).issubset(arguments) or not set(arguments).issubset(required + optional):
+                return False, None
+            if not all(check(v) for v in arguments.values()):
+                return False, None
+            args = [arguments[a] for a in required]
+            kwargs = {a: arguments[a] for a in optional if a in arguments}
+            value = _safe_number(function(*args, **kwargs))
+            return value is not None, value
+    return False, None
+
+
+def _simplify(node: dict, graph: FlatGraph) -> Optional[Tuple[object, str, Optional[str]]]:
+    """
+    Try to simplify given node with identity rules: returns ``None`` or tuple
+    (replacement value, description of applied rule, id of input node that might become unused).
+    """
+    process_id = node["process_id"]
+    arguments = node.get("arguments", {})
+    if node.get("namespace"):
+        return None
+    for keep, argument, neutral in _IDENTITIES.get(process_id, []):
+        value = arguments.get(argument)
+        if set(arguments) == {keep, argument} and _is_number(value) and value == neutral:
+            return arguments[keep], f"{process_id}(..., {neutral}) is identity", None
+    # Double negation
+    inner = arguments.get("x")
+    inner = graph.get(inner["from_node"]) if _is_reference(inner, "from_node") else None
+    if inner and not inner.get("namespace") and inner["process_id"] == process_id:
+        inner_arguments = inner.get("arguments", {})
+        if process_id == "not" and set(arguments) == set(inner_arguments) == {"x"}:
+            return inner_arguments["x"], "double negation", arguments["x"]["from_node"]
+        if (
+            process_id == "multiply"
+            and set(arguments) == set(inner_arguments) == {"x", "y"}
+            and all(_is_number(a["y"]) and a["y"] == -1 for a in [arguments, inner_arguments])
+        ):
+            return inner_arguments["x"], "double negation", arguments["x"]["from_node"]
+    return None
+
+
+def _replace_node(graph: FlatGraph, node_id: str, replacement) -> bool:
+    """
+    Replace node with given replacement (literal value or reference) in given (child) process graph.
+    Returns false if this is not possible (result node that should be replaced by a value).
+    """
+    if graph[node_id].get("result"):
+        if not _is_reference(replacement, "from_node"):
+            return False
+        graph[replacement["from_node"]]["result"] = True
+    del graph[node_id]
+
+    def replace(value: dict):
+        if _is_reference(value, "from_node") and value["from_node"] == node_id:
+            return copy.deepcopy(replacement)
+
+    for node in graph.values():
+        node["arguments"] = _replace(node.get("arguments", {}), replace)
+    return True
+
+
+def _simplify_callback(graph: FlatGraph, log: _RewriteLog, context: str) -> bool:
+    """Simplify a single callback process graph (in place) until nothing changes."""
+    changed = False
+    progress = True
+    while progress:
+        progress = False
+        for node_id, node in list(graph.items()):
+            if node_id not in graph:
+                continue
+            folded, value = _fold(node)
+            if folded and _replace_node(graph, node_id, value):
+                log.add("simplify_callbacks", f"folded {node['process_id']} {node_id!r} to {value!r}{context}")
+                progress = True
+                continue
+            simplified = _simplify(node, graph)
+            if simplified and _replace_node(graph, node_id, simplified[0]):
+                replacement, description, inner_id = simplified
+                log.add("simplify_callbacks", f"simplified {node['process_id']} {node_id!r}{context}: {description}")
+                if inner_id and not graph[inner_id].get("result") and _consumer_counts(graph)[inner_id] == 0:
+                    del graph[inner_id]
+                progress = True
+        # Share identical nodes (e.g. repeated `array_element` lookups of the same band).
+        seen = {}
+        for node_id, node in list(graph.items()):
+            if node["process_id"] not in _PURE_PROCESSES or node.get("namespace"):
+                continue
+            key = json.dumps([node["process_id"], node.get("arguments")], sort_keys=True, default=repr)
+            if key not in seen:
+                seen[key] = node_id
+            elif _replace_node(graph, node_id, {"from_node": seen[key]}):
+                log.add("simplify_callbacks", f"shared {node['process_id']} {node_id!r} with {seen[key]!r}{context}")
+                progress = True
+        changed |= progress
+    return changed
+
+
+def simplify_callbacks(flat_graph: FlatGraph, log: _RewriteLog) -> bool:
+    """
+    Rewrite rule to simplify callbacks (child process graphs, e.g. the ``reducer`` of ``reduce_dimension``
+    or the ``process`` of ``apply``), which are evaluated per pixel on the backend:
+
+    - fold constant subexpressions (e.g. ``divide(1, 2)`` or ``linear_scale_range`` of a literal),
+    - apply identity rules (e.g. ``multiply(x, 1)``, ``add(x, 0)`` and double negation),
+    - share identical nodes (e.g. repeated ``array_element`` lookups of the same band).
+    """
+    changed = False
+    todo = [(g, node_id) for node_id, node in flat_graph.items() for g in _child_process_graphs(node.get("arguments", {}))]
+    while todo:
+        graph, parent_id = todo.pop()
+        changed |= _simplify_callback(graph, log, context=f" in callback of {parent_id!r}")
+        for node_id, node in graph.items():
+            todo.extend((g, node_id) for g in _child_process_graphs(node.get("arguments", {})))
+    return changed
+
+
+# Default rewrite rules (applied repeatedly, in this order, until none of them changes the process graph).
+DEFAULT_RULES = {
+    "push_down_filters": push_down_filters,
+    "fuse_callbacks": fuse_callbacks,
+    "simplify_callbacks": simplify_callbacks,
+    "remove_dead_nodes": remove_dead_nodes,
+}
+
+
+class OptimizationResult:
+    """
+    Result of a process graph optimization: the optimized flat graph
+    and a report of the applied rewrites.
+
+    .. versionadded:: 0.21.0
+    """
+
+    def __init__(self, original: FlatGraph, flat_graph: FlatGraph, rewrites: List[Tuple[str, str]]):
+        #: Original (flat) process graph.
+        self.original = original
+        #: Optimized (flat) process graph.
+        self.flat_graph = flat_graph
+        #: List of applied rewrites as (rule name, description) tuples.
+        self.rewrites = rewrites
+
+    def __repr__(self):
+        return f"<{type(self).__name__} with {len(self.rewrites)} rewrites>"
+
+    @property
+    def changed(self) -> bool:
+        return bool(self.rewrites)
+
+    def summary(self) -> str:
+        """Human-readable overview of the applied rewrites."""
+        if not self.rewrites:
+            return "No process graph optimizations applied."
+        lines = [f"Applied {len(self.rewrites)} process graph optimization(s):"]
+        lines.extend(f"- {rule}: {message}" for rule, message in self.rewrites)
+        return "\n".join(lines)
+
+    def diff(self, context: int = 3) -> str:
+        """Unified diff between the JSON representations of the original and optimized process graph."""
+        original = json.dumps({"process_graph": self.original}, indent=2).splitlines()
+        optimized = json.dumps({"process_graph": self.flat_graph}, indent=2).splitlines()
+        lines = difflib.unified_diff(original, optimized, "original", "optimized", n=context, lineterm="")
+        return "\n".join(lines)
+
+
+def optimize_flat_graph(
+    flat_graph: FlatGraph, rules: Optional[Sequence[str]] = None, max_passes: int = 100
+) -> OptimizationResult:
+    """
+    Optimize a process graph (in flat graph representation) with rewrite rules:
+
+    - ``"push_down_filters"``: push ``filter_bbox``, ``filter_temporal`` and ``filter_bands``
+      into ``load_collection`` (also from further down the chain, e.g. after pixel-wise ``apply``),
+      so that the backend has to load less data.
+    - ``"fuse_callbacks"``: fuse consecutive ``apply`` (or ``apply_dimension``) nodes into one.
+    - ``"simplify_callbacks"``: fold constants, apply identity rules (e.g. ``multiply(x, 1)``)
+      and share repeated ``array_element`` lookups in callbacks.
+    - ``"remove_dead_nodes"``: remove nodes that do not contribute to the result.
+
+    Rewrites are only applied when they do not change the result of the process graph,
+    e.g. a filter is not pushed into a ``load_collection`` that is also used elsewhere.
+
+    :param flat_graph: flat graph representation of the process graph (not modified)
+    :param rules: names of the rewrite rules to apply (all by default)
+    :param max_passes: maximum number of rewrites
+    :return: :py:class:`OptimizationResult` with optimized process graph and report of applied rewrites
+
+    .. versionadded:: 0.21.0
+    """
+    rule_functions = []
+    for name in rules if rules is not None else DEFAULT_RULES:
+        if name not in DEFAULT_RULES:
+            raise ValueError(f"Invalid optimization rule {name!r}, should be one of {list(DEFAULT_RULES)}")
+        rule_functions.append(DEFAULT_RULES[name])
+    optimized = copy.deepcopy(flat_graph)
+    log = _RewriteLog()
+    for _ in range(max_passes):
+        if not any(rule(optimized, log) for rule in rule_functions):
+            break
+    return OptimizationResult(original=flat_graph, flat_graph=optimized, rewrites=log.entries)
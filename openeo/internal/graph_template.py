@@ -0,0 +1,164 @@
+"""
+Parameterized process graph templates: build a process graph once with
+:py:class:`~openeo.api.process.Parameter` placeholders and instantiate it
+many times with concrete values (e.g. a different bounding box and dates per batch job),
+without rebuilding and re-flattening the whole process graph.
+
+.. versionadded:: 0.21.0
+"""
+
+import copy
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple, Union
+
+from openeo.api.process import Parameter
+from openeo.internal.graph_building import as_flat_graph
+from openeo.internal.process_graph_visitor import ProcessGraphVisitException
+
+# Path of (dict keys or list indices) to a parameter slot in the flat graph.
+SlotPath = Tuple[Union[str, int], ...]
+
+
+class _Slot:
+    """Leaf of the slot trie: parameter to fill in."""
+
+    __slots__ = ("name",)
+
+    def __init__(self, name: str):
+        self.name = name
+
+
+class GraphTemplate:
+    """
+    Process graph template with parameter placeholders,
+    to be instantiated (fast) with concrete values.
+
+    The flat graph and the paths of all parameter slots (``{"from_parameter": ...}`` references)
+    are computed once. Instantiation only copies the containers on the paths to the slots:
+    other (possibly large) parts of the process graph are shared between instances and the template,
+    so instances should not be modified in place.
+
+    Usage example, e.g. in a ``start_job`` callback of
+    :py:class:`~openeo.extra.job_management.MultiBackendJobManager`:
+
+    .. code-block:: python
+
+        from openeo.api.process import Parameter
+
+        cube = connection.load_collection(
+            "SENTINEL2_L2A",
+            spatial_extent=Parameter("bbox", description="Bounding box"),
+            temporal_extent=[Parameter.string("start"), Parameter.string("end")],
+            bands=["B04", "B08"],
+        )
+        cube = cube.ndvi().save_result("GTiff")
+        template = GraphTemplate(cube)
+
+        def start_job(row, connection, **kwargs):
+            flat_graph = template.instantiate(bbox=row["bbox"], start=row["start"], end=row["end"])
+            return connection.create_job(flat_graph)
+
+    :param graph: process graph to use as template
+        (e.g. a :py:class:`~openeo.rest.datacube.DataCube` or a flat graph dict)
+    :param parameters: template parameters (:py:class:`~openeo.api.process.Parameter` objects or names).
+        Defaults of :py:class:`~openeo.api.process.Parameter` objects are used for values that are not given.
+        By default, all parameters referenced in the process graph outside of callbacks are template parameters.
+        Parameter references inside callbacks (child process graphs) usually refer to the parameters
+        of the callback itself (like "x", "data", "index" or "label"):
+        these are only template parameters when they are listed explicitly.
+
+    .. versionadded:: 0.21.0
+    """
+
+    def __init__(self, graph, parameters: Optional[Iterable[Union[Parameter, str]]] = None):
+        flat_graph = as_flat_graph(graph)
+        if "process_graph" in flat_graph:
+            flat_graph = flat_graph["process_graph"]
+        # Own copy, as instances share data with it.
+        self._flat_graph: Dict[str, dict] = copy.deepcopy(flat_graph)
+        self._defaults: Dict[str, Any] = {}
+        names = None
+        if parameters is not None:
+            names = set()
+            for parameter in parameters:
+                if isinstance(parameter, Parameter):
+                    names.add(parameter.name)
+                    if parameter.default is not Parameter._DEFAULT_UNDEFINED:
+                        self._defaults[parameter.name] = parameter.default
+                else:
+                    names.add(parameter)
+        self._slot_paths = self._find_slots(self._flat_graph, names=names)
+        self._names: Set[str] = set(names if names is not None else self._slot_paths)
+        # Trie of slot paths, to only copy the containers on these paths when instantiating.
+        self._trie: dict = {}
+        for name, paths in self._slot_paths.items():
+            for path in paths:
+                trie = self._trie
+                for key in path[:-1]:
+                    trie = trie.setdefault(key, {})
+                trie[path[-1]] = _Slot(name)
+
+    def __repr__(self):
+        return f"<{type(self).__name__} with parameters {sorted(self._names)}>"
+
+    @staticmethod
+    def _find_slots(flat_graph: Dict[str, dict], names: Optional[Set[str]]) -> Dict[str, List[SlotPath]]:
+        """Find the paths of all parameter references (in scope) in the flat graph."""
+        slots = {}
+        # Stack of (value, path, whether we are in a callback)
+        stack = [(flat_graph, (), False)]
+        while stack:
+            value, path, in_callback = stack.pop()
+            if isinstance(value, dict):
+                if len(value) == 1 and "from_parameter" in value:
+                    name = value["from_parameter"]
+                    if (name in names) if names is not None else not in_callback:
+                        slots.setdefault(name, []).append(path)
+                    continue
+                callback = in_callback or (len(value) == 1 and "process_graph" in value and path != ())
+                stack.extend((v, path + (k,), callback) for k, v in value.items())
+            elif isinstance(value, list):
+                stack.extend((v, path + (i,), in_callback) for i, v in enumerate(value))
+        for paths in slots.values():
+            paths.sort(key=lambda p: tuple(str(k) for k in p))
+        return slots
+
+    @property
+    def parameters(self) -> List[str]:
+        """Names of the template parameters."""
+        return sorted(self._names)
+
+    @property
+    def slot_paths(self) -> Dict[str, List[SlotPath]]:
+        """Paths (tuples of keys and indices in the flat graph) of the parameter slots, per parameter."""
+        return {name: list(paths) for name, paths in self._slot_paths.items()}
+
+    def flat_graph(self) -> Dict[str, dict]:
+        """Flat graph of the template (with parameter references)."""
+        return copy.deepcopy(self._flat_graph)
+
+    def instantiate(self, values: Optional[Dict[str, Any]] = None, **kwargs) -> Dict[str, dict]:
+        """
+        Instantiate the template: get the flat graph with parameter references replaced by given values.
+
+        :param values: mapping of parameter names to values (or given as keyword arguments).
+        :return: flat graph, which can be used directly with methods like
+            :py:meth:`Connection.create_job() <openeo.rest.connection.Connection.create_job>`.
+            Note that it shares unmodified parts with the template: do not modify it in place.
+        """
+        values = {**self._defaults, **(values or {}), **kwargs}
+        missing = self._names.difference(values)
+        if missing:
+            raise ProcessGraphVisitException(f"No substitution value for parameter {sorted(missing)[0]!r}.")
+        unknown = set(values).difference(self._names)
+        if unknown:
+            raise ProcessGraphVisitException(f"Unknown template parameter(s) {sorted(unknown)}.")
+        return self._fill(self._flat_graph, self._trie, values)
+
+    def _fill(self, value, trie: dict, values: Dict[str, Any]):
+        filled = dict(value) if isinstance(value, dict) else list(value)
+        for key, sub in trie.items():
+            if isinstance(sub, _Slot):
+                filled[key] = values[sub.name]
+            else:
+                filled[key] = self._fill(value[key], sub, values)
+        return filled
@@ -0,0 +1,154 @@
+"""
+JSON encoding of (large) process graphs:
+fast encoding with `orjson <https://github.com/ijl/orjson>`_ when it is available,
+compact wire format for request bodies and streaming output (node by node)
+to avoid building one huge string in memory.
+
+.. versionadded:: 0.21.0
+"""
+
+import json
+import math
+import re
+from typing import Iterator, Optional, Tuple, Union
+
+try:
+    # Optional fast JSON backend.
+    import orjson
+except ImportError:
+    orjson = None
+
+# Separators of the compact (wire) format: no whitespace.
+COMPACT_SEPARATORS = (",", ":")
+
+
+def _orjson_option(indent: Optional[int], separators: Optional[Tuple[str, str]]) -> Optional[int]:
+    """
+    Get orjson option to produce the same formatting as ``json.dumps`` with given formatting options,
+    or ``None`` if orjson is not available or does not support the formatting.
+    """
+    if orjson is None:
+        return None
+    if indent is None and separators is not None and tuple(separators) == COMPACT_SEPARATORS:
+        return 0
+    if indent == 2 and (separators is None or tuple(separators) == (",", ": ")):
+        return orjson.OPT_INDENT_2
+    return None
+
+
+# Pattern for float formatting where orjson differs from stdlib ``json``:
+# exponent notation (e.g. orjson "1e-7" versus stdlib "1e-07", "1e16" versus "1e+16")
+# and small values (e.g. orjson "0.00001" versus stdlib "1e-05").
+# Note that this can also match string content, which just means falling back to stdlib.
+_FLOAT_FORMAT_MISMATCH = re.compile(rb"[0-9][eE]|0\.0000")
+
+
+def _has_non_finite_float(data) -> bool:
+    """Check whether data contains NaN or infinite floats."""
+    isfinite = math.isfinite
+    stack = [data]
+    while stack:
+        value = stack.pop()
+        if isinstance(value, dict):
+            stack.extend(value.values())
+        elif isinstance(value, (list, tuple)):
+            try:
+                # Fast path for lists of numbers (e.g. coordinates).
+                if not all(map(isfinite, value)):
+                    return True
+            except (TypeError, OverflowError):
+                stack.extend(value)
+        elif isinstance(value, float) and not isfinite(value):
+            return True
+    return False
+
+
+def _orjson_dumps(data, option: int) -> Optional[bytes]:
+    """Encode with orjson, or return ``None`` if the data is not supported by orjson or not JSON compliant."""
+    try:
+        encoded = orjson.dumps(data, option=option)
+    except TypeError:
+        # Not supported by orjson (e.g. non-string keys or big integers).
+        return None
+    # orjson does not raise on NaN or infinite floats, but silently encodes them as ``null``,
+    # so only when there is a ``null`` in the output, the data has to be checked.
+    if b"null" in encoded and _has_non_finite_float(data):
+        return None
+    return encoded
+
+
+def dumps(data, *, indent: Union[int, None] = None, separators: Optional[Tuple[str, str]] = None) -> str:
+    """
+    Drop-in replacement of ``json.dumps`` (for given formatting options),
+    using orjson when available and the output would be the same.
+
+    :param data: data to encode
+    :param indent: JSON indentation level.
+    :param separators: (optional) tuple of item/key separators.
+    """
+    option = _orjson_option(indent=indent, separators=separators)
+    if option is not None:
+        encoded = _orjson_dumps(data, option=option)
+        if encoded is not None and not _FLOAT_FORMAT_MISMATCH.search(encoded):
+            try:
+                return encoded.decode("ascii")
+            except UnicodeDecodeError:
+                # orjson does not escape non-ASCII characters: leave these to stdlib for identical output.
+                pass
+    return json.dumps(data, indent=indent, separators=separators)
+
+
+def dumps_bytes(data) -> bytes:
+    """
+    Encode data in compact JSON format (no whitespace) as UTF-8 bytes, e.g. for a request body.
+    Unlike :py:func:`dumps`, the output is not guaranteed to be identical to stdlib ``json``:
+    with orjson, floats can be formatted differently (e.g. ``1e-7`` instead of ``1e-07``).
+
+    :raises ValueError: on NaN or infinite floats, which are not JSON compliant.
+    """
+    if orjson is not None:
+        encoded = _orjson_dumps(data, option=0)
+        if encoded is not None:
+            return encoded
+    return json.dumps(data, separators=COMPACT_SEPARATORS, ensure_ascii=False, allow_nan=False).encode("utf8")
+
+
+def iterdumps(
+    data, *, indent: Union[int, None] = None, separators: Optional[Tuple[str, str]] = None, depth: int = 2
+) -> Iterator[str]:
+    """
+    Encode data as JSON (with the same output as ``json.dumps``) in chunks:
+    dictionaries (up to given depth) are encoded item by item.
+    With the default depth of 2, a ``{"process_graph": {...}}`` construct is encoded node by node,
+    so that huge process graphs can be written to a file without building one huge string.
+
+    :param data: data to encode
+    :param indent: JSON indentation level.
+    :param separators: (optional) tuple of item/key separators.
+    :param depth: nesting depth of dictionaries to encode item by item.
+    """
+    if separators:
+        item_separator, key_separator = separators
+    else:
+        item_separator, key_separator = ("," if indent is not None else ", "), ": "
+
+    def chunks(value, level: int, depth: int) -> Iterator[str]:
+        if depth <= 0 or not isinstance(value, dict) or not value or not all(isinstance(k, str) for k in value):
+            encoded = dumps(value, indent=indent, separators=separators)
+            if indent is not None and level > 0:
+                # Re-indent nested value (note that encoded strings can not contain raw newlines).
+                encoded = encoded.replace("\n", "\n" + " " * (indent * level))
+            yield encoded
+            return
+        if indent is None:
+            item_prefix = closing = ""
+        else:
+            item_prefix = "\n" + " " * (indent * (level + 1))
+            closing = "\n" + " " * (indent * level)
+        yield "{"
+        for i, (key, item) in enumerate(value.items()):
+            yield (item_separator if i else "") + item_prefix + json.dumps(key) + key_separator
+            yield from chunks(item, level=level + 1, depth=depth - 1)
+        yield closing + "}"
+
+    return chunks(data, level=0, depth=depth)
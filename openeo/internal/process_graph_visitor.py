@@ -1,6 +1,7 @@
+import functools
 import json
 from abc import ABC
-from typing import Union, Tuple, Any
+from typing import Any, Callable, Iterator, List, Tuple, Union
 
 from openeo.internal.warnings import deprecated
 from openeo.rest import OpenEoClientException
@@ -17,6 +18,9 @@ class ProcessGraphVisitor(ABC):
 
     def __init__(self):
         self.process_stack = []
+        # Explicit stack of scheduled traversal actions (see `_run_scheduled`)
+        self._todo: List[Callable[[], None]] = []
+        self._running = False
 
     @classmethod
     def dereference_from_node_arguments(cls, process_graph: dict) -> str:
@@ -85,30 +89,68 @@ class ProcessGraphVisitor(ABC):
         namespace = node.get("namespace", None)
         self._accept_process(process_id=pid, arguments=arguments, namespace=namespace)
 
+    def _schedule(self, *actions: Callable[[], None]):
+        """
+        Schedule actions (argument-less callables) to run (in given order)
+        before previously scheduled actions.
+        """
+        self._todo.extend(reversed(actions))
+
+    def _run_scheduled(self):
+        """
+        Run scheduled actions, unless already running (e.g. when called from a scheduled action).
+
+        Instead of recursing into nested nodes, the traversal schedules actions on an explicit stack,
+        to support deeply nested graphs (e.g. long method chains) without hitting the recursion limit.
+        """
+        if self._running:
+            return
+        self._running = True
+        try:
+            while self._todo:
+                self._todo.pop()()
+        finally:
+            self._running = False
+            self._todo.clear()
+
     def _accept_process(self, process_id: str, arguments: dict, namespace: Union[str, None]):
-        self.process_stack.append(process_id)
-        self.enterProcess(process_id=process_id, arguments=arguments, namespace=namespace)
-        for arg_id, value in sorted(arguments.items()):
+        def enter():
+            self.process_stack.append(process_id)
+            self.enterProcess(process_id=process_id, arguments=arguments, namespace=namespace)
+
+        def leave():
+            self.leaveProcess(process_id=process_id, arguments=arguments, namespace=namespace)
+            assert self.process_stack.pop() == process_id
+
+        actions = [enter]
+        for arg_id, value in (sorted(arguments.items()) if len(arguments) > 1 else arguments.items()):
             if isinstance(value, list):
-                self.enterArray(argument_id=arg_id)
-                self._accept_argument_list(value)
-                self.leaveArray(argument_id=arg_id)
+                actions.append(functools.partial(self.enterArray, argument_id=arg_id))
+                actions.extend(self._argument_list_actions(value))
+                actions.append(functools.partial(self.leaveArray, argument_id=arg_id))
             elif isinstance(value, dict):
-                self.enterArgument(argument_id=arg_id, value=value)
-                self._accept_argument_dict(value)
-                self.leaveArgument(argument_id=arg_id, value=value)
+                actions.append(functools.partial(self.enterArgument, argument_id=arg_id, value=value))
+                actions.append(functools.partial(self._accept_argument_dict, value))
+                actions.append(functools.partial(self.leaveArgument, argument_id=arg_id, value=value))
             else:
-                self.constantArgument(argument_id=arg_id, value=value)
-        self.leaveProcess(process_id=process_id, arguments=arguments, namespace=namespace)
-        assert self.process_stack.pop() == process_id
+                actions.append(functools.partial(self.constantArgument, argument_id=arg_id, value=value))
+        actions.append(leave)
+        self._schedule(*actions)
+        self._run_scheduled()
 
-    def _accept_argument_list(self, elements: list):
+    def _argument_list_actions(self, elements: list) -> List[Callable[[], None]]:
+        actions = []
         for element in elements:
             if isinstance(element, dict):
-                self._accept_argument_dict(element)
-                self.arrayElementDone(element)
+                actions.append(functools.partial(self._accept_argument_dict, element))
+                actions.append(functools.partial(self.arrayElementDone, element))
             else:
-                self.constantArrayElement(element)
+                actions.append(functools.partial(self.constantArrayElement, element))
+        return actions
+
+    def _accept_argument_list(self, elements: list):
+        self._schedule(*self._argument_list_actions(elements))
+        self._run_scheduled()
 
     def _accept_argument_dict(self, value: dict):
         if 'node' in value and 'from_node' in value:
@@ -197,8 +239,53 @@ class ProcessGraphUnflattener:
     def process(self):
         """Process the flat process graph: unflatten it."""
         result_key, result_node = find_result_node(flat_graph=self._flat_graph)
+        # Process dependencies first (bottom-up), so that resolving a "from_node" reference
+        # does not have to recurse into (possibly deeply nested) dependencies.
+        for key in self._dependency_order(result_key):
+            self.get_node(key)
         return self.get_node(result_key)
 
+    @staticmethod
+    def _from_node_keys(value) -> Iterator[str]:
+        """Iterate over the "from_node" references in given value (e.g. node arguments), in traversal order."""
+        stack = [value]
+        while stack:
+            value = stack.pop()
+            if isinstance(value, dict):
+                if "from_node" in value:
+                    yield value["from_node"]
+                elif "from_parameter" not in value and "process_graph" not in value:
+                    stack.extend(reversed(list(value.values())))
+            elif isinstance(value, (list, tuple)):
+                stack.extend(reversed(value))
+
+    def _dependency_order(self, key: str) -> List[str]:
+        """
+        Keys of the nodes that given node depends on (including itself) in depth-first post-order
+        (dependencies before dependents), using an explicit stack instead of recursion.
+        """
+        order = []
+        done = set()
+        visiting = {key}
+        stack = [(key, self._from_node_keys(self._flat_graph[key].get("arguments", {})))]
+        while stack:
+            current, dependencies = stack[-1]
+            for dependency in dependencies:
+                if dependency in done or dependency not in self._flat_graph:
+                    # Note: invalid references are reported when processing the node.
+                    continue
+                if dependency in visiting:
+                    raise ProcessGraphVisitException("Cycle in process graph")
+                visiting.add(dependency)
+                stack.append((dependency, self._from_node_keys(self._flat_graph[dependency].get("arguments", {}))))
+                break
+            else:
+                stack.pop()
+                visiting.discard(current)
+                done.add(current)
+                order.append(current)
+        return order
+
     def get_node(self, key: str) -> Any:
         """Get processed node by node key."""
         if key not in self._nodes:
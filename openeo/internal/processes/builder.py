@@ -53,9 +53,9 @@ class ProcessBuilderBase(_FromNodeMixin, FlatGraphableMixin):
         }
         return cls(PGNode(process_id=process_id, arguments=arguments, namespace=namespace))
 
-    def flat_graph(self) -> Dict[str, dict]:
+    def flat_graph(self, *, deduplicate: bool = False) -> Dict[str, dict]:
         """Get the process graph in internal flat dict representation."""
-        return self.pgnode.flat_graph()
+        return self.pgnode.flat_graph(deduplicate=deduplicate)
 
     def from_node(self) -> PGNode:
         # _FromNodeMixin API
@@ -36,12 +36,15 @@ class OpenEoApiError(OpenEoRestError):
     """
 
     def __init__(self, http_status_code: int = None,
-                 code: str = 'unknown', message: str = 'unknown error', id: str = None, url: str = None):
+                 code: str = 'unknown', message: str = 'unknown error', id: str = None, url: str = None,
+                 retry_after: float = None):
         self.http_status_code = http_status_code
         self.code = code
         self.message = message
         self.id = id
         self.url = url
+        # Delay (in seconds) requested by the server through a "Retry-After" header (e.g. with 429 or 503 status).
+        self.retry_after = retry_after
         msg = "[{s}] {c}: {m}".format(s=self.http_status_code, c=self.code, m=self.message)
         if self.id:
             msg += " (ref: {i})".format(i=self.id)
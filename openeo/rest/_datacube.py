@@ -40,10 +40,14 @@ class _ProcessGraphAbstraction(_FromNodeMixin, FlatGraphableMixin):
     def __str__(self):
         return "{t}({pg})".format(t=self.__class__.__name__, pg=self._pg)
 
-    def flat_graph(self) -> Dict[str, dict]:
+    def flat_graph(self, *, deduplicate: bool = False) -> Dict[str, dict]:
         """
         Get the process graph in internal flat dict representation.
 
+        :param deduplicate: whether to merge structurally identical nodes
+            (e.g. the same ``load_collection`` or band math subexpression built multiple times),
+            so that the backend does not compute them multiple times.
+
         .. warning:: This method is mainly intended for internal use.
             It is not recommended for general use and is *subject to change*.
 
@@ -51,9 +55,11 @@ class _ProcessGraphAbstraction(_FromNodeMixin, FlatGraphableMixin):
             :py:meth:`to_json()` or :py:meth:`print_json()`
             to obtain a standardized, interoperable JSON representation of the process graph.
             See :ref:`process_graph_export` for more information.
+
+        .. versionchanged:: 0.21.0 added ``deduplicate`` argument
         """
         # TODO: wrap in {"process_graph":...} by default/optionally?
-        return self._pg.flat_graph()
+        return self._pg.flat_graph(deduplicate=deduplicate)
 
     @property
     def _api_version(self):
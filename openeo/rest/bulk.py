@@ -0,0 +1,178 @@
+"""
+Helpers to do many independent requests concurrently (e.g. create many batch jobs),
+with bounded parallelism, rate limit handling ("429 Too Many Requests" with "Retry-After" header)
+and per item reporting of success or failure.
+
+.. versionadded:: 0.21.0
+"""
+
+import concurrent.futures
+import logging
+import threading
+import time
+from typing import Any, Callable, Collection, Iterable, Iterator, Optional
+
+import requests
+
+from openeo.rest import OpenEoApiError
+from openeo.util import ContextTimer
+
+_log = logging.getLogger(__name__)
+
+
+class BulkResult:
+    """
+    Outcome of a single item of a bulk operation
+    (e.g. :py:meth:`~openeo.rest.connection.Connection.create_jobs`).
+
+    .. versionadded:: 0.21.0
+    """
+
+    __slots__ = ("index", "value", "error", "elapsed", "attempts")
+
+    def __init__(self, index: int):
+        #: Index of the item in the input.
+        self.index = index
+        #: Result value (e.g. a :py:class:`~openeo.rest.job.BatchJob`).
+        #: Can be set even if there is an error, e.g. a job that was created, but failed to start.
+        self.value: Any = None
+        #: Exception if the item failed, ``None`` on success.
+        self.error: Optional[Exception] = None
+        #: Total time (in seconds) spent on the item, including retries.
+        self.elapsed: Optional[float] = None
+        #: Number of requests that were attempted for the item.
+        self.attempts = 0
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
+
+    def __repr__(self):
+        outcome = f"value={self.value!r}" if self.ok else f"error={self.error!r}"
+        return f"<{type(self).__name__} #{self.index} {outcome}>"
+
+
+class _RateLimitGate:
+    """Shared pause of all worker threads, e.g. after a "429 Too Many Requests" response."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._resume_at = 0.0
+
+    def pause(self, delay: float):
+        with self._lock:
+            self._resume_at = max(self._resume_at, time.time() + delay)
+
+    def wait(self):
+        while True:
+            with self._lock:
+                delay = self._resume_at - time.time()
+            if delay <= 0:
+                return
+            time.sleep(delay)
+
+
+class BulkRunner:
+    """
+    Run a function on many items concurrently, with bounded parallelism and retries.
+
+    :param max_workers: maximum number of concurrent requests
+    :param max_retries: maximum number of retries of a request
+    :param retry_statuses: HTTP status codes of API errors to retry.
+        On a "429 Too Many Requests" response, all workers pause,
+        as long as requested through the "Retry-After" header if available.
+    :param retry_connection_errors: whether to retry on connection errors
+        (only safe for idempotent requests).
+    :param backoff: initial delay (in seconds) before retrying, when not specified by the server.
+        This delay doubles with each attempt.
+    :param max_backoff: maximum delay (in seconds) before retrying.
+
+    .. versionadded:: 0.21.0
+    """
+
+    def __init__(
+        self,
+        max_workers: int = 4,
+        max_retries: int = 5,
+        retry_statuses: Collection[int] = (429,),
+        retry_connection_errors: bool = False,
+        backoff: float = 1,
+        max_backoff: float = 60,
+    ):
+        if max_workers < 1:
+            raise ValueError(f"Invalid max_workers {max_workers!r}")
+        self.max_workers = max_workers
+        self.max_retries = max_retries
+        self.retry_statuses = set(retry_statuses)
+        self.retry_connection_errors = retry_connection_errors
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self._gate = _RateLimitGate()
+
+    def _retry_delay(self, error: Exception, attempt: int) -> Optional[float]:
+        """Delay (in seconds) before retrying after given error, or ``None`` if it should not be retried."""
+        if isinstance(error, OpenEoApiError):
+            if error.http_status_code not in self.retry_statuses:
+                return None
+            if error.retry_after is not None:
+                return min(error.retry_after, self.max_backoff)
+        elif not (self.retry_connection_errors and isinstance(error, requests.exceptions.ConnectionError)):
+            return None
+        return min(self.backoff * 2 ** (attempt - 1), self.max_backoff)
+
+    def call(self, func: Callable[[], Any], result: Optional[BulkResult] = None) -> Any:
+        """
+        Call given (argument-less) function, with retries on rate limiting and other retryable errors.
+
+        :param func: function to call
+        :param result: result object to keep track of attempts
+        """
+        attempt = 0
+        while True:
+            self._gate.wait()
+            attempt += 1
+            if result:
+                result.attempts += 1
+            try:
+                return func()
+            except Exception as e:
+                delay = self._retry_delay(e, attempt=attempt) if attempt <= self.max_retries else None
+                if delay is None:
+                    raise
+                _log.warning(f"Request failed with {e!r} (attempt {attempt}), retrying in {delay:.1f}s")
+                if isinstance(e, OpenEoApiError) and e.http_status_code == 429:
+                    self._gate.pause(delay)
+                else:
+                    time.sleep(delay)
+
+    def run(self, func: Callable[[Any, BulkResult], Any], items: Iterable) -> Iterator[BulkResult]:
+        """
+        Run given function on all items concurrently and yield results as they complete.
+
+        :param func: function to call with an item and its :py:class:`BulkResult`.
+            Its return value is stored as result value, an exception is stored as result error.
+            Use :py:meth:`call` inside this function to do requests with retries.
+        :param items: items to process
+        :return: iterator of :py:class:`BulkResult` objects, in order of completion
+        """
+
+        def process(index: int, item) -> BulkResult:
+            result = BulkResult(index=index)
+            with ContextTimer() as timer:
+                try:
+                    result.value = func(item, result)
+                except Exception as e:
+                    _log.error(f"Bulk item #{index} failed: {e!r}")
+                    result.error = e
+            result.elapsed = timer.elapsed()
+            return result
+
+        with concurrent.futures.ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            futures = [executor.submit(process, index, item) for index, item in enumerate(items)]
+            try:
+                for future in concurrent.futures.as_completed(futures):
+                    yield future.result()
+            finally:
+                # E.g. consumer stopped iterating early: don't start pending items.
+                for future in futures:
+                    future.cancel()
@@ -2,10 +2,12 @@
 This module provides a Connection object to manage and persist settings when interacting with the OpenEO API.
 """
 import datetime
+import email.utils
 import json
 import logging
 import os
 import shlex
+import shutil
 import sys
 import warnings
 from collections import OrderedDict
@@ -19,6 +21,7 @@ from requests.auth import HTTPBasicAuth, AuthBase
 import openeo
 from openeo.capabilities import ApiVersionException, ComparableVersion
 from openeo.config import get_config_option, config_log
+from openeo.internal import json_encoding
 from openeo.internal.graph_building import PGNode, as_flat_graph, FlatGraphableMixin
 from openeo.internal.jupyter import VisualDict, VisualList
 from openeo.internal.processes.builder import ProcessBuilderBase
@@ -27,6 +30,7 @@ from openeo.metadata import CollectionMetadata, SpatialDimension, TemporalDimens
 from openeo.rest import OpenEoClientException, OpenEoApiError, OpenEoRestError
 from openeo.rest.auth.auth import NullAuth, BearerAuth, BasicBearerAuth, OidcBearerAuth
 from openeo.rest.auth.config import RefreshTokenStore, AuthConfig
+from openeo.rest.bulk import BulkResult, BulkRunner
 from openeo.rest.auth.oidc import OidcClientCredentialsAuthenticator, OidcAuthCodePkceAuthenticator, \
     OidcClientInfo, OidcAuthenticator, OidcRefreshTokenAuthenticator, OidcResourceOwnerPasswordAuthenticator, \
     OidcDeviceAuthenticator, OidcProviderInfo, OidcException, DefaultOidcClientGrant, GrantsChecker
@@ -34,7 +38,11 @@ from openeo.rest.datacube import DataCube
 from openeo.rest.mlmodel import MlModel
 from openeo.rest.userfile import UserFile
 from openeo.rest.job import BatchJob, RESTJob
+from openeo.rest.geometry_reduction import GeometryReducer
+from openeo.rest.geometry_upload import GeometryUploader
+from openeo.rest.job_registry import JobResultRegistry
 from openeo.rest.rest_capabilities import RESTCapabilities
+from openeo.rest.result_cache import ResultCache
 from openeo.rest.service import Service
 from openeo.rest.udp import RESTUserDefinedProcess, Parameter
 from openeo.rest.vectorcube import VectorCube
@@ -52,6 +60,23 @@ from openeo.util import (
 _log = logging.getLogger(__name__)
 
 
+def _parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """Parse "Retry-After" header value (delay in seconds or HTTP date) to delay in seconds."""
+    if not value:
+        return None
+    value = value.strip()
+    if value.isdigit():
+        return float(value)
+    try:
+        retry_at = email.utils.parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        _log.warning(f"Failed to parse Retry-After header {value!r}")
+        return None
+    if retry_at.tzinfo is None:
+        retry_at = retry_at.replace(tzinfo=datetime.timezone.utc)
+    return max(0.0, (retry_at - datetime.datetime.now(tz=datetime.timezone.utc)).total_seconds())
+
+
 class RestApiConnection:
     """Base connection class implementing generic REST API request functionality"""
 
@@ -111,6 +136,17 @@ class RestApiConnection:
         # Don't send default auth headers to external domains.
         auth = auth or (self.auth if not self._is_external(url) else None)
         slow_response_threshold = kwargs.pop("slow_response_threshold", self.slow_response_threshold)
+        if kwargs.get("json") is not None:
+            # Encode JSON payload ourselves: compact (and fast with orjson, when available).
+            try:
+                data = json_encoding.dumps_bytes(kwargs["json"])
+            except ValueError:
+                # Not JSON compliant (e.g. NaN values): leave it to `requests` to raise an error.
+                pass
+            else:
+                del kwargs["json"]
+                kwargs["data"] = data
+                headers = {"Content-Type": "application/json", **(headers or {})}
         if _log.isEnabledFor(logging.DEBUG):
             _log.debug("Request `{m} {u}` with headers {h}, auth {a}, kwargs {k}".format(
                 m=method.upper(), u=url, h=headers and headers.keys(), a=type(auth).__name__, k=list(kwargs.keys()))
@@ -145,6 +181,7 @@ class RestApiConnection:
     def _raise_api_error(self, response: requests.Response):
         """Convert API error response to Python exception"""
         status_code = response.status_code
+        retry_after = _parse_retry_after(response.headers.get("Retry-After"))
         try:
             # Try parsing the error info according to spec and wrap it in an exception.
             info = response.json()
@@ -154,6 +191,7 @@ class RestApiConnection:
                 message=info.get("message", "unknown error"),
                 id=info.get("id"),
                 url=info.get("url"),
+                retry_after=retry_after,
             )
         except Exception:
             # Parsing of error info went wrong: let's see if we can still extract some helpful information.
@@ -163,9 +201,9 @@ class RestApiConnection:
                 msg = "Received 502 Proxy Error." \
                       " This typically happens if an OpenEO request takes too long and is killed." \
                       " Consider using batch jobs instead of doing synchronous processing."
-                exception = OpenEoApiError(http_status_code=status_code, message=msg)
+                exception = OpenEoApiError(http_status_code=status_code, message=msg, retry_after=retry_after)
             else:
-                exception = OpenEoApiError(http_status_code=status_code, message=text)
+                exception = OpenEoApiError(http_status_code=status_code, message=text, retry_after=retry_after)
         raise exception
 
     def get(self, path: str, stream: bool = False, auth: Optional[AuthBase] = None, **kwargs) -> Response:
@@ -240,11 +278,26 @@ class Connection(RestApiConnection):
         refresh_token_store: Optional[RefreshTokenStore] = None,
         slow_response_threshold: Optional[float] = None,
         oidc_auth_renewer: Optional[OidcAuthenticator] = None,
+        result_cache: Optional[ResultCache] = None,
+        job_registry: Optional[JobResultRegistry] = None,
+        geometry_uploader: Optional[GeometryUploader] = None,
+        geometry_reducer: Optional[GeometryReducer] = None,
     ):
         """
         Constructor of Connection, authenticates user.
 
         :param url: String Backend root url
+        :param result_cache: (optional) local cache of synchronous processing results
+            (see :py:class:`~openeo.rest.result_cache.ResultCache`).
+        :param job_registry: (optional) registry of finished batch jobs, to reuse their results
+            (see :py:class:`~openeo.rest.job_registry.JobResultRegistry`).
+        :param geometry_uploader: (optional) offloading of large inline geometries to the user workspace
+            (see :py:class:`~openeo.rest.geometry_upload.GeometryUploader`).
+        :param geometry_reducer: (optional) simplification and quantization of inline geometries
+            (see :py:class:`~openeo.rest.geometry_reduction.GeometryReducer`).
+
+        .. versionchanged:: 0.21.0
+            added ``result_cache``, ``job_registry``, ``geometry_uploader`` and ``geometry_reducer`` arguments.
         """
         if "://" not in url:
             url = "https://" + url
@@ -262,6 +315,14 @@ class Connection(RestApiConnection):
         self._auth_config = auth_config
         self._refresh_token_store = refresh_token_store
         self._oidc_auth_renewer = oidc_auth_renewer
+        #: Local cache of synchronous processing results (``None`` to disable).
+        self.result_cache = result_cache
+        #: Registry of finished batch jobs to reuse (``None`` to disable).
+        self.job_registry = job_registry
+        #: Offloading of large inline geometries to the user workspace (``None`` to disable).
+        self.geometry_uploader = geometry_uploader
+        #: Simplification and quantization of inline geometries (``None`` to disable).
+        self.geometry_reducer = geometry_reducer
 
     @classmethod
     def version_discovery(
@@ -1399,15 +1460,31 @@ class Connection(RestApiConnection):
             or as local file path or URL
         :param outputfile: output file
         :param timeout: timeout to wait for response
+
+        .. versionchanged:: 0.21.0
+            use the :py:attr:`result_cache` (if set).
         """
         request = self._build_request_with_process_graph(process_graph=graph)
+        cache_key = self._result_cache_key(request)
+        cached = self.result_cache.get(cache_key) if cache_key else None
+        if cached is not None:
+            _log.info(f"Using cached result {cache_key} instead of POST /result")
+            if outputfile is not None:
+                shutil.copyfile(cached, outputfile)
+                return
+            return cached.read_bytes()
+
         response = self.post(path="/result", json=request, expected_status=200, stream=True, timeout=timeout)
 
         if outputfile is not None:
             with Path(outputfile).open(mode="wb") as f:
                 for chunk in response.iter_content(chunk_size=None):
                     f.write(chunk)
+            if cache_key:
+                self.result_cache.put(cache_key, Path(outputfile))
         else:
+            if cache_key:
+                self.result_cache.put(cache_key, response.content)
             return response.content
 
     def execute(self, process_graph: Union[dict, str, Path]):
@@ -1417,9 +1494,151 @@ class Connection(RestApiConnection):
         :param process_graph: (flat) dict representing a process graph, or process graph as raw JSON string,
             or as local file path or URL
         :return: parsed JSON response
+
+        .. versionchanged:: 0.21.0
+            use the :py:attr:`result_cache` (if set).
         """
         req = self._build_request_with_process_graph(process_graph=process_graph)
-        return self.post(path="/result", json=req, expected_status=200).json()
+        cache_key = self._result_cache_key(req, default_format="json")
+        cached = self.result_cache.get(cache_key) if cache_key else None
+        if cached is not None:
+            _log.info(f"Using cached result {cache_key} instead of POST /result")
+            return json.loads(cached.read_bytes())
+        response = self.post(path="/result", json=req, expected_status=200)
+        if cache_key:
+            self.result_cache.put(cache_key, response.content)
+        return response.json()
+
+    def _result_cache_key(self, request: dict, default_format: Optional[str] = None) -> Optional[str]:
+        """Key in the result cache for given `/result` request (``None`` if there is no result cache)."""
+        if self.result_cache is None:
+            return None
+        flat_graph = request["process"]["process_graph"]
+        formats = sorted(
+            str(node["arguments"]["format"])
+            for node in flat_graph.values()
+            if node.get("process_id") == "save_result" and "format" in node.get("arguments", {})
+        )
+        return self.result_cache.key(
+            backend=self.root_url, graph=flat_graph, output_format=",".join(formats) or default_format
+        )
+
+    def _run_many(
+        self, func: Callable, items: list, *, max_workers: int, max_retries: int, ordered: bool
+    ) -> Union[List[BulkResult], Iterator[BulkResult]]:
+        """Run synchronous processing requests concurrently, with retries of transient failures."""
+        runner = BulkRunner(
+            max_workers=max_workers,
+            max_retries=max_retries,
+            retry_statuses=[429, 502, 503, 504],
+            retry_connection_errors=True,
+        )
+
+        def results() -> Iterator[BulkResult]:
+            elapsed = []
+            failures = 0
+            for result in runner.run(lambda item, result: runner.call(lambda: func(item), result=result), items):
+                elapsed.append(result.elapsed)
+                failures += not result.ok
+                yield result
+            if elapsed:
+                _log.info(
+                    f"Processed {len(elapsed)} synchronous requests ({failures} failed):"
+                    f" mean {sum(elapsed) / len(elapsed):.2f}s, max {max(elapsed):.2f}s per request"
+                )
+
+        if ordered:
+            return sorted(results(), key=lambda r: r.index)
+        return results()
+
+    def download_many(
+        self,
+        graphs: Iterable[Union[dict, FlatGraphableMixin, str, Path]],
+        outputfiles: Iterable[Union[str, Path]],
+        *,
+        max_workers: int = 4,
+        max_retries: int = 3,
+        timeout: int = 30 * 60,
+        ordered: bool = True,
+    ) -> Union[List[BulkResult], Iterator[BulkResult]]:
+        """
+        Download the results of many (small) process graphs synchronously, with concurrent requests.
+
+        Each result is streamed to its own output file
+        (through a temporary ``.part`` file, so that a failed download does not leave an incomplete file).
+        Transient failures (rate limiting, gateway errors, connection errors) are retried per process graph,
+        other failures are reported per process graph without aborting the others.
+
+        Usage example:
+
+        .. code-block:: python
+
+            graphs = [cube.filter_bbox(bbox) for bbox in bboxes]
+            outputs = [f"result_{i}.nc" for i in range(len(bboxes))]
+            for result in connection.download_many(graphs, outputs, max_workers=8, ordered=False):
+                print(result.index, result.ok, result.elapsed)
+
+        :param graphs: process graphs (e.g. flat dicts or :py:class:`~openeo.rest.datacube.DataCube` objects)
+        :param outputfiles: output file for each process graph
+        :param max_workers: maximum number of concurrent requests
+        :param max_retries: maximum number of retries per process graph
+        :param timeout: timeout to wait for each response
+        :param ordered: whether to return a list of results in input order (after all requests completed)
+            or an iterator of results as they complete.
+        :return: :py:class:`~openeo.rest.bulk.BulkResult` objects, with the output path as ``value``,
+            the exception as ``error`` on failure and timing as ``elapsed``.
+
+        .. versionadded:: 0.21.0
+        """
+        graphs = list(graphs)
+        outputfiles = [Path(p) for p in outputfiles]
+        if len(graphs) != len(outputfiles):
+            raise OpenEoClientException(
+                f"Number of output files ({len(outputfiles)}) does not match number of process graphs ({len(graphs)})."
+            )
+        items = list(zip(graphs, outputfiles))
+
+        def download(item) -> Path:
+            graph, outputfile = item
+            part = outputfile.with_name(outputfile.name + ".part")
+            try:
+                self.download(graph, outputfile=part, timeout=timeout)
+                part.replace(outputfile)
+            finally:
+                if part.exists():
+                    part.unlink()
+            return outputfile
+
+        return self._run_many(download, items, max_workers=max_workers, max_retries=max_retries, ordered=ordered)
+
+    def execute_many(
+        self,
+        graphs: Iterable[Union[dict, FlatGraphableMixin, str, Path]],
+        *,
+        max_workers: int = 4,
+        max_retries: int = 3,
+        ordered: bool = True,
+    ) -> Union[List[BulkResult], Iterator[BulkResult]]:
+        """
+        Execute many (small) process graphs synchronously, with concurrent requests,
+        and get the results (assumed to be JSON).
+
+        Transient failures (rate limiting, gateway errors, connection errors) are retried per process graph,
+        other failures are reported per process graph without aborting the others.
+
+        :param graphs: process graphs (e.g. flat dicts or :py:class:`~openeo.rest.datacube.DataCube` objects)
+        :param max_workers: maximum number of concurrent requests
+        :param max_retries: maximum number of retries per process graph
+        :param ordered: whether to return a list of results in input order (after all requests completed)
+            or an iterator of results as they complete.
+        :return: :py:class:`~openeo.rest.bulk.BulkResult` objects, with the parsed JSON response as ``value``,
+            the exception as ``error`` on failure and timing as ``elapsed``.
+
+        .. versionadded:: 0.21.0
+        """
+        return self._run_many(
+            self.execute, list(graphs), max_workers=max_workers, max_retries=max_retries, ordered=ordered
+        )
 
     def create_job(
         self,
@@ -1442,12 +1661,20 @@ class Connection(RestApiConnection):
         :param budget: maximum cost the request is allowed to produce
         :param additional: additional job options to pass to the backend
         :return: Created job
+            (or an earlier, finished job with the same process graph, if the :py:attr:`job_registry` has a match).
+
+        .. versionchanged:: 0.21.0
+            use the :py:attr:`job_registry` (if set).
         """
         # TODO move all this (BatchJob factory) logic to BatchJob?
         req = self._build_request_with_process_graph(
             process_graph=process_graph,
             **dict_no_none(title=title, description=description, plan=plan, budget=budget)
         )
+        if self.job_registry is not None:
+            job = self.job_registry.lookup(self, req["process"])
+            if job is not None:
+                return job
         if additional:
             # TODO: get rid of this non-standard field? https://github.com/Open-EO/openeo-api/issues/276
             req["job_options"] = additional
@@ -1462,7 +1689,76 @@ class Connection(RestApiConnection):
             job_id = response.headers['location'].split("/")[-1]
         if not job_id:
             raise OpenEoClientException("Job creation response did not contain a valid job id")
-        return BatchJob(job_id=job_id, connection=self)
+        job = BatchJob(job_id=job_id, connection=self)
+        if self.job_registry is not None:
+            self.job_registry.track(job, req["process"])
+        return job
+
+    def create_jobs(
+        self,
+        graphs: Iterable[Union[dict, FlatGraphableMixin, str, Path]],
+        *,
+        start: bool = True,
+        max_workers: int = 4,
+        max_retries: int = 5,
+        title: Optional[str] = None,
+        description: Optional[str] = None,
+        plan: Optional[str] = None,
+        budget: Optional[float] = None,
+        additional: Optional[dict] = None,
+    ) -> List[BulkResult]:
+        """
+        Create (and start) batch jobs for many process graphs concurrently.
+
+        Requests that are rejected with "429 Too Many Requests" are retried
+        (after the delay requested with the "Retry-After" header, if any).
+        Other failures do not abort the batch, but are reported per process graph.
+
+        Usage example:
+
+        .. code-block:: python
+
+            results = connection.create_jobs([cube1, cube2, cube3], max_workers=8)
+            jobs = [r.value for r in results if r.ok]
+            failed = [r for r in results if not r.ok]
+
+        :param graphs: process graphs (e.g. flat dicts or :py:class:`~openeo.rest.datacube.DataCube` objects)
+        :param start: whether to start the jobs after creating them
+            (jobs reused from the :py:attr:`job_registry` are only started if they are still in "created" status)
+        :param max_workers: maximum number of concurrent requests
+        :param max_retries: maximum number of retries of a rate limited request
+        :param title: job title (for all jobs)
+        :param description: job description (for all jobs)
+        :param plan: billing plan
+        :param budget: maximum cost the request is allowed to produce
+        :param additional: additional job options to pass to the backend
+        :return: list of :py:class:`~openeo.rest.bulk.BulkResult` objects, in input order,
+            with the :py:class:`BatchJob` as ``value`` if it was created
+            (also when the job failed to start) and the exception as ``error`` on failure.
+
+        .. versionadded:: 0.21.0
+        """
+        runner = BulkRunner(max_workers=max_workers, max_retries=max_retries, retry_statuses=[429])
+
+        def create_and_start(graph, result: BulkResult) -> BatchJob:
+            result.value = runner.call(
+                lambda: self.create_job(
+                    graph, title=title, description=description, plan=plan, budget=budget, additional=additional
+                ),
+                result=result,
+            )
+            if start:
+                job = result.value
+                # A job reused from the job registry may already be finished (or still running).
+                if self.job_registry is None or runner.call(job.status, result=result) == "created":
+                    runner.call(job.start, result=result)
+            return result.value
+
+        results = sorted(runner.run(create_and_start, graphs), key=lambda r: r.index)
+        failures = sum(1 for r in results if not r.ok)
+        if failures:
+            _log.warning(f"Failed to create/start {failures} of {len(results)} jobs.")
+        return results
 
     def job(self, job_id: str) -> BatchJob:
         """
@@ -1531,7 +1827,7 @@ class Connection(RestApiConnection):
         if isinstance(self.auth, BearerAuth):
             cmd += ["-H", f"Authorization: Bearer {'...' if obfuscate_auth else self.auth.bearer}"]
         post_data = self._build_request_with_process_graph(data)
-        post_json = json.dumps(post_data, separators=(',', ':'))
+        post_json = json_encoding.dumps(post_data, separators=json_encoding.COMPACT_SEPARATORS)
         cmd += ["--data", post_json]
         cmd += [self.build_url(path)]
         return " ".join(shlex.quote(c) for c in cmd)
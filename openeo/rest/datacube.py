@@ -25,14 +25,17 @@ import openeo.processes
 from openeo.api.process import Parameter
 from openeo.internal.documentation import openeo_process
 from openeo.internal.graph_building import PGNode, ReduceNode, _FromNodeMixin
+from openeo.internal.graph_estimate import GraphVolumeEstimate, estimate_volume
+from openeo.internal.graph_optimizer import optimize_flat_graph
 from openeo.internal.processes.builder import get_parameter_names, convert_callable_to_pgnode
 from openeo.internal.warnings import legacy_alias, UserDeprecationWarning, deprecated
 from openeo.internal.jupyter import in_jupyter_context
 from openeo.metadata import CollectionMetadata, Band, BandDimension, TemporalDimension, SpatialDimension
 from openeo.processes import ProcessBuilder
-from openeo.rest import BandMathException, OperatorException, OpenEoClientException
+from openeo.rest import BandMathException, OperatorException, OpenEoClientException, OpenEoApiError
 from openeo.rest._datacube import _ProcessGraphAbstraction, THIS, UDF
 from openeo.rest.job import BatchJob
+from openeo.rest.job_registry import CheckpointRegistry
 from openeo.rest.mlmodel import MlModel
 from openeo.rest.service import Service
 from openeo.rest.udp import RESTUserDefinedProcess
@@ -810,7 +813,9 @@ class DataCube(_ProcessGraphAbstraction):
         crs: Optional[str] = None,
     ) -> Union[dict, Parameter, PGNode]:
         """
-        Convert input to a geometry as "geojson" subtype object.
+        Convert input to a geometry as "geojson" subtype object
+        (simplified and quantized if the connection has a ``geometry_reducer``,
+        or a ``load_uploaded_files`` node for large geometries if the connection has a ``geometry_uploader``).
         """
         if isinstance(geometry, (str, pathlib.Path)):
             # Assumption: `geometry` is path to polygon is a path to vector file at backend.
@@ -831,11 +836,20 @@ class DataCube(_ProcessGraphAbstraction):
             raise OpenEoClientException("Invalid geometry type {t!r}, must be one of {s}".format(
                 t=geometry.get("type"), s=valid_geojson_types
             ))
+        reducer = getattr(self._connection, "geometry_reducer", None)
+        if reducer is not None:
+            geometry = reducer.reduce(geometry, crs=crs)
         if crs:
             # TODO: don't warn when the crs is Lon-Lat like EPSG:4326?
             warnings.warn("Geometry with non-Lon-Lat CRS {c!r} is only supported by specific back-ends.".format(c=crs))
             # TODO #204 alternative for non-standard CRS in GeoJSON object?
             geometry["crs"] = {"type": "name", "properties": {"name": crs}}
+        uploader = getattr(self._connection, "geometry_uploader", None)
+        if uploader is not None:
+            # Large geometry: upload once and reference it instead of embedding it inline.
+            offloaded = uploader.offload(self._connection, geometry)
+            if offloaded is not None:
+                return offloaded
         return geometry
 
     @openeo_process
@@ -1955,6 +1969,64 @@ class DataCube(_ProcessGraphAbstraction):
         """
         return self._connection.validate_process_graph(self.flat_graph())
 
+    def optimize(self, rules: Optional[List[str]] = None) -> "DataCube":
+        """
+        Optimize the process graph with client-side rewrite rules,
+        e.g. push filters (like :py:meth:`filter_bbox`) that are applied further down the chain
+        into :py:meth:`~openeo.rest.connection.Connection.load_collection`, so that the backend has to load less data.
+        The applied rewrites are logged (at INFO level) as a diff of the process graph.
+
+        See :py:func:`openeo.internal.graph_optimizer.optimize_flat_graph` for the available rules.
+
+        :param rules: names of the rewrite rules to apply (all by default)
+        :return: new :py:class:`DataCube` with optimized process graph
+
+        .. versionadded:: 0.21.0
+        """
+        result = optimize_flat_graph(self.flat_graph(), rules=rules)
+        if not result.changed:
+            return self
+        log.info(f"{result.summary()}\n{result.diff()}")
+        return DataCube(
+            graph=PGNode.from_flat_graph(result.flat_graph), connection=self._connection, metadata=self.metadata
+        )
+
+    def estimate_volume(self, *, bytes_per_value: int = 4) -> GraphVolumeEstimate:
+        """
+        Estimate (client-side, before submitting) the data volume this data cube will touch:
+        number of pixels, bands, time steps and bytes per ``load_collection`` and of the result,
+        based on the collection metadata of the backend.
+        For example, to reject too large requests or to use a batch job instead of synchronous processing:
+
+        .. code-block:: python
+
+            estimate = cube.estimate_volume()
+            if estimate.exceeds(max_input_bytes=10 * 1024 ** 3):
+                cube.execute_batch("result.nc")
+            else:
+                cube.download("result.nc")
+
+        This is a rough estimate: see :py:mod:`openeo.internal.graph_estimate` for more information.
+        For the backend side estimate of a batch job, see :py:meth:`BatchJob.estimate() <openeo.rest.job.BatchJob.estimate>`.
+
+        :param bytes_per_value: number of bytes per value (e.g. 4 for float32)
+        :return: volume estimate
+
+        .. versionadded:: 0.21.0
+        """
+        metadata = {}
+
+        def get_metadata(collection_id: str) -> Optional[CollectionMetadata]:
+            if collection_id not in metadata:
+                try:
+                    metadata[collection_id] = self._connection.collection_metadata(collection_id)
+                except OpenEoApiError as e:
+                    log.warning(f"Failed to get metadata of collection {collection_id!r}: {e!r}")
+                    metadata[collection_id] = None
+            return metadata[collection_id]
+
+        return estimate_volume(self.flat_graph(), metadata=get_metadata, bytes_per_value=bytes_per_value)
+
     def tiled_viewing_service(self, type: str, **kwargs) -> Service:
         return self._connection.create_service(self.flat_graph(), type=type, **kwargs)
 
@@ -2115,6 +2187,38 @@ class DataCube(_ProcessGraphAbstraction):
 
     send_job = legacy_alias(create_job, name="send_job", since="0.10.0")
 
+    def checkpoint(
+        self,
+        registry: Optional[CheckpointRegistry] = None,
+        *,
+        out_format: Optional[str] = None,
+        title: Optional[str] = None,
+        job_options: Optional[dict] = None,
+        print: typing.Callable[[str], None] = print,
+    ) -> "DataCube":
+        """
+        Mark this data cube as checkpoint: materialize it once as a batch job
+        and continue from its results (through ``load_result``) instead of recomputing it,
+        also in later sessions (e.g. other experiments that start from the same data cube).
+
+        The first time, this runs a batch job and waits for it to finish.
+        The job is registered by the fingerprint of the process graph in the checkpoint registry,
+        so that later checkpoints of the same data cube just load its results.
+        See :py:class:`~openeo.rest.job_registry.CheckpointRegistry` for more information.
+
+        :param registry: checkpoint registry (a default one in the user data directory if not given)
+        :param out_format: output file format of the batch job
+            (must be supported by the backend's ``load_result``)
+        :param title: job title
+        :param job_options: custom job options
+        :param print: print/logging function to show progress/status of the batch job
+        :return: new :py:class:`DataCube` that loads the results of the checkpoint.
+
+        .. versionadded:: 0.21.0
+        """
+        registry = registry or CheckpointRegistry()
+        return registry.materialize(self, out_format=out_format, title=title, job_options=job_options, print=print)
+
     def save_user_defined_process(
             self,
             user_defined_process_id: str,
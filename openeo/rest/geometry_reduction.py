@@ -0,0 +1,154 @@
+"""
+Local (opt-in) reduction of the payload size of inline geometries,
+through simplification and coordinate quantization,
+e.g. for survey data with a precision far beyond the resolution of the processing.
+
+.. versionadded:: 0.21.0
+"""
+
+import json
+import logging
+from typing import Any, List, Optional, Union
+
+import shapely.geometry
+
+_log = logging.getLogger(__name__)
+
+# Approximate length (in meter) of a degree of latitude (or longitude at the equator).
+_METERS_PER_DEGREE = 111_320
+
+
+def _is_lonlat(crs: Union[int, str, None]) -> bool:
+    """Whether given geometry CRS (``None`` for the GeoJSON default) has coordinates in degrees."""
+    if crs is None:
+        return True
+    try:
+        import pyproj
+    except ImportError:
+        return str(crs).upper().replace("EPSG:", "") in {"4326", "OGC:CRS84", "CRS84"}
+    return pyproj.CRS.from_user_input(crs).is_geographic
+
+
+def _round_coordinates(coordinates: Any, decimals: int) -> Any:
+    """Round (nested) GeoJSON coordinates, dropping consecutive duplicate positions that result from it."""
+    if coordinates and isinstance(coordinates[0], (int, float)):
+        return [round(c, decimals) for c in coordinates]
+    rounded = [_round_coordinates(c, decimals) for c in coordinates]
+    if rounded and isinstance(rounded[0], list) and rounded[0] and isinstance(rounded[0][0], (int, float)):
+        # List of positions (line string or ring): drop consecutive duplicates.
+        positions = rounded[:1]
+        for position in rounded[1:]:
+            if position != positions[-1]:
+                positions.append(position)
+        if len(positions) < min(len(rounded), 4 if rounded[0] == rounded[-1] else 2):
+            # Collapsed ring or line: keep the duplicates to avoid an invalid geometry.
+            return rounded
+        return positions
+    return rounded
+
+
+def reduce_geometry(geometry: dict, *, tolerance: Optional[float] = None, decimals: Optional[int] = None) -> dict:
+    """
+    Reduce the payload size of given GeoJSON object (geometry, ``Feature``, ``FeatureCollection``
+    or ``GeometryCollection``): topology-preserving simplification of each geometry with given ``tolerance``
+    (in units of the geometry CRS) and rounding of the coordinates to given number of ``decimals``.
+
+    Note that the simplification preserves the topology of each geometry individually:
+    borders shared between different features are not guaranteed to stay coincident.
+
+    :param geometry: GeoJSON object.
+    :param tolerance: (optional) simplification tolerance.
+    :param decimals: (optional) number of decimals to round coordinates to.
+    :return: new GeoJSON object (other members, like feature properties, are preserved).
+
+    .. versionadded:: 0.21.0
+    """
+    geometry_type = geometry.get("type")
+    if geometry_type == "FeatureCollection":
+        features = [reduce_geometry(f, tolerance=tolerance, decimals=decimals) for f in geometry["features"]]
+        return dict(geometry, features=features)
+    elif geometry_type == "Feature":
+        if geometry.get("geometry") is None:
+            return dict(geometry)
+        return dict(geometry, geometry=reduce_geometry(geometry["geometry"], tolerance=tolerance, decimals=decimals))
+    elif geometry_type == "GeometryCollection":
+        geometries = [reduce_geometry(g, tolerance=tolerance, decimals=decimals) for g in geometry["geometries"]]
+        return dict(geometry, geometries=geometries)
+
+    reduced = dict(geometry)
+    if tolerance:
+        simplified = shapely.geometry.shape(geometry).simplify(tolerance, preserve_topology=True)
+        reduced["coordinates"] = json.loads(json.dumps(shapely.geometry.mapping(simplified)))["coordinates"]
+    if decimals is not None:
+        reduced["coordinates"] = _round_coordinates(reduced["coordinates"], decimals)
+    return reduced
+
+
+class GeometryReducer:
+    """
+    Reduce the payload size of inline geometries (e.g. for survey data with sub-millimeter precision
+    and many more vertices than relevant at the processing resolution)
+    through topology-preserving simplification and coordinate quantization (see :py:func:`reduce_geometry`).
+
+    Enable it on a connection with:
+
+    .. code-block:: python
+
+        from openeo.rest.geometry_reduction import GeometryReducer
+
+        connection.geometry_reducer = GeometryReducer(resolution=10, decimals=6)
+
+    With a reducer, the geometry arguments of
+    :py:meth:`DataCube.aggregate_spatial() <openeo.rest.datacube.DataCube.aggregate_spatial>`,
+    :py:meth:`DataCube.mask_polygon() <openeo.rest.datacube.DataCube.mask_polygon>`,
+    :py:meth:`DataCube.filter_spatial() <openeo.rest.datacube.DataCube.filter_spatial>`, ...
+    are reduced before they are embedded in the process graph
+    (or offloaded by a :py:class:`~openeo.rest.geometry_upload.GeometryUploader`).
+    The payload size before and after reduction is logged (at INFO level)
+    and tracked in :py:attr:`reports`.
+
+    :param tolerance: simplification tolerance (in units of the geometry CRS).
+    :param resolution: target resolution of the processing (in meter),
+        as alternative for ``tolerance``: simplify with a tolerance of half the resolution
+        (converted approximately to degrees for longitude-latitude geometries).
+    :param decimals: number of decimals to round the coordinates to.
+
+    .. versionadded:: 0.21.0
+    """
+
+    def __init__(
+        self,
+        tolerance: Optional[float] = None,
+        *,
+        resolution: Optional[float] = None,
+        decimals: Optional[int] = None,
+    ):
+        if tolerance is not None and resolution is not None:
+            raise ValueError("Specify either tolerance or resolution, not both.")
+        self.tolerance = tolerance
+        self.resolution = resolution
+        self.decimals = decimals
+        #: Payload sizes (in bytes) ``(before, after)`` of the reduced geometries.
+        self.reports: List[tuple] = []
+
+    def __repr__(self):
+        return (
+            f"<{type(self).__name__} tolerance={self.tolerance!r} resolution={self.resolution!r}"
+            f" decimals={self.decimals!r}>"
+        )
+
+    def get_tolerance(self, crs: Union[int, str, None] = None) -> Optional[float]:
+        """Simplification tolerance for a geometry in given CRS (``None`` for longitude-latitude)."""
+        if self.resolution is None:
+            return self.tolerance
+        tolerance = self.resolution / 2
+        return tolerance / _METERS_PER_DEGREE if _is_lonlat(crs) else tolerance
+
+    def reduce(self, geometry: dict, crs: Union[int, str, None] = None) -> dict:
+        """Reduce the payload size of given GeoJSON object (in given CRS) and report the sizes."""
+        reduced = reduce_geometry(geometry, tolerance=self.get_tolerance(crs), decimals=self.decimals)
+        before = len(json.dumps(geometry, separators=(",", ":")))
+        after = len(json.dumps(reduced, separators=(",", ":")))
+        self.reports.append((before, after))
+        _log.info(f"Reduced geometry payload from {before} to {after} bytes ({after / max(before, 1):.1%})")
+        return reduced
@@ -0,0 +1,194 @@
+"""
+Local (opt-in) offloading of large inline geometries to the user workspace on the backend,
+to avoid resending multi-MB GeoJSON with every job, validation or synchronous processing request.
+
+.. versionadded:: 0.21.0
+"""
+
+import contextlib
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import tempfile
+import time
+import weakref
+from pathlib import Path
+from typing import TYPE_CHECKING, List, Optional, Union
+
+from openeo.config import get_user_data_dir
+from openeo.internal.graph_building import PGNode
+
+if TYPE_CHECKING:
+    # Imports for type checking only (circular import issue at runtime).
+    from openeo.rest.connection import Connection
+
+_log = logging.getLogger(__name__)
+
+
+class GeometryUploader:
+    """
+    Offload inline GeoJSON geometries above a size threshold to the user workspace on the backend:
+    the geometry is uploaded once
+    (with :py:meth:`Connection.upload_file() <openeo.rest.connection.Connection.upload_file>`),
+    deduplicated by content hash, and referenced in the process graph through ``load_uploaded_files``
+    instead of being embedded inline.
+
+    Enable it on a connection with:
+
+    .. code-block:: python
+
+        from openeo.rest.geometry_upload import GeometryUploader
+
+        connection.geometry_uploader = GeometryUploader(threshold=512 * 1024)
+
+    With an uploader, the geometry arguments of
+    :py:meth:`DataCube.aggregate_spatial() <openeo.rest.datacube.DataCube.aggregate_spatial>`,
+    :py:meth:`DataCube.mask_polygon() <openeo.rest.datacube.DataCube.mask_polygon>`,
+    :py:meth:`DataCube.filter_spatial() <openeo.rest.datacube.DataCube.filter_spatial>`, ...
+    are offloaded when their (compact) GeoJSON serialization is larger than ``threshold`` bytes.
+
+    A local manifest records the already uploaded geometries (by backend, user account and content hash),
+    so that later jobs (also in later sessions) skip the upload entirely.
+    Use :py:meth:`forget` or :py:meth:`clear` when uploaded files were removed from the workspace.
+    The manifest is stored in a SQLite database file, so it can be shared safely between processes.
+
+    :param threshold: minimum size (in bytes) of the GeoJSON serialization of a geometry to offload it.
+    :param folder: folder in the user workspace to upload the geometries to.
+    :param manifest: path of the SQLite database file to record the uploaded geometries in
+        (a "geometry-uploads.db" file in the user data directory by default).
+    :param timeout: number of seconds to wait for a lock on the manifest database (e.g. held by another process).
+
+    .. versionadded:: 0.21.0
+    """
+
+    def __init__(
+        self,
+        threshold: int = 1024 * 1024,
+        *,
+        folder: str = "openeo-geometries",
+        manifest: Union[str, Path, None] = None,
+        timeout: float = 60,
+    ):
+        self.threshold = threshold
+        self.folder = folder.strip("/")
+        self.manifest = Path(manifest) if manifest else get_user_data_dir(auto_create=True) / "geometry-uploads.db"
+        self._timeout = timeout
+        # User id per connection (the user workspace belongs to one account).
+        self._user_ids = weakref.WeakKeyDictionary()
+
+    def __repr__(self):
+        return f"<{type(self).__name__} {str(self.manifest)!r}>"
+
+    @staticmethod
+    def serialize(geometry: dict) -> bytes:
+        """Canonical (compact, sorted keys) GeoJSON serialization of a geometry."""
+        return json.dumps(geometry, sort_keys=True, separators=(",", ":")).encode("utf8")
+
+    @contextlib.contextmanager
+    def _connect(self):
+        self.manifest.parent.mkdir(parents=True, exist_ok=True)
+        # Autocommit mode (isolation_level=None) with explicit transaction handling.
+        connection = sqlite3.connect(str(self.manifest), timeout=self._timeout, isolation_level=None)
+        try:
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS uploads ("
+                "account TEXT NOT NULL, digest TEXT NOT NULL, path TEXT NOT NULL, size INTEGER, uploaded REAL,"
+                " PRIMARY KEY (account, digest))"
+            )
+            connection.execute("BEGIN IMMEDIATE")
+            try:
+                yield connection
+            except BaseException:
+                connection.execute("ROLLBACK")
+                raise
+            else:
+                connection.execute("COMMIT")
+        finally:
+            connection.close()
+
+    def entries(self) -> List[dict]:
+        """Recorded uploads, as dicts with "account", "digest", "path", "size" and "uploaded" (epoch time)."""
+        columns = ("account", "digest", "path", "size", "uploaded")
+        with self._connect() as connection:
+            rows = connection.execute(f"SELECT {', '.join(columns)} FROM uploads ORDER BY rowid").fetchall()
+        return [dict(zip(columns, row)) for row in rows]
+
+    def _account(self, connection: "Connection") -> str:
+        """Manifest key of the user workspace of given connection: backend URL and user id."""
+        user_id = self._user_ids.get(connection)
+        if user_id is None:
+            user_id = self._user_ids[connection] = connection.describe_account()["user_id"]
+        return f"{connection.root_url.rstrip('/')}#{user_id}"
+
+    def lookup(self, connection: "Connection", digest: str) -> Optional[str]:
+        """Workspace path of an earlier upload of the geometry with given content hash, if any."""
+        account = self._account(connection)
+        with self._connect() as db:
+            row = db.execute("SELECT path FROM uploads WHERE account = ? AND digest = ?", (account, digest)).fetchone()
+        return row[0] if row else None
+
+    def upload(self, connection: "Connection", geometry: dict) -> str:
+        """
+        Upload given geometry as GeoJSON file to the user workspace (unless it was already uploaded before)
+        and return its path in the workspace.
+        """
+        return self._upload(connection, self.serialize(geometry))
+
+    def _upload(self, connection: "Connection", data: bytes) -> str:
+        digest = hashlib.sha256(data).hexdigest()
+        path = self.lookup(connection, digest)
+        if path:
+            _log.debug(f"Geometry upload: reusing {path}")
+            return path
+
+        fd, tmp = tempfile.mkstemp(suffix=".geojson")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            user_file = connection.upload_file(tmp, target=f"{self.folder}/{digest}.geojson")
+        finally:
+            os.unlink(tmp)
+        path = str(user_file.path)
+        _log.info(f"Uploaded geometry ({len(data)} bytes) to {path}")
+
+        account = self._account(connection)
+        with self._connect() as db:
+            db.execute(
+                "INSERT OR REPLACE INTO uploads (account, digest, path, size, uploaded) VALUES (?, ?, ?, ?, ?)",
+                (account, digest, path, len(data), time.time()),
+            )
+        return path
+
+    def offload(self, connection: "Connection", geometry: dict) -> Optional[PGNode]:
+        """
+        Offload given geometry if its GeoJSON serialization exceeds the threshold:
+        upload it (if necessary) and return a ``load_uploaded_files`` node to use instead of the inline geometry.
+        Returns ``None`` for geometries below the threshold.
+        """
+        data = self.serialize(geometry)
+        if len(data) <= self.threshold:
+            return None
+        path = self._upload(connection, data)
+        return PGNode(
+            process_id="load_uploaded_files",
+            arguments={"paths": [path], "format": "GeoJSON", "options": {}},
+        )
+
+    def forget(self, connection: "Connection", path: Optional[str] = None):
+        """
+        Remove the uploads to the user workspace of given connection from the manifest
+        (only the one with given workspace path if specified), e.g. after deleting them from the workspace.
+        """
+        account = self._account(connection)
+        with self._connect() as db:
+            if path is None:
+                db.execute("DELETE FROM uploads WHERE account = ?", (account,))
+            else:
+                db.execute("DELETE FROM uploads WHERE account = ? AND path = ?", (account, path))
+
+    def clear(self):
+        """Remove all recorded uploads from the manifest."""
+        with self._connect() as db:
+            db.execute("DELETE FROM uploads")
@@ -1,10 +1,13 @@
 import datetime
+import heapq
 import json
 import logging
+import random
+import tempfile
 import time
 import typing
 from pathlib import Path
-from typing import List, Union, Dict, Optional
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple, Union
 
 import requests
 
@@ -13,6 +16,7 @@ from openeo.internal.documentation import openeo_endpoint
 from openeo.internal.jupyter import render_component, render_error, VisualDict, VisualList
 from openeo.internal.warnings import deprecated, legacy_alias
 from openeo.rest import OpenEoClientException, JobFailedException, OpenEoApiError
+from openeo.rest.profiling import JobProfile, _is_profile_asset_name
 from openeo.util import ensure_dir
 
 if typing.TYPE_CHECKING:
@@ -218,6 +222,76 @@ class BatchJob:
         entries = [LogEntry(log) for log in logs]
         return VisualList("logs", data=entries)
 
+    def iter_logs(
+        self,
+        level: Optional[Union[str, int]] = None,
+        *,
+        offset: Optional[str] = None,
+        follow: bool = False,
+        limit: Optional[int] = None,
+        poll_interval: float = 5,
+        max_poll_interval: float = 60,
+    ) -> Iterator[LogEntry]:
+        """
+        Lazily iterate over the job logs, page by page,
+        optionally following the logs of a running job (like ``tail -f``).
+
+        Only log entries after the last seen entry are requested from the backend
+        (using the ``offset`` parameter), so following the logs of a long-running job
+        does not re-fetch the full log each time.
+
+        :param level: Minimum log level to retrieve (see :py:meth:`logs`).
+            Like with :py:meth:`logs`, log entries are also filtered client-side,
+            as not all backends support the ``level`` parameter.
+        :param offset: The last identifier (property ``id`` of a LogEntry) the client has received:
+            only entries after that one will be yielded.
+        :param follow: Keep polling for new log entries until the job is finished (or failed).
+        :param limit: Page size to request from the backend.
+        :param poll_interval: Initial number of seconds between polls for new log entries in ``follow`` mode.
+            Polling becomes less frequent (up to ``max_poll_interval``) when no new log entries appear.
+        :param max_poll_interval: Maximum number of seconds between polls for new log entries.
+        :return: iterator of log entries
+
+        .. versionadded:: 0.21.0
+        """
+        url = f"/jobs/{self.job_id}/logs"
+        base_params = {}
+        if level is not None:
+            base_params["level"] = log_level_name(level)
+        if limit is not None:
+            base_params["limit"] = limit
+
+        # We should still support client-side log_level filtering because not all backends
+        # support the minimum log level parameter.
+        client_level = normalize_log_level(level) if level is not None else None
+
+        interval = poll_interval
+        job_done = False
+        while True:
+            new_entries = False
+            page_url = url
+            params = dict(base_params, **({"offset": offset} if offset is not None else {}))
+            while page_url:
+                data = self.connection.get(page_url, params=params, expected_status=200).json()
+                for log in data.get("logs", []):
+                    offset = log["id"]
+                    new_entries = True
+                    if client_level is None or normalize_log_level(log.get("level")) >= client_level:
+                        yield LogEntry(log)
+                # Follow pagination links, if any.
+                page_url = next((l["href"] for l in data.get("links", []) if l.get("rel") == "next"), None)
+                params = None
+
+            if not follow or job_done:
+                return
+            if self.status() not in ("submitted", "created", "queued", "running"):
+                # Fetch once more to get the remaining entries.
+                job_done = True
+                continue
+
+            interval = poll_interval if new_entries else min(1.25 * interval, max_poll_interval)
+            time.sleep(interval)
+
     def run_synchronous(
             self, outputfile: Union[str, Path, None] = None,
             print=print, max_poll_interval=60, connection_retry_interval=30
@@ -242,9 +316,15 @@ class BatchJob:
         :param connection_retry_interval: how long to wait when status poll failed due to connection issue
         :param soft_error_max: maximum number of soft errors (e.g. temporary connection glitches) to allow
         :return:
+
+        .. versionchanged:: 0.21.0
+            with a :py:attr:`~openeo.rest.connection.Connection.job_registry` on the connection:
+            a finished job (e.g. reused from the registry) is not restarted,
+            and the job is registered when it finishes.
         """
         # TODO rename `connection_retry_interval` to something more generic?
         start_time = time.time()
+        job_registry = getattr(self.connection, "job_registry", None)
 
         def elapsed() -> str:
             return str(datetime.timedelta(seconds=time.time() - start_time)).rsplit(".")[0]
@@ -252,6 +332,10 @@ class BatchJob:
         def print_status(msg: str):
             print("{t} Job {i!r}: {m}".format(t=elapsed(), i=self.job_id, m=msg))
 
+        if job_registry is not None and self.status() == "finished":
+            print_status("already finished: reusing results")
+            return self
+
         # TODO: make `max_poll_interval`, `connection_retry_interval` class constants or instance properties?
         print_status("send 'start'")
         self.start()
@@ -298,6 +382,9 @@ class BatchJob:
             poll_interval = min(1.25 * poll_interval, max_poll_interval)
 
         if status != "finished":
+            if job_registry is not None:
+                # Failed job will never be registered: stop tracking it.
+                job_registry.invalidate(job_id=self.job_id)
             # TODO: allow to disable this printing logs (e.g. in non-interactive contexts)?
             # TODO: render logs jupyter-aware in a notebook context?
             print(f"Your batch job {self.job_id!r} failed. Error logs:")
@@ -310,6 +397,8 @@ class BatchJob:
                 job=self,
             )
 
+        if job_registry is not None:
+            job_registry.register(self)
         return self
 
 
@@ -320,6 +409,120 @@ class RESTJob(BatchJob):
     """
 
 
+def wait_for_jobs(
+    jobs: Iterable[BatchJob],
+    *,
+    min_poll_interval: float = 5,
+    max_poll_interval: float = 60,
+    connection_retry_interval: float = 30,
+    soft_error_max: int = 10,
+    jitter: float = 0.1,
+    print: Optional[Callable[[str], None]] = None,
+) -> Iterator[Tuple[BatchJob, dict]]:
+    """
+    Wait for multiple (already started) batch jobs with a single poller,
+    and yield the jobs in order of completion (when they finished or failed).
+
+    Instead of polling each job in its own loop (like :py:meth:`BatchJob.start_and_wait`),
+    a priority queue of next poll times is used, so that waiting on many jobs
+    does not require multiple threads.
+    Each job gets its own adaptive poll interval: polling starts fast and becomes
+    less frequent over time, but when the backend reports progress,
+    the poll interval is adapted to the estimated remaining time.
+
+    Soft errors (e.g. temporary connection glitches) are handled like in :py:meth:`BatchJob.start_and_wait`,
+    but with a budget shared by all jobs.
+
+    Usage example:
+
+    .. code-block:: python
+
+        jobs = [cube.create_job(...) for cube in cubes]
+        for job in jobs:
+            job.start()
+        for job, job_info in wait_for_jobs(jobs):
+            if job_info["status"] == "finished":
+                job.get_results().download_files(...)
+
+    :param jobs: batch jobs to wait for
+    :param min_poll_interval: minimum (and initial) number of seconds between status polls of a job
+    :param max_poll_interval: maximum number of seconds between status polls of a job
+    :param connection_retry_interval: how long to wait before polling a job again after a soft error
+    :param soft_error_max: maximum number of soft errors (over all jobs) to allow
+    :param jitter: relative amount of randomization to apply on poll intervals,
+        to avoid bursts of requests to the backend
+    :param print: print/logging function to show progress/status
+    :return: iterator of ``(job, job_info)`` tuples, with ``job_info`` the final metadata
+        of the job (as returned by :py:meth:`BatchJob.describe`).
+
+    .. versionadded:: 0.21.0
+    """
+    start_time = time.time()
+
+    def print_status(job: BatchJob, msg: str):
+        message = "{t} Job {i!r}: {m}".format(
+            t=str(datetime.timedelta(seconds=time.time() - start_time)).rsplit(".")[0], i=job.job_id, m=msg
+        )
+        (print or logger.debug)(message)
+
+    def jittered(interval: float) -> float:
+        return interval * (1 + random.uniform(-jitter, jitter))
+
+    jobs = list(jobs)
+    # Per job state: current poll interval and last observed (time, progress)
+    intervals = [min(min_poll_interval, max_poll_interval)] * len(jobs)
+    last_progress: List[Optional[Tuple[float, float]]] = [None] * len(jobs)
+    # Priority queue of (next poll time, job index)
+    queue = [(start_time, i) for i in range(len(jobs))]
+    heapq.heapify(queue)
+    soft_error_count = 0
+
+    while queue:
+        poll_time, i = heapq.heappop(queue)
+        job = jobs[i]
+        now = time.time()
+        if poll_time > now:
+            time.sleep(poll_time - now)
+
+        try:
+            job_info = job.describe()
+        except (requests.ConnectionError, OpenEoApiError) as e:
+            if isinstance(e, requests.ConnectionError):
+                message = "Connection error while polling job status: {e}".format(e=e)
+            elif e.http_status_code in [502, 503]:
+                message = "Service availability error while polling job status: {e}".format(e=e)
+            else:
+                raise
+            soft_error_count += 1
+            if soft_error_count > soft_error_max:
+                raise OpenEoClientException("Excessive soft errors")
+            print_status(job, message)
+            heapq.heappush(queue, (time.time() + jittered(connection_retry_interval), i))
+            continue
+
+        status = job_info.get("status", "N/A")
+        progress = job_info.get("progress")
+        print_status(job, "{s} (progress {p})".format(s=status, p="N/A" if progress is None else f"{progress}%"))
+        if status not in ("submitted", "created", "queued", "running"):
+            yield job, job_info
+            continue
+
+        # Adaptive poll interval: gradually poll less frequently,
+        # but take estimated remaining time into account when progress is reported.
+        interval = intervals[i]
+        intervals[i] = min(1.25 * interval, max_poll_interval)
+        now = time.time()
+        if isinstance(progress, (int, float)):
+            previous = last_progress[i]
+            if previous and progress > previous[1] and now > previous[0]:
+                rate = (progress - previous[1]) / (now - previous[0])
+                remaining = (100 - progress) / rate
+                interval = min(interval, max(min_poll_interval, remaining))
+            if not previous or progress != previous[1]:
+                last_progress[i] = (now, progress)
+        heapq.heappush(queue, (now + jittered(interval), i))
+
+
 class ResultAsset:
     """
     Result asset of a batch job (e.g. a GeoTIFF or JSON file)
@@ -494,6 +697,29 @@ class JobResults:
 
         return downloaded
 
+    def get_profile(self) -> JobProfile:
+        """
+        Get the profiling data of the batch job (e.g. of UDF execution),
+        merged from the profile dumps (e.g. one per executor) in the result assets
+        (``.pstats`` files or ``.tar.gz`` archives of ``.pstats`` files, like ``profile_dumps.tar.gz``).
+
+        Profiling has to be enabled when creating the batch job,
+        for example with job option ``"profile": "true"`` on VITO/Terrascope based backends.
+
+        :return: :py:class:`~openeo.rest.profiling.JobProfile` object
+
+        .. versionadded:: 0.21.0
+        """
+        assets = [a for a in self.get_assets() if _is_profile_asset_name(a.name)]
+        if not assets:
+            raise OpenEoClientException(
+                f"No profiling assets found in results of job {self._job.job_id!r}"
+                " (profiling has to be enabled explicitly, e.g. with job option 'profile')."
+            )
+        with tempfile.TemporaryDirectory(prefix="openeo-profile-") as tmp_dir:
+            paths = [a.download(Path(tmp_dir) / str(i) / Path(a.name).name) for i, a in enumerate(assets)]
+            return JobProfile.from_files(paths)
+
 
 @deprecated(reason="Use :py:class:`JobResults` instead", version="0.4.10")
 class _Result:
@@ -0,0 +1,498 @@
+"""
+Local (opt-in) registry of finished batch jobs by process graph fingerprint,
+to reuse the results of an earlier batch job with the same process graph
+(or of a checkpointed intermediate data cube) instead of recomputing them.
+
+.. versionadded:: 0.21.0
+"""
+
+import contextlib
+import json
+import logging
+import sqlite3
+import time
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, Dict, Iterable, Iterator, List, Optional, Union
+
+import requests
+
+from openeo.config import get_user_data_dir
+from openeo.internal.graph_building import PGNode, as_flat_graph, graph_fingerprint
+from openeo.internal.process_graph_visitor import ProcessGraphUnflattener
+from openeo.rest import OpenEoApiError
+
+if TYPE_CHECKING:
+    # Imports for type checking only (circular import issue at runtime).
+    from openeo.rest.connection import Connection
+    from openeo.rest.datacube import DataCube
+    from openeo.rest.job import BatchJob
+
+_log = logging.getLogger(__name__)
+
+_from_node_keys = ProcessGraphUnflattener._from_node_keys
+
+
+def _collection_ids(flat_graph: Dict[str, dict]) -> Iterator[str]:
+    """Ids of the collections loaded in given flat graph (including child process graphs)."""
+    stack = [flat_graph]
+    while stack:
+        value = stack.pop()
+        if isinstance(value, dict):
+            if value.get("process_id") == "load_collection" and isinstance(value.get("arguments", {}).get("id"), str):
+                yield value["arguments"]["id"]
+            stack.extend(value.values())
+        elif isinstance(value, list):
+            stack.extend(value)
+
+
+class JobResultRegistry:
+    """
+    Local registry of finished batch jobs, by backend and
+    :py:func:`canonical process graph fingerprint <openeo.internal.graph_building.graph_fingerprint>`,
+    to reuse the results of an earlier batch job instead of recomputing them
+    when a batch job with the same process graph is created again.
+
+    Enable it on a connection with:
+
+    .. code-block:: python
+
+        from openeo.rest.job_registry import JobResultRegistry
+
+        connection.job_registry = JobResultRegistry(max_age=7 * 24 * 3600)
+
+    With a registry, :py:meth:`Connection.create_job() <openeo.rest.connection.Connection.create_job>`
+    (and :py:meth:`DataCube.create_job() <openeo.rest.datacube.DataCube.create_job>`,
+    :py:meth:`DataCube.execute_batch() <openeo.rest.datacube.DataCube.execute_batch>`
+    or a :py:class:`~openeo.extra.job_management.MultiBackendJobManager`)
+    returns the existing (finished) job on a match, instead of creating a new one.
+    Jobs are registered when they are tracked to completion
+    (e.g. with :py:meth:`BatchJob.start_and_wait() <openeo.rest.job.BatchJob.start_and_wait>`)
+    or explicitly with :py:meth:`register`.
+
+    A registered job is not reused anymore (invalidation) when:
+
+    - it finished longer than ``max_age`` seconds ago,
+    - it finished before the ``since`` time of a lookup
+      (e.g. after a known reprocessing of the input data),
+    - the version of one of its collections changed (``"version"`` field of the collection metadata),
+    - it was invalidated explicitly with :py:meth:`invalidate` (e.g. by collection id),
+    - it is not available anymore on the backend (e.g. deleted, or results expired).
+
+    Jobs that are tracked, but do not finish (e.g. because they failed)
+    are removed after ``max_pending_age`` seconds.
+
+    The registry is stored in a SQLite database file, so it can be shared safely
+    between processes (e.g. job manager instances working on the same job store).
+
+    :param path: path of the SQLite database file to store the registry in
+        (a "job-registry.db" file in the user data directory by default).
+    :param max_age: maximum age (in seconds since finishing) of jobs to reuse, ``None`` for no limit.
+    :param check_collection_versions: whether to check that the collection versions are unchanged
+        (which requires a collection metadata request per collection on a match).
+    :param max_pending_age: maximum age (in seconds since tracking) of tracked jobs that did not finish,
+        ``None`` for no limit.
+    :param timeout: number of seconds to wait for a lock on the database (e.g. held by another process).
+
+    .. versionadded:: 0.21.0
+    """
+
+    _COLUMNS = ("backend", "job_id", "fingerprint", "results_url", "finished", "collections")
+
+    def __init__(
+        self,
+        path: Union[str, Path, None] = None,
+        *,
+        max_age: Optional[float] = None,
+        check_collection_versions: bool = True,
+        max_pending_age: Optional[float] = 7 * 24 * 3600,
+        timeout: float = 60,
+    ):
+        self.path = Path(path) if path else get_user_data_dir(auto_create=True) / "job-registry.db"
+        self.max_age = max_age
+        self.check_collection_versions = check_collection_versions
+        self.max_pending_age = max_pending_age
+        self._timeout = timeout
+
+    def __repr__(self):
+        return f"<{type(self).__name__} {str(self.path)!r}>"
+
+    @contextlib.contextmanager
+    def _connect(self, exclusive: bool = False):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        # Autocommit mode (isolation_level=None) with explicit transaction handling.
+        connection = sqlite3.connect(str(self.path), timeout=self._timeout, isolation_level=None)
+        try:
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS jobs ("
+                "backend TEXT NOT NULL, job_id TEXT NOT NULL, fingerprint TEXT NOT NULL, results_url TEXT,"
+                " finished REAL, tracked REAL, collections TEXT NOT NULL, PRIMARY KEY (backend, job_id))"
+            )
+            connection.execute("CREATE INDEX IF NOT EXISTS jobs_fingerprint ON jobs (backend, fingerprint)")
+            connection.execute("CREATE INDEX IF NOT EXISTS jobs_pending ON jobs (finished, tracked)")
+            connection.execute("BEGIN IMMEDIATE" if exclusive else "BEGIN")
+            try:
+                yield connection
+            except BaseException:
+                connection.execute("ROLLBACK")
+                raise
+            else:
+                connection.execute("COMMIT")
+        finally:
+            connection.close()
+
+    def _select(self, where: str = "", params: Iterable = ()) -> List[dict]:
+        with self._connect() as connection:
+            rows = connection.execute(
+                f"SELECT {', '.join(self._COLUMNS)} FROM jobs {where} ORDER BY rowid", list(params)
+            ).fetchall()
+        entries = [dict(zip(self._COLUMNS, row)) for row in rows]
+        for entry in entries:
+            entry["collections"] = json.loads(entry["collections"])
+        return entries
+
+    @staticmethod
+    def _insert(connection: sqlite3.Connection, entry: dict, tracked: Optional[float] = None):
+        connection.execute(
+            "INSERT OR REPLACE INTO jobs (backend, job_id, fingerprint, results_url, finished, tracked, collections)"
+            " VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (
+                entry["backend"],
+                entry["job_id"],
+                entry["fingerprint"],
+                entry["results_url"],
+                entry["finished"],
+                tracked,
+                json.dumps(entry["collections"]),
+            ),
+        )
+
+    @staticmethod
+    def _backend(connection: "Connection") -> str:
+        return connection.root_url.rstrip("/")
+
+    def entries(self) -> List[dict]:
+        """
+        Registered jobs, as dicts with "backend", "job_id", "fingerprint", "results_url", "finished" (epoch time,
+        ``None`` if not finished yet) and "collections" (mapping of collection id to version).
+        """
+        return self._select()
+
+    def _collection_versions(self, connection: "Connection", collection_ids: List[str]) -> Dict[str, Any]:
+        """
+        Mapping of given collection ids to their current version (``None`` if versions are not checked).
+
+        :raises Exception: when the collection metadata can not be retrieved (e.g. temporary backend issue).
+        """
+        return {
+            cid: connection.describe_collection(cid).get("version") if self.check_collection_versions else None
+            for cid in sorted(collection_ids)
+        }
+
+    def track(self, job: "BatchJob", process_graph: Any):
+        """
+        Track given (new) job with its process graph, to register it when it finishes.
+        """
+        flat_graph = as_flat_graph(process_graph)
+        flat_graph = flat_graph.get("process_graph", flat_graph)
+        entry = {
+            "backend": self._backend(job.connection),
+            "job_id": job.job_id,
+            "fingerprint": graph_fingerprint(flat_graph),
+            "results_url": None,
+            "finished": None,
+            "collections": {cid: None for cid in sorted(set(_collection_ids(flat_graph)))},
+        }
+        now = time.time()
+        with self._connect(exclusive=True) as connection:
+            self._insert(connection, entry, tracked=now)
+            if self.max_pending_age is not None:
+                # Prune jobs that never finished (e.g. failed or canceled).
+                connection.execute(
+                    "DELETE FROM jobs WHERE finished IS NULL AND tracked < ?", [now - self.max_pending_age]
+                )
+
+    def register(self, job: "BatchJob", process_graph: Any = None):
+        """
+        Register given finished job, to be reused for batch jobs with the same process graph.
+
+        :param job: finished batch job
+        :param process_graph: process graph of the job.
+            If not given: the process graph given when the job was tracked,
+            or the process graph from the job metadata.
+        """
+        backend = self._backend(job.connection)
+        tracked = next(iter(self._select("WHERE backend = ? AND job_id = ?", [backend, job.job_id])), None)
+        if tracked and tracked["finished"] is not None:
+            # Already registered (e.g. a reused job): keep original finish time.
+            return
+        if process_graph is not None:
+            tracked = None
+        elif tracked is None:
+            process_graph = job.describe()["process"]["process_graph"]
+        if tracked:
+            fingerprint = tracked["fingerprint"]
+            collection_ids = list(tracked["collections"])
+        else:
+            flat_graph = as_flat_graph(process_graph)
+            flat_graph = flat_graph.get("process_graph", flat_graph)
+            fingerprint = graph_fingerprint(flat_graph)
+            collection_ids = set(_collection_ids(flat_graph))
+        try:
+            collections = self._collection_versions(job.connection, collection_ids)
+        except Exception as e:
+            _log.warning(f"Failed to get collection versions {sorted(collection_ids)}: {e!r}")
+            collections = {cid: None for cid in sorted(collection_ids)}
+        entry = {
+            "backend": backend,
+            "job_id": job.job_id,
+            "fingerprint": fingerprint,
+            "results_url": job.get_results_metadata_url(full=True),
+            "finished": time.time(),
+            "collections": collections,
+        }
+        with self._connect(exclusive=True) as connection:
+            self._insert(connection, entry)
+        _log.info(f"Registered finished job {job.job_id!r} with process graph fingerprint {fingerprint}")
+
+    def lookup(
+        self, connection: "Connection", process_graph: Any, *, since: Optional[float] = None
+    ) -> Optional["BatchJob"]:
+        """
+        Look up a finished (and still valid) batch job with the same process graph on given backend.
+
+        Registered jobs that can not be verified because of a temporary issue
+        (e.g. connection error, or a server error when getting collection metadata or job status)
+        are skipped for this lookup, but not invalidated.
+
+        :param connection: backend connection
+        :param process_graph: process graph (e.g. a :py:class:`~openeo.rest.datacube.DataCube` or flat graph dict)
+        :param since: (optional) only consider jobs that finished after this time (epoch time in seconds).
+        :return: the finished batch job (use :py:meth:`~openeo.rest.job.BatchJob.get_results` to get its results),
+            or ``None`` if there is no match.
+        """
+        flat_graph = as_flat_graph(process_graph)
+        flat_graph = flat_graph.get("process_graph", flat_graph)
+        fingerprint = graph_fingerprint(flat_graph)
+        now = time.time()
+        candidates = [
+            e
+            for e in self._select(
+                "WHERE backend = ? AND fingerprint = ? AND finished IS NOT NULL",
+                [self._backend(connection), fingerprint],
+            )
+            if (self.max_age is None or now - e["finished"] <= self.max_age)
+            and (since is None or e["finished"] >= since)
+        ]
+        # Most recently finished first.
+        for entry in sorted(candidates, key=lambda e: e["finished"], reverse=True):
+            if self.check_collection_versions and entry["collections"]:
+                try:
+                    versions = self._collection_versions(connection, list(entry["collections"]))
+                except Exception as e:
+                    _log.warning(f"Skipping job {entry['job_id']!r}: failed to get collection versions: {e!r}")
+                    continue
+                # Versions that were unknown at registration time can not be compared.
+                if any(v is not None and versions[c] != v for c, v in entry["collections"].items()):
+                    _log.info(f"Not reusing job {entry['job_id']!r}: collection versions changed {versions}")
+                    self.invalidate(job_id=entry["job_id"])
+                    continue
+            job = connection.job(entry["job_id"])
+            try:
+                status = job.status()
+            except OpenEoApiError as e:
+                if e.http_status_code == 404 or e.code == "JobNotFound":
+                    _log.info(f"Not reusing job {entry['job_id']!r}: {e!r}")
+                    self.invalidate(job_id=entry["job_id"])
+                else:
+                    _log.warning(f"Skipping job {entry['job_id']!r}: failed to get status: {e!r}")
+                continue
+            except requests.exceptions.ConnectionError as e:
+                _log.warning(f"Skipping job {entry['job_id']!r}: failed to get status: {e!r}")
+                continue
+            if status != "finished":
+                self.invalidate(job_id=entry["job_id"])
+                continue
+            _log.info(f"Reusing finished job {job.job_id!r} with process graph fingerprint {fingerprint}")
+            return job
+        return None
+
+    def load_result(self, connection: "Connection", process_graph: Any, **kwargs) -> Optional["DataCube"]:
+        """
+        Look up a finished batch job with the same process graph (see :py:meth:`lookup`)
+        and return a ``load_result`` reference to its results
+        (e.g. to continue processing on them, instead of recomputing them).
+
+        :return: :py:class:`~openeo.rest.datacube.DataCube` or ``None`` if there is no match.
+        """
+        job = self.lookup(connection, process_graph, **kwargs)
+        return connection.load_result(id=job.job_id) if job else None
+
+    def invalidate(
+        self,
+        *,
+        job_id: Optional[str] = None,
+        collection_id: Optional[str] = None,
+        before: Optional[float] = None,
+    ) -> int:
+        """
+        Remove registered jobs matching all given criteria (or all jobs if no criteria are given).
+
+        :param job_id: job id
+        :param collection_id: collection loaded by the job (e.g. when the collection was reprocessed)
+        :param before: only jobs that finished before this time (epoch time in seconds)
+        :return: number of removed jobs
+        """
+        conditions = []
+        params = []
+        if job_id is not None:
+            conditions.append("job_id = ?")
+            params.append(job_id)
+        if before is not None:
+            conditions.append("finished < ?")
+            params.append(before)
+        where = ("WHERE " + " AND ".join(conditions)) if conditions else ""
+        with self._connect(exclusive=True) as connection:
+            if collection_id is None:
+                return connection.execute(f"DELETE FROM jobs {where}", params).rowcount
+            # Filter on collection id (stored as JSON) in Python.
+            keys = [
+                (backend, jid)
+                for backend, jid, collections in connection.execute(
+                    f"SELECT backend, job_id, collections FROM jobs {where}", params
+                )
+                if collection_id in json.loads(collections)
+            ]
+            connection.executemany("DELETE FROM jobs WHERE backend = ? AND job_id = ?", keys)
+            return len(keys)
+
+
+class CheckpointRegistry(JobResultRegistry):
+    """
+    Registry of checkpoints: (expensive) intermediate data cubes that are materialized once as a batch job
+    and reused through ``load_result`` instead of being recomputed,
+    e.g. a cloud masked Sentinel-2 composite that is the common start of different experiments.
+
+    Usage example:
+
+    .. code-block:: python
+
+        checkpoints = CheckpointRegistry()
+        composite = connection.load_collection("SENTINEL2_L2A", ...).mask(...).reduce_temporal("median")
+        # First time: runs a batch job (and waits for it). Later (e.g. other sessions): no processing.
+        composite = composite.checkpoint(registry=checkpoints)
+        ...
+
+        # Or replace checkpointed subgraphs of a (complete) process graph:
+        cube = checkpoints.apply(cube)
+
+    Checkpoints are registered by the fingerprint of the data cube's process graph
+    (without ``save_result``), so they don't interfere with reuse of normal batch jobs.
+    Invalidation works the same as for :py:class:`JobResultRegistry`.
+
+    :param path: path of the SQLite database file to store the registry in
+        (a "checkpoints.db" file in the user data directory by default).
+
+    .. versionadded:: 0.21.0
+    """
+
+    def __init__(self, path: Union[str, Path, None] = None, **kwargs):
+        super().__init__(path=path or get_user_data_dir(auto_create=True) / "checkpoints.db", **kwargs)
+
+    def materialize(
+        self,
+        cube: "DataCube",
+        *,
+        out_format: Optional[str] = None,
+        title: Optional[str] = None,
+        job_options: Optional[dict] = None,
+        print=print,
+    ) -> "DataCube":
+        """
+        Get a ``load_result`` based data cube for the checkpoint of given data cube:
+        reuse a registered checkpoint, or run a batch job (and wait for it) to create one.
+
+        :param cube: data cube to checkpoint
+        :param out_format: output file format of the batch job
+            (must be supported by the backend's ``load_result``)
+        :param title: job title
+        :param job_options: custom job options
+        :param print: print/logging function to show progress/status of the batch job
+        :return: data cube that loads the checkpoint results (with the metadata of the given data cube).
+        """
+        connection = cube.connection
+        job = self.lookup(connection, cube)
+        if job is None:
+            job = cube.create_job(out_format=out_format, title=title or "Checkpoint", job_options=job_options)
+            job.start_and_wait(print=print)
+            self.register(job, process_graph=cube)
+        return type(cube)(
+            graph=PGNode("load_result", id=job.job_id), connection=connection, metadata=cube.metadata
+        )
+
+    def apply(self, cube: "DataCube") -> "DataCube":
+        """
+        Replace the subgraphs of given data cube that match a registered (and still valid) checkpoint
+        with ``load_result`` of the checkpoint.
+
+        :return: new data cube (or the given one if there was nothing to replace)
+        """
+        flat_graph = cube.flat_graph()
+        replaced = self.substitute(cube.connection, flat_graph)
+        if replaced is flat_graph:
+            return cube
+        return type(cube)(graph=PGNode.from_flat_graph(replaced), connection=cube.connection, metadata=cube.metadata)
+
+    def substitute(self, connection: "Connection", flat_graph: Dict[str, dict]) -> Dict[str, dict]:
+        """
+        Replace the (top-level) subgraphs of given flat graph that match a registered checkpoint
+        with a ``load_result`` node (and drop the nodes that are not used anymore).
+
+        :return: new flat graph (or the given one if there was nothing to replace)
+        """
+        backend = self._backend(connection)
+        fingerprints = {e["fingerprint"] for e in self.entries() if e["backend"] == backend and e["finished"]}
+        if not fingerprints:
+            return flat_graph
+        (result_id,) = [k for k, n in flat_graph.items() if n.get("result")]
+        replaced = {}
+        # Top-down (from the result node), so that the largest matching subgraph is replaced.
+        stack = [result_id]
+        visited = set()
+        while stack:
+            node_id = stack.pop()
+            if node_id in visited:
+                continue
+            visited.add(node_id)
+            subgraph = _subgraph(flat_graph, node_id)
+            if graph_fingerprint(subgraph) in fingerprints:
+                job = self.lookup(connection, subgraph)
+                if job is not None:
+                    _log.info(f"Replacing subgraph {node_id!r} with results of checkpoint job {job.job_id!r}")
+                    replaced[node_id] = {"process_id": "load_result", "arguments": {"id": job.job_id}}
+                    continue
+            stack.extend(_from_node_keys(flat_graph[node_id].get("arguments", {})))
+        if not replaced:
+            return flat_graph
+        result = {}
+        for node_id, node in flat_graph.items():
+            result[node_id] = replaced.get(node_id, node)
+            if node.get("result"):
+                result[node_id] = {**result[node_id], "result": True}
+        # Drop nodes that are not used anymore.
+        used = set(_subgraph(result, result_id))
+        return {k: v for k, v in result.items() if k in used}
+
+
+def _subgraph(flat_graph: Dict[str, dict], node_id: str) -> Dict[str, dict]:
+    """Subgraph with given node (as result node) and the nodes it depends on."""
+    keep = {}
+    stack = [node_id]
+    while stack:
+        key = stack.pop()
+        if key in keep:
+            continue
+        node = flat_graph[key]
+        keep[key] = {k: v for k, v in node.items() if k != "result"}
+        stack.extend(_from_node_keys(node.get("arguments", {})))
+    keep[node_id]["result"] = True
+    return keep
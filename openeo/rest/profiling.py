@@ -0,0 +1,215 @@
+"""
+Retrieval and aggregation of profiling data of batch jobs.
+
+.. versionadded:: 0.21.0
+"""
+
+import collections
+import logging
+import pstats
+import re
+import tarfile
+import tempfile
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple, Union
+
+from openeo.rest import OpenEoClientException
+
+_log = logging.getLogger(__name__)
+
+# Function key as used by `pstats`: (filename, line number, function name)
+_FunctionKey = Tuple[str, int, str]
+
+
+def _is_profile_asset_name(name: str) -> bool:
+    """Check whether given (result asset) name looks like profiling data."""
+    name = name.lower()
+    return name.endswith(".pstats") or (name.endswith((".tar.gz", ".tgz")) and "profile" in name)
+
+
+class JobProfile:
+    """
+    Profiling data of one or more batch jobs (e.g. of UDF execution),
+    as merged :py:class:`pstats.Stats` object, with helpers to find hotspots
+    and export to flamegraph-compatible "collapsed stack" format.
+
+    Profiling has to be enabled when creating the batch job,
+    for example with job option ``"profile": "true"`` on VITO/Terrascope based backends.
+
+    Usage example:
+
+    .. code-block:: python
+
+        job = cube.create_job(job_options={"profile": "true"})
+        job.start_and_wait()
+        profile = job.get_results().get_profile()
+        for hotspot in profile.hotspots(limit=10):
+            print(hotspot)
+        profile.write_collapsed_stacks("udf.folded")
+
+    .. versionadded:: 0.21.0
+    """
+
+    def __init__(self, stats: pstats.Stats, sources: Optional[List[str]] = None):
+        #: Merged :py:class:`pstats.Stats`.
+        self.stats = stats
+        #: Names of the profile dumps that were merged.
+        self.sources = sources or []
+
+    def __repr__(self):
+        return f"<{type(self).__name__} from {len(self.sources)} profile dump(s)>"
+
+    @classmethod
+    def from_files(cls, paths: Iterable[Union[str, Path]]) -> "JobProfile":
+        """
+        Load and merge profile dumps: ``.pstats`` files or (``.tar.gz``) archives of ``.pstats`` files.
+        """
+        with tempfile.TemporaryDirectory(prefix="openeo-profile-") as tmp_dir:
+            pstats_files = []
+            sources = []
+            for path in paths:
+                path = Path(path)
+                if path.name.lower().endswith(".pstats"):
+                    pstats_files.append(path)
+                    sources.append(path.name)
+                elif tarfile.is_tarfile(path):
+                    with tarfile.open(path, "r") as tar:
+                        for member in tar.getmembers():
+                            if member.isfile() and member.name.lower().endswith(".pstats"):
+                                # Don't trust member paths: extract to flat, generated file names.
+                                target = Path(tmp_dir) / f"{len(pstats_files):06d}.pstats"
+                                with tar.extractfile(member) as src:
+                                    target.write_bytes(src.read())
+                                pstats_files.append(target)
+                                sources.append(f"{path.name}:{member.name}")
+                else:
+                    _log.warning(f"Skipping unsupported profile file {path}")
+            if not pstats_files:
+                raise OpenEoClientException("No profiling data (pstats files) found.")
+            stats = pstats.Stats(*(str(p) for p in pstats_files))
+        return cls(stats=stats, sources=sources)
+
+    @classmethod
+    def merge(cls, profiles: Iterable["JobProfile"]) -> "JobProfile":
+        """Merge multiple profiles (e.g. of multiple batch jobs) into one."""
+        profiles = list(profiles)
+        if not profiles:
+            raise OpenEoClientException("No profiles to merge.")
+        stats = pstats.Stats()
+        for profile in profiles:
+            stats.add(profile.stats)
+        return cls(stats=stats, sources=[s for p in profiles for s in p.sources])
+
+    @staticmethod
+    def _label(func: _FunctionKey) -> str:
+        filename, line, name = func
+        if filename == "~" and line == 0:
+            # Built-in function
+            return name
+        return f"{name} ({filename}:{line})"
+
+    def hotspots(
+        self, limit: Optional[int] = 20, sort: str = "tottime", filename_filter: Optional[str] = None
+    ) -> List[dict]:
+        """
+        Get the top functions, sorted by self time (``"tottime"``) or cumulative time (``"cumtime"``).
+
+        :param limit: maximum number of functions to return
+        :param sort: sort key: "tottime" (self time) or "cumtime" (cumulative time, including callees).
+        :param filename_filter: regex to only include functions from matching filenames,
+            e.g. ``"<string>"`` for UDF code that was executed from a string.
+        :return: list of dicts with keys "function", "filename", "line", "ncalls", "tottime" and "cumtime".
+        """
+        if sort not in {"tottime", "cumtime"}:
+            raise ValueError(f"Invalid sort key {sort!r}")
+        result = []
+        for func, (cc, nc, tt, ct, callers) in self.stats.stats.items():
+            if filename_filter and not re.search(filename_filter, func[0]):
+                continue
+            result.append(
+                {
+                    "function": func[2],
+                    "filename": func[0],
+                    "line": func[1],
+                    "ncalls": nc,
+                    "tottime": tt,
+                    "cumtime": ct,
+                }
+            )
+        result.sort(key=lambda h: h[sort], reverse=True)
+        return result[:limit] if limit else result
+
+    def collapsed_stacks(self, max_depth: int = 64, max_stacks: int = 10000) -> Dict[str, int]:
+        """
+        Reconstruct call stacks in flamegraph-compatible "collapsed stack" form:
+        mapping of semicolon-separated call stacks to self time (in microseconds).
+
+        Note that profile data only contains caller-callee pairs (no full call stacks),
+        so the time of a function is distributed over its call paths
+        proportionally to the (cumulative) time of each caller-callee pair.
+
+        :param max_depth: maximum call stack depth.
+        :param max_stacks: maximum number of call paths to visit.
+            The number of call paths can grow exponentially with the size of the call graph
+            (e.g. with a lot of functions that are called from multiple places),
+            so the call paths beyond this limit are dropped (visiting the most expensive callees first).
+        """
+        stats = self.stats.stats
+        labels = {func: self._label(func).replace(";", ",") for func in stats}
+        callees: Dict[_FunctionKey, Dict[_FunctionKey, float]] = collections.defaultdict(dict)
+        for func, (cc, nc, tt, ct, callers) in stats.items():
+            for caller, edge in callers.items():
+                # Edge stats: (cc, nc, tt, ct), or just call count in older formats.
+                edge_ct = edge[3] if isinstance(edge, tuple) else ct
+                callees[caller][func] = edge_ct
+
+        stacks = collections.Counter()
+        path: List[str] = []
+        # Labels on the current call path (to skip recursive calls).
+        on_path = set()
+        visits = 0
+
+        def walk(func: _FunctionKey, scale: float, depth: int):
+            nonlocal visits
+            visits += 1
+            cc, nc, tt, ct, callers = stats[func]
+            label = labels[func]
+            path.append(label)
+            on_path.add(label)
+            self_time = round(tt * scale * 1e6)
+            if self_time > 0:
+                stacks[";".join(path)] += self_time
+            if depth < max_depth:
+                for callee, edge_ct in sorted(callees.get(func, {}).items(), key=lambda c: c[1], reverse=True):
+                    if visits >= max_stacks:
+                        break
+                    callee_ct = stats[callee][3]
+                    if callee_ct <= 0 or edge_ct <= 0 or callee == func:
+                        continue
+                    child_scale = min(1.0, edge_ct * scale / callee_ct)
+                    if child_scale * callee_ct < 1e-6 or labels[callee] in on_path:
+                        continue
+                    walk(callee, child_scale, depth + 1)
+            path.pop()
+            on_path.discard(label)
+
+        roots = [f for f, (cc, nc, tt, ct, callers) in stats.items() if not callers]
+        for root in roots:
+            if visits >= max_stacks:
+                break
+            walk(root, 1.0, 0)
+        if visits >= max_stacks:
+            _log.warning(f"Collapsed stacks are incomplete: reached the maximum of {max_stacks} call paths.")
+        return dict(stacks)
+
+    def write_collapsed_stacks(self, path: Union[str, Path], max_depth: int = 64, max_stacks: int = 10000) -> Path:
+        """
+        Write "collapsed stack" file, to be rendered as flamegraph with tools
+        like ``flamegraph.pl`` or `speedscope <https://www.speedscope.app/>`_
+        (see :py:meth:`collapsed_stacks` for the parameters).
+        """
+        path = Path(path)
+        with path.open("w", encoding="utf8") as f:
+            for stack, value in sorted(self.collapsed_stacks(max_depth=max_depth, max_stacks=max_stacks).items()):
+                f.write(f"{stack} {value}\n")
+        return path
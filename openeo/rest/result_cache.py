@@ -0,0 +1,162 @@
+"""
+Local (opt-in) cache of synchronous processing results,
+to avoid recomputing the same process graph on the backend,
+e.g. when re-running a notebook or a CI pipeline.
+
+.. versionadded:: 0.21.0
+"""
+
+import hashlib
+import json
+import logging
+import os
+import shutil
+import tempfile
+import time
+from pathlib import Path
+from typing import Any, Optional, Union
+
+from openeo.config import get_user_data_dir
+from openeo.internal.graph_building import graph_fingerprint
+
+_log = logging.getLogger(__name__)
+
+
+class ResultCache:
+    """
+    Local file based cache of synchronous processing results
+    (e.g. :py:meth:`DataCube.download() <openeo.rest.datacube.DataCube.download>`
+    and :py:meth:`DataCube.execute() <openeo.rest.datacube.DataCube.execute>`),
+    keyed by backend, :py:func:`canonical process graph fingerprint <openeo.internal.graph_building.graph_fingerprint>`
+    and output format.
+
+    Enable it on a connection with:
+
+    .. code-block:: python
+
+        from openeo.rest.result_cache import ResultCache
+
+        connection.result_cache = ResultCache(max_size=2 * 1024 ** 3, ttl=24 * 3600)
+
+    Note that the backend is not contacted for cached results:
+    only use this for processing that is deterministic
+    (e.g. not for collections that are updated continuously with relative temporal extents).
+
+    :param directory: directory to store the cached results in
+        (a "result-cache" folder in the user data directory by default).
+    :param max_size: maximum total size (in bytes) of the cached results:
+        the least recently used results are evicted when it is exceeded.
+    :param ttl: time to live (in seconds) of a cached result, ``None`` for no expiry.
+
+    .. versionadded:: 0.21.0
+    """
+
+    _SUFFIX = ".result"
+
+    def __init__(
+        self,
+        directory: Union[str, Path, None] = None,
+        *,
+        max_size: int = 1024 ** 3,
+        ttl: Optional[float] = 7 * 24 * 3600,
+    ):
+        self.directory = Path(directory) if directory else get_user_data_dir(auto_create=True) / "result-cache"
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.max_size = max_size
+        self.ttl = ttl
+
+    def __repr__(self):
+        return f"<{type(self).__name__} {str(self.directory)!r}>"
+
+    @staticmethod
+    def key(backend: str, graph: Any, output_format: Optional[str] = None) -> str:
+        """
+        Cache key for given backend (root url), process graph and output format.
+        """
+        data = json.dumps([backend.rstrip("/"), graph_fingerprint(graph), (output_format or "").lower()])
+        return hashlib.sha256(data.encode("utf8")).hexdigest()
+
+    def _path(self, key: str) -> Path:
+        return self.directory / (key + self._SUFFIX)
+
+    def _expired(self, stat: os.stat_result, now: float) -> bool:
+        return self.ttl is not None and now - stat.st_mtime > self.ttl
+
+    def get(self, key: str) -> Optional[Path]:
+        """
+        Get path to the cached result for given key, or ``None`` if there is no (unexpired) cached result.
+        """
+        path = self._path(key)
+        now = time.time()
+        try:
+            stat = path.stat()
+            if self._expired(stat, now):
+                _log.debug(f"Result cache: expired {key}")
+                path.unlink()
+                return None
+            # Note: access time is used for least recently used eviction, modification time for expiry.
+            os.utime(path, times=(now, stat.st_mtime))
+        except FileNotFoundError:
+            return None
+        _log.debug(f"Result cache: hit {key}")
+        return path
+
+    def put(self, key: str, data: Union[bytes, Path]):
+        """
+        Store result (as bytes or a path to a file to copy) for given key.
+        Results larger than the maximum cache size are not stored.
+        """
+        size = len(data) if isinstance(data, bytes) else Path(data).stat().st_size
+        if size > self.max_size:
+            _log.debug(f"Result cache: not storing {key} ({size} bytes)")
+            return
+        # Write to temp file first (and rename), so that no partial results end up in the cache.
+        fd, tmp = tempfile.mkstemp(dir=self.directory, prefix=".", suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                if isinstance(data, bytes):
+                    f.write(data)
+                else:
+                    with Path(data).open("rb") as source:
+                        shutil.copyfileobj(source, f)
+            now = time.time()
+            os.utime(tmp, times=(now, now))
+            os.replace(tmp, self._path(key))
+        except BaseException:
+            os.unlink(tmp)
+            raise
+        _log.debug(f"Result cache: stored {key} ({size} bytes)")
+        self.evict()
+
+    def evict(self):
+        """Remove expired results, and least recently used results when exceeding the maximum size."""
+        now = time.time()
+        entries = []
+        for path in self.directory.glob("*" + self._SUFFIX):
+            try:
+                stat = path.stat()
+                if self._expired(stat, now):
+                    path.unlink()
+                else:
+                    entries.append((stat.st_atime, stat.st_size, path))
+            except FileNotFoundError:
+                # Evicted concurrently.
+                continue
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries, key=lambda e: e[0]):
+            if total <= self.max_size:
+                break
+            _log.debug(f"Result cache: evicting {path.name}")
+            try:
+                path.unlink()
+            except FileNotFoundError:
+                pass
+            total -= size
+
+    def clear(self):
+        """Remove all cached results."""
+        for path in self.directory.glob("*" + self._SUFFIX):
+            try:
+                path.unlink()
+            except FileNotFoundError:
+                pass
@@ -0,0 +1,79 @@
+import json
+import re
+from typing import Callable, Dict, Union
+
+import pytest
+
+API_URL = "https://oeo.test"
+
+
+class FakeBatchBackend:
+    """
+    Fake backend where batch jobs finish as soon as they are started,
+    with result assets that are generated from the job's process graph.
+
+    Configure it (per test) with :py:meth:`setup`.
+    """
+
+    def __init__(self, requests_mock, root_url: str = API_URL):
+        self.root_url = root_url
+        #: Job creation request per job id.
+        self.jobs: Dict[str, dict] = {}
+        #: Output file formats, with their GIS data types.
+        self.formats: Dict[str, list] = {}
+        #: Function per asset name to generate the asset (bytes or JSON data) from the job's process graph.
+        self.assets: Dict[str, Callable[[dict], Union[bytes, dict, list]]] = {}
+        #: Function to decide from the job creation request whether a job fails.
+        self.fail: Callable[[dict], bool] = lambda job: False
+
+        requests_mock.get(root_url + "/", json={"api_version": "1.1.0"})
+        requests_mock.get(
+            root_url + "/file_formats",
+            json=lambda r, c: {"output": {f: {"gis_data_types": t} for f, t in self.formats.items()}},
+        )
+        requests_mock.post(root_url + "/jobs", status_code=201, text=self._create_job)
+        requests_mock.post(re.compile(root_url + "/jobs/[^/]+/results$"), status_code=202)
+        requests_mock.get(re.compile(root_url + "/jobs/[^/]+$"), json=self._describe_job)
+        requests_mock.get(re.compile(root_url + "/jobs/[^/]+/results$"), json=self._results)
+        requests_mock.get(
+            re.compile(root_url + "/jobs/[^/]+/logs"),
+            json={"logs": [{"id": "1", "level": "error", "message": "Boom"}]},
+        )
+        requests_mock.get(re.compile(root_url + "/jobs/[^/]+/assets/.+$"), content=self._asset)
+
+    def setup(
+        self,
+        out_format: str,
+        gis_data_type: str,
+        assets: Dict[str, Callable[[dict], Union[bytes, dict, list]]],
+        fail: Callable[[dict], bool] = None,
+    ) -> "FakeBatchBackend":
+        self.formats[out_format] = [gis_data_type]
+        self.assets = assets
+        if fail:
+            self.fail = fail
+        return self
+
+    def _create_job(self, request, context):
+        job_id = f"job-{len(self.jobs)}"
+        self.jobs[job_id] = request.json()
+        context.headers["OpenEO-Identifier"] = job_id
+        return ""
+
+    def _describe_job(self, request, context):
+        job_id = request.path.split("/")[-1]
+        return {"id": job_id, "status": "error" if self.fail(self.jobs[job_id]) else "finished"}
+
+    def _results(self, request, context):
+        job_url = self.root_url + request.path.rsplit("/", 1)[0]
+        return {"assets": {name: {"href": f"{job_url}/assets/{name}"} for name in self.assets}}
+
+    def _asset(self, request, context):
+        _, job_id, _, name = request.path.rsplit("/", 3)
+        data = self.assets[name](self.jobs[job_id]["process"]["process_graph"])
+        return data if isinstance(data, bytes) else json.dumps(data).encode("utf8")
+
+
+@pytest.fixture
+def batch_backend(requests_mock) -> FakeBatchBackend:
+    return FakeBatchBackend(requests_mock)
@@ -0,0 +1,202 @@
+import json
+import re
+
+import geopandas
+import pandas as pd
+import pytest
+import shapely.geometry
+
+import openeo
+from openeo.extra.geometry_batching import (
+    BatchedResults,
+    aggregate_spatial_batches,
+    batch_geometries,
+    run_aggregate_spatial_batched,
+)
+from openeo.extra.job_management import MultiBackendJobManager
+from openeo.rest import OpenEoClientException
+
+API_URL = "https://oeo.test"
+
+
+def _points(*coordinates) -> dict:
+    return {
+        "type": "FeatureCollection",
+        "features": [
+            {"type": "Feature", "id": f"f{i}", "properties": {}, "geometry": {"type": "Point", "coordinates": c}}
+            for i, c in enumerate(coordinates)
+        ],
+    }
+
+
+# Two clusters of points, interleaved in the input order.
+CLUSTERS = _points([0, 0], [10, 10], [0.1, 0], [10.1, 10], [0, 0.1], [10, 10.1], [0.1, 0.1], [10.1, 10.1])
+
+
+class TestBatchGeometries:
+    def test_max_features(self):
+        batches = batch_geometries(CLUSTERS, max_features=4, buffer=0)
+        assert [b.id for b in batches] == ["batch-0000", "batch-0001"]
+        assert [sorted(b.feature_ids) for b in batches] == [["f0", "f2", "f4", "f6"], ["f1", "f3", "f5", "f7"]]
+        assert batches[0].bbox == {"west": 0, "south": 0, "east": 0.1, "north": 0.1, "crs": 4326}
+
+    def test_max_features_small(self):
+        batches = batch_geometries(CLUSTERS, max_features=3)
+        assert [len(b.feature_ids) for b in batches] == [3, 3, 2]
+        assert sorted(f for b in batches for f in b.feature_ids) == [f"f{i}" for i in range(8)]
+        # Only one batch mixes both clusters
+        assert [len({int(f[1:]) % 2 for f in b.feature_ids}) for b in batches] == [1, 2, 1]
+
+    def test_max_area(self):
+        batches = batch_geometries(CLUSTERS, max_features=100, max_area=1)
+        assert [sorted(b.feature_ids) for b in batches] == [["f0", "f2", "f4", "f6"], ["f1", "f3", "f5", "f7"]]
+        (batch,) = batch_geometries(CLUSTERS, max_features=100, max_area=1000)
+        assert batch.feature_ids == [f"f{i}" for i in range(8)]
+
+    def test_geodataframe(self):
+        df = geopandas.GeoDataFrame(
+            {"name": ["a", "b", "c"]},
+            geometry=[
+                shapely.geometry.Point(500000, 5600000),
+                shapely.geometry.Point(510000, 5600000),
+                shapely.geometry.Point(700000, 5700000),
+            ],
+            index=[101, 102, 103],
+            crs=32631,
+        )
+        batches = batch_geometries(df, max_features=2)
+        assert [b.feature_ids for b in batches] == [[101, 102], [103]]
+        # Reprojected to lon/lat
+        assert batches[0].bbox["west"] == pytest.approx(3.0 - 0.0001)
+        assert batches[1].to_geojson()["features"][0]["geometry"]["coordinates"] == (
+            pytest.approx(5.876, abs=0.001), pytest.approx(51.416, abs=0.001)
+        )
+
+    def test_geometry_list(self):
+        batches = batch_geometries([shapely.geometry.Point(1, 2), {"type": "Point", "coordinates": [3, 4]}])
+        assert batches[0].feature_ids == [0, 1]
+        assert batches[0].to_geojson() == {
+            "type": "FeatureCollection",
+            "features": [
+                {"type": "Feature", "id": 0, "properties": {}, "geometry": {"type": "Point", "coordinates": (1, 2)}},
+                {"type": "Feature", "id": 1, "properties": {}, "geometry": {"type": "Point", "coordinates": (3, 4)}},
+            ],
+        }
+
+    def test_bbox_buffer_points(self):
+        # Single point and collinear points
+        points = _points([3, 51], [4, 52], [4, 52.5], [4, 53])
+        batches = batch_geometries(points, max_features=1, max_area=0.5)
+        assert [b.feature_ids for b in batches] == [["f0"], ["f1"], ["f2"], ["f3"]]
+        assert batches[0].bbox == {
+            "west": pytest.approx(2.9999),
+            "south": pytest.approx(50.9999),
+            "east": pytest.approx(3.0001),
+            "north": pytest.approx(51.0001),
+            "crs": 4326,
+        }
+        (batch,) = batch_geometries(_points([4, 52], [4, 52.5], [4, 53]), buffer=0.01)
+        assert batch.bbox == {
+            "west": pytest.approx(3.99),
+            "south": pytest.approx(51.99),
+            "east": pytest.approx(4.01),
+            "north": pytest.approx(53.01),
+            "crs": 4326,
+        }
+        for batch in batches:
+            assert batch.bbox["west"] < batch.bbox["east"]
+            assert batch.bbox["south"] < batch.bbox["north"]
+
+    def test_invalid(self):
+        with pytest.raises(OpenEoClientException, match="Expected GeoJSON FeatureCollection"):
+            batch_geometries({"type": "Point", "coordinates": [1, 2]})
+        with pytest.raises(ValueError, match="max_features must be at least 1"):
+            batch_geometries(CLUSTERS, max_features=0)
+
+
+class TestAggregateSpatialBatches:
+    def test_aggregate_spatial_batches(self, requests_mock):
+        requests_mock.get(API_URL + "/", json={"api_version": "1.0.0"})
+        cube = openeo.connect(API_URL).load_collection("S2", fetch_metadata=False)
+        batches = batch_geometries(CLUSTERS, max_features=4, buffer=0.5)
+        vector_cubes = aggregate_spatial_batches(cube, batches, reducer="mean")
+        flat_graph = vector_cubes[batches[1]].flat_graph()
+        assert flat_graph["filterbbox1"]["arguments"]["extent"] == {
+            "west": 9.5, "south": 9.5, "east": 10.6, "north": 10.6, "crs": 4326,
+        }
+        geometries = flat_graph["aggregatespatial1"]["arguments"]["geometries"]
+        assert len(geometries["features"]) == 4
+        assert flat_graph["aggregatespatial1"]["arguments"]["data"] == {"from_node": "filterbbox1"}
+
+
+class TestBatchedResults:
+    @pytest.fixture
+    def batches(self):
+        return batch_geometries(CLUSTERS, max_features=4)
+
+    def test_json(self, tmp_path, batches):
+        files = {}
+        for batch in batches:
+            files[batch.id] = tmp_path / f"{batch.id}.json"
+            # Value: first band is feature id number, second band 0
+            timeseries = {
+                "2020-01-01T00:00:00Z": [[int(f[1:]), 0] for f in batch.feature_ids],
+                "2020-01-06T00:00:00Z": [[int(f[1:]) + 100, 0] if f != "f3" else [] for f in batch.feature_ids],
+            }
+            files[batch.id].write_text(json.dumps(timeseries))
+        df = BatchedResults(batches=batches, files=files).to_pandas()
+        assert list(df.columns) == ["feature_id", "date", 0, 1]
+        assert len(df) == 16
+        df = df.set_index(["feature_id", "date"]).sort_index()
+        assert df.loc[("f5", "2020-01-01T00:00:00Z"), 0] == 5
+        assert df.loc[("f5", "2020-01-06T00:00:00Z"), 0] == 105
+        assert df.loc[("f3", "2020-01-06T00:00:00Z")].isna().all()
+
+    def test_csv(self, tmp_path, batches):
+        files = {}
+        for batch in batches:
+            files[batch.id] = tmp_path / f"{batch.id}.csv"
+            pd.DataFrame(
+                {
+                    "date": "2020-01-01",
+                    "feature_index": range(len(batch.feature_ids)),
+                    "ndvi": [int(f[1:]) / 10 for f in batch.feature_ids],
+                }
+            ).to_csv(files[batch.id], index=False)
+        df = BatchedResults(batches=batches, files=files).to_pandas()
+        assert dict(zip(df.feature_id, df.ndvi)) == {f"f{i}": i / 10 for i in range(8)}
+
+    def test_missing(self, tmp_path, batches):
+        path = tmp_path / "batch.csv"
+        pd.DataFrame({"date": "2020-01-01", "feature_index": [0], "ndvi": [0.5]}).to_csv(path, index=False)
+        results = BatchedResults(batches=batches, files={batches[1].id: path})
+        assert results.missing == [batches[0]]
+        with pytest.raises(OpenEoClientException, match=re.escape("Missing results of batches ['batch-0000']")):
+            results.to_pandas()
+        df = results.to_pandas(allow_missing=True)
+        assert list(df.feature_id) == [batches[1].feature_ids[0]]
+
+
+class TestRunAggregateSpatialBatched:
+    def test_run(self, tmp_path, batch_backend):
+        def timeseries_asset(graph: dict) -> dict:
+            # Time series with value: x coordinate of the point
+            features = graph["aggregatespatial1"]["arguments"]["geometries"]["features"]
+            return {"2020-01-01T00:00:00Z": [[f["geometry"]["coordinates"][0]] for f in features]}
+
+        jobs = batch_backend.setup("JSON", "vector", assets={"timeseries.json": timeseries_asset}).jobs
+
+        connection = openeo.connect(API_URL)
+        cube = connection.load_collection("S2", fetch_metadata=False)
+        manager = MultiBackendJobManager(poll_sleep=0, root_dir=tmp_path / "root")
+        manager.add_backend("foo", connection=connection, parallel_jobs=2)
+        results = run_aggregate_spatial_batched(
+            cube, CLUSTERS, reducer="mean", max_features=4, manager=manager, output_file=tmp_path / "batches.csv"
+        )
+
+        assert sorted(j["title"] for j in jobs.values()) == ["Aggregate batch-0000", "Aggregate batch-0001"]
+        tracking = pd.read_csv(tmp_path / "batches.csv")
+        assert list(tracking.features) == [4, 4]
+        df = results.to_pandas()
+        expected_x = {f["id"]: f["geometry"]["coordinates"][0] for f in CLUSTERS["features"]}
+        assert dict(zip(df.feature_id, df[0])) == expected_x
@@ -1,4 +1,12 @@
+import asyncio
+import collections
 import json
+import multiprocessing
+import re
+import threading
+import time
+from pathlib import Path
+from typing import List, Optional
 from unittest import mock
 
 # TODO: can we avoid using httpretty?
@@ -15,12 +23,22 @@ from httpretty.core import httpretty as corehttpretty
 import pandas as pd
 import pytest
 import requests
+import requests_mock
 import shapely.geometry.point as shpt
+import time_machine
 
 
 import openeo
-from openeo.extra.job_management import MultiBackendJobManager, MAX_RETRIES
+from openeo.extra.job_management import (
+    MAX_RETRIES,
+    MultiBackendJobManager,
+    SqliteJobStore,
+    run_partition_jobs,
+)
+from openeo.extra.job_metrics import JobManagerMetrics
 from openeo import BatchJob
+from openeo.rest import OpenEoApiError
+from openeo.rest.job_registry import JobResultRegistry
 
 
 class TestMultiBackendJobManager:
@@ -116,6 +134,13 @@ class TestMultiBackendJobManager:
         metadata_path = manager.get_job_metadata_path(job_id="job-2022")
         assert metadata_path.exists()
 
+        # Metrics time series and report are written next to the output file.
+        assert len((tmp_path / "jobs.metrics.jsonl").read_text().strip().split("\n")) > 5
+        report = json.loads((tmp_path / "jobs.report.json").read_text())
+        assert report["backends"]["foo"]["finished"] + report["backends"]["bar"]["finished"] == 5
+        assert (tmp_path / "jobs.report.html").exists()
+        assert manager.metrics.report()["backends"]["foo"]["start_failed"] == 0
+
     def test_on_error_log(self, tmp_path, requests_mock):
         backend = "http://foo.test"
         requests_mock.get(backend, json={"api_version": "1.1.0"})
@@ -351,3 +376,548 @@ class TestMultiBackendJobManager:
         assert len(result) == 1
         assert set(result.status) == {"running"}
         assert set(result.backend_name) == {"foo"}
+
+
+def _mock_dummy_backend(mocker, finish_after: Optional[int] = 2) -> collections.Counter:
+    """Set up stand-in backend: jobs are finished after being polled a couple of times (or never)."""
+    mocker.get("http://foo.test/", json={"api_version": "1.1.0"})
+    polls = collections.Counter()
+    lock = threading.Lock()
+
+    def get_job(request, context):
+        job_id = request.path.split("/")[-1]
+        with lock:
+            polls[job_id] += 1
+            status = "running" if finish_after is None or polls[job_id] <= finish_after else "finished"
+        return {"id": job_id, "status": status}
+
+    mocker.get(re.compile(r"http://foo\.test/jobs/[\w-]+$"), json=get_job)
+    mocker.get(re.compile(r"http://foo\.test/jobs/[\w-]+/results$"), json={"links": []})
+    return polls
+
+
+@pytest.fixture
+def dummy_backend(requests_mock):
+    """Stand-in backend: jobs are finished after being polled a couple of times."""
+    return _mock_dummy_backend(requests_mock)
+
+
+def _run_leased_worker(db_path: Path, root_dir: Path, worker_id: str, lease_duration: float, finish_jobs: bool = True):
+    """Run a job manager on a shared job store (e.g. in a separate process)."""
+    with requests_mock.Mocker() as mocker:
+        _mock_dummy_backend(mocker, finish_after=2 if finish_jobs else None)
+        manager = MultiBackendJobManager(poll_sleep=0.05, root_dir=root_dir)
+        manager.add_backend("foo", connection=openeo.connect("http://foo.test"), parallel_jobs=2)
+
+        def start_job(row, connection, **kwargs):
+            with (root_dir / f"started-{worker_id}.txt").open("a") as f:
+                f.write(f"{row['year']}\n")
+            return BatchJob(job_id=f"job-{row['year']}", connection=connection)
+
+        manager.run_jobs_leased(
+            job_store=SqliteJobStore(db_path), start_job=start_job, worker_id=worker_id, lease_duration=lease_duration
+        )
+
+
+def _read_started(root_dir: Path, worker_id: str) -> List[int]:
+    path = root_dir / f"started-{worker_id}.txt"
+    return [int(y) for y in path.read_text().split()] if path.exists() else []
+
+
+class TestSqliteJobStore:
+    @pytest.fixture
+    def job_store(self, tmp_path) -> SqliteJobStore:
+        job_store = SqliteJobStore(tmp_path / "jobs.db")
+        df = MultiBackendJobManager()._normalize_df(pd.DataFrame({"year": [2018, 2019, 2020, 2021, 2022]}))
+        assert job_store.initialize(df)
+        return job_store
+
+    def test_initialize(self, tmp_path, job_store):
+        assert job_store.exists()
+        df = job_store.read()
+        assert list(df.index) == [0, 1, 2, 3, 4]
+        assert list(df["year"]) == [2018, 2019, 2020, 2021, 2022]
+        assert set(df["status"]) == {"not_started"}
+        assert job_store.count_unfinished() == 5
+
+        # Second initialization should not overwrite
+        assert not job_store.initialize(pd.DataFrame({"year": [1999], "status": ["not_started"]}))
+        assert job_store.count_unfinished() == 5
+
+    def test_initialize_geometry(self, tmp_path):
+        job_store = SqliteJobStore(tmp_path / "jobs.db")
+        df = MultiBackendJobManager()._normalize_df(pd.DataFrame({"geometry": ["POINT (1 2)"]}))
+        job_store.initialize(df)
+        assert list(job_store.read()["geometry"]) == ["POINT (1 2)"]
+
+    def test_claim_respects_parallel_jobs_across_workers(self, job_store):
+        assert job_store.claim(worker_id="w1", backend_name="foo", parallel_jobs=2, lease_duration=60) == [0, 1]
+        assert job_store.claim(worker_id="w2", backend_name="foo", parallel_jobs=2, lease_duration=60) == []
+        assert job_store.claim(worker_id="w2", backend_name="bar", parallel_jobs=2, lease_duration=60) == [2, 3]
+        df = job_store.read()
+        assert list(df["lease_owner"].fillna("-")) == ["w1", "w1", "w2", "w2", "-"]
+        assert list(df["backend_name"].fillna("-")) == ["foo", "foo", "bar", "bar", "-"]
+
+    def test_claim_expired_lease(self, job_store):
+        with time_machine.travel("2023-07-01T12:00:00Z"):
+            assert job_store.claim(worker_id="w1", backend_name="foo", parallel_jobs=2, lease_duration=60) == [0, 1]
+        with time_machine.travel("2023-07-01T12:00:50Z"):
+            assert job_store.claim(worker_id="w2", backend_name="foo", parallel_jobs=3, lease_duration=60) == [2]
+        with time_machine.travel("2023-07-01T12:01:30Z"):
+            # Lease of w1 expired: its not started rows can be claimed by others
+            # (own rows that are still not started come first).
+            assert job_store.claim(worker_id="w2", backend_name="foo", parallel_jobs=3, lease_duration=60) == [2, 0, 1]
+
+    def test_persist_only_owned(self, job_store):
+        job_store.claim(worker_id="w1", backend_name="foo", parallel_jobs=1, lease_duration=60)
+        df = job_store.read_rows([0, 1])
+        df["status"] = "queued"
+        df["id"] = ["job-0", "job-1"]
+        df["network"] = "12 kb"
+        assert job_store.persist(df, worker_id="w1") == 1
+        df = job_store.read()
+        assert list(df["status"]) == ["queued", "not_started", "not_started", "not_started", "not_started"]
+        assert list(df["id"].fillna("-")) == ["job-0", "-", "-", "-", "-"]
+        assert list(df["network"].fillna("-")) == ["12 kb", "-", "-", "-", "-"]
+
+    def test_read_owned(self, job_store):
+        job_store.claim(worker_id="w1", backend_name="foo", parallel_jobs=3, lease_duration=60)
+        df = job_store.read_rows([0, 1, 2])
+        df["status"] = ["running", "finished", "not_started"]
+        job_store.persist(df, worker_id="w1")
+        owned = job_store.read_owned(worker_id="w1")
+        assert list(owned.index) == [0, 2]
+        assert "lease_owner" not in owned.columns
+        assert job_store.read_owned(worker_id="w2").empty
+
+    def test_renew_and_take_over(self, job_store):
+        with time_machine.travel("2023-07-01T12:00:00Z"):
+            job_store.claim(worker_id="w1", backend_name="foo", parallel_jobs=2, lease_duration=60)
+            df = job_store.read_rows([0, 1])
+            df["status"] = "running"
+            job_store.persist(df, worker_id="w1")
+            assert job_store.take_over_stale(worker_id="w2", lease_duration=60) == []
+        with time_machine.travel("2023-07-01T12:00:50Z"):
+            assert job_store.renew_leases(worker_id="w1", lease_duration=60) == 2
+        with time_machine.travel("2023-07-01T12:01:30Z"):
+            assert job_store.take_over_stale(worker_id="w2", lease_duration=60) == []
+        with time_machine.travel("2023-07-01T12:02:30Z"):
+            assert job_store.take_over_stale(worker_id="w2", lease_duration=60) == [0, 1]
+            assert list(job_store.read_owned(worker_id="w2").index) == [0, 1]
+            assert job_store.read_owned(worker_id="w1").empty
+
+
+class TestMultiBackendJobManagerLeased:
+    @pytest.fixture
+    def sleep_mock(self):
+        with mock.patch("time.sleep") as sleep:
+            yield sleep
+
+    def test_multiple_workers(self, tmp_path, dummy_backend, sleep_mock):
+        job_store = SqliteJobStore(tmp_path / "jobs.db")
+        df = pd.DataFrame({"year": range(2000, 2020)})
+        started = collections.defaultdict(list)
+
+        def run_worker(worker_id: str):
+            manager = MultiBackendJobManager(root_dir=tmp_path / "root")
+            manager.add_backend("foo", connection=openeo.connect("http://foo.test"), parallel_jobs=4)
+
+            def start_job(row, connection, **kwargs):
+                started[worker_id].append(row["year"])
+                return BatchJob(job_id=f"job-{row['year']}", connection=connection)
+
+            manager.run_jobs_leased(job_store=job_store, start_job=start_job, df=df, worker_id=worker_id)
+
+        workers = [threading.Thread(target=run_worker, args=(f"w{w}",)) for w in range(3)]
+        for w in workers:
+            w.start()
+        for w in workers:
+            w.join(timeout=60)
+
+        result = job_store.read()
+        assert len(result) == 20
+        assert set(result.status) == {"finished"}
+        # Each job was started exactly once
+        all_started = sum(started.values(), [])
+        assert sorted(all_started) == list(range(2000, 2020))
+        assert set(result["lease_owner"]).issubset({"w0", "w1", "w2"})
+        assert (tmp_path / "jobs.w0.report.json").exists()
+
+    def test_multiple_worker_processes(self, tmp_path):
+        db_path = tmp_path / "jobs.db"
+        root_dir = tmp_path / "root"
+        root_dir.mkdir()
+        df = MultiBackendJobManager()._normalize_df(pd.DataFrame({"year": range(2000, 2012)}))
+        SqliteJobStore(db_path).initialize(df)
+
+        workers = [
+            multiprocessing.Process(target=_run_leased_worker, args=(db_path, root_dir, f"w{w}", 60)) for w in range(3)
+        ]
+        for w in workers:
+            w.start()
+        for w in workers:
+            w.join(timeout=60)
+        assert [w.exitcode for w in workers] == [0, 0, 0]
+
+        result = SqliteJobStore(db_path).read()
+        assert set(result.status) == {"finished"}
+        # Each job was started exactly once, over all processes
+        all_started = sum((_read_started(root_dir, f"w{w}") for w in range(3)), [])
+        assert sorted(all_started) == list(range(2000, 2012))
+
+    def test_take_over_from_killed_process(self, tmp_path):
+        db_path = tmp_path / "jobs.db"
+        root_dir = tmp_path / "root"
+        root_dir.mkdir()
+        df = MultiBackendJobManager()._normalize_df(pd.DataFrame({"year": [2018, 2019, 2020, 2021]}))
+        job_store = SqliteJobStore(db_path)
+        job_store.initialize(df)
+
+        # Worker process with short lease, of which the jobs keep running.
+        dead = multiprocessing.Process(target=_run_leased_worker, args=(db_path, root_dir, "dead", 1, False))
+        dead.start()
+        deadline = time.time() + 30
+        while (job_store.read().status == "running").sum() < 2:
+            assert time.time() < deadline
+            time.sleep(0.05)
+        dead.kill()
+        dead.join(timeout=10)
+        assert _read_started(root_dir, "dead") == [2018, 2019]
+
+        alive = multiprocessing.Process(target=_run_leased_worker, args=(db_path, root_dir, "alive", 60))
+        alive.start()
+        alive.join(timeout=60)
+        assert alive.exitcode == 0
+
+        result = job_store.read()
+        assert list(result.status) == ["finished"] * 4
+        assert list(result["lease_owner"]) == ["alive"] * 4
+        # Running jobs of the dead worker were taken over (after lease expiry), not restarted.
+        assert _read_started(root_dir, "alive") == [2020, 2021]
+
+    def test_take_over_running_job(self, tmp_path, dummy_backend, sleep_mock):
+        job_store = SqliteJobStore(tmp_path / "jobs.db")
+        df = MultiBackendJobManager()._normalize_df(pd.DataFrame({"year": [2018, 2019]}))
+        job_store.initialize(df)
+        # Simulate a dead worker that left a running job behind.
+        with time_machine.travel("2023-07-01T12:00:00Z"):
+            job_store.claim(worker_id="dead", backend_name="foo", parallel_jobs=1, lease_duration=60)
+            dead = job_store.read_rows([0])
+            dead["status"] = "running"
+            dead["id"] = "job-2018"
+            job_store.persist(dead, worker_id="dead")
+
+        manager = MultiBackendJobManager(root_dir=tmp_path / "root")
+        manager.add_backend("foo", connection=openeo.connect("http://foo.test"), parallel_jobs=1)
+
+        def start_job(row, connection, **kwargs):
+            return BatchJob(job_id=f"job-{row['year']}", connection=connection)
+
+        manager.run_jobs_leased(job_store=job_store, start_job=start_job, worker_id="alive")
+
+        result = job_store.read()
+        assert list(result.status) == ["finished", "finished"]
+        assert list(result["lease_owner"]) == ["alive", "alive"]
+        # Polled until finished, plus the final `describe` of `on_job_done`
+        assert dummy_backend["job-2018"] == 4
+
+
+class TestMultiBackendJobManagerAsync:
+    def test_basic(self, tmp_path, dummy_backend):
+        # Large `poll_sleep` (max poll interval) to check that launching and polling is not bound to it.
+        manager = MultiBackendJobManager(poll_sleep=60, root_dir=tmp_path / "root")
+        manager.add_backend("foo", connection=openeo.connect("http://foo.test"), parallel_jobs=3)
+
+        df = pd.DataFrame({"year": range(2000, 2010), "geometry": ["POINT (1 2)"] * 10})
+        output_file = tmp_path / "jobs.csv"
+        started = []
+
+        def start_job(row, connection, **kwargs):
+            # Jobs should be launched while respecting the parallel_jobs limit.
+            unfinished = [j for j in started if dummy_backend[j] < 3]
+            assert len(unfinished) < 3
+            job_id = f"job-{row['year']}"
+            started.append(job_id)
+            return BatchJob(job_id=job_id, connection=connection)
+
+        t0 = time.time()
+        asyncio.run(
+            manager.run_jobs_async(df=df, start_job=start_job, output_file=output_file, min_poll_interval=0.01)
+        )
+        assert time.time() - t0 < 10
+
+        assert sorted(started) == [f"job-{y}" for y in range(2000, 2010)]
+        result = pd.read_csv(output_file)
+        assert len(result) == 10
+        assert set(result.status) == {"finished"}
+        assert set(result.backend_name) == {"foo"}
+        assert manager.get_job_metadata_path(job_id="job-2005").exists()
+        report = json.loads((tmp_path / "jobs.report.json").read_text())
+        assert report["backends"]["foo"]["finished"] == 10
+        assert report["backends"]["foo"]["run_time"]["count"] == 10
+
+    def test_async_start_job(self, tmp_path, dummy_backend):
+        manager = MultiBackendJobManager(poll_sleep=0.1, root_dir=tmp_path / "root")
+        manager.add_backend("foo", connection=openeo.connect("http://foo.test"), parallel_jobs=2)
+        df = pd.DataFrame({"year": [2018, 2019, 2020]})
+        output_file = tmp_path / "jobs.csv"
+
+        async def start_job(row, connection, **kwargs):
+            if row["year"] == 2019:
+                return None
+            return BatchJob(job_id=f"job-{row['year']}", connection=connection)
+
+        asyncio.run(
+            manager.run_jobs_async(df=df, start_job=start_job, output_file=output_file, min_poll_interval=0.01)
+        )
+        result = pd.read_csv(output_file)
+        assert list(result.status) == ["finished", "skipped", "finished"]
+
+    def test_resume(self, tmp_path, dummy_backend):
+        manager = MultiBackendJobManager(poll_sleep=0.1, root_dir=tmp_path / "root")
+        manager.add_backend("foo", connection=openeo.connect("http://foo.test"), parallel_jobs=2)
+        output_file = tmp_path / "jobs.csv"
+        pd.DataFrame(
+            {
+                "year": [2018, 2019],
+                "status": ["running", "not_started"],
+                "id": ["job-2018", None],
+                "backend_name": ["foo", None],
+            }
+        ).to_csv(output_file, index=False)
+
+        def start_job(row, connection, **kwargs):
+            return BatchJob(job_id=f"job-{row['year']}", connection=connection)
+
+        asyncio.run(
+            manager.run_jobs_async(df=None, start_job=start_job, output_file=output_file, min_poll_interval=0.01)
+        )
+        result = pd.read_csv(output_file)
+        assert list(result.status) == ["finished", "finished"]
+        assert dummy_backend["job-2018"] == 4
+
+    def test_bookkeeping_on_loop_thread(self, tmp_path, requests_mock):
+        polls = _mock_dummy_backend(requests_mock, finish_after=20)
+        manager = MultiBackendJobManager(poll_sleep=0.01, root_dir=tmp_path / "root")
+        manager.add_backend("foo", connection=openeo.connect("http://foo.test"), parallel_jobs=4)
+        df = pd.DataFrame({"year": [2017, 2018, 2019, 2020]})
+        output_file = tmp_path / "jobs.csv"
+
+        def start_job(row, connection, **kwargs):
+            return BatchJob(job_id=f"job-{row['year']}", connection=connection)
+
+        threads = set()
+        persists = []
+
+        def on_thread(method):
+            def wrapped(metrics, *args, **kwargs):
+                threads.add(threading.current_thread())
+                return method(metrics, *args, **kwargs)
+
+            return wrapped
+
+        with mock.patch.object(
+            JobManagerMetrics, "job_started", new=on_thread(JobManagerMetrics.job_started)
+        ), mock.patch.object(
+            JobManagerMetrics, "job_status", new=on_thread(JobManagerMetrics.job_status)
+        ), mock.patch.object(
+            manager, "_persists", side_effect=lambda df, path: persists.append(df.status.tolist())
+        ):
+            asyncio.run(
+                manager.run_jobs_async(
+                    df=df, start_job=start_job, output_file=output_file, min_poll_interval=0.01, max_poll_interval=0.01
+                )
+            )
+        assert sum(polls.values()) > 80
+        # Metrics (and dataframe) are only updated from the event loop thread.
+        assert threads == {threading.main_thread()}
+        # Job statuses are persisted (debounced) on status changes, not on each poll.
+        assert len(persists) < 20
+        assert persists[-1] == ["finished"] * 4
+
+
+    def test_result_download_failure_is_bounded(self, tmp_path, dummy_backend):
+        class Manager(MultiBackendJobManager):
+            downloads = collections.Counter()
+
+            def on_job_done(self, job, row):
+                self.downloads[job.job_id] += 1
+                raise OpenEoApiError(http_status_code=500, code="Internal", message="Download failed")
+
+        manager = Manager(poll_sleep=0.1, root_dir=tmp_path / "root")
+        manager.add_backend("foo", connection=openeo.connect("http://foo.test"), parallel_jobs=2)
+        output_file = tmp_path / "jobs.csv"
+
+        def start_job(row, connection, **kwargs):
+            return BatchJob(job_id=f"job-{row['year']}", connection=connection)
+
+        asyncio.run(
+            manager.run_jobs_async(
+                df=pd.DataFrame({"year": [2018]}), start_job=start_job, output_file=output_file, min_poll_interval=0.01
+            )
+        )
+        result = pd.read_csv(output_file)
+        assert list(result.status) == ["finished"]
+        # Download was retried a limited number of times, without re-polling the job status.
+        assert manager.downloads == {"job-2018": MAX_RETRIES}
+        assert dummy_backend["job-2018"] == 3
+        report = json.loads((tmp_path / "jobs.report.json").read_text())
+        assert report["backends"]["foo"]["retries"] == MAX_RETRIES
+
+    def test_failing_job_cancels_others(self, tmp_path, dummy_backend):
+        class Manager(MultiBackendJobManager):
+            def on_job_done(self, job, row):
+                if job.job_id == "job-2018":
+                    raise RuntimeError("Boom")
+
+        manager = Manager(poll_sleep=60, root_dir=tmp_path / "root")
+        manager.add_backend("foo", connection=openeo.connect("http://foo.test"), parallel_jobs=2)
+        output_file = tmp_path / "jobs.csv"
+        started = []
+
+        def start_job(row, connection, **kwargs):
+            started.append(row["year"])
+            return BatchJob(job_id=f"job-{row['year']}", connection=connection)
+
+        async def run():
+            with pytest.raises(RuntimeError, match="Boom"):
+                await manager.run_jobs_async(
+                    df=pd.DataFrame({"year": [2018, 2019, 2020, 2021]}),
+                    start_job=start_job,
+                    output_file=output_file,
+                    min_poll_interval=0.01,
+                )
+            # No tasks are left behind running.
+            assert asyncio.all_tasks() == {asyncio.current_task()}
+
+        asyncio.run(run())
+        assert 2021 not in started
+
+
+class TestMultiBackendJobManagerJobRegistry:
+    @staticmethod
+    def _graph(year: int) -> dict:
+        return {"lc": {"process_id": "load_collection", "arguments": {"id": "S2", "year": year}, "result": True}}
+
+    def test_reuse_finished_job(self, tmp_path, dummy_backend, requests_mock):
+        requests_mock.post("http://foo.test/jobs", status_code=201, headers={"OpenEO-Identifier": "job-new"})
+        connection = openeo.connect("http://foo.test")
+        registry = JobResultRegistry(tmp_path / "registry.db", check_collection_versions=False)
+        registry.register(connection.job("job-old"), process_graph=self._graph(2018))
+        # Already finished
+        dummy_backend["job-old"] = 10
+
+        manager = MultiBackendJobManager(poll_sleep=0, root_dir=tmp_path / "root", job_registry=registry)
+        manager.add_backend("foo", connection=connection)
+
+        def start_job(row, connection, **kwargs):
+            return connection.create_job(self._graph(int(row["year"])))
+
+        output_file = tmp_path / "jobs.csv"
+        manager.run_jobs(df=pd.DataFrame({"year": [2018, 2019]}), start_job=start_job, output_file=output_file)
+
+        result = pd.read_csv(output_file)
+        assert list(result.id) == ["job-old", "job-new"]
+        assert list(result.status) == ["finished", "finished"]
+        assert manager.get_job_metadata_path(job_id="job-old").exists()
+        # Only one new job created
+        assert [r.path for r in requests_mock.request_history if r.method == "POST"] == ["/jobs"]
+        assert [(e["job_id"], e["finished"] is not None) for e in registry.entries()] == [
+            ("job-old", True),
+            ("job-new", True),
+        ]
+
+
+class TestRunPartitionJobs:
+    @staticmethod
+    def _graphs(*partition_ids: str) -> dict:
+        return {
+            p: {"lc": {"process_id": "load_collection", "arguments": {"id": f"S2-{p}"}, "result": True}}
+            for p in partition_ids
+        }
+
+    @staticmethod
+    def _collection_id(graph: dict) -> dict:
+        return {"collection": graph["loadcollection1"]["arguments"]["id"]}
+
+    @pytest.fixture
+    def manager(self, tmp_path, batch_backend) -> MultiBackendJobManager:
+        manager = MultiBackendJobManager(poll_sleep=0, root_dir=tmp_path / "root")
+        manager.add_backend("foo", connection=openeo.connect(batch_backend.root_url), parallel_jobs=2)
+        return manager
+
+    def test_basic(self, tmp_path, batch_backend, manager):
+        batch_backend.setup("JSON", "vector", assets={"result.json": self._collection_id})
+        files = run_partition_jobs(
+            self._graphs("p0", "p1"),
+            manager=manager,
+            output_file=tmp_path / "jobs.csv",
+            columns={"size": [3, 4]},
+            out_format="JSON",
+            title="Part",
+        )
+        assert sorted(j["title"] for j in batch_backend.jobs.values()) == ["Part p0", "Part p1"]
+        assert {p: json.loads(f.read_text()) for p, f in files.items()} == {
+            "p0": {"collection": "S2-p0"},
+            "p1": {"collection": "S2-p1"},
+        }
+        jobs = pd.read_csv(tmp_path / "jobs.csv")
+        assert list(jobs.partition_id) == ["p0", "p1"]
+        assert list(jobs["size"]) == [3, 4]
+
+    def test_resume(self, tmp_path, batch_backend, manager):
+        batch_backend.setup("JSON", "vector", assets={"result.json": self._collection_id})
+        # Earlier run, in which "p0" already finished.
+        output_file = tmp_path / "jobs.csv"
+        pd.DataFrame(
+            {"partition_id": ["p0", "p1"], "status": ["finished", "not_started"], "id": ["job-old", None]}
+        ).to_csv(output_file, index=False)
+        manager.ensure_job_dir_exists("job-old")
+        (manager.get_job_dir("job-old") / "result.json").write_text('{"collection": "old"}')
+        manager.get_job_metadata_path("job-old").write_text("{}")
+
+        files = run_partition_jobs(
+            self._graphs("p0",
+            "p1"),
+            manager=manager,
+            output_file=output_file,
+            columns={},
+            out_format="JSON",
+            title="Part",
+        )
+        assert [j["title"] for j in batch_backend.jobs.values()] == ["Part p1"]
+        assert {p: json.loads(f.read_text()) for p, f in files.items()} == {
+            "p0": {"collection": "old"},
+            "p1": {"collection": "S2-p1"},
+        }
+
+    def test_failed_partition(self, tmp_path, batch_backend, manager):
+        batch_backend.setup(
+            "JSON", "vector", assets={"result.json": self._collection_id}, fail=lambda job: job["title"] == "Part p1"
+        )
+        files = run_partition_jobs(
+            self._graphs("p0", "p1", "p2"),
+            manager=manager,
+            output_file=tmp_path / "jobs.csv",
+            columns={},
+            out_format="JSON",
+            title="Part",
+        )
+        assert sorted(files) == ["p0", "p2"]
+        jobs = pd.read_csv(tmp_path / "jobs.csv")
+        assert list(jobs.status) == ["finished", "error", "finished"]
+
+    def test_multiple_result_files(self, tmp_path, batch_backend, manager, caplog):
+        batch_backend.setup(
+            "JSON", "vector", assets={"result.json": self._collection_id, "extra.json": self._collection_id}
+        )
+        files = run_partition_jobs(
+            self._graphs("p0"),
+            manager=manager,
+            output_file=tmp_path / "jobs.csv",
+            columns={},
+            out_format="JSON",
+            title="Part",
+        )
+        assert files == {}
+        assert "Expected one result file for p0 (job job-0)" in caplog.text
@@ -0,0 +1,101 @@
+import json
+
+import pytest
+import time_machine
+
+from openeo.extra.job_metrics import JobManagerMetrics
+
+
+class TestJobManagerMetrics:
+    @pytest.fixture
+    def metrics(self) -> JobManagerMetrics:
+        with time_machine.travel("2023-07-01T12:00:00Z", tick=False) as traveller:
+            metrics = JobManagerMetrics()
+            metrics.job_started("foo", "j1")
+            metrics.job_status("foo", "j1", "queued")
+            metrics.job_started("foo", "j2")
+            metrics.job_start_failed("bar")
+            traveller.shift(60)
+            metrics.job_status("foo", "j1", "running")
+            metrics.job_status("foo", "j2", "queued")
+            metrics.retry("foo")
+            traveller.shift(120)
+            metrics.job_status("foo", "j1", "running")
+            metrics.job_status("foo", "j2", "running")
+            traveller.shift(180)
+            metrics.job_status(
+                "foo",
+                "j1",
+                "finished",
+                usage={"cpu": {"value": 10, "unit": "cpu-seconds"}, "memory": {"value": 20, "unit": "mb-seconds"}},
+            )
+            metrics.job_downloaded("foo", "j1", duration=3.5)
+            metrics.job_status("foo", "j2", "error", usage={"cpu": {"value": 5, "unit": "cpu-seconds"}})
+            traveller.shift(3600 - 360)
+            yield metrics
+
+    def test_report(self, metrics):
+        report = metrics.report()
+        assert report["start"] == "2023-07-01T12:00:00Z"
+        assert report["end"] == "2023-07-01T13:00:00Z"
+        assert report["elapsed"] == 3600
+        assert report["backends"]["bar"] == {
+            "jobs": 0,
+            "finished": 0,
+            "error": 0,
+            "start_failed": 1,
+            "retries": 0,
+            "polls": 0,
+            "throughput_per_hour": 0,
+            "queue_wait": {"count": 0},
+            "run_time": {"count": 0},
+            "download_time": {"count": 0},
+            "usage": {},
+        }
+        foo = report["backends"]["foo"]
+        assert foo["jobs"] == 2
+        assert foo["finished"] == 1
+        assert foo["error"] == 1
+        assert foo["retries"] == 1
+        assert foo["polls"] == 7
+        assert foo["throughput_per_hour"] == 1.0
+        assert foo["queue_wait"] == {
+            "count": 2,
+            "mean": 120.0,
+            "min": 60.0,
+            "p50": 120.0,
+            "p90": 168.0,
+            "p95": 174.0,
+            "max": 180.0,
+        }
+        assert foo["run_time"]["count"] == 2
+        assert foo["run_time"]["min"] == 180.0
+        assert foo["run_time"]["max"] == 300.0
+        assert foo["download_time"]["mean"] == 3.5
+        assert foo["usage"] == {"cpu (cpu-seconds)": 15, "memory (mb-seconds)": 20}
+
+    def test_snapshot(self, metrics):
+        snapshot = metrics.snapshot()
+        assert snapshot == {
+            "timestamp": "2023-07-01T13:00:00Z",
+            "elapsed": 3600,
+            "backends": {
+                "bar": {"statuses": {}, "start_failed": 1},
+                "foo": {"statuses": {"finished": 1, "error": 1}, "started": 2, "polls": 7, "retries": 1},
+            },
+        }
+
+    def test_write(self, metrics, tmp_path):
+        metrics.write_snapshot(tmp_path / "m.jsonl")
+        metrics.write_snapshot(tmp_path / "m.jsonl")
+        lines = (tmp_path / "m.jsonl").read_text().strip().split("\n")
+        assert len(lines) == 2
+        assert json.loads(lines[0])["backends"]["foo"]["polls"] == 7
+
+        metrics.write_report(tmp_path / "report.json")
+        assert json.loads((tmp_path / "report.json").read_text())["backends"]["foo"]["finished"] == 1
+        metrics.write_report(tmp_path / "report.html")
+        html = (tmp_path / "report.html").read_text()
+        assert html.startswith("<!DOCTYPE html>")
+        assert "<td>foo</td>" in html
+        assert "cpu (cpu-seconds): 15.00" in html
@@ -0,0 +1,82 @@
+import pandas as pd
+
+from openeo.extra.job_management import MultiBackendJobManager
+from openeo.extra.job_simulator import FakeBackend, JobManagerSimulator, VirtualClock
+
+
+class TestVirtualClock:
+    def test_basic(self):
+        clock = VirtualClock(start=1000)
+        assert clock.time() == 1000
+        clock.sleep(5)
+        assert clock.time() == 1005
+        clock.advance(-10)
+        assert clock.time() == 1005
+        assert clock.elapsed == 5
+
+
+class TestJobManagerSimulator:
+    def _simulate(self, tmp_path, poll_sleep=60, parallel_jobs=2, jobs=10, seed=42, **kwargs):
+        simulator = JobManagerSimulator(seed=seed)
+        simulator.add_backend(
+            "foo",
+            FakeBackend(
+                queue_time=lambda rng: rng.uniform(60, 120), run_time=lambda rng: rng.uniform(300, 600), **kwargs
+            ),
+            parallel_jobs=parallel_jobs,
+        )
+        tmp_path.mkdir(parents=True, exist_ok=True)
+        manager = MultiBackendJobManager(poll_sleep=poll_sleep, root_dir=tmp_path / "root")
+        output_file = tmp_path / "jobs.csv"
+        report = simulator.run(manager, df=pd.DataFrame({"year": range(jobs)}), output_file=output_file)
+        return report, pd.read_csv(output_file)
+
+    def test_basic(self, tmp_path):
+        report, result = self._simulate(tmp_path)
+        assert set(result.status) == {"finished"}
+        assert list(result.id) == [f"foo-job-{i:06d}" for i in range(10)]
+        # 10 jobs of 360-720s total, 2 in parallel
+        assert 5 * 360 < report.makespan < 5 * 720 + 300
+        foo = report.backends["foo"]
+        assert foo["jobs"] == 10
+        assert foo["finished"] == 10
+        assert 0.5 < foo["compute_utilization"] < foo["slot_utilization"] <= 1.0
+        assert 0 < foo["mean_detection_lag"] <= 60 + 1
+        assert foo["request_counts"]["POST /jobs"] == 10
+        assert foo["request_counts"]["POST /jobs/{job_id}/results"] == 10
+        assert foo["requests"] == report.request_count
+        assert report.metrics["backends"]["foo"]["finished"] == 10
+        assert report.metrics["backends"]["foo"]["run_time"]["min"] >= 300
+
+    def test_reproducible(self, tmp_path):
+        report1, _ = self._simulate(tmp_path / "1", jobs=4)
+        report2, _ = self._simulate(tmp_path / "2", jobs=4)
+        report3, _ = self._simulate(tmp_path / "3", jobs=4, seed=123)
+        assert report1.makespan == report2.makespan
+        assert report1.backends == report2.backends
+        assert report1.makespan != report3.makespan
+
+    def test_failures(self, tmp_path):
+        report, result = self._simulate(tmp_path, failure_rate=0.5)
+        assert set(result.status) == {"finished", "error"}
+        foo = report.backends["foo"]
+        assert foo["finished"] + foo["error"] == 10
+        assert foo["error"] == (result.status == "error").sum()
+        assert foo["request_counts"]["GET /jobs/{job_id}/logs"] == foo["error"]
+
+    def test_poll_sleep_tradeoff(self, tmp_path):
+        fast, _ = self._simulate(tmp_path / "fast", poll_sleep=20, jobs=6)
+        slow, _ = self._simulate(tmp_path / "slow", poll_sleep=120, jobs=6)
+        assert fast.makespan < slow.makespan
+        assert fast.request_count > slow.request_count
+        assert fast.backends["foo"]["mean_detection_lag"] < slow.backends["foo"]["mean_detection_lag"]
+
+    def test_parallel_jobs_speedup(self, tmp_path):
+        baseline, _ = self._simulate(tmp_path / "base", parallel_jobs=1, jobs=8)
+        report, _ = self._simulate(tmp_path / "sim", parallel_jobs=4, jobs=8)
+        assert baseline.makespan / report.makespan > 3
+
+    def test_rate_limit(self, tmp_path):
+        report, result = self._simulate(tmp_path, poll_sleep=5, jobs=4, max_requests_per_minute=10)
+        assert set(result.status) == {"finished"}
+        assert report.backends["foo"]["throttled"] > 0
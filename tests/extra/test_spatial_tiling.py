@@ -0,0 +1,177 @@
+import re
+
+import numpy as np
+import pandas as pd
+import pytest
+import xarray
+
+import openeo
+from openeo.extra.job_management import MultiBackendJobManager
+from openeo.extra.spatial_tiling import TileGrid, TileMosaic, run_tiled, split_cube
+from openeo.rest import OpenEoClientException
+
+API_URL = "https://oeo.test"
+
+
+def _tile_data(west: float, south: float, east: float, north: float, resolution: float = 10) -> xarray.Dataset:
+    """Tile data with pixel value equal to x + y (at pixel center)."""
+    x = np.arange(west + resolution / 2, east, resolution)
+    y = np.arange(north - resolution / 2, south, -resolution)
+    data = x[np.newaxis, :] + y[:, np.newaxis]
+    return xarray.Dataset({"ndvi": (("y", "x"), data)}, coords={"x": x, "y": y})
+
+
+class TestTileGrid:
+    def test_split(self):
+        grid = TileGrid(size=100, crs=32631)
+        tiles = grid.split({"west": 550, "south": 1020, "east": 760, "north": 1100, "crs": 32631})
+        assert [t.id for t in tiles] == ["x5_y10", "x6_y10", "x7_y10"]
+        assert [tuple(t.core.values()) for t in tiles] == [
+            (550, 1020, 600, 1100, 32631),
+            (600, 1020, 700, 1100, 32631),
+            (700, 1020, 760, 1100, 32631),
+        ]
+        assert [t.core for t in tiles] == [t.extent for t in tiles]
+
+    def test_split_overlap(self):
+        grid = TileGrid(size=100, overlap=10)
+        tiles = grid.split([0, 0, 200, 150])
+        assert [(t.id, t.extent) for t in tiles] == [
+            ("x0_y0", {"west": 0, "south": 0, "east": 110, "north": 110, "crs": 4326}),
+            ("x1_y0", {"west": 90, "south": 0, "east": 200, "north": 110, "crs": 4326}),
+            ("x0_y1", {"west": 0, "south": 90, "east": 110, "north": 150, "crs": 4326}),
+            ("x1_y1", {"west": 90, "south": 90, "east": 200, "north": 150, "crs": 4326}),
+        ]
+        assert tiles[3].core == {"west": 100, "south": 100, "east": 200, "north": 150, "crs": 4326}
+
+    def test_split_origin(self):
+        grid = TileGrid(size=100, origin=(50, 50), crs="EPSG:32631")
+        tiles = grid.split({"west": 0, "south": 0, "east": 100, "north": 100, "crs": 32631})
+        assert [t.id for t in tiles] == ["x-1_y-1", "x0_y-1", "x-1_y0", "x0_y0"]
+        assert tiles[3].core == {"west": 50, "south": 50, "east": 100, "north": 100, "crs": "EPSG:32631"}
+
+    def test_split_reproject(self):
+        pytest.importorskip("pyproj")
+        grid = TileGrid(size=10_000, crs=32631)
+        tiles = grid.split({"west": 3.0, "south": 51.0, "east": 3.2, "north": 51.1})
+        assert [t.id for t in tiles] == ["x50_y564", "x51_y564", "x50_y565", "x51_y565", "x50_y566", "x51_y566"]
+        # 3 degrees east is the central meridian of UTM zone 31
+        assert tiles[0].core["west"] == pytest.approx(500_000)
+        assert tiles[0].core["south"] == pytest.approx(5_649_824, abs=1)
+        assert all(t.core["crs"] == 32631 for t in tiles)
+
+    def test_invalid(self):
+        with pytest.raises(ValueError, match="Tile size must be positive"):
+            TileGrid(size=0)
+        with pytest.raises(ValueError, match="Invalid \\(empty\\) spatial extent"):
+            TileGrid(size=10).split([5, 5, 5, 10])
+
+
+class TestSplitCube:
+    @pytest.fixture
+    def con(self, requests_mock) -> openeo.Connection:
+        requests_mock.get(API_URL + "/", json={"api_version": "1.0.0"})
+        return openeo.connect(API_URL)
+
+    def test_split_cube(self, con):
+        bbox = {"west": 0, "south": 0, "east": 200, "north": 100, "crs": 32631}
+        cube = con.load_collection("S2", spatial_extent=bbox, fetch_metadata=False).apply("absolute")
+        tiles = split_cube(cube, grid=TileGrid(size=100, overlap=10))
+        assert [t.id for t in tiles] == ["x0_y0", "x1_y0"]
+        (first, second) = tiles.values()
+        assert first.flat_graph()["loadcollection1"]["arguments"]["spatial_extent"] == {
+            "west": 0, "south": 0, "east": 110, "north": 100, "crs": 32631,
+        }
+        assert second.flat_graph()["loadcollection1"]["arguments"]["spatial_extent"] == {
+            "west": 90, "south": 0, "east": 200, "north": 100, "crs": 32631,
+        }
+        assert second.flat_graph()["apply1"]["arguments"] == cube.flat_graph()["apply1"]["arguments"]
+        assert second.flat_graph()["resamplespatial1"] == {
+            "process_id": "resample_spatial",
+            "arguments": {
+                "data": {"from_node": "apply1"},
+                "resolution": 0,
+                "projection": 32631,
+                "method": "near",
+                "align": "upper-left",
+            },
+            "result": True,
+        }
+
+    def test_split_cube_resample_to_grid_crs(self, con):
+        bbox = {"west": 3.0, "south": 51.0, "east": 3.2, "north": 51.1}
+        cube = con.load_collection("S2", spatial_extent=bbox, fetch_metadata=False)
+        # Grid in the CRS of the (lon/lat) extent: results of e.g. a UTM collection must be reprojected.
+        tiles = split_cube(cube, grid=TileGrid(size=0.1))
+        assert len(tiles) == 2
+        for tile_cube in tiles.values():
+            assert tile_cube.flat_graph()["resamplespatial1"]["arguments"]["projection"] == 4326
+        tiles = split_cube(cube, grid=TileGrid(size=0.1, crs="EPSG:4326"))
+        for tile_cube in tiles.values():
+            assert tile_cube.flat_graph()["resamplespatial1"]["arguments"]["projection"] == 4326
+
+    def test_split_cube_explicit_extent(self, con):
+        cube = con.load_collection("S2", fetch_metadata=False)
+        with pytest.raises(OpenEoClientException, match="No bounding box `spatial_extent`"):
+            split_cube(cube, grid=TileGrid(size=100))
+        tiles = split_cube(cube, grid=TileGrid(size=100), extent=[0, 0, 100, 100])
+        assert len(tiles) == 1
+
+
+class TestTileMosaic:
+    def test_to_xarray(self, tmp_path):
+        tiles = TileGrid(size=100, overlap=20).split({"west": 0, "south": 0, "east": 200, "north": 200, "crs": 32631})
+        files = {}
+        for tile in tiles:
+            files[tile.id] = tmp_path / f"{tile.id}.nc"
+            _tile_data(*[tile.extent[k] for k in ["west", "south", "east", "north"]]).to_netcdf(files[tile.id])
+        mosaic = TileMosaic(tiles=tiles, files=files)
+        assert mosaic.missing == []
+        ds = mosaic.to_xarray()
+        expected = _tile_data(0, 0, 200, 200)
+        assert ds.sizes == {"x": 20, "y": 20}
+        xarray.testing.assert_equal(ds.sortby("y", ascending=False), expected)
+
+    def test_missing(self, tmp_path):
+        tiles = TileGrid(size=100).split([0, 0, 200, 100])
+        path = tmp_path / "tile.nc"
+        _tile_data(0, 0, 100, 100).to_netcdf(path)
+        mosaic = TileMosaic(tiles=tiles, files={"x0_y0": path})
+        assert mosaic.missing == [tiles[1]]
+        with pytest.raises(OpenEoClientException, match=re.escape("Missing results of tiles ['x1_y0']")):
+            mosaic.to_xarray()
+
+
+class TestRunTiled:
+    @pytest.fixture
+    def backend(self, batch_backend, tmp_path):
+        """Fake backend where tile jobs have a NetCDF asset of the tile extent."""
+
+        def tile_asset(graph: dict) -> bytes:
+            extent = graph["loadcollection1"]["arguments"]["spatial_extent"]
+            path = tmp_path / "asset.nc"
+            _tile_data(*[extent[k] for k in ["west", "south", "east", "north"]]).to_netcdf(path, engine="netcdf4")
+            return path.read_bytes()
+
+        return batch_backend.setup("netCDF", "raster", assets={"result.nc": tile_asset}).jobs
+
+    def test_run_tiled(self, tmp_path, backend):
+        connection = openeo.connect(API_URL)
+        bbox = {"west": 0, "south": 0, "east": 300, "north": 200, "crs": 32631}
+        cube = connection.load_collection("S2", spatial_extent=bbox, fetch_metadata=False)
+
+        manager = MultiBackendJobManager(poll_sleep=0, root_dir=tmp_path / "root")
+        manager.add_backend("foo", connection=connection, parallel_jobs=4)
+        grid = TileGrid(size=100, overlap=20)
+        mosaic = run_tiled(cube, grid=grid, manager=manager, output_file=tmp_path / "tiles.csv", title="NDVI")
+
+        assert len(backend) == 6
+        assert sorted(j["title"] for j in backend.values())[:2] == ["NDVI x0_y0", "NDVI x0_y1"]
+        assert [j["process"]["process_graph"]["saveresult1"]["arguments"]["format"] for j in backend.values()] == [
+            "netCDF"
+        ] * 6
+        jobs = pd.read_csv(tmp_path / "tiles.csv")
+        assert set(jobs.status) == {"finished"}
+        assert mosaic.missing == []
+        ds = mosaic.to_xarray()
+        xarray.testing.assert_equal(ds.sortby("y", ascending=False), _tile_data(0, 0, 300, 200))
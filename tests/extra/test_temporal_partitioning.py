@@ -0,0 +1,245 @@
+import datetime
+import json
+import re
+
+import numpy as np
+import pandas as pd
+import pytest
+import xarray
+
+import openeo
+from openeo.extra.job_management import MultiBackendJobManager
+from openeo.extra.temporal_partitioning import (
+    TemporalResults,
+    TimeWindows,
+    run_temporal,
+    split_cube_temporal,
+    temporal_graph,
+)
+from openeo.rest import OpenEoClientException
+
+API_URL = "https://oeo.test"
+
+
+def _dates(start: str, end: str, step_days: int = 5) -> pd.DatetimeIndex:
+    return pd.date_range(start, end, freq=f"{step_days}D", inclusive="left")
+
+
+def _timeseries_json(start: str, end: str) -> dict:
+    """Time series JSON (like from `aggregate_spatial`): value of polygon i is day of year + i."""
+    return {
+        d.strftime("%Y-%m-%dT%H:%M:%SZ"): [[float(d.dayofyear + i)] for i in range(2)] for d in _dates(start, end)
+    }
+
+
+class TestTimeWindows:
+    def test_split_year(self):
+        windows = TimeWindows("year").split(["2015-07-01", "2018-03-01"])
+        assert [(w.id, w.extent) for w in windows] == [
+            ("2015-07-01_2016-01-01", ("2015-07-01", "2016-01-01")),
+            ("2016-01-01_2017-01-01", ("2016-01-01", "2017-01-01")),
+            ("2017-01-01_2018-01-01", ("2017-01-01", "2018-01-01")),
+            ("2018-01-01_2018-03-01", ("2018-01-01", "2018-03-01")),
+        ]
+
+    def test_split_quarter_overlap(self):
+        windows = TimeWindows("quarter", overlap=10).split(["2020-02-10", "2020-08-01"])
+        assert [(w.core, w.extent) for w in windows] == [
+            (("2020-02-10", "2020-04-01"), ("2020-02-10", "2020-04-11")),
+            (("2020-04-01", "2020-07-01"), ("2020-03-22", "2020-07-11")),
+            (("2020-07-01", "2020-08-01"), ("2020-06-21", "2020-08-01")),
+        ]
+
+    def test_split_fixed_length(self):
+        windows = TimeWindows(datetime.timedelta(hours=36)).split(["2020-01-01", "2020-01-04"])
+        assert [w.extent for w in windows] == [
+            ("2020-01-01T00:00:00Z", "2020-01-02T12:00:00Z"),
+            ("2020-01-02T12:00:00Z", "2020-01-04T00:00:00Z"),
+        ]
+
+    def test_split_datetime_strings(self):
+        windows = TimeWindows("year").split(["2019-06-01T12:00:00Z", "2020-03-01T00:00:00Z"])
+        assert [w.extent for w in windows] == [
+            ("2019-06-01T12:00:00Z", "2020-01-01T00:00:00Z"),
+            ("2020-01-01T00:00:00Z", "2020-03-01T00:00:00Z"),
+        ]
+
+    def test_invalid(self):
+        with pytest.raises(ValueError, match="Invalid window 'decade'"):
+            TimeWindows("decade")
+        with pytest.raises(ValueError, match="Window length must be positive"):
+            TimeWindows(0)
+        with pytest.raises(ValueError, match="Expected bounded temporal extent"):
+            TimeWindows("year").split(["2020-01-01", None])
+        with pytest.raises(ValueError, match="Invalid \\(empty\\) temporal extent"):
+            TimeWindows("year").split(["2020-01-01", "2020-01-01"])
+
+
+class TestSplitCubeTemporal:
+    @pytest.fixture
+    def con(self, requests_mock) -> openeo.Connection:
+        requests_mock.get(API_URL + "/", json={"api_version": "1.0.0"})
+        return openeo.connect(API_URL)
+
+    def test_temporal_graph(self):
+        flat_graph = {
+            "lc": {"process_id": "load_collection", "arguments": {"id": "S2", "temporal_extent": None}},
+            "ft": {
+                "process_id": "filter_temporal",
+                "arguments": {"data": {"from_node": "lc"}, "extent": ["2020-03-01", None]},
+                "result": True,
+            },
+        }
+        assert temporal_graph(flat_graph, ("2020-01-01", "2021-01-01")) == {
+            "lc": {
+                "process_id": "load_collection",
+                "arguments": {"id": "S2", "temporal_extent": ["2020-01-01", "2021-01-01"]},
+            },
+            "ft": {
+                "process_id": "filter_temporal",
+                "arguments": {"data": {"from_node": "lc"}, "extent": ["2020-03-01", "2021-01-01"]},
+                "result": True,
+            },
+        }
+        assert flat_graph["lc"]["arguments"]["temporal_extent"] is None
+
+    def test_temporal_graph_empty(self):
+        flat_graph = {
+            "lc": {"process_id": "load_collection", "arguments": {"id": "S2", "temporal_extent": None}},
+            "ft": {
+                "process_id": "filter_temporal",
+                "arguments": {"data": {"from_node": "lc"}, "extent": ["2020-03-01", "2020-06-01"]},
+                "result": True,
+            },
+        }
+        assert temporal_graph(flat_graph, ("2020-06-01", "2021-01-01")) is None
+        assert temporal_graph(flat_graph, ("2019-01-01", "2020-03-01")) is None
+        assert temporal_graph(flat_graph, ("2020-05-01", "2021-01-01"))["ft"]["arguments"]["extent"] == [
+            "2020-05-01",
+            "2020-06-01",
+        ]
+
+    def test_split_cube_temporal(self, con):
+        cube = con.load_collection("S2", temporal_extent=["2019-06-01", "2021-01-01"], fetch_metadata=False)
+        cube = cube.filter_temporal("2019-01-01", "2020-09-01")
+        windows = split_cube_temporal(cube, windows=TimeWindows("year"))
+        assert [w.id for w in windows] == ["2019-06-01_2020-01-01", "2020-01-01_2020-09-01"]
+        (first, second) = windows.values()
+        assert first.flat_graph()["loadcollection1"]["arguments"]["temporal_extent"] == ["2019-06-01", "2020-01-01"]
+        assert first.flat_graph()["filtertemporal1"]["arguments"]["extent"] == ["2019-06-01", "2020-01-01"]
+        assert second.flat_graph()["loadcollection1"]["arguments"]["temporal_extent"] == ["2020-01-01", "2020-09-01"]
+        assert second.flat_graph()["filtertemporal1"]["arguments"]["extent"] == ["2020-01-01", "2020-09-01"]
+
+    def test_split_cube_temporal_unbounded(self, con):
+        cube = con.load_collection("S2", temporal_extent=["2019-06-01", None], fetch_metadata=False)
+        with pytest.raises(OpenEoClientException, match="No bounded temporal extent"):
+            split_cube_temporal(cube, windows=TimeWindows("year"))
+        windows = split_cube_temporal(cube, windows=TimeWindows("year"), extent=["2020-01-01", "2022-01-01"])
+        assert len(windows) == 2
+
+    def test_split_cube_temporal_explicit_extent_outside_filter(self, con):
+        cube = con.load_collection("S2", temporal_extent=["2018-01-01", "2021-01-01"], fetch_metadata=False)
+        cube = cube.filter_temporal("2019-03-01", "2019-09-01")
+        windows = split_cube_temporal(cube, windows=TimeWindows("year"), extent=["2018-01-01", "2021-01-01"])
+        # Only the window that overlaps with the `filter_temporal` extent.
+        assert [w.id for w in windows] == ["2019-01-01_2020-01-01"]
+        (window_cube,) = windows.values()
+        assert window_cube.flat_graph()["filtertemporal1"]["arguments"]["extent"] == ["2019-03-01", "2019-09-01"]
+
+    def test_split_cube_temporal_empty(self, con):
+        cube = con.load_collection("S2", temporal_extent=["2018-01-01", "2019-01-01"], fetch_metadata=False)
+        cube = cube.filter_temporal("2020-01-01", "2021-01-01")
+        with pytest.raises(OpenEoClientException, match="Empty temporal extent"):
+            split_cube_temporal(cube, windows=TimeWindows("year"))
+
+
+class TestTemporalResults:
+    @pytest.fixture
+    def windows(self):
+        return TimeWindows("year", overlap=30).split(["2019-06-01", "2021-03-01"])
+
+    def test_json(self, tmp_path, windows):
+        files = {}
+        for window in windows:
+            files[window.id] = tmp_path / f"{window.id}.json"
+            files[window.id].write_text(json.dumps(_timeseries_json(*window.extent)))
+        df = TemporalResults(windows=windows, files=files).to_pandas()
+        expected = openeo.rest.conversions.timeseries_json_to_pandas(_timeseries_json("2019-06-01", "2021-03-01"))
+        # Overlap removed, so no duplicate dates
+        assert df.index.is_unique
+        # Windows use different date grid (start of each window extent), so only check a range of dates.
+        assert df.index[0] == "2019-06-01T00:00:00Z"
+        assert df.index[-1] < "2021-03-01"
+        assert list(df.columns) == list(expected.columns)
+        assert df.index.is_monotonic_increasing
+
+    def test_csv(self, tmp_path, windows):
+        files = {}
+        for window in windows:
+            dates = _dates(*window.extent)
+            df = pd.DataFrame({"date": dates.strftime("%Y-%m-%d"), "feature_index": 0, "ndvi": dates.dayofyear})
+            files[window.id] = tmp_path / f"{window.id}.csv"
+            df.to_csv(files[window.id], index=False)
+        df = TemporalResults(windows=windows, files=files).to_pandas()
+        assert df["date"].is_unique
+        assert df["date"].is_monotonic_increasing
+        assert (df["date"].iloc[0], df["date"].iloc[-1]) == ("2019-06-01", "2021-02-25")
+        assert "2019-12-28" in set(df["date"])
+        # Date of the overlap of the second window (which starts 30 days before 2020-01-01) is dropped.
+        assert "2019-12-02" not in set(df["date"])
+
+    def test_netcdf(self, tmp_path, windows):
+        files = {}
+        for window in windows:
+            t = _dates(*window.extent)
+            files[window.id] = tmp_path / f"{window.id}.nc"
+            xarray.Dataset({"ndvi": (("t",), np.arange(len(t)))}, coords={"t": t}).to_netcdf(files[window.id])
+        results = TemporalResults(windows=windows, files=files)
+        ds = results.to_xarray()
+        t = pd.to_datetime(ds.t.values)
+        assert t.is_unique and t.is_monotonic_increasing
+        assert t[0] == pd.Timestamp("2019-06-01")
+        assert t[-1] < pd.Timestamp("2021-03-01")
+        assert len(results.to_pandas()) == ds.sizes["t"]
+
+    def test_missing(self, tmp_path, windows):
+        results = TemporalResults(windows=windows, files={})
+        assert results.missing == windows
+        expected = re.escape("Missing results of windows ['2019-06-01_2020-01-01', '2020-01-01_2021-01-01'")
+        with pytest.raises(OpenEoClientException, match=expected):
+            results.to_xarray()
+
+
+class TestRunTemporal:
+    @pytest.fixture
+    def backend(self, batch_backend):
+        """Fake backend where window jobs have a time series JSON asset of the window."""
+
+        def timeseries_asset(graph: dict) -> dict:
+            return _timeseries_json(*graph["loadcollection1"]["arguments"]["temporal_extent"])
+
+        return batch_backend.setup("JSON", "vector", assets={"timeseries.json": timeseries_asset}).jobs
+
+    def test_run_temporal(self, tmp_path, backend):
+        connection = openeo.connect(API_URL)
+        cube = connection.load_collection("S2", temporal_extent=["2018-01-01", "2021-01-01"], fetch_metadata=False)
+        timeseries = cube.aggregate_spatial(geometries={"type": "Point", "coordinates": [3, 51]}, reducer="mean")
+
+        manager = MultiBackendJobManager(poll_sleep=0, root_dir=tmp_path / "root")
+        manager.add_backend("foo", connection=connection, parallel_jobs=3)
+        results = run_temporal(timeseries, windows=TimeWindows("year"), manager=manager, output_file=tmp_path / "w.csv")
+
+        assert sorted(j["title"] for j in backend.values()) == [
+            "Window 2018-01-01_2019-01-01",
+            "Window 2019-01-01_2020-01-01",
+            "Window 2020-01-01_2021-01-01",
+        ]
+        assert [j["process"]["process_graph"]["saveresult1"]["arguments"]["format"] for j in backend.values()] == [
+            "JSON"
+        ] * 3
+        jobs = pd.read_csv(tmp_path / "w.csv")
+        assert list(jobs.partition_id) == [w.id for w in results.windows]
+        assert set(jobs.status) == {"finished"}
+        df = results.to_pandas()
+        assert df.index.is_unique and df.index.is_monotonic_increasing
+        assert (df.index[0], df.index[-1]) == ("2018-01-01T00:00:00Z", "2020-12-31T00:00:00Z")
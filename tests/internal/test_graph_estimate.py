@@ -0,0 +1,187 @@
+import pytest
+
+from openeo.internal.graph_estimate import estimate_volume
+from openeo.internal.process_graph_visitor import ProcessGraphVisitException
+from openeo.metadata import CollectionMetadata
+
+S2_METADATA = {
+    "id": "S2",
+    "extent": {
+        "spatial": {"bbox": [[-180, -56, 180, 83]]},
+        "temporal": {"interval": [["2015-07-01T00:00:00Z", None]]},
+    },
+    "cube:dimensions": {
+        "x": {"type": "spatial", "axis": "x", "step": 10, "reference_system": 32631},
+        "y": {"type": "spatial", "axis": "y", "step": 10, "reference_system": 32631},
+        "t": {"type": "temporal", "extent": ["2015-07-01T00:00:00Z", None], "step": "P5D"},
+        "bands": {"type": "bands", "values": ["B02", "B03", "B04", "B08"]},
+    },
+}
+
+UTM_EXTENT = {"west": 500000, "south": 5600000, "east": 510000, "north": 5610000, "crs": 32631}
+
+
+def _metadata(collection_id: str):
+    if collection_id == "S2":
+        return CollectionMetadata(S2_METADATA)
+    return None
+
+
+def _load(**arguments) -> dict:
+    return {
+        "process_id": "load_collection",
+        "arguments": {
+            "id": "S2",
+            "spatial_extent": UTM_EXTENT,
+            "temporal_extent": ["2020-01-01", "2020-02-01"],
+            "bands": ["B04", "B08"],
+            **arguments,
+        },
+    }
+
+
+def _node(process_id: str, data: str, result: bool = False, **arguments) -> dict:
+    node = {"process_id": process_id, "arguments": {"data": {"from_node": data}, **arguments}}
+    if result:
+        node["result"] = True
+    return node
+
+
+class TestEstimateVolume:
+    def test_load_collection(self):
+        estimate = estimate_volume({"lc": {**_load(), "result": True}}, metadata=_metadata)
+        expected = {
+            "width": 1000,
+            "height": 1000,
+            "bands": 2,
+            "time_steps": 7,
+            "pixels": 1000000,
+            "values": 14000000,
+            "bytes": 56000000,
+        }
+        assert estimate.inputs["lc"].to_dict() == expected
+        assert estimate.output.to_dict() == expected
+        assert estimate.input_bytes == 56000000
+        assert estimate.warnings == []
+
+    def test_geographic_extent(self):
+        spatial_extent = {"west": 3.0, "south": 51.0, "east": 3.1, "north": 51.1}
+        estimate = estimate_volume({"lc": {**_load(spatial_extent=spatial_extent), "result": True}}, _metadata)
+        # Roughly 7km x 11km
+        assert estimate.output.width == 700
+        assert estimate.output.height == 1106
+
+    def test_filters(self):
+        flat_graph = {
+            "lc": _load(bands=None),
+            "fb": _node("filter_bands", "lc", bands=["B04"]),
+            "ft": _node("filter_temporal", "fb", extent=["2020-01-11", "2020-06-01"]),
+            "fs": _node(
+                "filter_bbox",
+                "ft",
+                result=True,
+                extent={"west": 500000, "south": 5600000, "east": 502000, "north": 5601000, "crs": 32631},
+            ),
+        }
+        estimate = estimate_volume(flat_graph, metadata=_metadata)
+        assert estimate.inputs["lc"].to_dict()["bands"] == 4
+        assert estimate.output.to_dict() == {
+            "width": 200,
+            "height": 100,
+            "bands": 1,
+            "time_steps": 5,
+            "pixels": 20000,
+            "values": 100000,
+            "bytes": 400000,
+        }
+
+    def test_reduce_and_resample(self):
+        flat_graph = {
+            "lc": _load(),
+            "rs": _node("resample_spatial", "lc", resolution=20),
+            "rt": _node("reduce_dimension", "rs", dimension="t", reducer={}),
+            "rb": _node("reduce_dimension", "rt", dimension="bands", reducer={}, result=True),
+        }
+        estimate = estimate_volume(flat_graph, metadata=_metadata, bytes_per_value=8)
+        assert estimate.inputs["lc"].bytes == 112000000
+        assert estimate.output.to_dict() == {
+            "width": 500,
+            "height": 500,
+            "bands": 1,
+            "time_steps": 1,
+            "pixels": 250000,
+            "values": 250000,
+            "bytes": 2000000,
+        }
+
+    def test_aggregate_temporal_period(self):
+        flat_graph = {
+            "lc": _load(temporal_extent=["2020-01-01", "2021-01-01"]),
+            "ag": _node("aggregate_temporal_period", "lc", period="month", reducer={}, result=True),
+        }
+        estimate = estimate_volume(flat_graph, metadata=_metadata)
+        assert estimate.inputs["lc"].time_steps == 74
+        assert estimate.output.time_steps == 12
+
+    def test_merge_cubes(self):
+        flat_graph = {
+            "lc1": _load(bands=["B02", "B03"]),
+            "lc2": _load(bands=["B03", "B04", "B08"]),
+            "mc": {
+                "process_id": "merge_cubes",
+                "arguments": {"cube1": {"from_node": "lc1"}, "cube2": {"from_node": "lc2"}},
+                "result": True,
+            },
+        }
+        estimate = estimate_volume(flat_graph, metadata=_metadata)
+        assert estimate.inputs["lc1"].bands == 2
+        assert estimate.inputs["lc2"].bands == 3
+        assert estimate.input_bytes == 5 * 7 * 1000 * 1000 * 4
+        assert estimate.output.bands == 4
+
+    def test_aggregate_spatial(self):
+        geometries = {
+            "type": "FeatureCollection",
+            "features": [
+                {"type": "Feature", "properties": {}, "geometry": {"type": "Point", "coordinates": [3, 51]}},
+                {"type": "Feature", "properties": {}, "geometry": {"type": "Point", "coordinates": [4, 52]}},
+            ],
+        }
+        flat_graph = {
+            "lc": _load(),
+            "as": _node("aggregate_spatial", "lc", geometries=geometries, reducer={}, result=True),
+        }
+        estimate = estimate_volume(flat_graph, metadata=_metadata)
+        assert estimate.output.values == 2 * 2 * 7
+
+    def test_unknown_metadata(self):
+        estimate = estimate_volume({"lc": {**_load(id="S3"), "result": True}}, metadata=_metadata)
+        assert estimate.output.bytes is None
+        assert estimate.input_bytes is None
+        assert estimate.warnings == [
+            "lc: no metadata for collection 'S3'",
+            "lc: unknown spatial resolution of collection 'S3'",
+        ]
+        assert estimate.exceeds(max_input_bytes=1000)
+        assert not estimate.exceeds()
+
+    def test_unbounded(self):
+        estimate = estimate_volume(
+            {"lc": {**_load(spatial_extent=None, temporal_extent=None), "result": True}}, metadata=_metadata
+        )
+        assert estimate.warnings == [
+            "lc: no spatial extent: using full extent of collection 'S2'",
+            "lc: no temporal extent: using full extent of collection 'S2'",
+        ]
+        assert estimate.output.time_steps > 365
+        assert estimate.exceeds(max_input_bytes=10 * 1024 ** 4)
+
+    def test_exceeds(self):
+        estimate = estimate_volume({"process_graph": {"lc": {**_load(), "result": True}}}, metadata=_metadata)
+        assert not estimate.exceeds(max_input_bytes=100000000, max_output_bytes=100000000)
+        assert estimate.exceeds(max_input_bytes=1000000)
+        assert estimate.exceeds(max_output_bytes=1000000)
+
+    def test_no_result_node(self):
+        with pytest.raises(ProcessGraphVisitException, match="Expected exactly one result node"):
+            estimate_volume({"lc": _load()}, metadata=_metadata)
@@ -0,0 +1,522 @@
+import copy
+import math
+import random
+
+import pytest
+
+import openeo.processes
+from openeo.internal.graph_optimizer import OptimizationResult, optimize_flat_graph
+from openeo.internal.processes.builder import convert_callable_to_pgnode
+
+
+def _load(**arguments) -> dict:
+    return {"process_id": "load_collection", "arguments": {"id": "S2", "spatial_extent": None, **arguments}}
+
+
+def _node(process_id: str, data: str, result: bool = False, **arguments) -> dict:
+    node = {"process_id": process_id, "arguments": {"data": {"from_node": data}, **arguments}}
+    if result:
+        node["result"] = True
+    return node
+
+
+def _callback(process_id: str, parameter: str = "x", **arguments) -> dict:
+    return {
+        "process_graph": {
+            process_id
+            + "1": {
+                "process_id": process_id,
+                "arguments": {"x": {"from_parameter": parameter}, **arguments},
+                "result": True,
+            }
+        }
+    }
+
+
+BBOX = {"west": 3, "south": 51, "east": 4, "north": 52}
+
+
+class TestPushDownFilters:
+    def test_filter_bbox(self):
+        flat_graph = {
+            "lc": _load(),
+            "fb": _node("filter_bbox", "lc", extent=BBOX),
+            "sr": _node("save_result", "fb", result=True, format="GTiff"),
+        }
+        original = copy.deepcopy(flat_graph)
+        result = optimize_flat_graph(flat_graph)
+        assert result.flat_graph == {
+            "lc": _load(spatial_extent=BBOX),
+            "sr": _node("save_result", "lc", result=True, format="GTiff"),
+        }
+        assert result.rewrites == [("push_down_filters", "pushed filter_bbox 'fb' into load_collection 'lc'")]
+        assert flat_graph == original
+
+    def test_filter_result_node(self):
+        flat_graph = {"lc": _load(), "fb": _node("filter_bbox", "lc", result=True, extent=BBOX)}
+        result = optimize_flat_graph(flat_graph)
+        assert result.flat_graph == {"lc": {**_load(spatial_extent=BBOX), "result": True}}
+
+    def test_through_apply_and_reduce(self):
+        flat_graph = {
+            "lc": _load(temporal_extent=["2022-01-01", "2022-12-01"], bands=["B02", "B03", "B04"]),
+            "ap": _node("apply", "lc", process=_callback("absolute")),
+            "rd": _node("reduce_dimension", "ap", dimension="t", reducer=_callback("mean", "data")),
+            "fb": _node("filter_bbox", "rd", extent=BBOX),
+            "fbd": _node("filter_bands", "fb", bands=["B04", "B03"]),
+            "sr": _node("save_result", "fbd", result=True, format="GTiff"),
+        }
+        result = optimize_flat_graph(flat_graph)
+        assert result.flat_graph == {
+            "lc": _load(temporal_extent=["2022-01-01", "2022-12-01"], bands=["B04", "B03"], spatial_extent=BBOX),
+            "ap": _node("apply", "lc", process=_callback("absolute")),
+            "rd": _node("reduce_dimension", "ap", dimension="t", reducer=_callback("mean", "data")),
+            "sr": _node("save_result", "rd", result=True, format="GTiff"),
+        }
+        assert [m for r, m in result.rewrites] == [
+            "pushed filter_bbox 'fb' into load_collection 'lc' (through 'rd', 'ap')",
+            "pushed filter_bands 'fbd' into load_collection 'lc' (through 'rd', 'ap')",
+        ]
+
+    def test_not_through_temporal_reduce(self):
+        flat_graph = {
+            "lc": _load(),
+            "rd": _node("reduce_dimension", "lc", dimension="t", reducer=_callback("mean", "data")),
+            "ft": _node("filter_temporal", "rd", result=True, extent=["2022-01-01", "2022-02-01"]),
+        }
+        result = optimize_flat_graph(flat_graph)
+        assert result.flat_graph == flat_graph
+        assert not result.changed
+
+    @pytest.mark.parametrize("process_id", ["resample_spatial", "apply_kernel", "mask"])
+    def test_not_through_other_processes(self, process_id):
+        flat_graph = {
+            "lc": _load(),
+            "p": _node(process_id, "lc"),
+            "fb": _node("filter_bbox", "p", result=True, extent=BBOX),
+        }
+        assert optimize_flat_graph(flat_graph).flat_graph == flat_graph
+
+    def test_shared_load_collection(self):
+        flat_graph = {
+            "lc": _load(),
+            "fb": _node("filter_bbox", "lc", extent=BBOX),
+            "mg": {
+                "process_id": "merge_cubes",
+                "arguments": {"cube1": {"from_node": "fb"}, "cube2": {"from_node": "lc"}},
+                "result": True,
+            },
+        }
+        assert optimize_flat_graph(flat_graph).flat_graph == flat_graph
+
+    def test_shared_intermediate_node(self):
+        flat_graph = {
+            "lc": _load(),
+            "ap": _node("apply", "lc", process=_callback("absolute")),
+            "fb": _node("filter_bbox", "ap", extent=BBOX),
+            "mg": {
+                "process_id": "merge_cubes",
+                "arguments": {"cube1": {"from_node": "fb"}, "cube2": {"from_node": "ap"}},
+                "result": True,
+            },
+        }
+        assert optimize_flat_graph(flat_graph).flat_graph == flat_graph
+
+    @pytest.mark.parametrize(
+        ["current", "extent", "expected"],
+        [
+            ({"west": 2, "south": 50, "east": 3.5, "north": 53}, BBOX, {"west": 3, "south": 51, "east": 3.5, "north": 52}),
+            ({**BBOX, "crs": "EPSG:4326"}, BBOX, {**BBOX, "crs": "EPSG:4326"}),
+            ({**BBOX, "crs": 32631}, BBOX, None),
+            ({"west": 5, "south": 51, "east": 6, "north": 52}, BBOX, None),
+            ({"type": "Polygon", "coordinates": []}, BBOX, None),
+        ],
+    )
+    def test_merge_spatial_extent(self, current, extent, expected):
+        flat_graph = {"lc": _load(spatial_extent=current), "fb": _node("filter_bbox", "lc", result=True, extent=extent)}
+        result = optimize_flat_graph(flat_graph)
+        if expected:
+            assert result.flat_graph == {"lc": {**_load(spatial_extent=expected), "result": True}}
+        else:
+            assert result.flat_graph == flat_graph
+
+    @pytest.mark.parametrize(
+        ["current", "extent", "expected"],
+        [
+            (["2022-01-01", "2022-06-01"], ["2022-03-01", "2022-09-01"], ["2022-03-01", "2022-06-01"]),
+            (["2022-01-01", None], [None, "2022-09-01"], ["2022-01-01", "2022-09-01"]),
+            (["2022-01-01", "2022-06-01"], ["2022-03-01T00:00:00Z", "2022-09-01T00:00:00Z"], None),
+            (["2022-01-01", "2022-02-01"], ["2022-03-01", "2022-09-01"], None),
+        ],
+    )
+    def test_merge_temporal_extent(self, current, extent, expected):
+        flat_graph = {
+            "lc": _load(temporal_extent=current),
+            "ft": _node("filter_temporal", "lc", result=True, extent=extent),
+        }
+        result = optimize_flat_graph(flat_graph)
+        if expected:
+            assert result.flat_graph == {"lc": {**_load(temporal_extent=expected), "result": True}}
+        else:
+            assert result.flat_graph == flat_graph
+
+    def test_bands_not_subset(self):
+        flat_graph = {
+            "lc": _load(bands=["B02", "B03"]),
+            "fb": _node("filter_bands", "lc", result=True, bands=["B04"]),
+        }
+        assert optimize_flat_graph(flat_graph).flat_graph == flat_graph
+
+    def test_consecutive_filters(self):
+        flat_graph = {
+            "lc": _load(),
+            "fb1": _node("filter_bands", "lc", bands=["B02", "B03", "B04"]),
+            "fb2": _node("filter_bands", "fb1", result=True, bands=["B04", "B03"]),
+        }
+        result = optimize_flat_graph(flat_graph)
+        assert result.flat_graph == {"lc": {**_load(bands=["B04", "B03"]), "result": True}}
+
+
+class TestFuseCallbacks:
+    def test_apply(self):
+        flat_graph = {
+            "lc": _load(),
+            "ap1": _node("apply", "lc", process=_callback("absolute")),
+            "ap2": _node("apply", "ap1", result=True, process=_callback("add", y=1)),
+        }
+        result = optimize_flat_graph(flat_graph)
+        assert result.flat_graph == {
+            "lc": _load(),
+            "ap2": _node(
+                "apply",
+                "lc",
+                result=True,
+                process={
+                    "process_graph": {
+                        "absolute1": {"process_id": "absolute", "arguments": {"x": {"from_parameter": "x"}}},
+                        "add1": {
+                            "process_id": "add",
+                            "arguments": {"x": {"from_node": "absolute1"}, "y": 1},
+                            "result": True,
+                        },
+                    }
+                },
+            ),
+        }
+        assert result.rewrites == [("fuse_callbacks", "fused apply 'ap1' into 'ap2'")]
+
+    def test_apply_chain_with_id_collisions(self):
+        flat_graph = {
+            "lc": _load(),
+            "ap1": _node("apply", "lc", process=_callback("add", y=1)),
+            "ap2": _node("apply", "ap1", process=_callback("add", y=2)),
+            "ap3": _node("apply", "ap2", result=True, process=_callback("add", y=3)),
+        }
+        result = optimize_flat_graph(flat_graph)
+        assert set(result.flat_graph) == {"lc", "ap3"}
+        callback = result.flat_graph["ap3"]["arguments"]["process"]["process_graph"]
+        assert callback == {
+            "add1_2": {"process_id": "add", "arguments": {"x": {"from_parameter": "x"}, "y": 1}},
+            "add1_3": {"process_id": "add", "arguments": {"x": {"from_node": "add1_2"}, "y": 2}},
+            "add1": {"process_id": "add", "arguments": {"x": {"from_node": "add1_3"}, "y": 3}, "result": True},
+        }
+
+    def test_apply_with_context(self):
+        flat_graph = {
+            "lc": _load(),
+            "ap1": _node("apply", "lc", process=_callback("add", y={"from_parameter": "context"}), context=5),
+            "ap2": _node("apply", "ap1", result=True, process=_callback("absolute")),
+        }
+        assert optimize_flat_graph(flat_graph).flat_graph == flat_graph
+
+    def test_apply_shared(self):
+        flat_graph = {
+            "lc": _load(),
+            "ap1": _node("apply", "lc", process=_callback("absolute")),
+            "ap2": _node("apply", "ap1", process=_callback("add", y=1)),
+            "mg": {
+                "process_id": "merge_cubes",
+                "arguments": {"cube1": {"from_node": "ap1"}, "cube2": {"from_node": "ap2"}},
+                "result": True,
+            },
+        }
+        assert optimize_flat_graph(flat_graph).flat_graph == flat_graph
+
+    def test_apply_dimension(self):
+        flat_graph = {
+            "lc": _load(),
+            "ad1": _node("apply_dimension", "lc", dimension="t", process=_callback("cumsum", "data")),
+            "ad2": _node("apply_dimension", "ad1", result=True, dimension="t", process=_callback("sort", "data")),
+        }
+        result = optimize_flat_graph(flat_graph)
+        assert set(result.flat_graph) == {"lc", "ad2"}
+        assert result.flat_graph["ad2"]["arguments"]["process"]["process_graph"] == {
+            "cumsum1": {"process_id": "cumsum", "arguments": {"x": {"from_parameter": "data"}}},
+            "sort1": {"process_id": "sort", "arguments": {"x": {"from_node": "cumsum1"}}, "result": True},
+        }
+
+    def test_apply_dimension_different_dimensions(self):
+        flat_graph = {
+            "lc": _load(),
+            "ad1": _node("apply_dimension", "lc", dimension="t", process=_callback("cumsum", "data")),
+            "ad2": _node("apply_dimension", "ad1", result=True, dimension="bands", process=_callback("sort", "data")),
+        }
+        assert optimize_flat_graph(flat_graph).flat_graph == flat_graph
+
+
+class TestRemoveDeadNodes:
+    def test_basic(self):
+        flat_graph = {
+            "lc": _load(),
+            "lc2": _load(id="S1"),
+            "ap": _node("apply", "lc2", process=_callback("absolute")),
+            "sr": _node("save_result", "lc", result=True, format="GTiff"),
+        }
+        result = optimize_flat_graph(flat_graph)
+        assert result.flat_graph == {"lc": _load(), "sr": _node("save_result", "lc", result=True, format="GTiff")}
+        assert result.rewrites == [("remove_dead_nodes", "removed 'lc2', 'ap'")]
+
+    def test_keep_side_effects(self):
+        flat_graph = {
+            "lc": _load(),
+            "sr1": _node("save_result", "lc", format="GTiff"),
+            "udp": {"process_id": "my_process", "namespace": "user", "arguments": {}},
+            "sr2": _node("save_result", "lc", result=True, format="netCDF"),
+        }
+        assert optimize_flat_graph(flat_graph).flat_graph == flat_graph
+
+    def test_in_callback(self):
+        flat_graph = {
+            "lc": _load(),
+            "ap": _node(
+                "apply",
+                "lc",
+                result=True,
+                process={
+                    "process_graph": {
+                        "unused": {"process_id": "cos", "arguments": {"x": {"from_parameter": "x"}}},
+                        "absolute1": {
+                            "process_id": "absolute",
+                            "arguments": {"x": {"from_parameter": "x"}},
+                            "result": True,
+                        },
+                    }
+                },
+            ),
+        }
+        result = optimize_flat_graph(flat_graph)
+        assert result.flat_graph == {"lc": _load(), "ap": _node("apply", "lc", result=True, process=_callback("absolute"))}
+        assert result.rewrites == [("remove_dead_nodes", "removed 'unused' in callback of 'ap'")]
+
+
+def test_rules_selection():
+    flat_graph = {
+        "lc": _load(),
+        "ap1": _node("apply", "lc", process=_callback("absolute")),
+        "fb": _node("filter_bbox", "ap1", result=True, extent=BBOX),
+    }
+    result = optimize_flat_graph(flat_graph, rules=["fuse_callbacks"])
+    assert not result.changed
+    result = optimize_flat_graph(flat_graph, rules=["push_down_filters"])
+    assert result.rewrites == [
+        ("push_down_filters", "pushed filter_bbox 'fb' into load_collection 'lc' (through 'ap1')")
+    ]
+    with pytest.raises(ValueError, match="Invalid optimization rule 'foo'"):
+        optimize_flat_graph(flat_graph, rules=["foo"])
+
+
+def test_report():
+    flat_graph = {"lc": _load(), "fb": _node("filter_bbox", "lc", result=True, extent=BBOX)}
+    result = optimize_flat_graph(flat_graph)
+    assert result.summary() == (
+        "Applied 1 process graph optimization(s):\n"
+        "- push_down_filters: pushed filter_bbox 'fb' into load_collection 'lc'"
+    )
+    diff = result.diff()
+    assert diff.startswith("--- original\n+++ optimized\n@@ ")
+    assert '-        "spatial_extent": null' in diff
+    assert '-    "fb": {' in diff
+    assert optimize_flat_graph(result.flat_graph).summary() == "No process graph optimizations applied."
+
+
+def _evaluate(flat_graph: dict, parameters: dict):
+    """Minimal evaluator of callback process graphs, to verify semantic equivalence."""
+    functions = {
+        "add": lambda x, y: x + y,
+        "subtract": lambda x, y: x - y,
+        "multiply": lambda x, y: x * y,
+        "divide": lambda x, y: x / y,
+        "absolute": lambda x: abs(x),
+        "sqrt": lambda x: math.sqrt(x),
+        "power": lambda base, p: base**p,
+        "lt": lambda x, y: x < y,
+        "gt": lambda x, y: x > y,
+        "not": lambda x: not x,
+        "and": lambda x, y: x and y,
+        "array_element": lambda data, index: data[index],
+        "constant": lambda x: x,
+        "linear_scale_range": lambda x, inputMin, inputMax, outputMin=0, outputMax=1: (
+            (min(max(x, inputMin), inputMax) - inputMin) / (inputMax - inputMin) * (outputMax - outputMin) + outputMin
+        ),
+    }
+    results = {}
+
+    def resolve(value):
+        if isinstance(value, dict) and "from_node" in value:
+            return evaluate(value["from_node"])
+        if isinstance(value, dict) and "from_parameter" in value:
+            return parameters[value["from_parameter"]]
+        return value
+
+    def evaluate(node_id):
+        if node_id not in results:
+            node = flat_graph[node_id]
+            arguments = {k: resolve(v) for k, v in node["arguments"].items()}
+            results[node_id] = functions[node["process_id"]](**arguments)
+        return results[node_id]
+
+    (result_id,) = [k for k, v in flat_graph.items() if v.get("result")]
+    return evaluate(result_id)
+
+
+class TestSimplifyCallbacks:
+    def _simplify(self, callback: dict) -> OptimizationResult:
+        flat_graph = {"lc": _load(), "ap": _node("apply", "lc", result=True, process={"process_graph": callback})}
+        return optimize_flat_graph(flat_graph, rules=["simplify_callbacks"])
+
+    def _callback(self, result: OptimizationResult) -> dict:
+        return result.flat_graph["ap"]["arguments"]["process"]["process_graph"]
+
+    def test_identities(self):
+        callback = convert_callable_to_pgnode(lambda x: (x * 1 + 0) / 1 - 0 + 5, parent_parameters=["x"]).flat_graph()
+        result = self._simplify(callback)
+        assert self._callback(result) == {
+            "add2": {"process_id": "add", "arguments": {"x": {"from_parameter": "x"}, "y": 5}, "result": True}
+        }
+        assert [m for r, m in result.rewrites] == [
+            "simplified multiply 'multiply1' in callback of 'ap': multiply(..., 1) is identity",
+            "simplified add 'add1' in callback of 'ap': add(..., 0) is identity",
+            "simplified divide 'divide1' in callback of 'ap': divide(..., 1) is identity",
+            "simplified subtract 'subtract1' in callback of 'ap': subtract(..., 0) is identity",
+        ]
+
+    def test_identity_result_node(self):
+        callback = convert_callable_to_pgnode(lambda x: (x + 3) * 1, parent_parameters=["x"]).flat_graph()
+        result = self._simplify(callback)
+        assert self._callback(result) == {
+            "add1": {"process_id": "add", "arguments": {"x": {"from_parameter": "x"}, "y": 3}, "result": True}
+        }
+        # Result node can not be replaced by a parameter.
+        callback = convert_callable_to_pgnode(lambda x: x * 1, parent_parameters=["x"]).flat_graph()
+        assert not self._simplify(callback).changed
+
+    def test_double_negation(self):
+        callback = convert_callable_to_pgnode(lambda x: (-(-x)) + 2, parent_parameters=["x"]).flat_graph()
+        result = self._simplify(callback)
+        assert self._callback(result) == {
+            "add1": {"process_id": "add", "arguments": {"x": {"from_parameter": "x"}, "y": 2}, "result": True}
+        }
+
+    def test_double_not(self):
+        callback = {
+            "gt1": {"process_id": "gt", "arguments": {"x": {"from_parameter": "x"}, "y": 5}},
+            "not1": {"process_id": "not", "arguments": {"x": {"from_node": "gt1"}}},
+            "not2": {"process_id": "not", "arguments": {"x": {"from_node": "not1"}}, "result": True},
+        }
+        result = self._simplify(callback)
+        assert self._callback(result) == {
+            "gt1": {"process_id": "gt", "arguments": {"x": {"from_parameter": "x"}, "y": 5}, "result": True},
+        }
+
+    def test_constant_folding(self):
+        callback = {
+            "lsr": {
+                "process_id": "linear_scale_range",
+                "arguments": {"x": 50, "inputMin": 0, "inputMax": 200, "outputMin": 0, "outputMax": 10},
+            },
+            "div": {"process_id": "divide", "arguments": {"x": {"from_node": "lsr"}, "y": 2}},
+            "add": {"process_id": "add", "arguments": {"x": {"from_parameter": "x"}, "y": {"from_node": "div"}}, "result": True},
+        }
+        result = self._simplify(callback)
+        assert self._callback(result) == {
+            "add": {"process_id": "add", "arguments": {"x": {"from_parameter": "x"}, "y": 1.25}, "result": True}
+        }
+        assert [m for r, m in result.rewrites] == [
+            "folded linear_scale_range 'lsr' to 2.5 in callback of 'ap'",
+            "folded divide 'div' to 1.25 in callback of 'ap'",
+        ]
+
+    @pytest.mark.parametrize(
+        "node",
+        [
+            {"process_id": "divide", "arguments": {"x": 1, "y": 0}},
+            {"process_id": "sqrt", "arguments": {"x": -1}},
+            {"process_id": "power", "arguments": {"base": -8, "p": 0.5}},
+            {"process_id": "power", "arguments": {"base": 10.0, "p": 1000}},
+            {"process_id": "add", "arguments": {"x": 1, "y": None}},
+            {"process_id": "add", "arguments": {"x": True, "y": 1}},
+            {"process_id": "multiply", "arguments": {"x": 1, "y": 2, "z": 3}},
+            {"process_id": "add", "arguments": {"x": 1, "y": 2}, "namespace": "user"},
+        ],
+    )
+    def test_no_folding(self, node):
+        callback = {
+            "n": node,
+            "add": {"process_id": "add", "arguments": {"x": {"from_parameter": "x"}, "y": {"from_node": "n"}}, "result": True},
+        }
+        assert not self._simplify(callback).changed
+
+    def test_no_folding_of_result_node(self):
+        callback = {"add": {"process_id": "add", "arguments": {"x": 1, "y": 2}, "result": True}}
+        assert not self._simplify(callback).changed
+
+    def test_nested_callback(self):
+        flat_graph = {
+            "lc": _load(),
+            "ad": _node(
+                "apply_dimension",
+                "lc",
+                result=True,
+                dimension="t",
+                process={
+                    "process_graph": {
+                        "ap": {
+                            "process_id": "array_apply",
+                            "arguments": {
+                                "data": {"from_parameter": "data"},
+                                "process": _callback("add", y={"from_node": "c"}),
+                            },
+                            "result": True,
+                        }
+                    }
+                },
+            ),
+        }
+        flat_graph["ad"]["arguments"]["process"]["process_graph"]["ap"]["arguments"]["process"]["process_graph"]["c"] = {
+            "process_id": "constant",
+            "arguments": {"x": 3},
+        }
+        result = optimize_flat_graph(flat_graph, rules=["simplify_callbacks"])
+        assert result.rewrites == [("simplify_callbacks", "folded constant 'c' to 3 in callback of 'ap'")]
+
+    @pytest.mark.parametrize(
+        "callback",
+        [
+            lambda data: (data[0] - data[1]) / (data[0] + data[1]),
+            lambda data: -(-(data[2] * 1 + 0)) * (10 / 4) - (2**3),
+            lambda data: (data[0] + 0) * (data[0] * 1) / (1 + 1) - data[0].absolute() + (-(-data[3])),
+            lambda data: data[1].linear_scale_range(0, 100, 0, 1) * openeo.processes.linear_scale_range(40, 0, 80, 0, 10),
+            lambda data: openeo.processes.sqrt(16) * data[1] + data[1] / openeo.processes.power(2, 1) - data[1] ** 1,
+        ],
+    )
+    def test_semantic_equivalence(self, callback):
+        original = convert_callable_to_pgnode(callback, parent_parameters=["data"]).flat_graph()
+        result = self._simplify(copy.deepcopy(original))
+        simplified = self._callback(result)
+        assert result.changed
+        assert len(simplified) < len(original)
+        rng = random.Random(42)
+        for _ in range(100):
+            data = [rng.uniform(-100, 100) for _ in range(4)]
+            expected = _evaluate(original, {"data": data})
+            assert _evaluate(simplified, {"data": data}) == pytest.approx(expected, rel=1e-12)
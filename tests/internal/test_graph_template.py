@@ -0,0 +1,149 @@
+import copy
+
+import pytest
+
+from openeo.api.process import Parameter
+from openeo.internal.graph_building import PGNode
+from openeo.internal.graph_template import GraphTemplate
+from openeo.internal.process_graph_visitor import ProcessGraphVisitException
+
+BBOX = {"west": 3, "south": 51, "east": 4, "north": 52}
+PARAMETERS = ["bbox", "start", "end", "factor", "format"]
+
+
+def _flat_graph() -> dict:
+    load = PGNode(
+        "load_collection",
+        id="S2",
+        spatial_extent=Parameter("bbox", description="Bounding box"),
+        temporal_extent=[Parameter.string("start", description="Start"), Parameter.string("end", description="End")],
+        bands=["B04", "B08"],
+    )
+    callback = PGNode("multiply", x={"from_parameter": "x"}, y=Parameter.number("factor", description="Factor"))
+    apply = PGNode("apply", data=load, process={"process_graph": callback})
+    return PGNode("save_result", data=apply, format=Parameter.string("format", description="Format", default="GTiff")).flat_graph()
+
+
+class TestGraphTemplate:
+    def test_parameters(self):
+        template = GraphTemplate(_flat_graph())
+        # Parameters in callbacks are not included by default.
+        assert template.parameters == ["bbox", "end", "format", "start"]
+        template = GraphTemplate(_flat_graph(), parameters=PARAMETERS)
+        assert template.parameters == ["bbox", "end", "factor", "format", "start"]
+        assert template.slot_paths == {
+            "bbox": [("loadcollection1", "arguments", "spatial_extent")],
+            "start": [("loadcollection1", "arguments", "temporal_extent", 0)],
+            "end": [("loadcollection1", "arguments", "temporal_extent", 1)],
+            "factor": [("apply1", "arguments", "process", "process_graph", "multiply1", "arguments", "y")],
+            "format": [("saveresult1", "arguments", "format")],
+        }
+
+    def test_instantiate(self):
+        flat_graph = _flat_graph()
+        template = GraphTemplate(flat_graph, parameters=PARAMETERS)
+        result = template.instantiate(bbox=BBOX, start="2022-01-01", end="2022-02-01", factor=2, format="netCDF")
+        expected = copy.deepcopy(flat_graph)
+        expected["loadcollection1"]["arguments"]["spatial_extent"] = BBOX
+        expected["loadcollection1"]["arguments"]["temporal_extent"] = ["2022-01-01", "2022-02-01"]
+        expected["apply1"]["arguments"]["process"]["process_graph"]["multiply1"]["arguments"]["y"] = 2
+        expected["saveresult1"]["arguments"]["format"] = "netCDF"
+        assert result == expected
+        # Template is not affected
+        assert template.flat_graph() == flat_graph
+
+    def test_instantiate_values_dict_and_default(self):
+        template = GraphTemplate(_flat_graph(), parameters=PARAMETERS)
+        result = template.instantiate({"bbox": BBOX, "start": "2022-01-01"}, end="2022-02-01", factor=2, format="GTiff")
+        assert result["saveresult1"]["arguments"]["format"] == "GTiff"
+        template = GraphTemplate(
+            _flat_graph(),
+            parameters=[
+                "bbox",
+                "start",
+                "end",
+                "factor",
+                Parameter.string("format", description="Format", default="GTiff"),
+            ],
+        )
+        result = template.instantiate(bbox=BBOX, start="2022-01-01", end="2022-02-01", factor=2)
+        assert result["saveresult1"]["arguments"]["format"] == "GTiff"
+
+    def test_instantiate_shares_unmodified_parts(self):
+        template = GraphTemplate(_flat_graph(), parameters=PARAMETERS)
+        first = template.instantiate(bbox=BBOX, start="2022-01-01", end="2022-02-01", factor=2, format="GTiff")
+        second = template.instantiate(bbox=BBOX, start="2022-03-01", end="2022-04-01", factor=3, format="GTiff")
+        assert first["loadcollection1"]["arguments"]["temporal_extent"] == ["2022-01-01", "2022-02-01"]
+        assert second["loadcollection1"]["arguments"]["temporal_extent"] == ["2022-03-01", "2022-04-01"]
+        assert first["loadcollection1"]["arguments"]["bands"] is second["loadcollection1"]["arguments"]["bands"]
+        assert first["apply1"]["arguments"]["data"] is second["apply1"]["arguments"]["data"]
+
+    def test_instantiate_missing(self):
+        template = GraphTemplate(_flat_graph(), parameters=PARAMETERS)
+        with pytest.raises(ProcessGraphVisitException, match="No substitution value for parameter 'end'"):
+            template.instantiate(bbox=BBOX, start="2022-01-01", factor=2, format="GTiff")
+
+    def test_instantiate_unknown(self):
+        template = GraphTemplate(_flat_graph(), parameters=PARAMETERS)
+        with pytest.raises(ProcessGraphVisitException, match=r"Unknown template parameter\(s\) \['stat'\]"):
+            template.instantiate(bbox=BBOX, start="2022-01-01", stat="foo", end="2022", factor=2, format="GTiff")
+
+    def test_partial_parameters(self):
+        template = GraphTemplate(_flat_graph(), parameters=["bbox"])
+        result = template.instantiate(bbox=BBOX)
+        assert result["loadcollection1"]["arguments"] == {
+            "id": "S2",
+            "spatial_extent": BBOX,
+            "temporal_extent": [{"from_parameter": "start"}, {"from_parameter": "end"}],
+            "bands": ["B04", "B08"],
+        }
+
+    def test_callback_parameters(self):
+        flat_graph = {
+            "lc": {"process_id": "load_collection", "arguments": {"id": {"from_parameter": "x"}}},
+            "ap": {
+                "process_id": "apply",
+                "arguments": {
+                    "data": {"from_node": "lc"},
+                    "process": {
+                        "process_graph": {
+                            "add": {
+                                "process_id": "add",
+                                "arguments": {"x": {"from_parameter": "x"}, "y": {"from_parameter": "offset"}},
+                                "result": True,
+                            }
+                        }
+                    },
+                },
+                "result": True,
+            },
+        }
+        template = GraphTemplate({"process_graph": flat_graph})
+        assert template.parameters == ["x"]
+        assert template.instantiate(x="S2") == {
+            "lc": {"process_id": "load_collection", "arguments": {"id": "S2"}},
+            "ap": flat_graph["ap"],
+        }
+        template = GraphTemplate({"process_graph": flat_graph}, parameters=["x", "offset"])
+        result = template.instantiate(x="S2", offset=5)
+        assert result["lc"]["arguments"]["id"] == "S2"
+        # Note: explicit template parameter "x" also matches the callback parameter "x".
+        assert result["ap"]["arguments"]["process"]["process_graph"]["add"]["arguments"] == {
+            "x": "S2",
+            "y": 5,
+        }
+
+    def test_array_apply_callback_parameters(self):
+        load = PGNode("load_collection", id="S2", spatial_extent=Parameter("bbox", description="Bounding box"))
+        callback = PGNode(
+            "add",
+            x={"from_parameter": "x"},
+            y=PGNode("multiply", x={"from_parameter": "index"}, y={"from_parameter": "label"}),
+        )
+        array_apply = PGNode("array_apply", data=load, process={"process_graph": callback})
+        flat_graph = PGNode("apply_dimension", data=load, process={"process_graph": array_apply}).flat_graph()
+        template = GraphTemplate(flat_graph)
+        assert template.parameters == ["bbox"]
+        result = template.instantiate(bbox=BBOX)
+        assert result["loadcollection1"]["arguments"]["spatial_extent"] == BBOX
+        assert result["applydimension1"] == flat_graph["applydimension1"]
@@ -1,11 +1,21 @@
 import io
+import re
 import textwrap
+from unittest import mock
 
 import pytest
 
 import openeo.processes
 from openeo.api.process import Parameter
-from openeo.internal.graph_building import FlatGraphNodeIdGenerator, PGNode, PGNodeGraphUnflattener, ReduceNode
+from openeo.internal.graph_building import (
+    FlatGraphNodeIdGenerator,
+    GraphFlattener,
+    PGNode,
+    PGNodeGraphUnflattener,
+    ReduceNode,
+    _FlatGraphCache,
+    graph_fingerprint,
+)
 from openeo.internal.process_graph_visitor import ProcessGraphVisitException
 
 
@@ -306,6 +316,417 @@ def test_pgnode_parameter_fahrenheit():
     }
 
 
+def test_flatten_deep_graph():
+    # Deeper than the default recursion limit
+    node = PGNode("load_collection", id="S2")
+    for i in range(5000):
+        node = PGNode("add", x={"from_node": node}, y=i)
+    flat = node.flat_graph()
+    assert len(flat) == 5001
+    assert flat["loadcollection1"] == {"process_id": "load_collection", "arguments": {"id": "S2"}}
+    assert flat["add1"] == {"process_id": "add", "arguments": {"x": {"from_node": "loadcollection1"}, "y": 0}}
+    assert flat["add5000"] == {
+        "process_id": "add",
+        "arguments": {"x": {"from_node": "add4999"}, "y": 4999},
+        "result": True,
+    }
+
+
+def test_flatten_node_id_order():
+    """Node ids are generated in post-order, visiting arguments in sorted order, subprocesses in place."""
+    lc = PGNode("load_collection", id="S2")
+    node = PGNode(
+        "merge_cubes",
+        zz={"from_node": PGNode("apply", data=lc, process={"process_graph": PGNode("absolute", x=1)})},
+        aa=[PGNode("apply", data=lc, process={"process_graph": PGNode("absolute", x=2)}), 3],
+        mm={"process_graph": PGNode("add", x=1, y=2)},
+    )
+    assert node.flat_graph() == {
+        "loadcollection1": {"process_id": "load_collection", "arguments": {"id": "S2"}},
+        "apply1": {
+            "process_id": "apply",
+            "arguments": {
+                "data": {"from_node": "loadcollection1"},
+                "process": {
+                    "process_graph": {
+                        "absolute1": {"process_id": "absolute", "arguments": {"x": 2}, "result": True}
+                    }
+                },
+            },
+        },
+        "apply2": {
+            "process_id": "apply",
+            "arguments": {
+                "data": {"from_node": "loadcollection1"},
+                "process": {
+                    "process_graph": {
+                        "absolute2": {"process_id": "absolute", "arguments": {"x": 1}, "result": True}
+                    }
+                },
+            },
+        },
+        "mergecubes1": {
+            "process_id": "merge_cubes",
+            "arguments": {
+                "aa": [{"from_node": "apply1"}, 3],
+                "mm": {"process_graph": {"add1": {"process_id": "add", "arguments": {"x": 1, "y": 2}, "result": True}}},
+                "zz": {"from_node": "apply2"},
+            },
+            "result": True,
+        },
+    }
+
+
+def test_pgnode_arguments_read_only():
+    bands = ["B02", "B03"]
+    node = PGNode("load_collection", id="S2", bands=bands)
+    assert node.arguments == {"id": "S2", "bands": ["B02", "B03"]}
+    with pytest.raises(TypeError):
+        node.arguments["id"] = "S1"
+
+
+def test_pgnode_does_not_modify_given_arguments():
+    lc = PGNode("load_collection", id="S2")
+    cubes = [lc, 3]
+    arguments = {"data": lc}
+    node = PGNode("foo", arguments=arguments, cubes=cubes)
+    assert cubes == [lc, 3]
+    assert arguments == {"data": lc}
+    assert node.arguments == {"data": {"from_node": lc}, "cubes": [{"from_node": lc}, 3]}
+
+
+class TestFlatGraphCache:
+    @staticmethod
+    def _chain(size: int, start: PGNode = None) -> PGNode:
+        node = start or PGNode("load_collection", id="S2")
+        for i in range(size):
+            node = PGNode("add", x={"from_node": node}, y=i)
+        return node
+
+    @staticmethod
+    def _count_flattened_nodes():
+        """Mock to count the nodes that are actually flattened (not taken from cache)."""
+        return mock.patch.object(
+            GraphFlattener, "_advance", autospec=True, side_effect=GraphFlattener._advance
+        )
+
+    def test_repeated_calls(self):
+        node = self._chain(10)
+        with self._count_flattened_nodes() as advance:
+            flat1 = node.flat_graph()
+            assert advance.call_count == 20
+            flat2 = node.flat_graph()
+            assert advance.call_count == 20
+        assert flat1 == flat2 == GraphFlattener().flatten(node)
+        assert flat1 is not flat2
+        assert flat1["add10"]["result"] is True
+
+    def test_returned_copy_modification(self):
+        node = self._chain(3)
+        flat1 = node.flat_graph()
+        flat1["add2"]["arguments"]["x"]["node"] = "nope"
+        flat1["add2"]["arguments"]["y"] = 123
+        flat1["add3"]["result"] = False
+        del flat1["add1"]
+        assert node.flat_graph() == GraphFlattener().flatten(node)
+
+    def test_incremental(self):
+        cube = self._chain(100)
+        cube.flat_graph()
+        cube = self._chain(3, start=cube)
+        save = PGNode("save_result", data=cube, format="GTiff")
+        with self._count_flattened_nodes() as advance:
+            flat = save.flat_graph()
+            # Only the 3 new "add" nodes and the "save_result" node are flattened.
+            assert advance.call_count == 6
+        assert flat == GraphFlattener().flatten(save)
+        assert list(flat)[-5:] == ["add100", "add101", "add102", "add103", "saveresult1"]
+
+        # Flat graph of first dependency ("data" cube) was cached too.
+        save2 = PGNode("save_result", data=cube, format="netCDF")
+        with self._count_flattened_nodes() as advance:
+            flat2 = save2.flat_graph()
+            assert advance.call_count == 1
+        assert flat2 == GraphFlattener().flatten(save2)
+
+    def test_incremental_not_first_visited(self):
+        """Cached flat graph of a dependency can not be used if other nodes are flattened before it."""
+        cube = self._chain(3)
+        cube.flat_graph()
+        other = self._chain(2, start=PGNode("load_collection", id="S1"))
+        node = PGNode(
+            "merge_cubes",
+            cube1=other,
+            cube2=cube,
+            overlap_resolver={"process_graph": PGNode("max", data={"from_parameter": "data"})},
+        )
+        flat = node.flat_graph()
+        assert flat == GraphFlattener().flatten(node)
+        assert list(flat) == [
+            "loadcollection1",
+            "add1",
+            "add2",
+            "loadcollection2",
+            "add3",
+            "add4",
+            "add5",
+            "mergecubes1",
+        ]
+
+    def test_update_arguments(self):
+        lc = PGNode("load_collection", id="S2")
+        cube = self._chain(2, start=lc)
+        assert cube.flat_graph()["loadcollection1"]["arguments"] == {"id": "S2"}
+        lc.update_arguments(bands=["B02"])
+        assert cube.flat_graph()["loadcollection1"]["arguments"] == {"id": "S2", "bands": ["B02"]}
+
+    def test_nested_arguments_changes(self):
+        bands = ["B02"]
+        lc = PGNode("load_collection", id="S2", bands=bands, properties={"cc": 10})
+        cube = self._chain(2, start=lc)
+        expected = {"id": "S2", "bands": ["B02"], "properties": {"cc": 10}}
+        assert cube.flat_graph()["loadcollection1"]["arguments"] == expected
+        bands.append("B03")
+        lc.arguments["bands"].append("B04")
+        lc.arguments["properties"]["cc"] = 20
+        assert lc.arguments == expected
+        assert cube.flat_graph()["loadcollection1"]["arguments"] == expected
+
+    def test_update_arguments_of_other_graph(self):
+        cube = self._chain(2)
+        flat_graph = cube.flat_graph()
+        cache = cube._flat_graph_cache
+        other = PGNode("load_collection", id="S2")
+        other.update_arguments(bands=["B02"])
+        assert cube.flat_graph() == flat_graph
+        assert cube._flat_graph_cache is cache
+
+    def test_update_arguments_in_child_process_graph(self):
+        add = PGNode("add", x={"from_parameter": "x"}, y=1)
+        lc = PGNode("load_collection", id="S2")
+        cube = PGNode("apply", data=lc, process={"process_graph": add})
+        assert cube.flat_graph()["apply1"]["arguments"]["process"]["process_graph"]["add1"]["arguments"]["y"] == 1
+        add.update_arguments(y=2)
+        assert cube.flat_graph()["apply1"]["arguments"]["process"]["process_graph"]["add1"]["arguments"]["y"] == 2
+
+    def test_cache_size_limit(self, monkeypatch):
+        monkeypatch.setattr(_FlatGraphCache, "max_size", 2)
+        nodes = [self._chain(2) for _ in range(3)]
+        for node in nodes:
+            node.flat_graph()
+        assert nodes[0]._flat_graph_cache is None
+        assert nodes[1]._flat_graph_cache is None
+        assert nodes[2]._flat_graph_cache is not None
+        assert nodes[0].flat_graph() == GraphFlattener().flatten(nodes[0])
+
+    def test_deep_chain(self):
+        cube = self._chain(5000)
+        assert len(cube.flat_graph()) == 5001
+        cube = self._chain(5, start=cube)
+        assert len(PGNode("save_result", data=cube).flat_graph()) == 5007
+
+
+class TestGraphFlattenerDeduplicate:
+    @staticmethod
+    def _load_collection() -> PGNode:
+        return PGNode("load_collection", id="S2", bands=["B02", "B03"])
+
+    def test_default_no_deduplication(self):
+        node = PGNode("merge_cubes", cube1=self._load_collection(), cube2=self._load_collection())
+        assert list(node.flat_graph()) == ["loadcollection1", "loadcollection2", "mergecubes1"]
+
+    def test_basic(self):
+        node = PGNode("merge_cubes", cube1=self._load_collection(), cube2=self._load_collection())
+        assert node.flat_graph(deduplicate=True) == {
+            "loadcollection1": {"process_id": "load_collection", "arguments": {"bands": ["B02", "B03"], "id": "S2"}},
+            "mergecubes1": {
+                "process_id": "merge_cubes",
+                "arguments": {"cube1": {"from_node": "loadcollection1"}, "cube2": {"from_node": "loadcollection1"}},
+                "result": True,
+            },
+        }
+
+    def test_different_arguments(self):
+        node = PGNode(
+            "merge_cubes",
+            cube1=PGNode("load_collection", id="S2", bands=["B02", "B03"]),
+            cube2=PGNode("load_collection", id="S2", bands=["B03", "B02"]),
+            cube3=PGNode("load_collection", id="S2", bands=["B02", "B03"], namespace="foo"),
+        )
+        flattener = GraphFlattener(deduplicate=True)
+        flat = flattener.flatten(node)
+        assert list(flat) == ["loadcollection1", "loadcollection2", "loadcollection3", "mergecubes1"]
+        assert flattener.stats == {"nodes": 4, "emitted": 4, "saved": 0}
+
+    def test_bottom_up(self):
+        """Nodes are identical when their dependencies are identical"""
+
+        def build() -> PGNode:
+            return PGNode("apply", data=PGNode("filter_bbox", data=self._load_collection(), extent=[1, 2, 3, 4]))
+
+        node = PGNode("merge_cubes", cube1=build(), cube2=build(), overlap=[build(), 3])
+        flattener = GraphFlattener(deduplicate=True)
+        flat = flattener.flatten(node)
+        assert list(flat) == ["loadcollection1", "filterbbox1", "apply1", "mergecubes1"]
+        assert flat["mergecubes1"]["arguments"] == {
+            "cube1": {"from_node": "apply1"},
+            "cube2": {"from_node": "apply1"},
+            "overlap": [{"from_node": "apply1"}, 3],
+        }
+        assert flattener.stats == {"nodes": 10, "emitted": 4, "saved": 6}
+
+    def test_child_process_graphs(self):
+        def apply(process_id: str) -> PGNode:
+            return PGNode(
+                "apply",
+                data=self._load_collection(),
+                process={"process_graph": PGNode(process_id, x={"from_parameter": "x"})},
+            )
+
+        node = PGNode("merge_cubes", cube1=apply("absolute"), cube2=apply("absolute"), cube3=apply("sqrt"))
+        flattener = GraphFlattener(deduplicate=True)
+        flat = flattener.flatten(node)
+        assert list(flat) == ["loadcollection1", "apply1", "apply2", "mergecubes1"]
+        assert flat["apply1"]["arguments"]["process"] == {
+            "process_graph": {
+                "absolute1": {"process_id": "absolute", "arguments": {"x": {"from_parameter": "x"}}, "result": True}
+            }
+        }
+        assert flat["apply2"]["arguments"]["process"] == {
+            "process_graph": {
+                "sqrt1": {"process_id": "sqrt", "arguments": {"x": {"from_parameter": "x"}}, "result": True}
+            }
+        }
+        assert flat["mergecubes1"]["arguments"] == {
+            "cube1": {"from_node": "apply1"},
+            "cube2": {"from_node": "apply1"},
+            "cube3": {"from_node": "apply2"},
+        }
+        # Merged second "apply" node also drops its child process graph node.
+        assert flattener.stats == {"nodes": 10, "emitted": 6, "saved": 4}
+
+    def test_deduplicate_within_child_process_graph(self):
+        def band(index: int) -> PGNode:
+            return PGNode("array_element", data={"from_parameter": "data"}, index=index)
+
+        reducer = PGNode("divide", x=PGNode("subtract", x=band(1), y=band(0)), y=PGNode("add", x=band(1), y=band(0)))
+        node = PGNode("reduce_dimension", data=self._load_collection(), reducer={"process_graph": reducer})
+        flattener = GraphFlattener(deduplicate=True)
+        flat = flattener.flatten(node)
+        assert list(flat["reducedimension1"]["arguments"]["reducer"]["process_graph"]) == [
+            "arrayelement1",
+            "arrayelement2",
+            "subtract1",
+            "add1",
+            "divide1",
+        ]
+        assert flattener.stats == {"nodes": 9, "emitted": 7, "saved": 2}
+
+    def test_deep_graph(self):
+        def chain():
+            node = self._load_collection()
+            for i in range(3000):
+                node = PGNode("add", x={"from_node": node}, y=i)
+            return node
+
+        flattener = GraphFlattener(deduplicate=True)
+        flat = flattener.flatten(PGNode("merge_cubes", cube1=chain(), cube2=chain()))
+        assert len(flat) == 3002
+        assert flat["mergecubes1"]["arguments"] == {"cube1": {"from_node": "add3000"}, "cube2": {"from_node": "add3000"}}
+        assert flattener.stats == {"nodes": 6003, "emitted": 3002, "saved": 3001}
+
+
+class TestGraphFingerprint:
+    @staticmethod
+    def _ndvi(namespace=None) -> PGNode:
+        data = PGNode("load_collection", id="S2", spatial_extent={"west": 3, "south": 51, "east": 4, "north": 52})
+        b4 = PGNode("array_element", data={"from_parameter": "data"}, index=0)
+        b8 = PGNode("array_element", data={"from_parameter": "data"}, index=1)
+        reducer = PGNode("normalized_difference", x=b8, y=b4, namespace=namespace)
+        return PGNode("reduce_dimension", data=data, dimension="bands", reducer={"process_graph": reducer})
+
+    def test_stable(self):
+        assert graph_fingerprint(self._ndvi()) == graph_fingerprint(self._ndvi())
+        assert graph_fingerprint(self._ndvi()) == graph_fingerprint({"process_graph": self._ndvi().flat_graph()})
+        assert graph_fingerprint(self._ndvi()) != graph_fingerprint(self._ndvi(namespace="user"))
+        assert re.fullmatch("[0-9a-f]{64}", graph_fingerprint(self._ndvi()))
+
+    def test_node_ids_and_argument_order(self):
+        graph = {
+            "lc": {"process_id": "load_collection", "arguments": {"id": "S2", "bands": ["B04", "B08"]}},
+            "ap": {
+                "process_id": "apply",
+                "arguments": {
+                    "data": {"from_node": "lc"},
+                    "process": {
+                        "process_graph": {
+                            "a": {"process_id": "absolute", "arguments": {"x": {"from_parameter": "x"}}},
+                            "m": {
+                                "process_id": "multiply",
+                                "arguments": {"x": {"from_node": "a"}, "y": 2},
+                                "result": True,
+                            },
+                        }
+                    },
+                },
+                "result": True,
+            },
+        }
+        renamed = {
+            "apply9": {
+                "result": True,
+                "arguments": {
+                    "process": {
+                        "process_graph": {
+                            "mul": {
+                                "result": True,
+                                "arguments": {"y": 2, "x": {"from_node": "abs"}},
+                                "process_id": "multiply",
+                            },
+                            "abs": {"arguments": {"x": {"from_parameter": "x"}}, "process_id": "absolute"},
+                        }
+                    },
+                    "data": {"from_node": "loadcollection9"},
+                },
+                "process_id": "apply",
+            },
+            "loadcollection9": {"arguments": {"bands": ["B04", "B08"], "id": "S2"}, "process_id": "load_collection"},
+        }
+        assert graph_fingerprint(graph) == graph_fingerprint(renamed)
+        # Argument values matter (including order of array elements).
+        renamed["loadcollection9"]["arguments"]["bands"] = ["B08", "B04"]
+        assert graph_fingerprint(graph) != graph_fingerprint(renamed)
+
+    def test_structure(self):
+        a = PGNode("subtract", x=PGNode("load_collection", id="S1"), y=PGNode("load_collection", id="S2"))
+        b = PGNode("subtract", x=PGNode("load_collection", id="S2"), y=PGNode("load_collection", id="S1"))
+        assert graph_fingerprint(a) != graph_fingerprint(b)
+
+    def test_deduplication(self):
+        load = lambda: PGNode("load_collection", id="S2")
+        node = PGNode("merge_cubes", cube1=load(), cube2=load())
+        assert len(node.flat_graph()) == 3
+        assert len(node.flat_graph(deduplicate=True)) == 2
+        assert graph_fingerprint(node.flat_graph()) == graph_fingerprint(node.flat_graph(deduplicate=True))
+
+    def test_long_chain(self):
+        node = PGNode("constant", x=0)
+        for i in range(5000):
+            node = PGNode("add", x=node, y=i)
+        assert graph_fingerprint(node) == graph_fingerprint(node.flat_graph())
+
+    def test_invalid(self):
+        with pytest.raises(ProcessGraphVisitException, match="Invalid node reference 'b' in node 'a'"):
+            graph_fingerprint({"a": {"process_id": "add", "arguments": {"x": {"from_node": "b"}}, "result": True}})
+        with pytest.raises(ProcessGraphVisitException, match="Cycle in process graph"):
+            graph_fingerprint(
+                {
+                    "a": {"process_id": "add", "arguments": {"x": {"from_node": "b"}}, "result": True},
+                    "b": {"process_id": "add", "arguments": {"x": {"from_node": "a"}}},
+                }
+            )
+
+
 class TestPGNodeGraphUnflattener:
 
     def test_minimal(self):
@@ -369,3 +790,16 @@ class TestPGNodeGraphUnflattener:
         }
         with pytest.raises(ProcessGraphVisitException, match="No substitution value for parameter 'increment'"):
             _ = PGNodeGraphUnflattener.unflatten(flat_graph, parameters={"other": 100})
+
+    def test_deep_graph(self):
+        # Deeper than the default recursion limit
+        flat_graph = {"add0": {"process_id": "add", "arguments": {"x": 1, "y": 0}}}
+        for i in range(1, 5000):
+            flat_graph[f"add{i}"] = {"process_id": "add", "arguments": {"x": {"from_node": f"add{i - 1}"}, "y": i}}
+        flat_graph["add4999"]["result"] = True
+        result: PGNode = PGNodeGraphUnflattener.unflatten(flat_graph)
+        assert result.arguments["y"] == 4999
+        assert result.arguments["x"]["from_node"].arguments["y"] == 4998
+        flat = result.flat_graph()
+        assert len(flat) == 5000
+        assert flat["add2"] == {"process_id": "add", "arguments": {"x": {"from_node": "add1"}, "y": 1}}
@@ -0,0 +1,118 @@
+import json
+
+import pytest
+
+from openeo.internal import json_encoding
+from openeo.internal.json_encoding import dumps, dumps_bytes, iterdumps
+
+DATA = {
+    "process_graph": {
+        "loadcollection1": {
+            "process_id": "load_collection",
+            "arguments": {"id": "S2", "spatial_extent": None, "bands": ["B02", "B03"]},
+        },
+        "aggregatespatial1": {
+            "process_id": "aggregate_spatial",
+            "arguments": {
+                "data": {"from_node": "loadcollection1"},
+                "geometries": {"type": "Polygon", "coordinates": [[[3, 51.5], [3.25, 51.5], [3.125, 51.75], [3, 51.5]]]},
+                "empty": {},
+                "options": {"scale": 1.5e-05, "big": 123456789012, "flag": True},
+            },
+            "result": True,
+        },
+    }
+}
+
+FORMATS = [
+    {},
+    {"indent": 2},
+    {"indent": None},
+    {"indent": None, "separators": (",", ":")},
+    {"indent": 4},
+    {"indent": 2, "separators": (", ", " : ")},
+]
+
+
+@pytest.fixture(params=["orjson", "stdlib"])
+def backend(request, monkeypatch):
+    if request.param == "orjson":
+        if json_encoding.orjson is None:
+            pytest.skip("orjson not available")
+    else:
+        monkeypatch.setattr(json_encoding, "orjson", None)
+    return request.param
+
+
+@pytest.mark.parametrize("options", FORMATS)
+def test_dumps(backend, options):
+    expected = json.dumps(DATA, **options)
+    actual = dumps(DATA, **options)
+    assert json.loads(actual) == DATA
+    assert actual == expected
+
+
+@pytest.mark.parametrize(
+    "data",
+    [
+        {"name": "café"},
+        {"value": float("nan")},
+        {"values": [1, [2, float("inf")]]},
+        {1: "int key"},
+        {"big": 2**70},
+        {"small": 1e-7},
+        {"small": 0.00001234},
+        {"large": 1e16},
+        {"values": [1.5, -2.5e-20, 6.02e23]},
+        [],
+        "foo",
+    ],
+)
+def test_dumps_stdlib_fallback(backend, data):
+    for options in FORMATS:
+        assert dumps(data, **options) == json.dumps(data, **options)
+
+
+def test_dumps_bytes(backend):
+    encoded = dumps_bytes(DATA)
+    assert isinstance(encoded, bytes)
+    assert b" " not in encoded
+    assert json.loads(encoded) == DATA
+
+
+@pytest.mark.parametrize("value", [1e-7, 0.00001234, 1e16, 1.5, 0.1, -3.25e-20])
+def test_dumps_bytes_float(backend, value):
+    # Float formatting can differ from stdlib, but must decode to the same value.
+    assert json.loads(dumps_bytes({"value": value})) == {"value": value}
+
+
+@pytest.mark.parametrize("value", [0.0001, 123.456, -0.5, 1e15, 12345678.9])
+def test_dumps_orjson_float_formatting(backend, value):
+    for options in FORMATS:
+        assert dumps({"value": value}, **options) == json.dumps({"value": value}, **options)
+
+
+def test_dumps_bytes_unicode(backend):
+    assert dumps_bytes({"name": "café"}) == '{"name":"café"}'.encode("utf8")
+
+
+@pytest.mark.parametrize("value", [float("nan"), float("inf"), [[1, float("-inf")]]])
+def test_dumps_bytes_non_finite(backend, value):
+    with pytest.raises(ValueError, match="not JSON compliant"):
+        dumps_bytes({"data": {"value": value}})
+
+
+@pytest.mark.parametrize("options", FORMATS)
+@pytest.mark.parametrize("depth", [0, 1, 2, 3, 10])
+def test_iterdumps(backend, options, depth):
+    chunks = list(iterdumps(DATA, depth=depth, **options))
+    assert "".join(chunks) == dumps(DATA, **options)
+    if depth >= 2:
+        # Node by node
+        assert len(chunks) >= 2 * len(DATA["process_graph"])
+
+
+@pytest.mark.parametrize("data", [{}, [1, 2], {"a": {}}, {"a": {"b": []}}, {1: {"b": 2}}, "foo"])
+@pytest.mark.parametrize("options", FORMATS)
+def test_iterdumps_edge_cases(backend, data, options):
+    assert "".join(iterdumps(data, **options)) == json.dumps(data, **options)
@@ -170,6 +170,31 @@ def test_visit_array_with_dereferenced_nodes():
     ]
 
 
+def test_visit_deep_graph():
+    # Deeper than the default recursion limit
+    graph = {"n0": {"process_id": "load_collection", "arguments": {"id": "S2"}}}
+    for i in range(1, 5000):
+        graph[f"n{i}"] = {"process_id": "add", "arguments": {"x": {"from_node": f"n{i - 1}"}, "y": i}}
+    graph["n4999"]["result"] = True
+
+    visitor = ProcessGraphVisitor()
+    visitor.leaveProcess = MagicMock()
+    visitor.constantArgument = MagicMock()
+    visitor.accept_process_graph(graph)
+
+    assert visitor.leaveProcess.call_count == 5000
+    assert visitor.leaveProcess.call_args_list[0] == call(
+        process_id="load_collection", arguments={"id": "S2"}, namespace=None
+    )
+    assert visitor.constantArgument.call_args_list[:3] == [
+        call(argument_id="id", value="S2"),
+        call(argument_id="y", value=1),
+        call(argument_id="y", value=2),
+    ]
+    assert visitor.constantArgument.call_args_list[-1] == call(argument_id="y", value=4999)
+    assert visitor.process_stack == []
+
+
 def test_dereference_basic():
     graph = {
         "node1": {},
@@ -482,3 +507,16 @@ class TestProcessGraphUnflattener:
         }
         with pytest.raises(ProcessGraphVisitException, match="Cycle in process graph"):
             _ = ProcessGraphUnflattener.unflatten(graph)
+
+    def test_deep_graph(self):
+        # Deeper than the default recursion limit
+        graph = {"n0": {"process_id": "increment", "arguments": {"x": 0}}}
+        for i in range(1, 5000):
+            graph[f"n{i}"] = {"process_id": "increment", "arguments": {"x": {"from_node": f"n{i - 1}"}}}
+        graph["n4999"]["result"] = True
+        result = ProcessGraphUnflattener.unflatten(graph)
+        for i in range(4999):
+            assert result["process_id"] == "increment"
+            assert result["arguments"]["x"]["from_node"] == f"n{4998 - i}"
+            result = result["arguments"]["x"]["node"]
+        assert result == {"process_id": "increment", "arguments": {"x": 0}}
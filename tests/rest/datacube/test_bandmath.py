@@ -369,3 +369,45 @@ def test_log3(con100):
         'data/1.0.0/bm_log.json',
         preprocess=lambda s: s.replace('"base": 10', '"base": 3')
     )
+
+
+def test_band_math_deduplicate(con100):
+    cube = con100.load_collection("SENTINEL2_RADIOMETRY_10M")
+    # Same band lookups built twice
+    ndvi = (cube.band("B08") - cube.band("B04")) / (cube.band("B08") + cube.band("B04"))
+    assert len(ndvi.flat_graph()["reducedimension1"]["arguments"]["reducer"]["process_graph"]) == 7
+    flat = ndvi.flat_graph(deduplicate=True)
+    assert flat["reducedimension1"]["arguments"]["reducer"]["process_graph"] == {
+        "arrayelement1": {"process_id": "array_element", "arguments": {"data": {"from_parameter": "data"}, "index": 3}},
+        "arrayelement2": {"process_id": "array_element", "arguments": {"data": {"from_parameter": "data"}, "index": 2}},
+        "subtract1": {
+            "process_id": "subtract",
+            "arguments": {"x": {"from_node": "arrayelement1"}, "y": {"from_node": "arrayelement2"}},
+        },
+        "add1": {"process_id": "add", "arguments": {"x": {"from_node": "arrayelement1"}, "y": {"from_node": "arrayelement2"}}},
+        "divide1": {
+            "process_id": "divide",
+            "arguments": {"x": {"from_node": "subtract1"}, "y": {"from_node": "add1"}},
+            "result": True,
+        },
+    }
+
+
+def test_band_math_optimize(con100):
+    cube = con100.load_collection("SENTINEL2_RADIOMETRY_10M")
+    ndvi = (cube.band("B08") - cube.band("B04")) / (cube.band("B08") + cube.band("B04"))
+    optimized = ndvi.optimize()
+    assert optimized.flat_graph()["reducedimension1"]["arguments"]["reducer"]["process_graph"] == {
+        "arrayelement1": {"process_id": "array_element", "arguments": {"data": {"from_parameter": "data"}, "index": 3}},
+        "arrayelement2": {"process_id": "array_element", "arguments": {"data": {"from_parameter": "data"}, "index": 2}},
+        "subtract1": {
+            "process_id": "subtract",
+            "arguments": {"x": {"from_node": "arrayelement1"}, "y": {"from_node": "arrayelement2"}},
+        },
+        "add1": {"process_id": "add", "arguments": {"x": {"from_node": "arrayelement1"}, "y": {"from_node": "arrayelement2"}}},
+        "divide1": {
+            "process_id": "divide",
+            "arguments": {"x": {"from_node": "subtract1"}, "y": {"from_node": "add1"}},
+            "result": True,
+        },
+    }
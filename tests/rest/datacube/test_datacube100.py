@@ -20,6 +20,7 @@ import openeo.metadata
 import openeo.processes
 from openeo.api.process import Parameter
 from openeo.internal.graph_building import PGNode
+from openeo.internal.graph_template import GraphTemplate
 from openeo.internal.process_graph_visitor import ProcessGraphVisitException
 from openeo.internal.warnings import UserDeprecationWarning
 from openeo.rest import OpenEoClientException
@@ -1941,6 +1942,92 @@ def test_send_nan_json(con100, requests_mock):
         cube.execute()
 
 
+def test_optimize(con100, caplog):
+    caplog.set_level("INFO")
+    cube = con100.load_collection("S2", bands=["B02", "B03", "B04"])
+    cube = cube.apply(lambda x: x.absolute()).apply(lambda x: x + 1)
+    cube = cube.filter_bbox(west=3, south=51, east=4, north=52).filter_bands(["B04"])
+    optimized = cube.optimize()
+    assert isinstance(optimized, DataCube)
+    assert optimized.metadata.band_names == ["B04"]
+    assert optimized.flat_graph() == {
+        "loadcollection1": {
+            "process_id": "load_collection",
+            "arguments": {
+                "id": "S2",
+                "spatial_extent": {"west": 3, "south": 51, "east": 4, "north": 52},
+                "temporal_extent": None,
+                "bands": ["B04"],
+            },
+        },
+        "apply1": {
+            "process_id": "apply",
+            "arguments": {
+                "data": {"from_node": "loadcollection1"},
+                "process": {
+                    "process_graph": {
+                        "absolute1": {"process_id": "absolute", "arguments": {"x": {"from_parameter": "x"}}},
+                        "add1": {
+                            "process_id": "add",
+                            "arguments": {"x": {"from_node": "absolute1"}, "y": 1},
+                            "result": True,
+                        },
+                    }
+                },
+            },
+            "result": True,
+        },
+    }
+    assert "Applied 3 process graph optimization(s)" in caplog.text
+    assert "+++ optimized" in caplog.text
+    # Original cube is not affected
+    assert len(cube.flat_graph()) == 5
+
+
+def test_optimize_nothing_to_do(con100):
+    cube = con100.load_collection("S2").ndvi()
+    assert cube.optimize() is cube
+
+
+def test_graph_template(con100):
+    cube = con100.load_collection("S2", spatial_extent=Parameter("bbox", description="Bounding box"))
+    template = GraphTemplate(cube.ndvi())
+    assert template.parameters == ["bbox"]
+    bbox = {"west": 3, "south": 51, "east": 4, "north": 52}
+    assert template.instantiate(bbox=bbox) == con100.load_collection("S2", spatial_extent=bbox).ndvi().flat_graph()
+
+
+def test_estimate_volume(con100, requests_mock):
+    requests_mock.get(API_URL + "/collections/S3", status_code=404, json={"code": "CollectionNotFound"})
+    requests_mock.get(API_URL + "/collections/S2", json={
+        "cube:dimensions": {
+            "x": {"type": "spatial", "step": 10, "reference_system": 32631},
+            "y": {"type": "spatial", "step": 10, "reference_system": 32631},
+            "t": {"type": "temporal", "extent": ["2015-07-01T00:00:00Z", None], "step": "P5D"},
+            "bands": {"type": "bands", "values": ["B02", "B03", "B04", "B08"]}
+        },
+    })
+    bbox = {"west": 500000, "south": 5600000, "east": 510000, "north": 5610000, "crs": 32631}
+    cube = con100.load_collection("S2", spatial_extent=bbox, temporal_extent=["2020-01-01", "2020-02-01"])
+    estimate = cube.ndvi().estimate_volume()
+    assert estimate.inputs["loadcollection1"].to_dict() == {
+        "width": 1000,
+        "height": 1000,
+        "bands": 4,
+        "time_steps": 7,
+        "pixels": 1000000,
+        "values": 28000000,
+        "bytes": 112000000,
+    }
+    assert estimate.output.bytes == 28000000
+    assert estimate.warnings == []
+
+    cube = con100.load_collection("S3", fetch_metadata=False, spatial_extent=bbox)
+    estimate = cube.estimate_volume()
+    assert estimate.input_bytes is None
+    assert estimate.warnings[0] == "loadcollection1: no metadata for collection 'S3'"
+
+
 def test_dimension_labels(con100):
     cube = con100.load_collection("S2").dimension_labels("bands")
     assert cube.flat_graph() == {
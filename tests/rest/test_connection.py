@@ -1,3 +1,4 @@
+import collections
 import json
 import logging
 import os
@@ -12,6 +13,7 @@ from pathlib import Path
 import pytest
 import requests.auth
 import requests_mock
+import time_machine
 
 import openeo
 from openeo.capabilities import ApiVersionException, ComparableVersion
@@ -22,6 +24,7 @@ from openeo.rest.auth.auth import BearerAuth, NullAuth
 from openeo.rest.auth.oidc import OidcException
 from openeo.rest.auth.testing import ABSENT, OidcMock
 from openeo.rest.connection import Connection, RestApiConnection, connect, paginate
+from openeo.rest.result_cache import ResultCache
 from openeo.util import ContextTimer
 
 from .. import load_json_resource
@@ -62,6 +65,26 @@ def test_rest_api_connection_url_handling(requests_mock, base, paths, expected_p
         assert conn.post(path, {"foo": "bar"}).text == "payload"
 
 
+def test_rest_api_post_json_compact(requests_mock):
+    conn = RestApiConnection(API_URL)
+
+    def post(request, context):
+        assert request.headers["Content-Type"] == "application/json"
+        assert request.body == '{"foo":"bar","list":[1,2.5,null],"naïve":true}'.encode("utf8")
+        return "ok"
+
+    requests_mock.post(API_URL + "foo", text=post)
+    assert conn.post("/foo", json={"foo": "bar", "list": [1, 2.5, None], "naïve": True}).text == "ok"
+
+
+def test_rest_api_post_json_content_type(requests_mock):
+    conn = RestApiConnection(API_URL)
+    requests_mock.post(API_URL + "foo", text="ok")
+    conn.post("/foo", json={"foo": "bar"}, headers={"Content-Type": "application/vnd+json"})
+    assert requests_mock.last_request.headers["Content-Type"] == "application/vnd+json"
+    assert requests_mock.last_request.json() == {"foo": "bar"}
+
+
 def test_rest_api_headers():
     conn = RestApiConnection(API_URL)
     with requests_mock.Mocker() as m:
@@ -3175,3 +3198,303 @@ class TestExecute:
         conn = Connection(API_URL)
         job = conn.create_job(url)
         assert job.job_id == "j-123"
+
+
+class TestCreateJobs:
+    @pytest.fixture
+    def con(self, requests_mock) -> Connection:
+        requests_mock.get(API_URL, json={"api_version": "1.0.0"})
+        return Connection(API_URL)
+
+    @pytest.fixture
+    def backend(self, requests_mock):
+        """Fake backend: job id based on process graph, with configurable per-graph failures."""
+
+        class Backend:
+            def __init__(self):
+                self.created = []
+                self.started = []
+                # Mapping of job id to list of (status code, headers) responses to give before succeeding
+                self.create_failures = collections.defaultdict(list)
+                self.start_failures = collections.defaultdict(list)
+
+            def post_jobs(self, request, context):
+                (node,) = request.json()["process"]["process_graph"].values()
+                x = node["arguments"]["x"]
+                job_id = f"job-{x}"
+                if self.create_failures[job_id]:
+                    context.status_code, context.headers = self.create_failures[job_id].pop(0)
+                    return {"code": "Nope", "message": f"Failed to create {job_id}"}
+                self.created.append(job_id)
+                context.status_code = 201
+                context.headers["OpenEO-Identifier"] = job_id
+                return ""
+
+            def post_results(self, request, context):
+                job_id = request.path.split("/")[-2]
+                if self.start_failures[job_id]:
+                    context.status_code, context.headers = self.start_failures[job_id].pop(0)
+                    return {"code": "Nope", "message": f"Failed to start {job_id}"}
+                self.started.append(job_id)
+                context.status_code = 202
+                return ""
+
+        backend = Backend()
+        requests_mock.post(API_URL + "jobs", json=backend.post_jobs)
+        requests_mock.post(re.compile(API_URL + "jobs/[^/]+/results"), json=backend.post_results)
+        return backend
+
+    @staticmethod
+    def _graph(x: int) -> dict:
+        return {"add": {"process_id": "add", "arguments": {"x": x, "y": 1}, "result": True}}
+
+    @pytest.mark.parametrize("max_workers", [1, 3])
+    def test_basic(self, con, backend, max_workers):
+        results = con.create_jobs([self._graph(x) for x in range(10)], max_workers=max_workers)
+        assert [r.index for r in results] == list(range(10))
+        assert all(r.ok for r in results)
+        assert [r.value.job_id for r in results] == [f"job-{x}" for x in range(10)]
+        assert sorted(backend.created) == sorted(f"job-{x}" for x in range(10))
+        assert sorted(backend.started) == sorted(f"job-{x}" for x in range(10))
+        assert [r.attempts for r in results] == [2] * 10
+
+    def test_no_start(self, con, backend):
+        results = con.create_jobs([self._graph(x) for x in range(3)], start=False)
+        assert [r.value.job_id for r in results] == ["job-0", "job-1", "job-2"]
+        assert backend.started == []
+
+    def test_datacubes(self, con, backend):
+        cubes = [con.datacube_from_process("add", x=x, y=1) for x in range(3)]
+        results = con.create_jobs(cubes)
+        assert [r.value.job_id for r in results] == ["job-0", "job-1", "job-2"]
+
+    def test_partial_failure(self, con, backend, caplog):
+        backend.create_failures["job-1"] = [(500, {})]
+        backend.start_failures["job-2"] = [(400, {})]
+        results = con.create_jobs([self._graph(x) for x in range(4)])
+        assert [r.ok for r in results] == [True, False, False, True]
+        assert results[1].value is None
+        assert isinstance(results[1].error, OpenEoApiError)
+        assert results[1].error.http_status_code == 500
+        # Created, but not started
+        assert results[2].value.job_id == "job-2"
+        assert results[2].error.message == "Failed to start job-2"
+        assert sorted(backend.created) == ["job-0", "job-2", "job-3"]
+        assert sorted(backend.started) == ["job-0", "job-3"]
+        assert "Failed to create/start 2 of 4 jobs" in caplog.text
+
+    def test_too_many_requests(self, con, backend):
+        backend.create_failures["job-1"] = [(429, {"Retry-After": "3"}), (429, {})]
+        backend.start_failures["job-2"] = [(429, {"Retry-After": "5"})]
+
+        class FakeTime:
+            def __init__(self):
+                self.now = 1000
+                self.sleeps = []
+
+            def time(self):
+                return self.now
+
+            def sleep(self, seconds):
+                self.sleeps.append(seconds)
+                self.now += seconds
+
+        fake_time = FakeTime()
+        with mock.patch("openeo.rest.bulk.time", fake_time):
+            results = con.create_jobs([self._graph(x) for x in range(4)], max_workers=1)
+        assert all(r.ok for r in results)
+        assert [r.attempts for r in results] == [2, 4, 3, 2]
+        # Delay from Retry-After header, or exponential backoff otherwise.
+        assert fake_time.sleeps == [3, 2, 5]
+        assert sorted(backend.started) == ["job-0", "job-1", "job-2", "job-3"]
+
+    def test_too_many_requests_max_retries(self, con, backend):
+        backend.create_failures["job-0"] = [(429, {"Retry-After": "0"})] * 5
+        results = con.create_jobs([self._graph(0)], max_retries=3)
+        assert not results[0].ok
+        assert results[0].error.http_status_code == 429
+        assert results[0].attempts == 4
+
+
+@pytest.mark.parametrize(
+    ["retry_after", "expected"],
+    [
+        (None, None),
+        ("120", 120),
+        ("Wed, 21 Oct 2015 07:28:00 GMT", 60),
+        ("Wed, 21 Oct 2015 07:20:00 GMT", 0),
+        ("nope", None),
+    ],
+)
+def test_api_error_retry_after(requests_mock, retry_after, expected):
+    requests_mock.get(API_URL, json={"api_version": "1.0.0"})
+    headers = {"Retry-After": retry_after} if retry_after else {}
+    requests_mock.get(API_URL + "foo", status_code=429, json={"code": "TooMany", "message": "Slow down"}, headers=headers)
+    con = Connection(API_URL)
+    with time_machine.travel("2015-10-21 07:27:00+00", tick=False):
+        with pytest.raises(OpenEoApiError) as exc_info:
+            con.get("/foo")
+    assert exc_info.value.http_status_code == 429
+    assert exc_info.value.retry_after == expected
+
+
+class TestDownloadExecuteMany:
+    @pytest.fixture
+    def con(self, requests_mock) -> Connection:
+        requests_mock.get(API_URL, json={"api_version": "1.0.0"})
+        return Connection(API_URL)
+
+    @pytest.fixture
+    def failures(self) -> typing.Dict[int, list]:
+        """Mapping of process graph "x" value to list of (status code, headers) responses to give before succeeding."""
+        return collections.defaultdict(list)
+
+    @pytest.fixture(autouse=True)
+    def post_result(self, requests_mock, failures):
+        def handler(request, context):
+            (node,) = request.json()["process"]["process_graph"].values()
+            x = node["arguments"]["x"]
+            if failures[x]:
+                context.status_code, context.headers = failures[x].pop(0)
+                return json.dumps({"code": "Nope", "message": f"Failed {x}"}).encode("utf8")
+            return json.dumps({"result": x + node["arguments"]["y"]}).encode("utf8")
+
+        return requests_mock.post(API_URL + "result", content=handler)
+
+    @staticmethod
+    def _graph(x: int) -> dict:
+        return {"add": {"process_id": "add", "arguments": {"x": x, "y": 100}, "result": True}}
+
+    @pytest.mark.parametrize("max_workers", [1, 3])
+    def test_execute_many(self, con, max_workers):
+        results = con.execute_many([self._graph(x) for x in range(10)], max_workers=max_workers)
+        assert [r.index for r in results] == list(range(10))
+        assert [r.value for r in results] == [{"result": 100 + x} for x in range(10)]
+        assert all(r.ok and r.elapsed >= 0 and r.attempts == 1 for r in results)
+
+    def test_execute_many_unordered(self, con):
+        results = con.execute_many([self._graph(x) for x in range(10)], ordered=False)
+        assert not isinstance(results, list)
+        results = list(results)
+        assert sorted(r.index for r in results) == list(range(10))
+        assert all(r.value == {"result": 100 + r.index} for r in results)
+
+    def test_execute_many_retry(self, con, failures):
+        failures[1] = [(503, {"Retry-After": "0"}), (429, {"Retry-After": "0"})]
+        failures[2] = [(500, {})]
+        results = con.execute_many([self._graph(x) for x in range(4)])
+        assert [r.ok for r in results] == [True, True, False, True]
+        assert [r.attempts for r in results] == [1, 3, 1, 1]
+        assert results[1].value == {"result": 101}
+        assert results[2].error.http_status_code == 500
+
+    def test_execute_many_connection_error(self, con, requests_mock):
+        requests_mock.post(
+            API_URL + "result",
+            [{"exc": requests.exceptions.ConnectionError("Connection reset")}, {"json": {"result": 123}}],
+        )
+        with mock.patch("openeo.rest.bulk.time.sleep") as sleep:
+            results = con.execute_many([self._graph(1)])
+        assert results[0].value == {"result": 123}
+        assert results[0].attempts == 2
+        sleep.assert_called_once_with(1)
+
+    def test_download_many(self, con, tmp_path, failures):
+        failures[1] = [(502, {"Retry-After": "0"})]
+        failures[2] = [(400, {})]
+        output_dir = tmp_path / "output"
+        output_dir.mkdir()
+        outputs = [output_dir / f"result{x}.json" for x in range(4)]
+        results = con.download_many([self._graph(x) for x in range(4)], outputs, max_workers=2)
+        assert [r.ok for r in results] == [True, True, False, True]
+        assert [r.value for r in results] == [outputs[0], outputs[1], None, outputs[3]]
+        assert json.loads(outputs[1].read_text()) == {"result": 101}
+        # No leftovers from failed download
+        assert sorted(p.name for p in output_dir.iterdir()) == ["result0.json", "result1.json", "result3.json"]
+
+    def test_download_many_datacubes(self, con, tmp_path):
+        cubes = [con.datacube_from_process("add", x=x, y=100) for x in range(3)]
+        outputs = [tmp_path / f"result{x}.json" for x in range(3)]
+        for result in con.download_many(cubes, outputs, ordered=False):
+            assert result.ok
+            assert json.loads(result.value.read_text()) == {"result": 100 + result.index}
+
+    def test_download_many_mismatch(self, con, tmp_path):
+        with pytest.raises(OpenEoClientException, match="Number of output files \\(1\\) does not match"):
+            con.download_many([self._graph(1), self._graph(2)], [tmp_path / "result.json"])
+
+
+class TestResultCache:
+    @pytest.fixture
+    def cache(self, tmp_path) -> ResultCache:
+        return ResultCache(tmp_path / "cache")
+
+    @pytest.fixture
+    def con(self, requests_mock, cache) -> Connection:
+        requests_mock.get(API_URL, json={"api_version": "1.0.0"})
+        return Connection(API_URL, result_cache=cache)
+
+    @pytest.fixture
+    def post_result(self, requests_mock):
+        def handler(request, context):
+            flat_graph = request.json()["process"]["process_graph"]
+            return json.dumps({"nodes": sorted(flat_graph)}).encode("utf8")
+
+        return requests_mock.post(API_URL + "result", content=handler)
+
+    def test_execute(self, con, post_result):
+        graph = {"add": {"process_id": "add", "arguments": {"x": 3, "y": 5}, "result": True}}
+        assert con.execute(graph) == {"nodes": ["add"]}
+        assert post_result.call_count == 1
+        # Same process graph (different node ids and argument order)
+        graph = {"add123": {"process_id": "add", "arguments": {"y": 5, "x": 3}, "result": True}}
+        assert con.execute(graph) == {"nodes": ["add"]}
+        assert post_result.call_count == 1
+        # Different process graph
+        graph = {"add": {"process_id": "add", "arguments": {"x": 3, "y": 6}, "result": True}}
+        assert con.execute(graph) == {"nodes": ["add"]}
+        assert post_result.call_count == 2
+
+    def test_download(self, con, post_result, tmp_path):
+        graph = {"add": {"process_id": "add", "arguments": {"x": 3, "y": 5}, "result": True}}
+        assert con.download(graph, tmp_path / "result.json") is None
+        assert post_result.call_count == 1
+        assert con.download(graph) == b'{"nodes": ["add"]}'
+        assert post_result.call_count == 1
+        con.download(graph, tmp_path / "again.json")
+        assert (tmp_path / "again.json").read_bytes() == b'{"nodes": ["add"]}'
+        assert post_result.call_count == 1
+
+    def test_output_format(self, con, post_result, cache):
+        def graph(format: str) -> PGNode:
+            return PGNode("save_result", data=PGNode("load_collection", id="S2"), format=format)
+
+        con.download(graph("GTiff"))
+        con.download(graph("GTiff"))
+        assert post_result.call_count == 1
+        con.download(graph("netCDF"))
+        assert post_result.call_count == 2
+        assert len(list(cache.directory.iterdir())) == 2
+        # Keyed by backend, process graph and format
+        key = cache.key(API_URL, graph("GTiff"), "GTiff")
+        assert key == cache.key("https://oeo.test", graph("GTiff"), "gtiff")
+        assert key != cache.key("https://other.test/", graph("GTiff"), "GTiff")
+        assert key != cache.key(API_URL, graph("GTiff"), "netCDF")
+
+    def test_no_cache(self, requests_mock, post_result):
+        requests_mock.get(API_URL, json={"api_version": "1.0.0"})
+        con = Connection(API_URL)
+        graph = {"add": {"process_id": "add", "arguments": {"x": 3, "y": 5}, "result": True}}
+        con.execute(graph)
+        con.execute(graph)
+        assert post_result.call_count == 2
+
+    def test_error_not_cached(self, con, requests_mock, cache):
+        requests_mock.post(
+            API_URL + "result", [{"status_code": 500, "json": {"code": "Nope", "message": "Nope"}}, {"json": 8}]
+        )
+        graph = {"add": {"process_id": "add", "arguments": {"x": 3, "y": 5}, "result": True}}
+        with pytest.raises(OpenEoApiError):
+            con.execute(graph)
+        assert list(cache.directory.iterdir()) == []
+        assert con.execute(graph) == 8
@@ -0,0 +1,106 @@
+import logging
+import math
+
+import pytest
+import shapely.geometry
+
+from openeo.rest.connection import Connection
+from openeo.rest.geometry_reduction import GeometryReducer, reduce_geometry
+
+API_URL = "https://oeo.test"
+
+# Square with many (nearly) collinear vertices and sub-millimeter precision noise.
+NOISY_SQUARE = {
+    "type": "Polygon",
+    "coordinates": [
+        [[3 + i / 1000 + 1e-9 * (i % 3), 51.0] for i in range(1000)]
+        + [[4.0, 51 + i / 1000] for i in range(1000)]
+        + [[4 - i / 1000, 52.0] for i in range(1000)]
+        + [[3.0, 52 - i / 1000] for i in range(1000)]
+        + [[3.0, 51.0]]
+    ],
+}
+
+
+class TestReduceGeometry:
+    def test_simplify(self):
+        reduced = reduce_geometry(NOISY_SQUARE, tolerance=1e-6)
+        assert reduced["coordinates"] == [[[3.0, 51.0], [4.0, 51.0], [4.0, 52.0], [3.0, 52.0], [3.0, 51.0]]]
+        assert len(NOISY_SQUARE["coordinates"][0]) == 4001
+
+    def test_round(self):
+        geometry = {"type": "LineString", "coordinates": [[3.123456, 51.1], [3.123459, 51.1], [3.2, 51.2]]}
+        assert reduce_geometry(geometry, decimals=4) == {
+            "type": "LineString",
+            "coordinates": [[3.1235, 51.1], [3.2, 51.2]],
+        }
+        assert reduce_geometry({"type": "Point", "coordinates": [3.123456, 51.1]}, decimals=2) == {
+            "type": "Point",
+            "coordinates": [3.12, 51.1],
+        }
+
+    def test_round_collapsed_ring(self):
+        tiny = {"type": "Polygon", "coordinates": [[[3.0, 51.0], [3.00001, 51.0], [3.0, 51.00001], [3.0, 51.0]]]}
+        reduced = reduce_geometry(tiny, decimals=3)
+        assert reduced["coordinates"] == [[[3.0, 51.0], [3.0, 51.0], [3.0, 51.0], [3.0, 51.0]]]
+
+    def test_feature_collection(self):
+        feature_collection = {
+            "type": "FeatureCollection",
+            "features": [
+                {"type": "Feature", "id": "a", "properties": {"name": "A"}, "geometry": NOISY_SQUARE},
+                {"type": "Feature", "id": "b", "properties": {}, "geometry": None},
+            ],
+        }
+        reduced = reduce_geometry(feature_collection, tolerance=1e-6, decimals=3)
+        assert reduced["features"][0] == {
+            "type": "Feature",
+            "id": "a",
+            "properties": {"name": "A"},
+            "geometry": {"type": "Polygon", "coordinates": [[[3, 51], [4, 51], [4, 52], [3, 52], [3, 51]]]},
+        }
+        assert reduced["features"][1] == feature_collection["features"][1]
+        # Input is not modified
+        assert len(feature_collection["features"][0]["geometry"]["coordinates"][0]) == 4001
+
+    def test_topology_preserved(self):
+        # Polygon with a narrow hole: simplification should not make it invalid.
+        outer = [[math.cos(a / 50), math.sin(a / 50)] for a in range(315)] + [[1, 0]]
+        hole = [[0.5 + 0.1 * math.cos(a / 50), 0.1 * math.sin(a / 50)] for a in range(315)] + [[0.6, 0]]
+        geometry = {"type": "Polygon", "coordinates": [outer, hole]}
+        reduced = reduce_geometry(geometry, tolerance=0.2)
+        assert shapely.geometry.shape(reduced).is_valid
+        assert len(reduced["coordinates"]) == 2
+
+
+class TestGeometryReducer:
+    def test_tolerance(self):
+        assert GeometryReducer(tolerance=0.5).get_tolerance() == 0.5
+        assert GeometryReducer(resolution=10).get_tolerance() == pytest.approx(5 / 111_320)
+        assert GeometryReducer(resolution=10).get_tolerance(crs=4326) == pytest.approx(5 / 111_320)
+        assert GeometryReducer(resolution=10).get_tolerance(crs="EPSG:32631") == 5
+        with pytest.raises(ValueError, match="either tolerance or resolution"):
+            GeometryReducer(tolerance=1, resolution=10)
+
+    def test_reduce_reports(self, caplog):
+        caplog.set_level(logging.INFO)
+        reducer = GeometryReducer(resolution=10, decimals=5)
+        reduced = reducer.reduce(NOISY_SQUARE)
+        assert len(reduced["coordinates"][0]) == 5
+        ((before, after),) = reducer.reports
+        assert before > 50_000
+        assert after < 100
+        assert f"Reduced geometry payload from {before} to {after} bytes" in caplog.text
+
+    def test_datacube(self, requests_mock):
+        requests_mock.get(API_URL + "/", json={"api_version": "1.1.0"})
+        connection = Connection(API_URL, geometry_reducer=GeometryReducer(resolution=10, decimals=4))
+        cube = connection.load_collection("S2", fetch_metadata=False)
+        flat_graph = cube.aggregate_spatial(geometries=NOISY_SQUARE, reducer="mean").flat_graph()
+        assert flat_graph["aggregatespatial1"]["arguments"]["geometries"] == {
+            "type": "Polygon",
+            "coordinates": [[[3, 51], [4, 51], [4, 52], [3, 52], [3, 51]]],
+        }
+        flat_graph = cube.mask_polygon(mask=shapely.geometry.shape(NOISY_SQUARE)).flat_graph()
+        assert len(flat_graph["maskpolygon1"]["arguments"]["mask"]["coordinates"][0]) == 5
+        assert len(connection.geometry_reducer.reports) == 2
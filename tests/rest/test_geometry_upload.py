@@ -0,0 +1,151 @@
+import base64
+import hashlib
+import json
+import math
+import multiprocessing
+import re
+from unittest import mock
+
+import pytest
+
+import openeo
+from openeo.rest.connection import Connection
+from openeo.rest.geometry_upload import GeometryUploader
+
+API_URL = "https://oeo.test"
+
+SMALL = {"type": "Polygon", "coordinates": [[[3, 51], [4, 51], [4, 52], [3, 51]]]}
+# Circle polygon with large GeoJSON serialization
+LARGE = {
+    "type": "Polygon",
+    "coordinates": [[[3 + math.cos(a / 20), 51 + math.sin(a / 20)] for a in range(126)] + [[4, 51]]],
+}
+
+
+def _upload_points(manifest, user: str, count: int):
+    """Upload geometries with a shared manifest (e.g. from a separate process)."""
+    connection = mock.Mock(root_url=API_URL)
+    connection.describe_account.return_value = {"user_id": user}
+    connection.upload_file.side_effect = lambda path, target: mock.Mock(path=target)
+    uploader = GeometryUploader(threshold=0, manifest=manifest)
+    for i in range(count):
+        uploader.upload(connection, {"type": "Point", "coordinates": [i, 0]})
+
+
+class TestGeometryUploader:
+    @pytest.fixture
+    def uploads(self, requests_mock) -> list:
+        """Fake `PUT /files/{path}` endpoint, tracking the uploaded files."""
+        requests_mock.get(
+            API_URL + "/",
+            json={"api_version": "1.1.0", "endpoints": [{"path": "/credentials/basic", "methods": ["GET"]}]},
+        )
+        # Basic auth: access token is the user name, which is also the user id.
+        requests_mock.get(
+            API_URL + "/credentials/basic",
+            json=lambda r, c: {"access_token": base64.b64decode(r.headers["Authorization"][6:]).decode().split(":")[0]},
+        )
+        requests_mock.get(API_URL + "/me", json=lambda r, c: {"user_id": r.headers["Authorization"].split("/")[-1]})
+        uploads = []
+
+        def put_file(request, context):
+            path = request.path.split("/files/", 1)[1]
+            uploads.append((path, json.loads(request.body.read())))
+            return {"path": path, "size": 123}
+
+        requests_mock.put(re.compile(API_URL + "/files/.*"), json=put_file)
+        return uploads
+
+    @pytest.fixture
+    def uploader(self, tmp_path) -> GeometryUploader:
+        return GeometryUploader(threshold=1000, manifest=tmp_path / "uploads.db")
+
+    def test_offload(self, uploads, uploader):
+        connection = openeo.connect(API_URL).authenticate_basic("john", "j0hn")
+        assert uploader.offload(connection, SMALL) is None
+        assert uploads == []
+
+        node = uploader.offload(connection, LARGE)
+        digest = hashlib.sha256(GeometryUploader.serialize(LARGE)).hexdigest()
+        path = f"openeo-geometries/{digest}.geojson"
+        assert node.flat_graph() == {
+            "loaduploadedfiles1": {
+                "process_id": "load_uploaded_files",
+                "arguments": {"paths": [path], "format": "GeoJSON", "options": {}},
+                "result": True,
+            }
+        }
+        assert uploads == [(path, json.loads(json.dumps(LARGE)))]
+
+    def test_deduplicate(self, uploads, uploader, tmp_path):
+        connection = openeo.connect(API_URL).authenticate_basic("john", "j0hn")
+        first = uploader.upload(connection, LARGE)
+        # Same content (different key order): no upload, also not for a new uploader with the same manifest.
+        reordered = dict(reversed(list(LARGE.items())))
+        assert uploader.upload(connection, reordered) == first
+        assert GeometryUploader(manifest=tmp_path / "uploads.db").upload(connection, LARGE) == first
+        assert len(uploads) == 1
+
+        other = uploader.upload(connection, SMALL)
+        assert other != first
+        assert len(uploads) == 2
+
+    def test_per_account(self, uploads, uploader):
+        john = openeo.connect(API_URL).authenticate_basic("john", "j0hn")
+        path = uploader.upload(john, LARGE)
+        assert uploader.upload(john, LARGE) == path
+        assert len(uploads) == 1
+        # Other account on same backend: not in its workspace yet.
+        alice = openeo.connect(API_URL).authenticate_basic("alice", "4l1c3")
+        assert uploader.upload(alice, LARGE) == path
+        assert len(uploads) == 2
+        assert sorted(e["account"] for e in uploader.entries()) == [API_URL + "#alice", API_URL + "#john"]
+
+    def test_account_fetched_once(self, uploads, uploader, requests_mock):
+        connection = openeo.connect(API_URL).authenticate_basic("john", "j0hn")
+        uploader.upload(connection, LARGE)
+        uploader.upload(connection, LARGE)
+        uploader.upload(connection, SMALL)
+        assert len([r for r in requests_mock.request_history if r.path == "/me"]) == 1
+
+    def test_forget(self, uploads, uploader):
+        connection = openeo.connect(API_URL).authenticate_basic("john", "j0hn")
+        path = uploader.upload(connection, LARGE)
+        uploader.upload(connection, SMALL)
+        uploader.forget(connection, path=path)
+        uploader.upload(connection, SMALL)
+        assert len(uploads) == 2
+        uploader.upload(connection, LARGE)
+        assert len(uploads) == 3
+        uploader.clear()
+        uploader.upload(connection, SMALL)
+        assert len(uploads) == 4
+
+    def test_concurrent_processes(self, tmp_path):
+        manifest = tmp_path / "shared.db"
+        processes = [
+            multiprocessing.Process(target=_upload_points, args=(manifest, f"user{u}", 20)) for u in range(4)
+        ]
+        for p in processes:
+            p.start()
+        for p in processes:
+            p.join(timeout=60)
+        assert [p.exitcode for p in processes] == [0] * 4
+        entries = GeometryUploader(manifest=manifest).entries()
+        assert len(entries) == 80
+        assert sorted(set(e["account"] for e in entries)) == [f"{API_URL}#user{u}" for u in range(4)]
+
+    def test_datacube(self, uploads, uploader):
+        connection = Connection(API_URL, geometry_uploader=uploader).authenticate_basic("john", "j0hn")
+        cube = connection.load_collection("S2", fetch_metadata=False)
+        flat_graph = cube.aggregate_spatial(geometries=LARGE, reducer="mean").flat_graph()
+        assert flat_graph["loaduploadedfiles1"]["arguments"]["paths"] == [uploads[0][0]]
+        assert flat_graph["aggregatespatial1"]["arguments"]["geometries"] == {"from_node": "loaduploadedfiles1"}
+
+        flat_graph = cube.mask_polygon(mask=LARGE).flat_graph()
+        assert flat_graph["maskpolygon1"]["arguments"]["mask"] == {"from_node": "loaduploadedfiles1"}
+        # Small geometries are still embedded inline
+        flat_graph = cube.mask_polygon(mask=SMALL).flat_graph()
+        assert flat_graph["maskpolygon1"]["arguments"]["mask"] == SMALL
+        assert len(uploads) == 1
+
@@ -9,7 +9,7 @@ import requests
 
 import openeo
 import openeo.rest.job
-from openeo.rest import JobFailedException, OpenEoClientException
+from openeo.rest import JobFailedException, OpenEoApiError, OpenEoClientException
 from openeo.rest.job import BatchJob, ResultAsset
 from .test_connection import _credentials_basic_handler
 
@@ -708,3 +708,196 @@ def test_list_jobs(con100, requests_mock):
         {"id": "job123", "status": "running", "created": "2021-02-22T09:00:00Z"},
         {"id": "job456", "status": "created", "created": "2021-03-22T10:00:00Z"},
     ]
+
+
+class _FakeClock:
+    """Fake for the `time` module, with `sleep()` advancing `time()`"""
+
+    def __init__(self, start: float = 1000):
+        self.now = start
+        self.sleeps = []
+
+    def time(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+class TestWaitForJobs:
+    @pytest.fixture
+    def clock(self):
+        clock = _FakeClock()
+        with mock.patch.object(openeo.rest.job, "time", clock):
+            yield clock
+
+    def _mock_job(self, requests_mock, job_id, statuses):
+        requests_mock.get(f"{API_URL}/jobs/{job_id}", [{"json": {"id": job_id, **s}} for s in statuses])
+
+    def test_completion_order(self, con100, requests_mock, clock):
+        self._mock_job(requests_mock, "j1", [{"status": "running"}] * 5 + [{"status": "finished"}])
+        self._mock_job(requests_mock, "j2", [{"status": "queued"}, {"status": "finished"}])
+        self._mock_job(requests_mock, "j3", [{"status": "running"}, {"status": "running"}, {"status": "error"}])
+        jobs = [con100.job("j1"), con100.job("j2"), con100.job("j3")]
+
+        log = []
+        result = [
+            (job.job_id, info["status"])
+            for job, info in openeo.rest.job.wait_for_jobs(jobs, jitter=0, print=log.append)
+        ]
+        assert result == [("j2", "finished"), ("j3", "error"), ("j1", "finished")]
+        # Single poller: sleeps are interleaved, no more than one poll round per interval.
+        assert clock.now - 1000 == pytest.approx(5 + 6.25 + 7.8125 + 9.765625 + 12.20703125, abs=0.01)
+        assert log[:3] == [
+            "0:00:00 Job 'j1': running (progress N/A)",
+            "0:00:00 Job 'j2': queued (progress N/A)",
+            "0:00:00 Job 'j3': running (progress N/A)",
+        ]
+
+    def test_max_poll_interval(self, con100, requests_mock, clock):
+        self._mock_job(requests_mock, "j1", [{"status": "running"}] * 20 + [{"status": "finished"}])
+        (result,) = list(openeo.rest.job.wait_for_jobs([con100.job("j1")], max_poll_interval=10, jitter=0))
+        assert result[1]["status"] == "finished"
+        assert max(clock.sleeps) == 10
+
+    def test_progress_aware(self, con100, requests_mock, clock):
+        self._mock_job(
+            requests_mock,
+            "j1",
+            [
+                {"status": "running", "progress": 10},
+                {"status": "running", "progress": 80},
+                {"status": "running", "progress": 95},
+                {"status": "finished", "progress": 100},
+            ],
+        )
+        list(openeo.rest.job.wait_for_jobs([con100.job("j1")], min_poll_interval=1, max_poll_interval=60, jitter=0))
+        # After 1s: 70% progress, estimated remaining time ~ 0.3s, so poll again soon (at min interval)
+        assert clock.sleeps == [1, 1, 1]
+
+    def test_jitter(self, con100, requests_mock, clock):
+        self._mock_job(requests_mock, "j1", [{"status": "running"}] * 10 + [{"status": "finished"}])
+        list(openeo.rest.job.wait_for_jobs([con100.job("j1")], min_poll_interval=10, max_poll_interval=10, jitter=0.2))
+        assert all(8 <= s <= 12 for s in clock.sleeps)
+        assert len(set(clock.sleeps)) > 1
+
+    def test_soft_errors(self, con100, requests_mock, clock):
+        requests_mock.get(
+            API_URL + "/jobs/j1",
+            [
+                {"json": {"status": "running"}},
+                {"status_code": 503, "text": "service unavailable"},
+                {"exc": requests.ConnectionError("time out")},
+                {"json": {"status": "finished"}},
+            ],
+        )
+        self._mock_job(requests_mock, "j2", [{"status": "running"}, {"status": "finished"}])
+        log = []
+        result = list(
+            openeo.rest.job.wait_for_jobs(
+                [con100.job("j1"), con100.job("j2")], connection_retry_interval=30, jitter=0, print=log.append
+            )
+        )
+        assert [j.job_id for j, _ in result] == ["j2", "j1"]
+        assert log == [
+            "0:00:00 Job 'j1': running (progress N/A)",
+            "0:00:00 Job 'j2': running (progress N/A)",
+            "0:00:05 Job 'j1': Service availability error while polling job status: [503] unknown: service unavailable",
+            "0:00:05 Job 'j2': finished (progress N/A)",
+            "0:00:35 Job 'j1': Connection error while polling job status: time out",
+            "0:01:05 Job 'j1': finished (progress N/A)",
+        ]
+
+    def test_excessive_soft_errors(self, con100, requests_mock, clock):
+        requests_mock.get(API_URL + "/jobs/j1", status_code=502, text="Bad Gateway")
+        requests_mock.get(API_URL + "/jobs/j2", exc=requests.ConnectionError("time out"))
+        with pytest.raises(OpenEoClientException, match="Excessive soft errors"):
+            list(openeo.rest.job.wait_for_jobs([con100.job("j1"), con100.job("j2")], soft_error_max=5))
+
+    def test_hard_error(self, con100, requests_mock, clock):
+        requests_mock.get(API_URL + "/jobs/j1", status_code=404, json={"code": "JobNotFound", "message": "nope"})
+        with pytest.raises(OpenEoApiError, match="JobNotFound"):
+            list(openeo.rest.job.wait_for_jobs([con100.job("j1")]))
+
+
+class TestIterLogs:
+    @pytest.fixture
+    def con120(self, requests_mock):
+        requests_mock.get(API_URL + "/", json={"api_version": "1.2.0"})
+        return openeo.connect(API_URL)
+
+    @pytest.fixture
+    def sleep_mock(self):
+        with mock.patch.object(openeo.rest.job.time, "sleep") as sleep:
+            yield sleep
+
+    def test_pagination(self, con100, requests_mock):
+        requests_mock.get(
+            API_URL + "/jobs/f00ba5/logs",
+            json={
+                "logs": [{"id": "1", "level": "info", "message": "hello"}],
+                "links": [{"rel": "next", "href": API_URL + "/jobs/f00ba5/logs?offset=1&limit=1"}],
+            },
+            complete_qs=True,
+        )
+        requests_mock.get(
+            API_URL + "/jobs/f00ba5/logs?offset=1&limit=1",
+            json={"logs": [{"id": "2", "level": "error", "message": "nope"}], "links": []},
+            complete_qs=True,
+        )
+        logs = con100.job("f00ba5").iter_logs()
+        assert not isinstance(logs, list)
+        assert [(l.id, l.message) for l in logs] == [("1", "hello"), ("2", "nope")]
+
+    def test_level_client_side_fallback(self, con100, requests_mock):
+        m = requests_mock.get(
+            API_URL + "/jobs/f00ba5/logs",
+            json={
+                "logs": [
+                    {"id": "1", "level": "info", "message": "hello"},
+                    {"id": "2", "level": "error", "message": "nope"},
+                ]
+            },
+        )
+        assert [l.id for l in con100.job("f00ba5").iter_logs(level="warning")] == ["2"]
+        assert m.last_request.qs == {"level": ["warning"]}
+
+    def test_level_server_side(self, con120, requests_mock):
+        # Backend (claiming API 1.2.0) should filter, but client-side filtering is still applied.
+        m = requests_mock.get(
+            API_URL + "/jobs/f00ba5/logs",
+            json={
+                "logs": [
+                    {"id": "1", "level": "info", "message": "hello"},
+                    {"id": "2", "level": "warning", "message": "hmm"},
+                ]
+            },
+        )
+        assert [l.id for l in con120.job("f00ba5").iter_logs(level="warning", limit=100)] == ["2"]
+        assert m.last_request.qs == {"level": ["warning"], "limit": ["100"]}
+
+    def test_follow(self, con100, requests_mock, sleep_mock):
+        def logs(request, context):
+            offset = request.qs.get("offset", [None])[0]
+            entries = {
+                None: [{"id": "1", "level": "info", "message": "start"}],
+                "1": [],
+                "2": [{"id": "3", "level": "info", "message": "done"}],
+            }
+            if offset == "1" and logs.calls > 2:
+                entries["1"] = [{"id": "2", "level": "info", "message": "busy"}]
+            logs.calls += 1
+            return {"logs": entries.get(offset, [])}
+
+        logs.calls = 0
+        m = requests_mock.get(API_URL + "/jobs/f00ba5/logs", json=logs)
+        requests_mock.get(
+            API_URL + "/jobs/f00ba5",
+            [{"json": {"status": s}} for s in ["running", "running", "running", "running", "finished"]],
+        )
+
+        entries = list(con100.job("f00ba5").iter_logs(follow=True, offset=None, poll_interval=2))
+        assert [(l.id, l.message) for l in entries] == [("1", "start"), ("2", "busy"), ("3", "done")]
+        assert [r.qs.get("offset") for r in m.request_history] == [None, ["1"], ["1"], ["1"], ["2"], ["3"]]
+        assert sleep_mock.call_args_list == [mock.call(2), mock.call(2.5), mock.call(3.125), mock.call(2)]
@@ -0,0 +1,295 @@
+import multiprocessing
+import re
+import time
+from unittest import mock
+
+import pytest
+import time_machine
+
+import openeo
+from openeo.internal.graph_building import PGNode
+from openeo.rest.datacube import DataCube
+from openeo.rest.job import BatchJob, JobFailedException
+from openeo.rest.job_registry import CheckpointRegistry, JobResultRegistry
+
+API_URL = "https://oeo.test/"
+
+
+class FakeJobs:
+    """Minimal fake of the batch job endpoints: jobs finish as soon as they are started."""
+
+    def __init__(self, requests_mock):
+        self.statuses = {}
+        self.graphs = {}
+        self.collection_versions = {"S2": "1.0"}
+        # Status of started jobs
+        self.start_status = "finished"
+        requests_mock.post(API_URL + "jobs", status_code=201, text=self._create)
+        requests_mock.get(re.compile(API_URL + "jobs/[^/]+$"), json=self._describe)
+        requests_mock.post(re.compile(API_URL + "jobs/[^/]+/results$"), status_code=202, text=self._start)
+        requests_mock.get(re.compile(API_URL + "collections/"), json=self._collection)
+
+    def _create(self, request, context):
+        job_id = f"job-{len(self.statuses)}"
+        self.statuses[job_id] = "created"
+        self.graphs[job_id] = request.json()["process"]
+        context.headers["OpenEO-Identifier"] = job_id
+        return ""
+
+    def _describe(self, request, context):
+        job_id = request.path.split("/")[-1]
+        if job_id not in self.statuses:
+            context.status_code = 404
+            return {"code": "JobNotFound", "message": "Nope"}
+        return {"id": job_id, "status": self.statuses[job_id], "process": self.graphs[job_id]}
+
+    def _start(self, request, context):
+        self.statuses[request.path.split("/")[-2]] = self.start_status
+        return ""
+
+    def _collection(self, request, context):
+        return {"id": request.path.split("/")[-1], "version": self.collection_versions.get("S2")}
+
+
+def _track_jobs(path, prefix: str, count: int):
+    """Track jobs in a registry (e.g. from a separate process)."""
+    connection = mock.Mock(root_url=API_URL)
+    registry = JobResultRegistry(path)
+    for i in range(count):
+        graph = {"lc": {"process_id": "load_collection", "arguments": {"id": f"C{i}"}, "result": True}}
+        registry.track(BatchJob(job_id=f"{prefix}-{i}", connection=connection), process_graph=graph)
+
+
+class TestJobResultRegistry:
+    @pytest.fixture
+    def fake_jobs(self, requests_mock) -> FakeJobs:
+        return FakeJobs(requests_mock)
+
+    @pytest.fixture
+    def registry(self, tmp_path) -> JobResultRegistry:
+        return JobResultRegistry(tmp_path / "registry.db")
+
+    @pytest.fixture
+    def con(self, requests_mock, registry) -> openeo.Connection:
+        requests_mock.get(API_URL, json={"api_version": "1.0.0"})
+        return openeo.Connection(API_URL, job_registry=registry)
+
+    @staticmethod
+    def _graph(x: int = 3) -> dict:
+        return {
+            "lc": {"process_id": "load_collection", "arguments": {"id": "S2"}},
+            "ap": {
+                "process_id": "apply",
+                "arguments": {
+                    "data": {"from_node": "lc"},
+                    "process": {
+                        "process_graph": {
+                            "add": {
+                                "process_id": "add",
+                                "arguments": {"x": {"from_parameter": "x"}, "y": x},
+                                "result": True,
+                            }
+                        }
+                    },
+                },
+                "result": True,
+            },
+        }
+
+    def test_reuse(self, con, fake_jobs, registry):
+        job = con.create_job(self._graph())
+        assert job.job_id == "job-0"
+        assert registry.entries()[0]["finished"] is None
+        # Not finished yet: no reuse
+        assert con.create_job(self._graph()).job_id == "job-1"
+
+        job.start_and_wait()
+        (entry,) = [e for e in registry.entries() if e["finished"]]
+        assert entry["job_id"] == "job-0"
+        assert entry["results_url"] == API_URL + "jobs/job-0/results"
+        assert entry["collections"] == {"S2": "1.0"}
+
+        assert con.create_job(self._graph()).job_id == "job-0"
+        assert con.create_job(self._graph(x=4)).job_id == "job-2"
+        assert len(fake_jobs.statuses) == 3
+
+    def test_execute_batch(self, con, fake_jobs, tmp_path, requests_mock):
+        requests_mock.get(API_URL + "jobs/job-0/results", json={"assets": {"out.json": {"href": API_URL + "out"}}})
+        requests_mock.get(API_URL + "out", json={"result": 8})
+        requests_mock.get(API_URL + "file_formats", json={"output": {"JSON": {"gis_data_types": ["raster"]}}})
+        cube = con.datacube_from_process("add", x=3, y=5)
+        cube.execute_batch(outputfile=tmp_path / "result1.json", format="JSON")
+        assert fake_jobs.statuses == {"job-0": "finished"}
+        job = cube.execute_batch(outputfile=tmp_path / "result2.json", format="JSON")
+        assert job.job_id == "job-0"
+        assert fake_jobs.statuses == {"job-0": "finished"}
+        assert (tmp_path / "result2.json").read_text() == '{"result": 8}'
+
+    def test_create_jobs_start_reused(self, con, fake_jobs, requests_mock):
+        con.create_job(self._graph()).start_and_wait()
+        starts = requests_mock.post(API_URL + "jobs/job-0/results", status_code=202)
+        results = con.create_jobs([self._graph(), self._graph(x=4)], start=True)
+        assert [r.ok for r in results] == [True, True]
+        assert [r.value.job_id for r in results] == ["job-0", "job-1"]
+        # Reused (finished) job is not restarted, new job is started.
+        assert starts.call_count == 0
+        assert fake_jobs.statuses == {"job-0": "finished", "job-1": "finished"}
+
+    def test_max_age_and_since(self, con, fake_jobs, registry):
+        with time_machine.travel("2022-10-01 12:00:00+00", tick=False) as traveller:
+            con.create_job(self._graph()).start_and_wait()
+            traveller.shift(3600)
+            assert registry.lookup(con, self._graph()).job_id == "job-0"
+            assert registry.lookup(con, self._graph(), since=time.time() - 1800) is None
+            registry.max_age = 1800
+            assert registry.lookup(con, self._graph()) is None
+
+    def test_collection_version_changed(self, con, fake_jobs, registry):
+        con.create_job(self._graph()).start_and_wait()
+        assert registry.lookup(con, self._graph()).job_id == "job-0"
+        fake_jobs.collection_versions["S2"] = "2.0"
+        assert registry.lookup(con, self._graph()) is None
+        assert registry.entries() == []
+
+    def test_invalidate(self, con, fake_jobs, registry):
+        con.create_job(self._graph()).start_and_wait()
+        assert registry.invalidate(collection_id="S1") == 0
+        assert registry.invalidate(collection_id="S2") == 1
+        assert registry.lookup(con, self._graph()) is None
+
+    def test_job_deleted(self, con, fake_jobs, registry):
+        con.create_job(self._graph()).start_and_wait()
+        del fake_jobs.statuses["job-0"]
+        assert registry.lookup(con, self._graph()) is None
+        assert registry.entries() == []
+
+    def test_collection_metadata_failure_does_not_invalidate(self, con, fake_jobs, registry, requests_mock):
+        con.create_job(self._graph()).start_and_wait()
+        requests_mock.get(API_URL + "collections/S2", status_code=500, json={"code": "Internal", "message": "Oops"})
+        assert registry.lookup(con, self._graph()) is None
+        assert [e["job_id"] for e in registry.entries()] == ["job-0"]
+        requests_mock.get(API_URL + "collections/S2", json={"id": "S2", "version": "1.0"})
+        assert registry.lookup(con, self._graph()).job_id == "job-0"
+
+    @pytest.mark.parametrize(
+        ["status_code", "invalidated"],
+        [(404, True), (500, False), (502, False)],
+    )
+    def test_job_status_failure(self, con, fake_jobs, registry, requests_mock, status_code, invalidated):
+        con.create_job(self._graph()).start_and_wait()
+        requests_mock.get(API_URL + "jobs/job-0", status_code=status_code, json={"code": "Nope", "message": "Nope"})
+        assert registry.lookup(con, self._graph()) is None
+        assert [e["job_id"] for e in registry.entries()] == ([] if invalidated else ["job-0"])
+
+    def test_prune_pending(self, con, fake_jobs, registry):
+        with time_machine.travel("2022-10-01 12:00:00+00", tick=False) as traveller:
+            con.create_job(self._graph(x=1))
+            traveller.shift(6 * 24 * 3600)
+            con.create_job(self._graph(x=2))
+            assert [e["job_id"] for e in registry.entries()] == ["job-0", "job-1"]
+            traveller.shift(2 * 24 * 3600)
+            con.create_job(self._graph(x=3))
+            assert [e["job_id"] for e in registry.entries()] == ["job-1", "job-2"]
+
+    def test_failed_job_is_not_tracked(self, con, fake_jobs, registry, requests_mock):
+        requests_mock.get(API_URL + "jobs/job-0/logs", json={"logs": []})
+        job = con.create_job(self._graph())
+        fake_jobs.start_status = "error"
+        with pytest.raises(JobFailedException):
+            job.start_and_wait(print=lambda m: None)
+        assert registry.entries() == []
+
+    def test_concurrent_processes(self, tmp_path):
+        path = tmp_path / "shared.db"
+        processes = [multiprocessing.Process(target=_track_jobs, args=(path, f"w{w}", 20)) for w in range(4)]
+        for p in processes:
+            p.start()
+        for p in processes:
+            p.join(timeout=60)
+        assert [p.exitcode for p in processes] == [0] * 4
+        entries = JobResultRegistry(path).entries()
+        assert sorted(e["job_id"] for e in entries) == sorted(f"w{w}-{i}" for w in range(4) for i in range(20))
+
+    def test_register_untracked(self, con, fake_jobs, tmp_path):
+        con.create_job(self._graph()).start_and_wait()
+        # Other registry: job metadata is used to get the process graph.
+        registry = JobResultRegistry(tmp_path / "other.db", check_collection_versions=False)
+        registry.register(con.job("job-0"))
+        assert registry.entries()[0]["collections"] == {"S2": None}
+        assert registry.lookup(con, self._graph()).job_id == "job-0"
+
+    def test_load_result(self, con, fake_jobs, registry):
+        assert registry.load_result(con, self._graph()) is None
+        con.create_job(self._graph()).start_and_wait()
+        cube = registry.load_result(con, self._graph())
+        assert cube.flat_graph() == {
+            "loadresult1": {"process_id": "load_result", "arguments": {"id": "job-0"}, "result": True}
+        }
+
+
+class TestCheckpointRegistry:
+    @pytest.fixture
+    def fake_jobs(self, requests_mock) -> FakeJobs:
+        requests_mock.get(API_URL + "file_formats", json={"output": {"GTiff": {"gis_data_types": ["raster"]}}})
+        return FakeJobs(requests_mock)
+
+    @pytest.fixture
+    def checkpoints(self, tmp_path) -> CheckpointRegistry:
+        return CheckpointRegistry(tmp_path / "checkpoints.db")
+
+    @pytest.fixture
+    def con(self, requests_mock) -> openeo.Connection:
+        requests_mock.get(API_URL, json={"api_version": "1.0.0"})
+        return openeo.Connection(API_URL)
+
+    @staticmethod
+    def _composite(con) -> DataCube:
+        cube = con.datacube_from_process("load_collection", id="S2")
+        median = PGNode("median", data={"from_parameter": "data"})
+        return cube.process("reduce_dimension", data=cube, dimension="t", reducer={"process_graph": median})
+
+    def test_checkpoint(self, con, fake_jobs, checkpoints):
+        cube = self._composite(con).checkpoint(registry=checkpoints, print=lambda m: None)
+        assert cube.flat_graph() == {
+            "loadresult1": {"process_id": "load_result", "arguments": {"id": "job-0"}, "result": True}
+        }
+        assert fake_jobs.graphs["job-0"]["process_graph"]["saveresult1"]["arguments"]["format"] == "GTiff"
+        # Later use: no new job
+        cube = self._composite(con).checkpoint(registry=checkpoints)
+        assert cube.flat_graph()["loadresult1"]["arguments"] == {"id": "job-0"}
+        assert list(fake_jobs.statuses) == ["job-0"]
+
+    def test_apply(self, con, fake_jobs, checkpoints):
+        self._composite(con).checkpoint(registry=checkpoints, print=lambda m: None)
+        cube = self._composite(con).apply("absolute").save_result(format="GTiff")
+        cube = checkpoints.apply(cube)
+        assert cube.flat_graph() == {
+            "loadresult1": {"process_id": "load_result", "arguments": {"id": "job-0"}},
+            "apply1": {
+                "process_id": "apply",
+                "arguments": {
+                    "data": {"from_node": "loadresult1"},
+                    "process": {
+                        "process_graph": {
+                            "absolute1": {
+                                "process_id": "absolute",
+                                "arguments": {"x": {"from_parameter": "x"}},
+                                "result": True,
+                            }
+                        }
+                    },
+                },
+            },
+            "saveresult1": {
+                "process_id": "save_result",
+                "arguments": {"data": {"from_node": "apply1"}, "format": "GTiff", "options": {}},
+                "result": True,
+            },
+        }
+
+    def test_apply_nothing_to_replace(self, con, fake_jobs, checkpoints):
+        cube = self._composite(con)
+        assert checkpoints.apply(cube) is cube
+        self._composite(con).checkpoint(registry=checkpoints, print=lambda m: None)
+        other = con.datacube_from_process("load_collection", id="S1")
+        assert checkpoints.apply(other) is other
@@ -29,3 +29,36 @@ def test_load_bytes(con100, requests_mock):
     content = con100.job('1').get_result().load_bytes()
 
     assert content == b'\x01\x02\x03\x04\x05'
+
+
+def test_get_profile(con100, requests_mock, tmp_path):
+    import cProfile
+
+    profiler = cProfile.Profile()
+    profiler.enable()
+    sorted(range(1000), key=lambda x: -x)
+    profiler.disable()
+    profiler.dump_stats(str(tmp_path / "rdd_1.pstats"))
+
+    requests_mock.get(
+        API_URL + "/jobs/1/results",
+        json={
+            "assets": {
+                "out.tif": {"href": API_URL + "/jobs/1/results/out.tif"},
+                "rdd_1.pstats": {"href": API_URL + "/jobs/1/results/rdd_1.pstats"},
+            }
+        },
+    )
+    requests_mock.get(API_URL + "/jobs/1/results/rdd_1.pstats", content=(tmp_path / "rdd_1.pstats").read_bytes())
+
+    profile = con100.job("1").get_results().get_profile()
+    assert profile.sources == ["rdd_1.pstats"]
+    assert "<lambda>" in [h["function"] for h in profile.hotspots(limit=None)]
+
+
+def test_get_profile_no_profile_assets(con100, requests_mock):
+    requests_mock.get(
+        API_URL + "/jobs/1/results", json={"assets": {"out.tif": {"href": API_URL + "/jobs/1/results/out.tif"}}}
+    )
+    with pytest.raises(openeo.rest.OpenEoClientException, match="No profiling assets found"):
+        con100.job("1").get_results().get_profile()
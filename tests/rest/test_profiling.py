@@ -0,0 +1,121 @@
+import cProfile
+import pstats
+import tarfile
+import time
+
+import pytest
+
+from openeo.rest import OpenEoClientException
+from openeo.rest.profiling import JobProfile
+
+
+def _slow_leaf(n):
+    return sum(i * i for i in range(n))
+
+
+def _udf(n):
+    return _slow_leaf(n) + _slow_leaf(n // 2)
+
+
+def _dump_profile(path, n=20000):
+    profiler = cProfile.Profile()
+    profiler.enable()
+    _udf(n)
+    profiler.disable()
+    profiler.dump_stats(str(path))
+    return path
+
+
+@pytest.fixture
+def profile_tar(tmp_path):
+    path = tmp_path / "profile_dumps.tar.gz"
+    with tarfile.open(path, "w:gz") as tar:
+        for i in range(3):
+            dump = _dump_profile(tmp_path / f"rdd_{i}.pstats")
+            tar.add(dump, arcname=f"dumps/rdd_{i}.pstats")
+        readme = tmp_path / "README.txt"
+        readme.write_text("hello")
+        tar.add(readme, arcname="README.txt")
+    return path
+
+
+class TestJobProfile:
+    def test_from_files_pstats(self, tmp_path):
+        profile = JobProfile.from_files([_dump_profile(tmp_path / "a.pstats"), _dump_profile(tmp_path / "b.pstats")])
+        assert profile.sources == ["a.pstats", "b.pstats"]
+        (udf,) = [h for h in profile.hotspots(limit=None) if h["function"] == "_udf"]
+        assert udf["ncalls"] == 2
+
+    def test_from_files_tar(self, profile_tar):
+        profile = JobProfile.from_files([profile_tar])
+        assert profile.sources == [
+            "profile_dumps.tar.gz:dumps/rdd_0.pstats",
+            "profile_dumps.tar.gz:dumps/rdd_1.pstats",
+            "profile_dumps.tar.gz:dumps/rdd_2.pstats",
+        ]
+        (leaf,) = [h for h in profile.hotspots(limit=None) if h["function"] == "_slow_leaf"]
+        assert leaf["ncalls"] == 6
+        assert leaf["filename"].endswith("test_profiling.py")
+
+    def test_from_files_empty(self, tmp_path):
+        (tmp_path / "foo.txt").write_text("hello")
+        with pytest.raises(OpenEoClientException, match="No profiling data"):
+            JobProfile.from_files([tmp_path / "foo.txt"])
+
+    def test_merge(self, tmp_path, profile_tar):
+        p1 = JobProfile.from_files([profile_tar])
+        p2 = JobProfile.from_files([_dump_profile(tmp_path / "x.pstats")])
+        merged = JobProfile.merge([p1, p2])
+        assert len(merged.sources) == 4
+        (udf,) = [h for h in merged.hotspots(limit=None) if h["function"] == "_udf"]
+        assert udf["ncalls"] == 4
+
+    def test_hotspots(self, profile_tar):
+        profile = JobProfile.from_files([profile_tar])
+        hotspots = profile.hotspots(limit=3, filename_filter=r"test_profiling\.py$")
+        assert len(hotspots) == 3
+        assert set(hotspots[0].keys()) == {"function", "filename", "line", "ncalls", "tottime", "cumtime"}
+        assert [h["tottime"] for h in hotspots] == sorted([h["tottime"] for h in hotspots], reverse=True)
+        by_cumtime = profile.hotspots(limit=1, sort="cumtime", filename_filter=r"test_profiling\.py$")
+        assert by_cumtime[0]["function"] == "_udf"
+        with pytest.raises(ValueError):
+            profile.hotspots(sort="foo")
+
+    def test_collapsed_stacks(self, tmp_path, profile_tar):
+        profile = JobProfile.from_files([profile_tar])
+        stacks = profile.collapsed_stacks()
+        udf_stacks = {s: v for s, v in stacks.items() if "_udf (" in s}
+        assert any(s.split(";")[-1].startswith("_slow_leaf (") for s in udf_stacks)
+        assert all(isinstance(v, int) and v > 0 for v in stacks.values())
+        # Total self time is roughly preserved
+        total = sum(h["tottime"] for h in profile.hotspots(limit=None))
+        assert sum(stacks.values()) / 1e6 == pytest.approx(total, rel=0.05)
+
+        path = profile.write_collapsed_stacks(tmp_path / "profile.folded")
+        lines = path.read_text().strip().split("\n")
+        assert len(lines) == len(stacks)
+        stack, value = lines[0].rsplit(" ", 1)
+        assert stacks[stack] == int(value)
+
+    def test_collapsed_stacks_diamonds(self, caplog):
+        # Chain of "diamonds": each function is called by both functions of the previous layer,
+        # which gives 2**depth distinct call paths.
+        depth = 16
+        stats = {}
+        layers = [[("udf.py", 1, "root")]]
+        layers += [[("udf.py", 10 * k + i, f"f{k}_{i}") for i in range(2)] for k in range(depth)]
+        for k, layer in reversed(list(enumerate(layers))):
+            for func in layer:
+                ct = 1.0 + (stats[layers[k + 1][0]][3] if k + 1 < len(layers) else 0)
+                callers = {c: (1, 1, 0.5, ct / len(layers[k - 1])) for c in layers[k - 1]} if k > 0 else {}
+                stats[func] = (1, 1, 1.0, ct, callers)
+        profile = JobProfile(stats=pstats.Stats())
+        profile.stats.stats = stats
+
+        t0 = time.time()
+        stacks = profile.collapsed_stacks(max_stacks=1000)
+        assert time.time() - t0 < 5
+        assert 0 < len(stacks) <= 1000
+        assert "Collapsed stacks are incomplete" in caplog.text
+        assert "root (udf.py:1)" in stacks
+        assert max(len(s.split(";")) for s in stacks) == depth + 1
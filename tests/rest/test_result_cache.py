@@ -0,0 +1,57 @@
+import time_machine
+
+from openeo.rest.result_cache import ResultCache
+
+
+class TestResultCache:
+    def test_get_put(self, tmp_path):
+        cache = ResultCache(tmp_path)
+        assert cache.get("abc") is None
+        cache.put("abc", b"hello")
+        assert cache.get("abc").read_bytes() == b"hello"
+
+    def test_put_file(self, tmp_path):
+        cache = ResultCache(tmp_path / "cache")
+        source = tmp_path / "result.tiff"
+        source.write_bytes(b"tiff")
+        cache.put("abc", source)
+        assert cache.get("abc").read_bytes() == b"tiff"
+        assert [p.name for p in (tmp_path / "cache").iterdir()] == ["abc.result"]
+
+    def test_ttl(self, tmp_path):
+        with time_machine.travel("2022-10-01 12:00:00+00") as traveller:
+            cache = ResultCache(tmp_path, ttl=3600)
+            cache.put("abc", b"hello")
+            traveller.shift(3000)
+            assert cache.get("abc").read_bytes() == b"hello"
+            cache.put("def", b"world")
+            traveller.shift(1000)
+            assert cache.get("abc") is None
+            assert cache.get("def").read_bytes() == b"world"
+            assert sorted(p.name for p in tmp_path.iterdir()) == ["def.result"]
+
+    def test_max_size(self, tmp_path):
+        with time_machine.travel("2022-10-01 12:00:00+00") as traveller:
+            cache = ResultCache(tmp_path, max_size=10)
+            cache.put("a", b"aaaa")
+            traveller.shift(10)
+            cache.put("b", b"bbbb")
+            traveller.shift(10)
+            # Recently used
+            assert cache.get("a") is not None
+            traveller.shift(10)
+            cache.put("c", b"cccc")
+            assert cache.get("a") is not None
+            assert cache.get("b") is None
+            assert cache.get("c") is not None
+            # Too large to cache
+            cache.put("d", b"d" * 11)
+            assert cache.get("d") is None
+            assert sorted(p.name for p in tmp_path.iterdir()) == ["a.result", "c.result"]
+
+    def test_clear(self, tmp_path):
+        cache = ResultCache(tmp_path)
+        cache.put("abc", b"hello")
+        cache.clear()
+        assert cache.get("abc") is None
+        assert list(tmp_path.iterdir()) == []